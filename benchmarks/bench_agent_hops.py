@@ -0,0 +1,75 @@
+"""
+Per-turn agent hops, model calls and latency through root_agent.
+
+Runs PROMPTS through the full agent tree and reports, for each turn, the
+agents that produced events, how many transfers and model calls it took
+and the wall-clock latency. Run once as is and once with --baseline
+(local routing and model-free delegation disabled) to compare before and
+after. This calls the real LLM, so it needs the usual API keys.
+
+Usage:
+    uv run python -m benchmarks.bench_agent_hops [--baseline]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import print_table
+
+
+PROMPTS = [
+    "Create a database for a gym with members, trainers and classes",
+    "How many tables are in the database?",
+]
+
+
+async def run_turns() -> List[Dict[str, Any]]:
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from kosix_agent.agent import root_agent
+
+    runner = InMemoryRunner(agent=root_agent, app_name="bench_agent_hops")
+    rows = []
+    for prompt in PROMPTS:
+        session = await runner.session_service.create_session(app_name="bench_agent_hops", user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text=prompt)])
+        agents, transfers, model_calls = [], 0, 0
+        start = time.perf_counter()
+        async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            if event.author != "user" and (not agents or agents[-1] != event.author):
+                agents.append(event.author)
+            if event.actions and event.actions.transfer_to_agent:
+                transfers += 1
+            if event.usage_metadata is not None:
+                model_calls += 1
+        rows.append({
+            "prompt": prompt[:40],
+            "path": " -> ".join(agents),
+            "hops": len(agents),
+            "transfers": transfers,
+            "model_calls": model_calls,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", action="store_true", help="disable local routing and model-free delegation")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so set them before importing the agents
+    enabled = "false" if args.baseline else "true"
+    os.environ["KOSIX_ROUTER_FAST_PATH_ENABLED"] = enabled
+    os.environ["KOSIX_DELEGATION_FAST_PATH_ENABLED"] = enabled
+
+    title = "agent hops per turn (baseline)" if args.baseline else "agent hops per turn (fast paths enabled)"
+    print_table(title, asyncio.run(run_turns()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark 100 concurrent schema tool calls on one event loop.
+
+The blocking psycopg2 tool is awaited the way a sync tool would run inside
+the FastAPI/ADK event loop (serialized, blocking the loop); the asyncpg
+tool runs the same calls concurrently.
+
+Usage:
+    uv run python -m benchmarks.bench_async_schema
+"""
+
+import asyncio
+import time
+
+from benchmarks.common import bench_dsn, print_table
+from kosix_agent.tools.schema_tool import getCachedMetaData, getMetaData
+from kosix_agent.tools.schema_tool_async import getCachedMetaDataAsync, getMetaDataAsync
+
+
+CONCURRENCY = 100
+
+
+async def run_blocking(fn, dsn: str) -> float:
+    async def call():
+        fn(dsn)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(CONCURRENCY)))
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_async(fn, dsn: str) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(fn(dsn) for _ in range(CONCURRENCY)))
+    return (time.perf_counter() - start) * 1000
+
+
+async def main() -> None:
+    dsn = bench_dsn()
+
+    # Warm pools and the metadata cache
+    getCachedMetaData(dsn)
+    await getCachedMetaDataAsync(dsn)
+
+    rows = []
+    for label, blocking, native in [
+        ("cached (fingerprint only)", getCachedMetaData, getCachedMetaDataAsync),
+        ("full introspection", getMetaData, getMetaDataAsync),
+    ]:
+        blocking_ms = await run_blocking(blocking, dsn)
+        async_ms = await run_async(native, dsn)
+        rows.append({
+            "workload": label,
+            "requests": CONCURRENCY,
+            "psycopg2_blocking_ms": round(blocking_ms, 1),
+            "asyncpg_ms": round(async_ms, 1),
+            "speedup": round(blocking_ms / async_ms, 2)
+        })
+
+    print_table("schema tool under concurrent requests", rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
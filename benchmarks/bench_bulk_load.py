@@ -0,0 +1,120 @@
+"""
+Bulk loader throughput against row-by-row INSERT.
+
+Writes a CSV of ROWS orders to a temporary file and loads it into a fresh
+table of the local benchmark database:
+
+- insert: one INSERT per row in one transaction (what an agent writing
+  INSERT statements amounts to, without the model time), on a sample and
+  extrapolated to the whole file
+- copy: bulk_load() with the default chunk size
+- copy_rejects: bulk_load() with one invalid row per BAD_EVERY rows,
+  isolated by bisecting the failed chunks
+
+Usage:
+    uv run python -m benchmarks.bench_bulk_load
+"""
+
+import csv
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import bench_dsn, print_table
+from kosix_agent.tools.bulk_loader import bulk_load
+from kosix_agent.utils.db_pool import pooled_connection
+
+
+ROWS = 200000
+INSERT_SAMPLE = 5000
+BAD_EVERY = 20000
+TABLE = "bench_bulk_orders"
+
+DDL = f"""
+DROP TABLE IF EXISTS {TABLE};
+DROP TYPE IF EXISTS bench_order_status;
+CREATE TYPE bench_order_status AS ENUM ('new', 'paid', 'shipped');
+CREATE TABLE {TABLE} (
+    id BIGINT PRIMARY KEY,
+    customer VARCHAR(64) NOT NULL,
+    amount NUMERIC(12, 2),
+    placed_at TIMESTAMP,
+    status bench_order_status
+);
+"""
+
+HEADER = ["Order Id", "Customer", "Amount", "Placed At", "Status"]
+MAPPING = {"Order Id": "id", "Customer": "customer", "Amount": "amount", "Placed At": "placed_at", "Status": "status"}
+
+
+def write_source(path: str, bad_every: int = 0) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(ROWS):
+            status = "lost" if bad_every and i % bad_every == 7 else ("new", "paid", "shipped")[i % 3]
+            writer.writerow([i, f"customer {i % 977}", f"{i % 1000}.25", "2026-01-05 10:00:00", status])
+
+
+def reset(dsn: str) -> None:
+    with pooled_connection(dsn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(DDL)
+        conn.commit()
+        cursor.close()
+
+
+def insert_rows(dsn: str, path: str) -> Dict[str, Any]:
+    reset(dsn)
+    with open(path, newline="") as f, pooled_connection(dsn) as conn:
+        reader = csv.reader(f)
+        next(reader)
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        for i, row in enumerate(reader):
+            if i >= INSERT_SAMPLE:
+                break
+            cursor.execute(f"INSERT INTO {TABLE} (id, customer, amount, placed_at, status) VALUES (%s, %s, %s, %s, %s)", row)
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        cursor.close()
+    return {
+        "mode": "insert",
+        "rows_loaded": INSERT_SAMPLE,
+        "rows_rejected": 0,
+        "seconds": round(elapsed * ROWS / INSERT_SAMPLE, 2),
+        "rows_per_second": round(INSERT_SAMPLE / elapsed)
+    }
+
+
+def copy_rows(dsn: str, path: str, mode: str) -> Dict[str, Any]:
+    reset(dsn)
+    summary = bulk_load(dsn, TABLE, path, MAPPING)
+    if summary["reject_file"]:
+        os.remove(summary["reject_file"])
+    return {
+        "mode": mode,
+        "rows_loaded": summary["rows_loaded"],
+        "rows_rejected": summary["rows_rejected"],
+        "seconds": round(summary["elapsed_ms"] / 1000, 2),
+        "rows_per_second": summary["rows_per_second"]
+    }
+
+
+def main() -> None:
+    dsn = bench_dsn()
+    with tempfile.TemporaryDirectory() as directory:
+        clean, dirty = os.path.join(directory, "orders.csv"), os.path.join(directory, "orders_rejects.csv")
+        write_source(clean)
+        write_source(dirty, BAD_EVERY)
+        rows: List[Dict[str, Any]] = [
+            insert_rows(dsn, clean),
+            copy_rows(dsn, clean, "copy"),
+            copy_rows(dsn, dirty, "copy_rejects")
+        ]
+    print_table(f"Loading {ROWS} rows (insert extrapolated from {INSERT_SAMPLE})", rows)
+
+
+if __name__ == "__main__":
+    main()
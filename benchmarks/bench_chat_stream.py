@@ -0,0 +1,108 @@
+"""
+Time to first byte of the streaming chat endpoint under concurrent load.
+
+Serves server.main's app in-process with the ADK runner replaced by a
+single agent on a stub model that sleeps LLM_DELAY seconds before
+answering, then opens CLIENTS concurrent POST /chat/message streams and
+records, per request, when the first SSE event arrived and when the
+stream ended. TTFB should stay flat while the total latency follows the
+stubbed model delay. No LLM or database is involved (execute is off).
+
+Usage:
+    uv run python -m benchmarks.bench_chat_stream
+"""
+
+import asyncio
+import statistics
+import time
+from typing import AsyncGenerator, Dict, List
+
+import httpx
+import uvicorn
+from google.adk import Agent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from benchmarks.common import print_table
+from server.chat import get_runner
+from server.main import app
+
+
+PORT = 8765
+CLIENTS = 50
+LLM_DELAYS = [0.1, 0.5, 2.0]
+
+
+class StubLlm(BaseLlm):
+    """Answers every request with fixed text after a delay"""
+
+    delay: float = 0.0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.delay)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="There are 12 tables.")]))
+
+
+def stub_runner(delay: float) -> InMemoryRunner:
+    agent = Agent(model=StubLlm(model="stub", delay=delay), name="stub_agent", instruction="Answer briefly.")
+    return InMemoryRunner(agent=agent, app_name="kosix")
+
+
+async def one_turn(client: httpx.AsyncClient, n: int) -> Dict[str, float]:
+    body = {"message": "How many tables are there?", "user_id": f"bench-{n}", "execute": False}
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/chat/message", json=body) as response:
+        async for chunk in response.aiter_raw():
+            if first is None and chunk:
+                first = time.perf_counter()
+    end = time.perf_counter()
+    return {"ttfb_ms": (first - start) * 1000, "total_ms": (end - start) * 1000}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "median": round(statistics.median(samples), 1),
+        "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+    }
+
+
+async def run() -> List[Dict[str, object]]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    rows = []
+    try:
+        limits = httpx.Limits(max_connections=CLIENTS)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+            for delay in LLM_DELAYS:
+                runner = stub_runner(delay)
+                app.dependency_overrides[get_runner] = lambda: runner
+                results = await asyncio.gather(*(one_turn(client, n) for n in range(CLIENTS)))
+                ttfb = summarize([r["ttfb_ms"] for r in results])
+                total = summarize([r["total_ms"] for r in results])
+                rows.append({
+                    "llm_delay_s": delay,
+                    "clients": CLIENTS,
+                    "ttfb_median_ms": ttfb["median"],
+                    "ttfb_p95_ms": ttfb["p95"],
+                    "total_median_ms": total["median"],
+                    "total_p95_ms": total["p95"],
+                })
+    finally:
+        app.dependency_overrides.clear()
+        server.should_exit = True
+        await serving
+    return rows
+
+
+def main() -> None:
+    print_table("POST /chat/message, stubbed LLM", asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
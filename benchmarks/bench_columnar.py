@@ -0,0 +1,77 @@
+"""
+Compare dict-per-row results with the columnar result representation.
+
+Builds a synthetic 10k-row result shaped like a typical analytics query
+(integer id, numeric amount, text, timestamp, boolean) and measures memory
+held by each representation and the time to encode it for the API.
+
+Usage:
+    uv run python -m benchmarks.bench_columnar
+"""
+
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from benchmarks.common import measure, print_table
+from kosix_agent.utils.columnar import ColumnarBuilder, ColumnarResult
+
+
+ROWS = 10_000
+COLUMNS = ["order_id", "amount", "customer_name", "created_at", "is_paid"]
+TYPE_CODES = [23, 1700, 25, 1114, 16]
+
+
+def make_rows():
+    start = datetime(2024, 1, 1)
+    return [
+        (i, Decimal(i) / 7, f"customer {i % 997}", start + timedelta(minutes=i), i % 3 == 0)
+        for i in range(ROWS)
+    ]
+
+
+def build_dicts(rows):
+    # What RealDictCursor produces: one dict per row with repeated keys
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def build_columnar(rows):
+    builder = ColumnarBuilder(COLUMNS, TYPE_CODES)
+    builder.append_batch(rows)
+    return builder.build()
+
+
+def retained_bytes(fn, rows):
+    tracemalloc.start()
+    result = fn(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    rows = make_rows()
+    dict_rows = build_dicts(rows)
+    columnar = build_columnar(rows)
+    wire = columnar.to_wire()
+
+    print_table("memory held by a 10k-row result", [
+        {"representation": "dict per row", "bytes": retained_bytes(build_dicts, rows)},
+        {"representation": "columnar buffers", "bytes": retained_bytes(build_columnar, rows)},
+    ])
+
+    print_table("encode / decode time", [
+        {"operation": "dict rows -> JSON", **measure(lambda: json.dumps(dict_rows, default=str), repeat=20)},
+        {"operation": "columnar -> wire (chunks)", **measure(columnar.to_wire_buffers, repeat=20)},
+        {"operation": "columnar -> wire (bytes)", **measure(columnar.to_wire, repeat=20)},
+        {"operation": "wire -> columnar", **measure(lambda: ColumnarResult.from_wire(wire), repeat=20)},
+        {"operation": "columnar -> row JSON", **measure(lambda: json.dumps(columnar.to_contract()), repeat=20)},
+    ])
+
+    print(f"\nwire payload: {len(wire)} bytes, JSON payload: {len(json.dumps(dict_rows, default=str))} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+File ingestion: parse cost, memory and the columnar table against the raw file.
+
+Generates CSV uploads of increasing size in a temporary store and reports,
+per size:
+
+- upload: receive_upload() hashing the stream while writing it
+- parse: ingest() of a new checksum (type inference + columnar table)
+- peak_mb: traced Python memory while parsing; stays flat as files grow
+- dedupe: ingest() of the same bytes again, which reuses the table
+- scan / csv: summing one numeric column from the table versus re-reading
+  the raw CSV
+
+Usage:
+    uv run python -m benchmarks.bench_file_ingest
+"""
+
+import asyncio
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Dict, List
+
+from benchmarks.common import print_table
+from kosix_agent.utils import file_store
+
+
+SIZES = [100000, 500000, 2000000]
+CHUNK = 64 * 1024
+
+
+def write_csv(path: str, rows: int) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["order_id", "customer", "amount", "placed_at", "paid", "region"])
+        for i in range(rows):
+            writer.writerow([i, f"customer {i % 977}", f"{i % 1000}.25", f"2026-01-{i % 28 + 1:02d} 10:00:00", i % 2 == 0, f"region {i % 7}"])
+
+
+async def stream(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK):
+            yield chunk
+
+
+def timed(fn) -> Any:
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run(directory: str, rows: int) -> Dict[str, Any]:
+    source = os.path.join(directory, f"orders_{rows}.csv")
+    write_csv(source, rows)
+
+    upload, upload_s = timed(lambda: asyncio.run(file_store.receive_upload(stream(source))))
+    _, parse_s = timed(lambda: file_store.ingest(upload["path"], upload["checksum"], source))
+
+    # Parse again under tracemalloc (which slows it down) for the memory peak
+    os.remove(file_store.table_path(upload["checksum"]))
+    traced = asyncio.run(file_store.receive_upload(stream(source)))
+    tracemalloc.start()
+    file_store.ingest(traced["path"], traced["checksum"], source)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    again = asyncio.run(file_store.receive_upload(stream(source)))
+    deduplicated, dedupe_s = timed(lambda: file_store.ingest(again["path"], again["checksum"], source))
+    assert deduplicated["deduplicated"]
+
+    def scan() -> float:
+        with file_store.FileTable(file_store.table_path(upload["checksum"])) as table:
+            return sum(sum(v for v in segment["amount"] if v is not None) for segment in table.scan(["amount"]))
+
+    def reread() -> float:
+        with open(source, newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            return sum(float(row[2]) for row in reader)
+
+    _, scan_s = timed(scan)
+    _, csv_s = timed(reread)
+    return {
+        "rows": rows,
+        "file_mb": round(upload["size"] / 1e6, 1),
+        "upload_s": round(upload_s, 2),
+        "parse_s": round(parse_s, 2),
+        "rows_per_s": round(rows / parse_s),
+        "peak_mb": round(peak / 1e6, 1),
+        "dedupe_ms": round(dedupe_s * 1000, 1),
+        "scan_s": round(scan_s, 3),
+        "csv_s": round(csv_s, 3),
+    }
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        file_store.FILE_STORE_DIR = directory
+        rows: List[Dict[str, Any]] = [run(directory, size) for size in SIZES]
+    print_table("File ingestion by size", rows)
+
+
+if __name__ == "__main__":
+    main()
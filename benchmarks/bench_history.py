@@ -0,0 +1,110 @@
+"""
+Conversation history cost against conversation length.
+
+Seeds conversations of increasing length in the application database
+(DATABASE_URL, migrated with the Prisma schema; use a local one) and
+reports, per length:
+
+- agent_context(): the rows read and the rendered context size the agents get
+- record_turn(): storing a turn and advancing the rolling summary
+- the last page of history through the keyset cursor versus OFFSET (skip)
+
+All of it should stay flat as the conversation grows, except the OFFSET
+page, which is the baseline the cursor replaces.
+
+Usage:
+    uv run python -m benchmarks.bench_history
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from prisma import Json
+
+from benchmarks.common import measure, print_table
+from kosix_agent.agents.context_plugin import render_context
+from kosix_agent.utils.history import (
+    agent_context,
+    encode_cursor,
+    fold_summary,
+    list_messages,
+    message_text,
+    record_turn
+)
+from kosix_agent.utils.prisma_client import get_prisma
+from kosix_agent.utils.tokens import estimate_tokens
+
+
+LENGTHS = [10, 100, 1000, 10000]
+PAGE = 50
+
+
+def seed(org_id: str, user_id: str, messages: int) -> str:
+    db = get_prisma()
+    conversation_id = str(uuid.uuid4())
+    db.conversation.create(data={"id": conversation_id, "userId": user_id, "organizationId": org_id, "title": "bench"})
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    rows = [
+        {
+            "role": "USER" if i % 2 == 0 else "ASSISTANT",
+            "content": Json({"text": f"message {i}: how many orders shipped to region {i % 7} last week?"}),
+            "conversationId": conversation_id,
+            "createdAt": start + timedelta(milliseconds=i)
+        }
+        for i in range(messages)
+    ]
+    for i in range(0, len(rows), 1000):
+        db.message.create_many(data=rows[i:i + 1000])
+    # Summary as record_turn would have left it (seeded rows have no ids yet; createdAt orders them)
+    summary = fold_summary(None, [
+        {"role": row["role"], "text": message_text(row["content"].data), "cursor": encode_cursor(row["createdAt"], "")}
+        for row in rows[:-12]
+    ]) if messages > 12 else None
+    if summary is not None:
+        db.conversation.update(where={"id": conversation_id}, data={"summary": Json(summary)})
+    return conversation_id
+
+
+def rows_for(org_id: str, user_id: str, messages: int) -> Dict[str, Any]:
+    db = get_prisma()
+    conversation_id = seed(org_id, user_id, messages)
+    context = agent_context(conversation_id, user_id, org_id)
+    rendered = render_context(context) or ""
+
+    cursor = None
+    for _ in range(max(0, (messages - 1) // PAGE)):
+        cursor = list_messages(conversation_id, PAGE, cursor)["next_cursor"]
+    keyset = measure(lambda: list_messages(conversation_id, PAGE, cursor), repeat=5)
+    offset = measure(lambda: db.message.find_many(
+        where={"conversationId": conversation_id},
+        order=[{"createdAt": "desc"}, {"id": "desc"}],
+        skip=max(0, messages - PAGE),
+        take=PAGE
+    ), repeat=5)
+
+    now = datetime.now(timezone.utc)
+    record = measure(lambda: record_turn(
+        conversation_id, user_id, org_id, {"text": "and the week before?"}, {"text": "SELECT 1"}, now, now
+    ), repeat=5)
+    return {
+        "messages": messages,
+        "context_messages": len(context["recent"]),
+        "context_tokens": estimate_tokens(rendered),
+        "agent_context_ms": measure(lambda: agent_context(conversation_id, user_id, org_id), repeat=5)["median_ms"],
+        "record_turn_ms": record["median_ms"],
+        "last_page_keyset_ms": keyset["median_ms"],
+        "last_page_offset_ms": offset["median_ms"],
+    }
+
+
+def main() -> None:
+    db = get_prisma()
+    org = db.organization.create(data={"name": "bench"})
+    user = db.user.create(data={"email": f"bench-{uuid.uuid4()}@example.com", "organizationId": org.id})
+    rows: List[Dict[str, Any]] = [rows_for(org.id, user.id, messages) for messages in LENGTHS]
+    print_table("Conversation history by length", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark getMetaData on synthetic schemas of 10, 100 and 1000 tables.
+
+Each synthetic schema is a chain of tables with a primary key, a few typed
+columns, a secondary index and a foreign key to the previous table.
+
+Usage:
+    uv run python -m benchmarks.bench_introspection
+"""
+
+import psycopg2
+
+from benchmarks.common import bench_dsn, measure, print_table
+from kosix_agent.tools.schema_tool import getMetaData
+
+
+SIZES = [10, 100, 1000]
+
+
+def create_synthetic_schema(dsn: str, schema: str, table_count: int) -> None:
+    """(Re)create a schema with table_count chained tables"""
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+    cursor.execute(f'CREATE SCHEMA "{schema}"')
+    for i in range(table_count):
+        parent = f", parent_id integer REFERENCES \"{schema}\".t_{i - 1}(id)" if i else ""
+        cursor.execute(f"""
+            CREATE TABLE "{schema}".t_{i} (
+                id serial PRIMARY KEY,
+                name varchar(120) NOT NULL,
+                amount numeric(12,2),
+                created_at timestamp DEFAULT now()
+                {parent}
+            )
+        """)
+        cursor.execute(f'CREATE INDEX ON "{schema}".t_{i} (created_at)')
+        cursor.execute(f"COMMENT ON TABLE \"{schema}\".t_{i} IS 'synthetic table {i}'")
+    cursor.close()
+    conn.close()
+
+
+def drop_schema(dsn: str, schema: str) -> None:
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    conn.cursor().execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+    conn.close()
+
+
+def main() -> None:
+    dsn = bench_dsn()
+    rows = []
+    for size in SIZES:
+        schema = f"bench_introspect_{size}"
+        create_synthetic_schema(dsn, schema, size)
+        try:
+            metadata = getMetaData(dsn, schemas=[schema])
+            stats = measure(lambda: getMetaData(dsn, schemas=[schema]), repeat=5)
+            rows.append({
+                "tables": size,
+                "introspected": len(metadata["tables"]),
+                "relationships": len(metadata["relationships"]),
+                **stats
+            })
+        finally:
+            drop_schema(dsn, schema)
+
+    print_table("getMetaData (set-based catalog queries)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Join-path lookups on synthetic foreign key graphs.
+
+Builds random schemas of increasing size (each table references up to
+three earlier tables, the first reference indexed) and reports the graph
+build time, the first lookup for a set of tables (which computes the
+shortest-path trees it needs) and repeated lookups (served from the
+memoized trees).
+
+Usage:
+    uv run python -m benchmarks.bench_join_graph
+"""
+
+import random
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_table
+from kosix_agent.tools.join_graph import JoinGraph
+
+
+SIZES = [50, 250, 1000, 2000]
+
+
+def synthetic_metadata(size: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    tables = []
+    for i in range(size):
+        parents = rng.sample(range(i), min(i, rng.randint(1, 3))) if i else []
+        foreign_keys = [
+            {"column": f"t{p}_id", "references": {"table": f"t{p}", "column": "id"}, "constraint": f"t{i}_t{p}_fkey"}
+            for p in parents
+        ]
+        tables.append({
+            "schema": "public",
+            "table_name": f"t{i}",
+            "row_count_estimate": rng.randint(10, 10 ** 7),
+            "primary_key": ["id"],
+            "indexes": [{"name": f"t{i}_fk_idx", "columns": [foreign_keys[0]["column"]], "unique": False}] if foreign_keys else [],
+            "columns": [],
+            "foreign_keys": foreign_keys
+        })
+    return {"tables": tables}
+
+
+def rows_for(size: int) -> Dict[str, Any]:
+    metadata = synthetic_metadata(size)
+    build = measure(lambda: JoinGraph(metadata), repeat=3)
+    rng = random.Random(size)
+    lookups: List[List[str]] = [[f"t{n}" for n in rng.sample(range(size), 3)] for _ in range(20)]
+
+    graph = JoinGraph(metadata)
+    cold = measure(lambda: graph.join_path(lookups[0]), repeat=1)
+    warm = measure(lambda: [graph.join_path(tables) for tables in lookups], repeat=5)
+    return {
+        "tables": size,
+        "edges": graph.stats()["edges"],
+        "build_ms": build["median_ms"],
+        "first_lookup_ms": cold["median_ms"],
+        "warm_lookup_ms": round(warm["median_ms"] / len(lookups), 3),
+    }
+
+
+def main() -> None:
+    print_table("join path graph", [rows_for(size) for size in SIZES])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark 1,000 consecutive schema tool calls with and without connection pooling.
+
+The unpooled baseline reproduces the previous behaviour: open a connection,
+run the cache-validation fingerprint query, close. The pooled run calls
+getCachedMetaData, which borrows from the shared pool.
+
+Usage:
+    uv run python -m benchmarks.bench_pool
+"""
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from benchmarks.common import bench_dsn, measure, print_table
+from kosix_agent.tools.schema_tool import _get_fingerprint, getCachedMetaData
+from kosix_agent.utils.db_pool import pool_stats
+
+
+CALLS = 1000
+
+
+def unpooled_call(dsn: str) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        _get_fingerprint(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    dsn = bench_dsn()
+
+    # Warm the metadata cache so both runs measure connection cost plus one query
+    getCachedMetaData(dsn)
+
+    rows = [
+        {"mode": "connect per call", "calls": CALLS, **measure(lambda: unpooled_call(dsn), repeat=CALLS)},
+        {"mode": "pooled", "calls": CALLS, **measure(lambda: getCachedMetaData(dsn), repeat=CALLS)},
+    ]
+    print_table("schema tool call latency", rows)
+    print("\npool stats:", pool_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Offline accuracy and latency of the local intent router.
+
+Classifies a labeled prompt set (disjoint from the router's training
+examples) and reports, per intent and overall: how many prompts took the
+fast path, how many of those were routed correctly, the accuracy of the
+classifier's top intent on all prompts, and classification latency. No
+network or database is used.
+
+Usage:
+    uv run python -m benchmarks.bench_router
+"""
+
+import time
+
+from benchmarks.common import print_table
+from kosix_agent.utils.intent_router import INTENT_AGENTS, INTENTS, IntentRouter
+
+
+LABELED = [
+    ("Create a database for a gym with members, trainers and classes", "schema_creation"),
+    ("I want tables for my bakery orders", "schema_creation"),
+    ("design a schema for a hotel reservation system", "schema_creation"),
+    ("Can you build me a data model for a veterinary clinic?", "schema_creation"),
+    ("set up a database to track my book collection", "schema_creation"),
+    ("I need tables for projects, tasks and team members", "schema_creation"),
+    ("normalize this into 3NF: order id, customer name, product, price", "schema_creation"),
+    ("create an invoices table with line items", "schema_creation"),
+    ("make a schema for an event ticketing platform", "schema_creation"),
+    ("add a suppliers table related to products", "schema_creation"),
+    ("upload sales.csv", "data_insertion"),
+    ("insert 3 new products: pen, pencil, eraser", "data_insertion"),
+    ("import this Excel sheet into employees", "data_insertion"),
+    ("load the attached customer list", "data_insertion"),
+    ("populate the tasks table with some example rows", "data_insertion"),
+    ("add Alice to the members table with plan gold", "data_insertion"),
+    ("bulk load these 500 transactions", "data_insertion"),
+    ("ingest the parquet export from last night", "data_insertion"),
+    ("save this order for customer 17", "data_insertion"),
+    ("seed the rooms table with 20 rooms", "data_insertion"),
+    ("How many orders were placed last month?", "analytics"),
+    ("top 5 customers by lifetime value", "analytics"),
+    ("what is the total revenue per product category", "analytics"),
+    ("show me daily active users for the last 30 days", "analytics"),
+    ("which suppliers deliver late most often", "analytics"),
+    ("average ticket price by event", "analytics"),
+    ("list all members whose plan expires this week", "analytics"),
+    ("compare bookings in June and July", "analytics"),
+    ("who placed the largest order", "analytics"),
+    ("give me monthly sales broken down by region", "analytics"),
+]
+
+
+def main() -> None:
+    router = IntentRouter()
+    available = list(INTENT_AGENTS.values())
+
+    results = []
+    for text, label in LABELED:
+        start = time.perf_counter()
+        classification, agent_name = router.route(text, available)
+        results.append((label, classification["intent"], bool(agent_name), (time.perf_counter() - start) * 1e6))
+
+    rows = []
+    for intent in list(INTENTS) + ["all"]:
+        subset = [r for r in results if intent == "all" or r[0] == intent]
+        fast = [r for r in subset if r[2]]
+        latencies = sorted(r[3] for r in subset)
+        rows.append({
+            "intent": intent,
+            "prompts": len(subset),
+            "fast_path": len(fast),
+            "coverage": f"{len(fast) / len(subset):.0%}",
+            "fast_path_precision": f"{sum(r[0] == r[1] for r in fast) / len(fast):.0%}" if fast else "-",
+            "top1_accuracy": f"{sum(r[0] == r[1] for r in subset) / len(subset):.0%}",
+            "p50_us": round(latencies[len(latencies) // 2], 1),
+            "max_us": round(latencies[-1], 1),
+        })
+    print_table(f"intent router (min confidence {router.min_confidence})", rows)
+
+    misrouted = [(text, label, r[1]) for (text, label), r in zip(LABELED, results) if r[2] and r[0] != r[1]]
+    for text, label, predicted in misrouted:
+        print(f"misrouted: {text!r} expected {label}, routed as {predicted}")
+
+
+if __name__ == "__main__":
+    main()
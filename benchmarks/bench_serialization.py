@@ -0,0 +1,114 @@
+"""
+Compare schema serialization formats by token count and sql_agent latency.
+
+Token counts use litellm's tokenizer for the configured model. Metadata
+comes from recorded getMetaData dumps (JSON files passed on the command
+line) or, when none are given, from the local benchmark database.
+
+With --e2e, each question in QUESTIONS is also run through sql_agent once
+per format (this calls the real LLM, so it needs the usual API keys).
+
+Usage:
+    uv run python -m benchmarks.bench_serialization [recorded.json ...] [--record out.json] [--e2e]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import litellm
+
+from benchmarks.common import bench_dsn, print_table
+from kosix_agent.tools.schema_serializer import available_formats, serialize_schema
+from kosix_agent.tools.schema_tool import getMetaData
+
+
+MODEL = "groq/openai/gpt-oss-120b"
+
+QUESTIONS = [
+    "How many rows does each table have?",
+    "List the ten most recent records by created_at",
+]
+
+
+def count_tokens(text: str) -> int:
+    return litellm.token_counter(model=MODEL, text=text)
+
+
+def token_rows(name: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for fmt in available_formats():
+        serialized = serialize_schema(metadata, fmt)
+        tokens = count_tokens(serialized["text"])
+        rows.append({
+            "schema": name,
+            "tables": len(metadata["tables"]),
+            "format": fmt,
+            "chars": serialized["chars"],
+            "tokens": tokens,
+            "estimated_tokens": serialized["estimated_tokens"],
+        })
+    json_tokens = next(r["tokens"] for r in rows if r["format"] == "json")
+    for row in rows:
+        row["vs_json"] = f"{row['tokens'] / json_tokens:.0%}"
+    return rows
+
+
+async def e2e_rows() -> List[Dict[str, Any]]:
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from kosix_agent.agents.sql_agent import sql_agent
+
+    runner = InMemoryRunner(agent=sql_agent, app_name="bench_serialization")
+    rows = []
+    for fmt in available_formats():
+        latencies = []
+        for question in QUESTIONS:
+            session = await runner.session_service.create_session(
+                app_name="bench_serialization", user_id="bench", state={"schema_format": fmt}
+            )
+            message = types.Content(role="user", parts=[types.Part(text=question)])
+            start = time.perf_counter()
+            async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+                pass
+            latencies.append((time.perf_counter() - start) * 1000)
+        rows.append({
+            "format": fmt,
+            "questions": len(QUESTIONS),
+            "mean_ms": round(sum(latencies) / len(latencies), 1),
+            "max_ms": round(max(latencies), 1),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recorded", nargs="*", help="getMetaData JSON dumps to compare")
+    parser.add_argument("--record", help="write the live benchmark database's metadata to this file")
+    parser.add_argument("--e2e", action="store_true", help="also measure sql_agent latency per format")
+    args = parser.parse_args()
+
+    schemas = {}
+    for path in args.recorded:
+        with open(path) as f:
+            schemas[path] = json.load(f)
+    if not schemas:
+        schemas["live"] = getMetaData(bench_dsn())
+        if args.record:
+            with open(args.record, "w") as f:
+                json.dump(schemas["live"], f)
+
+    rows = []
+    for name, metadata in schemas.items():
+        rows.extend(token_rows(name, metadata))
+    print_table("schema serialization size", rows)
+
+    if args.e2e:
+        print_table("sql_agent end-to-end latency", asyncio.run(e2e_rows()))
+
+
+if __name__ == "__main__":
+    main()
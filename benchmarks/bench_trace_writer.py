@@ -0,0 +1,129 @@
+"""
+AgentTrace write throughput: per-trace INSERTs versus the buffered COPY writer.
+
+Writes into a scratch copy of the AgentTrace table in the local benchmark
+database. The baseline inserts and commits one trace at a time, the way a
+synchronous write per agent hop would. The TraceWriter runs are fed by
+several producer threads and report the cost of record() on the caller
+and the end-to-end rate until every trace is in the table. The last run
+uses a buffer smaller than the burst to show load shedding.
+
+Usage:
+    uv run python -m benchmarks.bench_trace_writer
+"""
+
+import json
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+import psycopg2
+
+from benchmarks.common import bench_dsn, print_table
+from kosix_agent.utils.trace_writer import TraceWriter
+
+
+TABLE = "bench_agent_trace"
+TRACES = 50000
+PRODUCERS = 4
+BASELINE_TRACES = 1000
+
+_DDL = f"""
+    CREATE TABLE IF NOT EXISTS "{TABLE}" (
+        "id" TEXT PRIMARY KEY,
+        "agentName" TEXT NOT NULL,
+        "input" JSONB NOT NULL,
+        "output" JSONB NOT NULL,
+        "durationMs" INTEGER NOT NULL,
+        "conversationId" TEXT,
+        "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+INPUT = {"message": "How many orders were placed last month by customers in Germany?"}
+OUTPUT = {"text": "SELECT count(*) FROM orders o JOIN customers c ON c.id = o.customer_id WHERE c.country = 'DE' LIMIT 1000"}
+
+
+def reset(conn) -> None:
+    cursor = conn.cursor()
+    cursor.execute(_DDL)
+    cursor.execute(f'TRUNCATE "{TABLE}"')
+    conn.commit()
+
+
+def row_count(conn) -> int:
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT count(*) FROM "{TABLE}"')
+    conn.commit()
+    return cursor.fetchone()[0]
+
+
+def baseline(conn) -> Dict[str, object]:
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for _ in range(BASELINE_TRACES):
+        cursor.execute(
+            f'INSERT INTO "{TABLE}" ("id", "agentName", "input", "output", "durationMs", "conversationId") '
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (str(uuid.uuid4()), "sql_agent", json.dumps(INPUT), json.dumps(OUTPUT), 42, "bench")
+        )
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    return {
+        "writer": "INSERT per trace",
+        "batch": 1,
+        "traces": BASELINE_TRACES,
+        "record_us": round(elapsed / BASELINE_TRACES * 1e6, 1),
+        "traces_per_s": round(BASELINE_TRACES / elapsed),
+        "dropped": 0,
+    }
+
+
+def buffered(conn, batch_size: int, capacity: int) -> Dict[str, object]:
+    writer = TraceWriter(dsn=bench_dsn(), table=TABLE, capacity=capacity, batch_size=batch_size, flush_interval=0.05)
+    record_seconds: List[float] = []
+
+    def produce(count: int) -> None:
+        started = time.perf_counter()
+        for _ in range(count):
+            writer.record("sql_agent", INPUT, OUTPUT, 42, "bench")
+        record_seconds.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(TRACES // PRODUCERS,)) for _ in range(PRODUCERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close(timeout=120)
+    elapsed = time.perf_counter() - started
+
+    stats = writer.stats()
+    assert row_count(conn) == stats["written"]
+    return {
+        "writer": "TraceWriter (COPY)",
+        "batch": batch_size,
+        "traces": TRACES,
+        "record_us": round(sum(record_seconds) / TRACES * 1e6, 1),
+        "traces_per_s": round(stats["written"] / elapsed),
+        "dropped": stats["dropped"] + stats["failed"],
+    }
+
+
+def main() -> None:
+    conn = psycopg2.connect(bench_dsn())
+    rows = []
+    reset(conn)
+    rows.append(baseline(conn))
+    for batch_size in (100, 1000, 5000):
+        reset(conn)
+        rows.append(buffered(conn, batch_size, capacity=TRACES))
+    reset(conn)
+    rows.append(buffered(conn, 1000, capacity=TRACES // 10))
+    conn.close()
+    print_table(f"AgentTrace writes ({PRODUCERS} producer threads for TraceWriter)", rows)
+
+
+if __name__ == "__main__":
+    main()
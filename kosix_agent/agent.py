@@ -4,7 +4,9 @@ Coordinates sub-agents for multi-agent SQL generation system.
 """
 
 from google.adk import Agent
+from kosix_agent.agents.callbacks import intent_router_callback
 from kosix_agent.agents.creator_agent import creator_agent
+from kosix_agent.agents.inserter_agent import inserter_agent
 from kosix_agent.agents.sql_agent import sql_agent
 
 
@@ -46,7 +48,7 @@ ROUTING RULES (CRITICAL):
   → transfer_to_agent("InserterCoordinator")
 
 - If intent is analytics:
-  → transfer_to_agent("AnalyticsAgent")
+  → transfer_to_agent("sql_agent")
 
   
 ABSOLUTE CONSTRAINTS:
@@ -69,5 +71,7 @@ TERMINATION RULE (VERY IMPORTANT):
 You are a silent router.
 Classify → Route → Return → Stop.
 """,
-    sub_agents=[creator_agent, sql_agent]
+    sub_agents=[creator_agent, inserter_agent, sql_agent],
+    # Confidently classified messages are routed locally without a model call
+    before_model_callback=intent_router_callback([creator_agent.name, inserter_agent.name, sql_agent.name])
 )
\ No newline at end of file
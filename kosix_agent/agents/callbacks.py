@@ -0,0 +1,133 @@
+"""
+Agent callbacks that short-circuit model calls.
+
+The root router callback classifies the user's message locally and, when
+the classifier is confident, answers the root agent's model call with a
+transfer_to_agent call itself, so routing costs no LLM round trip.
+
+The sql_agent callbacks put the natural-language -> SQL cache in front of
+the agent: before the agent runs, the user's question is looked up under
+the data source's current schema fingerprint and a hit is returned as the
+agent's answer without calling the model; after the model produces its
+final SQL, the answer is stored for later questions.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Callable, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from kosix_agent.agents.delegation import transfer_response
+from kosix_agent.config.setting import NL_SQL_CACHE_ENABLED, ROUTER_FAST_PATH_ENABLED
+from kosix_agent.tools.schema_tool_async import get_fingerprint_async
+from kosix_agent.utils.datasource import resolve_datasource
+from kosix_agent.utils.intent_router import intent_router
+from kosix_agent.utils.nl_sql_cache import nl_sql_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Session state key (temp: keys are not persisted) holding the pending cache miss
+_PENDING_KEY = "temp:nl_sql_cache"
+
+_SQL_START = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+def _text(content: Optional[types.Content]) -> str:
+    if content is None or not content.parts:
+        return ""
+    return "".join(part.text or "" for part in content.parts).strip()
+
+
+def intent_router_callback(available_agents: List[str]) -> Callable:
+    """
+    Build a before_model callback that routes confidently classified messages locally.
+
+    Transfers go to the router's own sub-agents; a delegation-only agent
+    among them forwards without a model call (see agents.delegation).
+
+    Args:
+        available_agents: Names of the sub-agents the router may transfer to
+    """
+    def route_intent(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        if not ROUTER_FAST_PATH_ENABLED or not llm_request.contents:
+            return None
+        # Only the first model call of a turn, so a transfer back to the router falls through to the LLM
+        message = llm_request.contents[-1]
+        text = _text(message)
+        if message.role != "user" or not text or text != _text(callback_context.user_content):
+            return None
+
+        classification, agent_name = intent_router.route(text, available_agents)
+        logger.info(
+            "intent %s (confidence %.2f) -> %s",
+            classification["intent"], classification["confidence"], agent_name or "LLM router"
+        )
+        return transfer_response(agent_name) if agent_name else None
+
+    return route_intent
+
+
+async def sql_cache_before_agent(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Answer from the NL -> SQL cache, or note the question so the generated SQL can be stored"""
+    if not NL_SQL_CACHE_ENABLED:
+        return None
+    question = _text(callback_context.user_content)
+    if not question:
+        return None
+
+    try:
+        datasource = await asyncio.to_thread(resolve_datasource, callback_context)
+        fingerprint = await get_fingerprint_async(
+            datasource["connection_uri"],
+            cache_key=datasource["cache_key"],
+            org_id=datasource["organization_id"]
+        )
+    except Exception as e:
+        logger.warning("NL -> SQL cache unavailable: %s", e)
+        return None
+
+    org_id = datasource["organization_id"] or ""
+    hit = nl_sql_cache.lookup(org_id, datasource["cache_key"], fingerprint, question)
+    if hit is not None:
+        logger.info(
+            "NL -> SQL cache hit (similarity %.2f, rebound %s) for %r",
+            hit["similarity"], hit["rebound"], question
+        )
+        return types.Content(role="model", parts=[types.Part(text=hit["sql"])])
+
+    callback_context.state[_PENDING_KEY] = {
+        "org_id": org_id,
+        "datasource_key": datasource["cache_key"],
+        "fingerprint": fingerprint,
+        "question": question,
+        "started": time.time()
+    }
+    return None
+
+
+def sql_cache_after_model(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """Store the final SQL answer of a cache miss"""
+    pending = callback_context.state.get(_PENDING_KEY)
+    if not pending or llm_response.partial or llm_response.content is None:
+        return None
+    if any(part.function_call for part in llm_response.content.parts or []):
+        return None
+
+    sql = _text(llm_response.content)
+    if _SQL_START.match(sql):
+        nl_sql_cache.store(
+            pending["org_id"],
+            pending["datasource_key"],
+            pending["fingerprint"],
+            pending["question"],
+            sql,
+            latency_ms=(time.time() - pending["started"]) * 1000
+        )
+    callback_context.state[_PENDING_KEY] = None
+    return None
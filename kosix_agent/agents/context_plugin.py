@@ -0,0 +1,60 @@
+"""
+ADK plugin bounding the conversation context of every model call.
+
+Chat sessions live as long as their conversation. Requests are trimmed to
+the last CONTEXT_MAX_TURNS user turns of the session, so the prompt stops
+growing however many turns it holds. When the session carries a
+"history_context" (set by the chat endpoint from
+kosix_agent.utils.history.agent_context), the rolling summary and the
+recent messages older than those turns are appended to the system
+instruction.
+"""
+
+from typing import Any, Dict, Optional
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from kosix_agent.config.setting import CONTEXT_MAX_TURNS
+
+
+# Session state key holding {"summary", "recent"} for the turn
+HISTORY_CONTEXT_KEY = "history_context"
+
+# ADK replays other agents' replies as user content starting with this
+_FOREIGN_AGENT_PREFIX = "For context:"
+
+
+def render_context(context: Dict[str, Any]) -> Optional[str]:
+    sections = []
+    if context.get("summary"):
+        sections.append("Summary of the earlier conversation:\n" + context["summary"])
+    if context.get("recent"):
+        sections.append("Most recent messages, oldest first:\n" + "\n".join(
+            f"{message['role'].lower()}: {message['text']}" for message in context["recent"]
+        ))
+    return "\n\n".join(sections) or None
+
+
+def _is_user_turn(content) -> bool:
+    if content.role != "user" or not content.parts:
+        return False
+    text = "".join(part.text or "" for part in content.parts)
+    return bool(text) and not text.startswith(_FOREIGN_AGENT_PREFIX)
+
+
+class ContextPlugin(BasePlugin):
+    """Adds the persisted history to model calls and caps the replayed session history"""
+
+    def __init__(self, max_turns: int = CONTEXT_MAX_TURNS, name: str = "kosix_context"):
+        super().__init__(name)
+        self.max_turns = max_turns
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        context = callback_context.state.get(HISTORY_CONTEXT_KEY)
+        text = render_context(context) if context else None
+        if text:
+            llm_request.append_instructions([text])
+
+        turns = [i for i, content in enumerate(llm_request.contents) if _is_user_turn(content)]
+        if len(turns) > self.max_turns:
+            llm_request.contents = llm_request.contents[turns[-self.max_turns]:]
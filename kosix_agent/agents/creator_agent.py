@@ -1,11 +1,13 @@
-from google.adk.agents import Agent
 from kosix_agent.agents.creator_subagent.refiner_agent import refiner_agent
-from kosix_agent.agents.creator_subagent.schema_agent import schema_agent
+from kosix_agent.agents.delegation import delegation_agent
 
-creator_agent = Agent(
+# Delegation-only: forwards to RefinerAgent without a model call; the
+# instruction is only used if RefinerAgent hands the turn back
+creator_agent = delegation_agent(
     name="CreatorCoordinator",
     model="groq/openai/gpt-oss-120b",
     description="Delegates table creation requests to the RefinerAgent.",
+    target=refiner_agent,
     instruction="""
 You are the Creator Coordinator Agent.
 
@@ -42,6 +44,5 @@ TERMINATION RULE:
 
 You are a thin delegation layer.
 Delegate → Return → Stop.
-""",
-    sub_agents=[refiner_agent]
+"""
 )
\ No newline at end of file
@@ -1,9 +1,11 @@
 from google.adk.agents import Agent
+from kosix_agent.tools.dbml_compiler import apply_schema_tool
 
 schema_agent = Agent(
     name="SchemaAgent",
     model="groq/openai/gpt-oss-120b",
-    description="Transforms a fully refined database specification into DBML.",
+    description="Transforms a fully refined database specification into DBML and creates it in the connected database.",
+    tools=[apply_schema_tool],
     instruction="""
 You are the Schema Agent.
 
@@ -49,7 +51,7 @@ Ref: orders.user_id > users.id
 PROHIBITIONS (ABSOLUTE):
 
 - Do NOT ask questions
-- Do NOT generate SQL
+- Do NOT write SQL yourself (apply_schema_tool compiles the DBML)
 - Do NOT explain anything
 - Do NOT invent tables, columns, or relationships
 - Do NOT infer missing details
@@ -73,9 +75,21 @@ Ref: orders.user_id > users.id
 </dbml>
 
 
+APPLYING THE SCHEMA:
+
+1. Call `apply_schema_tool` with the DBML block and dry_run=true.
+   This only plans the DDL against the live database; nothing changes.
+2. If the result has an "error" caused by invalid DBML, fix the DBML and repeat step 1 once.
+3. If the result has an "error" or a non-empty "conflicts" list, do NOT apply.
+4. Otherwise call `apply_schema_tool` again with the same DBML and dry_run=false.
+Never call it with dry_run=false before a clean dry run of the same DBML.
+
+
 FINAL OUTPUT RULE:
 
-- Output ONLY the <dbml> block
-- No surrounding text
+- Output the <dbml> block, then one line:
+  - Applied: <create_tables, add_columns, add_foreign_keys and add_indexes of the applied plan>
+  - or Not applied: <the error or conflicts>
+- No other text
 """
 )
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+Model-free agent hops.
+
+delegation_agent() declares an agent that only forwards to one sub-agent.
+It stays an LlmAgent, so the agent tree (and ADK's transfer rules across
+it) is unchanged, but its before_model callback answers the first model
+call of each turn with the transfer itself, so forwarding costs no LLM
+round trip. Routers still transfer to the delegation agent itself, so its
+place in the tree (and its fallback instruction) is kept.
+"""
+
+import logging
+from typing import Callable, Optional
+
+from google.adk.agents import Agent, BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from kosix_agent.config.setting import DELEGATION_FAST_PATH_ENABLED
+
+
+logger = logging.getLogger(__name__)
+
+
+def transfer_response(agent_name: str) -> LlmResponse:
+    """A model response that hands the turn to another agent"""
+    return LlmResponse(content=types.Content(role="model", parts=[
+        types.Part(function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": agent_name}))
+    ]))
+
+
+def _delegate_to(name: str, target: str) -> Callable:
+    # Session state key (temp: keys are not persisted) marking that this turn was already forwarded
+    forwarded_key = f"temp:delegated:{name}"
+
+    def delegate(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        if not DELEGATION_FAST_PATH_ENABLED:
+            return None
+        # If the target hands the turn back, let the model handle it as before
+        if callback_context.state.get(forwarded_key) == callback_context.invocation_id:
+            return None
+        callback_context.state[forwarded_key] = callback_context.invocation_id
+        logger.info("%s forwarding to %s without a model call", name, target)
+        return transfer_response(target)
+
+    return delegate
+
+
+def delegation_agent(name: str, description: str, target: BaseAgent, instruction: str = "", model: str = None) -> Agent:
+    """
+    Build an agent that forwards every turn to a single sub-agent.
+
+    Args:
+        name: Agent name
+        description: Description shown to the agents that route to it
+        target: The agent requests are forwarded to
+        instruction: Prompt used only when the fast path is disabled or the
+            target transfers back
+        model: Model for that fallback path
+    """
+    return Agent(
+        name=name,
+        model=model or "groq/openai/gpt-oss-120b",
+        description=description,
+        instruction=instruction or f"Always transfer the request to {target.name}.",
+        sub_agents=[target],
+        before_model_callback=_delegate_to(name, target.name)
+    )
@@ -0,0 +1,142 @@
+"""
+ADK plugin feeding kosix_agent.utils.metrics.
+
+A runner plugin sees every agent, model call and tool of the tree without
+touching the agents' own callbacks. Agent spans nest: a transfer runs the
+target agent inside the parent's run, so a parent's duration includes its
+children. Spans that never get their "after" callback, because an agent or
+model callback answered early (the NL -> SQL cache, the local router, the
+delegation fast path), are settled when the invocation ends: open agent
+spans are observed at that point and open model calls are counted as
+skipped rather than timed. Turns that never reach after_run (a cancelled
+stream, an exception out of the run) are settled by end_invocation() from
+the caller, or once they outlive PLUGIN_INVOCATION_TTL_S or more than
+PLUGIN_MAX_OPEN_INVOCATIONS turns are open.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from kosix_agent.config.setting import PLUGIN_INVOCATION_TTL_S, PLUGIN_MAX_OPEN_INVOCATIONS
+from kosix_agent.utils.metrics import agent_seconds, llm_seconds, llm_short_circuits, llm_tokens, tool_seconds
+
+
+# usage_metadata attribute -> "kind" label of kosix_llm_tokens_total
+_TOKEN_FIELDS = {
+    "prompt_token_count": "prompt",
+    "candidates_token_count": "completion",
+    "cached_content_token_count": "cached",
+    "thoughts_token_count": "thoughts",
+}
+
+
+def _tool_status(result: Any) -> str:
+    """Tools report failures as {"status": "error"} dicts or JSON strings"""
+    if isinstance(result, str) and '"status"' in result:
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return "ok"
+    if isinstance(result, dict) and result.get("status") == "error":
+        return "error"
+    return "ok"
+
+
+class MetricsPlugin(BasePlugin):
+    """Records agent, model and tool latencies and token counts"""
+
+    def __init__(
+        self,
+        max_open_invocations: int = PLUGIN_MAX_OPEN_INVOCATIONS,
+        invocation_ttl: float = PLUGIN_INVOCATION_TTL_S,
+        name: str = "kosix_metrics"
+    ):
+        super().__init__(name)
+        self.max_open_invocations = max_open_invocations
+        self.invocation_ttl = invocation_ttl
+        # invocation id -> start time, oldest first
+        self._open: "OrderedDict[str, float]" = OrderedDict()
+        # (invocation id, agent) -> start times; a list since an agent can be re-entered by a transfer back
+        self._agents: Dict[Tuple[str, str], List[float]] = {}
+        # (invocation id, agent) -> (start time, model) of the model call in flight
+        self._models: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        # function call id -> (invocation id, start time)
+        self._tools: Dict[str, Tuple[str, float]] = {}
+
+    async def before_run_callback(self, *, invocation_context) -> None:
+        now = time.monotonic()
+        while self._open:
+            invocation_id, started = next(iter(self._open.items()))
+            if len(self._open) < self.max_open_invocations and now - started <= self.invocation_ttl:
+                break
+            self.end_invocation(invocation_id)
+        self._open[invocation_context.invocation_id] = now
+
+    async def before_agent_callback(self, *, agent, callback_context) -> None:
+        self._agents.setdefault((callback_context.invocation_id, agent.name), []).append(time.perf_counter())
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        starts = self._agents.get((callback_context.invocation_id, agent.name))
+        if starts:
+            agent_seconds.observe(time.perf_counter() - starts.pop(), agent=agent.name)
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        if key in self._models:
+            # The previous call of this agent was answered by a callback
+            llm_short_circuits.inc(agent=callback_context.agent_name)
+        self._models[key] = (time.perf_counter(), llm_request.model or "")
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        if llm_response.partial:
+            return
+        agent = callback_context.agent_name
+        pending = self._models.pop((callback_context.invocation_id, agent), None)
+        model = pending[1] if pending else (llm_response.model_version or "")
+        if pending:
+            llm_seconds.observe(time.perf_counter() - pending[0], agent=agent, model=model)
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            for field, kind in _TOKEN_FIELDS.items():
+                count = getattr(usage, field, None)
+                if count:
+                    llm_tokens.inc(count, agent=agent, model=model, kind=kind)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        pending = self._models.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if pending:
+            llm_seconds.observe(time.perf_counter() - pending[0], agent=callback_context.agent_name, model=pending[1])
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> None:
+        self._tools[tool_context.function_call_id] = (tool_context.invocation_id, time.perf_counter())
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> None:
+        self._finish_tool(tool.name, tool_context.function_call_id, _tool_status(result))
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> None:
+        self._finish_tool(tool.name, tool_context.function_call_id, "exception")
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        self.end_invocation(invocation_context.invocation_id)
+
+    def end_invocation(self, invocation_id: str) -> None:
+        """Settle and forget what is still open of an invocation; a no-op once it was settled"""
+        self._open.pop(invocation_id, None)
+        now = time.perf_counter()
+        for key in [key for key in self._agents if key[0] == invocation_id]:
+            for started in self._agents.pop(key):
+                agent_seconds.observe(now - started, agent=key[1])
+        for key in [key for key in self._models if key[0] == invocation_id]:
+            del self._models[key]
+            llm_short_circuits.inc(agent=key[1])
+        for call_id in [call_id for call_id, (owner, _) in self._tools.items() if owner == invocation_id]:
+            del self._tools[call_id]
+
+    def _finish_tool(self, name: str, call_id: Optional[str], status: str) -> None:
+        pending = self._tools.pop(call_id, None)
+        if pending:
+            tool_seconds.observe(time.perf_counter() - pending[1], tool=name, status=status)
@@ -0,0 +1,134 @@
+"""
+ADK plugin recording an AgentTrace row per agent run and per tool call.
+
+Callbacks only collect references and hand them to trace_writer.record(),
+which queues them; encoding and the database write happen on the writer's
+thread. An agent's input is the user message of the turn and its output
+the last final text it produced. Tool traces carry the tool name and
+arguments as input and its response as output, under the calling agent's
+name. Traces are tagged with the session state's conversation_id, or the
+session id without one. Agent runs cut short by a callback (a cached SQL
+answer, a local routing decision) are recorded when the invocation ends.
+Turns that never reach after_run (a cancelled stream, an exception out of
+the run) are settled by end_invocation() from the caller, or once they
+outlive PLUGIN_INVOCATION_TTL_S or more than PLUGIN_MAX_OPEN_INVOCATIONS
+turns are open.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from kosix_agent.config.setting import PLUGIN_INVOCATION_TTL_S, PLUGIN_MAX_OPEN_INVOCATIONS
+from kosix_agent.utils.trace_writer import TraceWriter, trace_writer
+
+
+def _text(content) -> Optional[str]:
+    if content is None or not content.parts:
+        return None
+    text = "".join(part.text or "" for part in content.parts if not part.thought)
+    return text or None
+
+
+class TracePlugin(BasePlugin):
+    """Queues agent and tool traces on a TraceWriter"""
+
+    def __init__(
+        self,
+        writer: TraceWriter = trace_writer,
+        max_open_invocations: int = PLUGIN_MAX_OPEN_INVOCATIONS,
+        invocation_ttl: float = PLUGIN_INVOCATION_TTL_S,
+        name: str = "kosix_trace"
+    ):
+        super().__init__(name)
+        self.writer = writer
+        self.max_open_invocations = max_open_invocations
+        self.invocation_ttl = invocation_ttl
+        # invocation id -> (conversation id, user message, start time), oldest first
+        self._invocations: "OrderedDict[str, Tuple[str, Optional[str], float]]" = OrderedDict()
+        # (invocation id, agent) -> start times of nested runs
+        self._agents: Dict[Tuple[str, str], List[float]] = {}
+        # (invocation id, agent) -> last final text
+        self._outputs: Dict[Tuple[str, str], str] = {}
+        # function call id -> (invocation id, start time)
+        self._tools: Dict[str, Tuple[str, float]] = {}
+
+    async def before_run_callback(self, *, invocation_context) -> None:
+        now = time.monotonic()
+        while self._invocations:
+            invocation_id, (_, _, started) = next(iter(self._invocations.items()))
+            if len(self._invocations) < self.max_open_invocations and now - started <= self.invocation_ttl:
+                break
+            self.end_invocation(invocation_id)
+
+        session = invocation_context.session
+        self._invocations[invocation_context.invocation_id] = (
+            session.state.get("conversation_id") or session.id,
+            _text(invocation_context.user_content),
+            now
+        )
+
+    async def on_event_callback(self, *, invocation_context, event) -> None:
+        if event.partial:
+            return
+        text = _text(event.content)
+        if text is not None:
+            self._outputs[(invocation_context.invocation_id, event.author)] = text
+
+    async def before_agent_callback(self, *, agent, callback_context) -> None:
+        self._agents.setdefault((callback_context.invocation_id, agent.name), []).append(time.perf_counter())
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        key = (callback_context.invocation_id, agent.name)
+        starts = self._agents.get(key)
+        if starts:
+            self._record_agent(key, starts.pop(), time.perf_counter())
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> None:
+        self._tools[tool_context.function_call_id] = (tool_context.invocation_id, time.perf_counter())
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> None:
+        self._record_tool(tool, tool_args, tool_context, {"result": result})
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> None:
+        self._record_tool(tool, tool_args, tool_context, {"error": str(error)})
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        self.end_invocation(invocation_context.invocation_id)
+
+    def end_invocation(self, invocation_id: str) -> None:
+        """Record open agent runs of an invocation and forget its state; a no-op once it was settled"""
+        now = time.perf_counter()
+        for key in [key for key in self._agents if key[0] == invocation_id]:
+            for started in self._agents.pop(key):
+                self._record_agent(key, started, now)
+        for key in [key for key in self._outputs if key[0] == invocation_id]:
+            del self._outputs[key]
+        for call_id in [call_id for call_id, (owner, _) in self._tools.items() if owner == invocation_id]:
+            del self._tools[call_id]
+        self._invocations.pop(invocation_id, None)
+
+    def _record_agent(self, key: Tuple[str, str], started: float, ended: float) -> None:
+        conversation_id, message, _ = self._invocations.get(key[0], (None, None, None))
+        self.writer.record(
+            key[1],
+            {"message": message},
+            {"text": self._outputs.get(key)},
+            (ended - started) * 1000,
+            conversation_id
+        )
+
+    def _record_tool(self, tool, tool_args: Dict[str, Any], tool_context, output: Dict[str, Any]) -> None:
+        pending = self._tools.pop(tool_context.function_call_id, None)
+        if pending is None:
+            return
+        conversation_id, _, _ = self._invocations.get(tool_context.invocation_id, (None, None, None))
+        self.writer.record(
+            tool_context.agent_name,
+            {"tool": tool.name, "args": tool_args},
+            output,
+            (time.perf_counter() - pending[1]) * 1000,
+            conversation_id
+        )
@@ -0,0 +1,153 @@
+"""
+Kosix Settings
+Environment-driven configuration shared by the agents, tools and server.
+"""
+
+import json
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Connection used by tools when the session is not bound to a DataSource row (unset: no fallback)
+DEFAULT_DATASOURCE_URI = os.getenv("KOSIX_DATASOURCE_URI")
+
+# Schema metadata cache
+SCHEMA_CACHE_MAX_ENTRIES = int(os.getenv("KOSIX_SCHEMA_CACHE_MAX_ENTRIES", "64"))
+SCHEMA_CACHE_PERSIST = os.getenv("KOSIX_SCHEMA_CACHE_PERSIST", "true").lower() == "true"
+# Resolved DataSource rows, so a schema cache hit needs no application database round trip
+DATASOURCE_CACHE_MAX_ENTRIES = int(os.getenv("KOSIX_DATASOURCE_CACHE_MAX_ENTRIES", "256"))
+DATASOURCE_CACHE_TTL_S = float(os.getenv("KOSIX_DATASOURCE_CACHE_TTL_S", "60"))
+
+# Tool-side connection pools (one pool per DataSource)
+POOL_MIN_SIZE = int(os.getenv("KOSIX_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("KOSIX_POOL_MAX_SIZE", "10"))
+POOL_MAX_LIFETIME_S = float(os.getenv("KOSIX_POOL_MAX_LIFETIME_S", "1800"))
+POOL_MAX_IDLE_S = float(os.getenv("KOSIX_POOL_MAX_IDLE_S", "300"))
+POOL_HEALTH_CHECK_AFTER_S = float(os.getenv("KOSIX_POOL_HEALTH_CHECK_AFTER_S", "30"))
+POOL_ACQUIRE_TIMEOUT_S = float(os.getenv("KOSIX_POOL_ACQUIRE_TIMEOUT_S", "10"))
+ORG_MAX_CONNECTIONS = int(os.getenv("KOSIX_ORG_MAX_CONNECTIONS", "20"))
+
+# Query-aware schema pruning
+SCHEMA_PRUNE_ENABLED = os.getenv("KOSIX_SCHEMA_PRUNE_ENABLED", "true").lower() == "true"
+SCHEMA_PRUNE_MIN_TABLES = int(os.getenv("KOSIX_SCHEMA_PRUNE_MIN_TABLES", "12"))
+SCHEMA_PRUNE_TOP_K = int(os.getenv("KOSIX_SCHEMA_PRUNE_TOP_K", "8"))
+SCHEMA_PRUNE_TOKEN_BUDGET = int(os.getenv("KOSIX_SCHEMA_PRUNE_TOKEN_BUDGET", "6000"))
+SCHEMA_PRUNE_MIN_CONFIDENCE = float(os.getenv("KOSIX_SCHEMA_PRUNE_MIN_CONFIDENCE", "0.5"))
+
+# Column value profiles from pg_stats, shown next to the schema
+COLUMN_PROFILE_ENABLED = os.getenv("KOSIX_COLUMN_PROFILE_ENABLED", "true").lower() == "true"
+COLUMN_PROFILE_MAX_VALUES = int(os.getenv("KOSIX_COLUMN_PROFILE_MAX_VALUES", "12"))
+# Minimum seconds between pg_stat_user_tables checks for new ANALYZE runs
+COLUMN_PROFILE_CHECK_INTERVAL_S = float(os.getenv("KOSIX_COLUMN_PROFILE_CHECK_INTERVAL_S", "60"))
+
+# Schema text handed to the LLM: "compact" (DDL-like) or "json"
+SCHEMA_SERIALIZATION_FORMAT = os.getenv("KOSIX_SCHEMA_FORMAT", "compact")
+
+# SQL execution
+EXECUTION_BATCH_SIZE = int(os.getenv("KOSIX_EXECUTION_BATCH_SIZE", "500"))
+# Validate generated SQL against the cached schema metadata before running it
+SQL_VALIDATION_ENABLED = os.getenv("KOSIX_SQL_VALIDATION_ENABLED", "true").lower() == "true"
+
+# EXPLAIN cost gate: planner cost and row budgets, overridable per organization with
+# KOSIX_COST_GATE_ORG_BUDGETS='{"<org id>": {"max_cost": 5e6, "max_rows": 1e7}}'
+COST_GATE_ENABLED = os.getenv("KOSIX_COST_GATE_ENABLED", "true").lower() == "true"
+COST_GATE_REWRITE = os.getenv("KOSIX_COST_GATE_REWRITE", "true").lower() == "true"
+COST_GATE_MAX_COST = float(os.getenv("KOSIX_COST_GATE_MAX_COST", "1000000"))
+COST_GATE_MAX_ROWS = float(os.getenv("KOSIX_COST_GATE_MAX_ROWS", "5000000"))
+COST_GATE_ORG_BUDGETS = json.loads(os.getenv("KOSIX_COST_GATE_ORG_BUDGETS", "{}"))
+COST_GATE_TIGHT_LIMIT = int(os.getenv("KOSIX_COST_GATE_TIGHT_LIMIT", "100"))
+COST_GATE_DATE_WINDOW_DAYS = int(os.getenv("KOSIX_COST_GATE_DATE_WINDOW_DAYS", "90"))
+
+# Query result cache
+RESULT_CACHE_ENABLED = os.getenv("KOSIX_RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("KOSIX_RESULT_CACHE_MAX_ENTRIES", "512"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("KOSIX_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_TTL_S = float(os.getenv("KOSIX_RESULT_CACHE_TTL_S", "900"))
+
+# Natural-language question -> SQL cache
+NL_SQL_CACHE_ENABLED = os.getenv("KOSIX_NL_SQL_CACHE_ENABLED", "true").lower() == "true"
+NL_SQL_CACHE_MAX_ENTRIES = int(os.getenv("KOSIX_NL_SQL_CACHE_MAX_ENTRIES", "256"))
+NL_SQL_CACHE_MAX_SCOPES = int(os.getenv("KOSIX_NL_SQL_CACHE_MAX_SCOPES", "128"))
+NL_SQL_CACHE_SIMILARITY = float(os.getenv("KOSIX_NL_SQL_CACHE_SIMILARITY", "0.85"))
+NL_SQL_CACHE_TTL_S = float(os.getenv("KOSIX_NL_SQL_CACHE_TTL_S", "86400"))
+
+# Local intent router
+ROUTER_FAST_PATH_ENABLED = os.getenv("KOSIX_ROUTER_FAST_PATH_ENABLED", "true").lower() == "true"
+ROUTER_MIN_CONFIDENCE = float(os.getenv("KOSIX_ROUTER_MIN_CONFIDENCE", "0.9"))
+
+# Model-free delegation through pass-through agents
+DELEGATION_FAST_PATH_ENABLED = os.getenv("KOSIX_DELEGATION_FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Streaming chat endpoint (server/chat.py)
+# Events buffered per request before the agent run is paused for a slow client
+CHAT_STREAM_QUEUE_SIZE = int(os.getenv("KOSIX_CHAT_STREAM_QUEUE_SIZE", "64"))
+CHAT_STREAM_HEARTBEAT_S = float(os.getenv("KOSIX_CHAT_STREAM_HEARTBEAT_S", "15"))
+
+# Health probes and metrics (server/health.py)
+# Probe results are reused for this long, so /health runs at most one probe per dependency per interval
+HEALTH_CACHE_TTL_S = float(os.getenv("KOSIX_HEALTH_CACHE_TTL_S", "10"))
+HEALTH_PROBE_TIMEOUT_S = float(os.getenv("KOSIX_HEALTH_PROBE_TIMEOUT_S", "2"))
+
+# Application database (Prisma's DATABASE_URL), for bulk writes that bypass Prisma
+APP_DATABASE_URI = os.getenv("DATABASE_URL", "")
+
+# AgentTrace writer: traces are buffered in memory and COPYed in batches by a background thread
+TRACE_ENABLED = os.getenv("KOSIX_TRACE_ENABLED", "true").lower() == "true"
+# Traces beyond this many unwritten ones are dropped rather than blocking the turn
+TRACE_BUFFER_SIZE = int(os.getenv("KOSIX_TRACE_BUFFER_SIZE", "10000"))
+TRACE_BATCH_SIZE = int(os.getenv("KOSIX_TRACE_BATCH_SIZE", "1000"))
+TRACE_FLUSH_INTERVAL_S = float(os.getenv("KOSIX_TRACE_FLUSH_INTERVAL_S", "1"))
+# Longer input/output JSON is replaced by a truncated preview
+TRACE_MAX_FIELD_CHARS = int(os.getenv("KOSIX_TRACE_MAX_FIELD_CHARS", "4000"))
+
+# Runner plugins (metrics, traces): state of turns that never reach after_run (cancelled, or
+# ended by an exception) is dropped once older than this, or beyond this many open turns
+PLUGIN_INVOCATION_TTL_S = float(os.getenv("KOSIX_PLUGIN_INVOCATION_TTL_S", "1800"))
+PLUGIN_MAX_OPEN_INVOCATIONS = int(os.getenv("KOSIX_PLUGIN_MAX_OPEN_INVOCATIONS", "1000"))
+
+# Conversation history: persisted turns, keyset pagination and the agents' bounded context
+HISTORY_PERSIST_ENABLED = os.getenv("KOSIX_HISTORY_PERSIST_ENABLED", "true").lower() == "true"
+# Most recent messages replayed to the agents verbatim; older ones only live on in the rolling summary
+HISTORY_WINDOW_MESSAGES = int(os.getenv("KOSIX_HISTORY_WINDOW_MESSAGES", "12"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("KOSIX_HISTORY_SUMMARY_MAX_TOKENS", "800"))
+HISTORY_PAGE_SIZE = int(os.getenv("KOSIX_HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("KOSIX_HISTORY_MAX_PAGE_SIZE", "200"))
+# User turns kept in a model request when a long-lived in-memory session is reused
+CONTEXT_MAX_TURNS = int(os.getenv("KOSIX_CONTEXT_MAX_TURNS", "6"))
+
+# Bulk loader for the data_insertion intent (kosix_agent/tools/bulk_loader.py)
+# Rows per COPY and commit; memory use is bounded by one chunk
+BULK_LOAD_CHUNK_ROWS = int(os.getenv("KOSIX_BULK_LOAD_CHUNK_ROWS", "10000"))
+# A load stops once this many rows have been rejected
+BULK_LOAD_MAX_REJECTS = int(os.getenv("KOSIX_BULK_LOAD_MAX_REJECTS", "10000"))
+BULK_LOAD_REJECT_DIR = os.getenv("KOSIX_BULK_LOAD_REJECT_DIR", os.path.join(tempfile.gettempdir(), "kosix_rejects"))
+
+# Uploaded files parsed into local columnar tables (kosix_agent/utils/file_store.py)
+FILE_STORE_DIR = os.getenv("KOSIX_FILE_STORE_DIR", os.path.join("data", "files"))
+# Rows read before parsing to infer the column types
+FILE_SCHEMA_SAMPLE_ROWS = int(os.getenv("KOSIX_FILE_SCHEMA_SAMPLE_ROWS", "1000"))
+# Rows converted and written at a time; memory use while parsing is bounded by one segment
+FILE_SEGMENT_ROWS = int(os.getenv("KOSIX_FILE_SEGMENT_ROWS", "65536"))
+# Larger uploads are rejected while they are received (0 for no limit)
+FILE_UPLOAD_MAX_BYTES = int(os.getenv("KOSIX_FILE_UPLOAD_MAX_BYTES", str(10 * 1024 ** 3)))
+FILE_ROWS_MAX_LIMIT = int(os.getenv("KOSIX_FILE_ROWS_MAX_LIMIT", "1000"))
+# An aggregate over an uploaded file fails rather than hold more groups than this
+FILE_QUERY_MAX_GROUPS = int(os.getenv("KOSIX_FILE_QUERY_MAX_GROUPS", "100000"))
+
+# Background schema refresh of every active DataSource (kosix_agent/tools/schema_scheduler.py)
+SCHEMA_REFRESH_ENABLED = os.getenv("KOSIX_SCHEMA_REFRESH_ENABLED", "true").lower() == "true"
+# Refreshes in flight at once; a cold start takes about the slowest source while sources <= this
+SCHEMA_REFRESH_CONCURRENCY = int(os.getenv("KOSIX_SCHEMA_REFRESH_CONCURRENCY", "64"))
+SCHEMA_REFRESH_TIMEOUT_S = float(os.getenv("KOSIX_SCHEMA_REFRESH_TIMEOUT_S", "30"))
+# Sources used by a chat turn (or whose organization had a conversation) within the window are active
+SCHEMA_REFRESH_ACTIVE_WINDOW_S = float(os.getenv("KOSIX_SCHEMA_REFRESH_ACTIVE_WINDOW_S", "1800"))
+SCHEMA_REFRESH_INTERVAL_S = float(os.getenv("KOSIX_SCHEMA_REFRESH_INTERVAL_S", "300"))
+SCHEMA_REFRESH_IDLE_INTERVAL_S = float(os.getenv("KOSIX_SCHEMA_REFRESH_IDLE_INTERVAL_S", "3600"))
+# Every interval is scaled by a random factor in [1 - jitter, 1 + jitter]
+SCHEMA_REFRESH_JITTER = float(os.getenv("KOSIX_SCHEMA_REFRESH_JITTER", "0.2"))
+SCHEMA_REFRESH_RELOAD_S = float(os.getenv("KOSIX_SCHEMA_REFRESH_RELOAD_S", "60"))
+# First retry delay after a failed refresh, doubled per consecutive failure up to the interval
+SCHEMA_REFRESH_RETRY_S = float(os.getenv("KOSIX_SCHEMA_REFRESH_RETRY_S", "30"))
@@ -0,0 +1,521 @@
+"""
+Bulk loader for the data_insertion intent.
+
+Rows never pass through the model. The source file (CSV, TSV, JSON lines
+or Excel, read by kosix_agent.utils.source_reader) is streamed in chunks of BULK_LOAD_CHUNK_ROWS, every value is
+coerced by a converter compiled once per column from the target table's
+metadata (getCachedMetaData), and each chunk is written with a single
+COPY ... FROM STDIN on the data source's pooled connection and committed.
+Memory stays bounded by one chunk whatever the size of the file.
+
+A chunk the database rejects is split in halves and retried until the
+offending rows are isolated; they go to a reject CSV (the source columns
+plus line number and error) next to the rows that failed coercion, and the
+rest of the chunk is loaded. Chunks are committed as they go, so a load
+that stops half way keeps the chunks before it; the summary says how far
+it got.
+
+The model is asked for the column mapping only: preview_load_tool returns
+the header, sample rows, target columns and a suggested mapping (names
+matched after normalization, then by similarity), and bulk_load_tool runs
+the whole load with the mapping it confirms. Both tools take the id of an
+uploaded File (see kosix_agent.utils.file_store) and only read files of the
+session's organization.
+"""
+
+import asyncio
+import csv
+import difflib
+import io
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+from google.adk.tools import ToolContext
+
+from kosix_agent.config.setting import (
+    BULK_LOAD_CHUNK_ROWS,
+    BULK_LOAD_MAX_REJECTS,
+    BULK_LOAD_REJECT_DIR
+)
+from kosix_agent.tools.schema_tool import getCachedMetaData
+from kosix_agent.utils.datasource import resolve_datasource
+from kosix_agent.utils.db_pool import pooled_connection
+from kosix_agent.utils.file_store import get_org_file
+from kosix_agent.utils.source_reader import SourceReader
+
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_ROWS = 5
+# Minimum similarity for a suggested mapping between names that do not match exactly
+_MATCH_CUTOFF = 0.8
+
+_TRUE = {"true", "t", "yes", "y", "1", "on"}
+_FALSE = {"false", "f", "no", "n", "0", "off"}
+_NULLS = {"", "null", "none", "\\n", "nan", "n/a"}
+_LENGTH = re.compile(r"\((\d+)\)")
+_DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y"]
+
+
+class RowError(Exception):
+    """A source value that cannot be converted to its target column"""
+
+
+# =============================================================================
+# Rejects
+# =============================================================================
+
+class RejectWriter:
+    """Appends rejected source rows to a CSV, created on the first reject"""
+
+    def __init__(self, path: str, header: List[str]):
+        self.path = path
+        self.header = header
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line: int, values: List[Optional[str]], error: str) -> None:
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["_line", "_error"] + self.header)
+        self._writer.writerow([line, error] + list(values[:len(self.header)]))
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+# =============================================================================
+# Column mapping and coercion
+# =============================================================================
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def suggest_mapping(header: List[str], columns: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Suggest a source column -> target column mapping.
+
+    Names equal after lower-casing and dropping punctuation are matched
+    first; the remaining ones are matched to the most similar free target
+    name above _MATCH_CUTOFF. Each target column is used at most once.
+
+    Args:
+        header: Source column names
+        columns: Target table columns from the metadata
+
+    Returns:
+        Dictionary of source column name -> target column name
+    """
+    targets = {_normalize(column["name"]): column["name"] for column in columns}
+    mapping: Dict[str, str] = {}
+    unmatched = []
+    for name in header:
+        target = targets.get(_normalize(name))
+        if target is not None and target not in mapping.values():
+            mapping[name] = target
+        else:
+            unmatched.append(name)
+    for name in unmatched:
+        free = [key for key, target in targets.items() if target not in mapping.values()]
+        close = difflib.get_close_matches(_normalize(name), free, n=1, cutoff=_MATCH_CUTOFF)
+        if close:
+            mapping[name] = targets[close[0]]
+    return mapping
+
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError("not a date")
+
+
+def _parse_timestamp(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return datetime.combine(_parse_date(value), datetime.min.time())
+
+
+def _as_integer(value: str) -> str:
+    value = value.replace(",", "").replace("_", "")
+    try:
+        return str(int(value))
+    except ValueError:
+        number = Decimal(value)
+        if number != number.to_integral_value():
+            raise ValueError("not an integer")
+        return str(int(number))
+
+
+def _as_decimal(value: str) -> str:
+    number = Decimal(value.replace(",", "").replace("_", ""))
+    if not number.is_finite():
+        raise ValueError("not a finite number")
+    return str(number)
+
+
+def _as_boolean(value: str) -> str:
+    lowered = value.lower()
+    if lowered in _TRUE:
+        return "true"
+    if lowered in _FALSE:
+        return "false"
+    raise ValueError("not a boolean")
+
+
+def _as_json(value: str) -> str:
+    json.loads(value)
+    return value
+
+
+def _converter(data_type: str) -> Callable[[str], str]:
+    if data_type in ("INTEGER", "BIGINT", "SMALLINT"):
+        return _as_integer
+    if data_type.startswith(("DECIMAL", "NUMERIC")) or data_type in ("REAL", "DOUBLE PRECISION"):
+        return _as_decimal
+    if data_type == "BOOLEAN":
+        return _as_boolean
+    if data_type == "DATE":
+        return lambda value: _parse_date(value).isoformat()
+    if data_type.startswith("TIMESTAMP"):
+        return lambda value: _parse_timestamp(value).isoformat()
+    if data_type in ("JSON", "JSONB"):
+        return _as_json
+    if data_type == "UUID":
+        return lambda value: str(uuid.UUID(value))
+    length = _LENGTH.search(data_type) if data_type.startswith(("VARCHAR", "CHARACTER")) else None
+    if length:
+        limit = int(length.group(1))
+
+        def bounded(value: str) -> str:
+            if len(value) > limit:
+                raise ValueError(f"longer than {limit} characters")
+            return value
+        return bounded
+    # Anything else (text, enums, arrays...) is left to the database to parse
+    return lambda value: value
+
+
+def compile_coercer(column: Dict[str, Any]) -> Callable[[Optional[str]], Optional[str]]:
+    """
+    Build the converter of a target column.
+
+    The converter takes a raw source value and returns its COPY text
+    representation (None for NULL) or raises RowError. Empty strings and
+    null markers are NULL for every column except text ones, where only a
+    missing value is.
+
+    Args:
+        column: Column metadata (name, data_type, nullable)
+    """
+    name, data_type, nullable = column["name"], column["data_type"].upper(), column["nullable"]
+    textual = data_type == "TEXT" or data_type.startswith(("VARCHAR", "CHARACTER"))
+    convert = _converter(data_type)
+
+    def coerce(value: Optional[str]) -> Optional[str]:
+        if value is not None and not textual:
+            value = value.strip()
+            if value.lower() in _NULLS:
+                value = None
+        if value is None:
+            if not nullable:
+                raise RowError(f"{name} is required")
+            return None
+        try:
+            return convert(value)
+        except InvalidOperation:
+            raise RowError(f"{name}: {value[:40]!r} is not a valid {data_type}")
+        except ValueError as e:
+            raise RowError(f"{name}: {value[:40]!r} is not a valid {data_type} ({e})")
+    return coerce
+
+
+def _copy_text(value: Optional[str]) -> str:
+    if value is None:
+        return "\\N"
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+# =============================================================================
+# Loading
+# =============================================================================
+
+def resolve_table(metadata: Dict[str, Any], table: str) -> Dict[str, Any]:
+    """Find a table by "schema.table" or bare name (public first) in the metadata"""
+    schema, _, name = table.rpartition(".")
+    candidates = [
+        t for t in metadata.get("tables", [])
+        if t["table_name"] == name and (not schema or t["schema"] == schema)
+    ]
+    if len(candidates) > 1:
+        candidates = [t for t in candidates if t["schema"] == "public"] or candidates
+    if len(candidates) != 1:
+        raise Exception(f"Table {table} not found" if not candidates else f"Table name {table} is ambiguous; qualify it with its schema")
+    return candidates[0]
+
+
+def _check_mapping(mapping: Dict[str, str], header: List[str], columns: Dict[str, Dict[str, Any]]) -> None:
+    missing = [source for source in mapping if source not in header]
+    if missing:
+        raise Exception(f"Source columns not in the file: {', '.join(missing)}")
+    unknown = [target for target in mapping.values() if target not in columns]
+    if unknown:
+        raise Exception(f"Target columns not in the table: {', '.join(unknown)}")
+    if len(set(mapping.values())) != len(mapping):
+        raise Exception("Each target column can be mapped from one source column only")
+    if not mapping:
+        raise Exception("The mapping is empty")
+
+
+def _chunks(rows: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_isolating(conn, copy_sql: str, rows: List[Tuple[int, List[Optional[str]], str]], rejects: RejectWriter) -> int:
+    """COPY the rows, bisecting on failure until the bad rows are isolated; returns rows loaded"""
+    cursor = conn.cursor()
+    try:
+        cursor.copy_expert(copy_sql, io.StringIO("".join(line for _, _, line in rows)))
+        conn.commit()
+        return len(rows)
+    except psycopg2.Error as e:
+        conn.rollback()
+        if len(rows) == 1:
+            line, values, _ = rows[0]
+            rejects.write(line, values, (e.pgerror or str(e)).strip().splitlines()[0])
+            return 0
+    finally:
+        cursor.close()
+    middle = len(rows) // 2
+    return _copy_isolating(conn, copy_sql, rows[:middle], rejects) + _copy_isolating(conn, copy_sql, rows[middle:], rejects)
+
+
+def bulk_load(
+    connection_string: str,
+    table: str,
+    source_path: str,
+    mapping: Optional[Dict[str, str]] = None,
+    cache_key: Optional[str] = None,
+    datasource_id: Optional[str] = None,
+    org_id: Optional[str] = None,
+    chunk_rows: int = BULK_LOAD_CHUNK_ROWS,
+    max_rejects: int = BULK_LOAD_MAX_REJECTS,
+    reject_path: Optional[str] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Load a CSV, TSV, JSON lines or Excel file into an existing table with chunked COPY.
+
+    Args:
+        connection_string: PostgreSQL connection string of the data source
+        table: Target table, "schema.table" or a bare name
+        source_path: Path of the source file
+        mapping: Source column -> target column (defaults to suggest_mapping);
+            unmapped target columns get their defaults
+        cache_key: Pool and metadata cache key of the data source
+        datasource_id: DataSource id whose schemaMetadata backs the metadata
+        org_id: Organization whose connection quota the load counts against
+        chunk_rows: Rows per COPY and commit
+        max_rejects: Stop the load once this many rows have been rejected
+        reject_path: Reject CSV (defaults to a new file in BULK_LOAD_REJECT_DIR)
+        progress: Called with the running summary after every chunk
+
+    Returns:
+        Summary with rows read, loaded and rejected, the reject file, timing
+        and, when the load stopped early, the reason
+    """
+    started = time.perf_counter()
+    metadata = getCachedMetaData(connection_string, cache_key=cache_key, datasource_id=datasource_id, org_id=org_id)
+    target = resolve_table(metadata, table)
+    columns = {column["name"]: column for column in target["columns"]}
+
+    with SourceReader(source_path) as source:
+        mapping = mapping if mapping is not None else suggest_mapping(source.header, target["columns"])
+        _check_mapping(mapping, source.header, columns)
+        positions = [source.header.index(name) for name in mapping]
+        coercers = [compile_coercer(columns[name]) for name in mapping.values()]
+        copy_sql = "COPY {}.{} ({}) FROM STDIN".format(
+            _quote(target["schema"]), _quote(target["table_name"]), ", ".join(_quote(name) for name in mapping.values())
+        )
+        reject_path = reject_path or os.path.join(
+            BULK_LOAD_REJECT_DIR, f"{target['table_name']}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.csv"
+        )
+        rejects = RejectWriter(reject_path, source.header)
+        summary = {
+            "table": f"{target['schema']}.{target['table_name']}",
+            "mapping": mapping,
+            "rows_read": 0,
+            "rows_loaded": 0,
+            "rows_rejected": 0,
+            "chunks": 0,
+            "completed": False
+        }
+
+        try:
+            with pooled_connection(connection_string, key=cache_key, org_id=org_id) as conn:
+                for chunk in _chunks(iter(source), chunk_rows):
+                    encoded = []
+                    for line, values in chunk:
+                        try:
+                            if len(values) > len(source.header):
+                                raise RowError(values[len(source.header)])
+                            fields = [coercer(values[i]) for i, coercer in zip(positions, coercers)]
+                        except RowError as e:
+                            rejects.write(line, values, str(e))
+                            continue
+                        encoded.append((line, values, "\t".join(_copy_text(field) for field in fields) + "\n"))
+                    loaded = _copy_isolating(conn, copy_sql, encoded, rejects) if encoded else 0
+
+                    summary["chunks"] += 1
+                    summary["rows_read"] += len(chunk)
+                    summary["rows_loaded"] += loaded
+                    summary["rows_rejected"] = rejects.count
+                    summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    summary["percent"] = round(100 * source.bytes_read / source.size, 1) if source.size else 100.0
+                    logger.info(
+                        "bulk load into %s: %d rows loaded, %d rejected, %.1f%% of %s",
+                        summary["table"], summary["rows_loaded"], rejects.count, summary["percent"], os.path.basename(source_path)
+                    )
+                    if progress is not None:
+                        progress(dict(summary))
+
+                    if summary["chunks"] == 1 and loaded == 0 and rejects.count:
+                        summary["stopped"] = "Every row of the first chunk was rejected; check the mapping and the reject file"
+                        break
+                    if rejects.count >= max_rejects:
+                        summary["stopped"] = f"Stopped after {rejects.count} rejected rows"
+                        break
+                else:
+                    summary["completed"] = True
+        finally:
+            rejects.close()
+
+    elapsed = time.perf_counter() - started
+    summary["elapsed_ms"] = round(elapsed * 1000, 1)
+    summary["rows_per_second"] = round(summary["rows_loaded"] / elapsed) if elapsed > 0 else None
+    summary["percent"] = 100.0 if summary["completed"] else summary.get("percent", 0.0)
+    summary["reject_file"] = reject_path if rejects.count else None
+    return summary
+
+
+# =============================================================================
+# Agent tools
+# =============================================================================
+
+def preview_load_tool(file_id: str, table: str, tool_context: ToolContext = None) -> str:
+    """
+    Reads the header and first rows of an uploaded data file and the columns of the target table,
+    and suggests which file column goes into which table column. Call this once before bulk_load_tool.
+
+    Args:
+        file_id: Id of the uploaded CSV, TSV, JSON lines or Excel file to load
+        table: Target table name, optionally schema-qualified (schema.table)
+
+    Returns:
+        JSON with the file header, sample rows, target columns, the suggested mapping
+        and the required target columns the mapping leaves out
+    """
+    try:
+        datasource = resolve_datasource(tool_context)
+        source_file = get_org_file(file_id, datasource["organization_id"])
+        metadata = getCachedMetaData(
+            datasource["connection_uri"],
+            cache_key=datasource["cache_key"],
+            datasource_id=datasource["id"],
+            org_id=datasource["organization_id"]
+        )
+        target = resolve_table(metadata, table)
+        with SourceReader(source_file.storagePath) as source:
+            samples = []
+            for _, values in source:
+                samples.append(values[:len(source.header)])
+                if len(samples) >= _SAMPLE_ROWS:
+                    break
+            header = source.header
+        mapping = suggest_mapping(header, target["columns"])
+        return json.dumps({
+            "file": source_file.filename,
+            "table": f"{target['schema']}.{target['table_name']}",
+            "source_columns": header,
+            "sample_rows": samples,
+            "target_columns": [
+                {"name": c["name"], "data_type": c["data_type"], "nullable": c["nullable"]} for c in target["columns"]
+            ],
+            "suggested_mapping": mapping,
+            "unmapped_source_columns": [name for name in header if name not in mapping],
+            "unmapped_required_columns": [
+                c["name"] for c in target["columns"] if not c["nullable"] and c["name"] not in mapping.values()
+            ]
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to preview load: {str(e)}",
+            "status": "error"
+        })
+
+
+async def bulk_load_tool(file_id: str, table: str, mapping: dict, tool_context: ToolContext = None) -> str:
+    """
+    Loads every row of an uploaded data file into an existing table. Call this exactly once per file,
+    after preview_load_tool, with the mapping you have confirmed.
+
+    Args:
+        file_id: Id of the uploaded CSV, TSV, JSON lines or Excel file to load
+        table: Target table name, optionally schema-qualified (schema.table)
+        mapping: Object mapping file column names to table column names; leave out
+            file columns that should not be loaded
+
+    Returns:
+        JSON summary with rows loaded and rejected and the reject file listing rejected rows
+    """
+    try:
+        datasource = await asyncio.to_thread(resolve_datasource, tool_context)
+        source_file = await asyncio.to_thread(get_org_file, file_id, datasource["organization_id"])
+        summary = await asyncio.to_thread(
+            bulk_load,
+            datasource["connection_uri"],
+            table,
+            source_file.storagePath,
+            {str(source): str(target) for source, target in mapping.items()},
+            cache_key=datasource["cache_key"],
+            datasource_id=datasource["id"],
+            org_id=datasource["organization_id"]
+        )
+        return json.dumps(summary)
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to load data: {str(e)}",
+            "status": "error"
+        })
@@ -0,0 +1,335 @@
+"""
+Column value profiles from pg_stats.
+
+The planner statistics PostgreSQL already keeps (null fraction, distinct
+count, most common values and histogram bounds) are pulled in bulk, one
+query for all the requested tables, and reduced to a compact profile per
+column: the full value set of enum-like columns, the dominant values of
+skewed ones, the value range, uniqueness and how often the column is NULL.
+schema_tool shows them next to the tables so generated predicates use
+values that actually exist. Columns listed in the security pii_policy keep
+only their null rate and distinct count: no values, top values or range.
+
+Profiles are cached per data source and per table, versioned by the
+table's last ANALYZE time in pg_stat_user_tables: a refresh only re-reads
+pg_stats for tables analyzed since they were cached, and the timestamp
+check itself runs at most once per COLUMN_PROFILE_CHECK_INTERVAL_S.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from kosix_agent.config.setting import (
+    COLUMN_PROFILE_CHECK_INTERVAL_S,
+    COLUMN_PROFILE_MAX_VALUES,
+    SCHEMA_CACHE_MAX_ENTRIES
+)
+from kosix_agent.utils.db_pool import pooled_connection
+from kosix_agent.utils.lru import LRUCache
+from kosix_agent.utils.metrics import catalog_query_seconds
+
+
+logger = logging.getLogger(__name__)
+
+# A column with at most this many distinct values whose most common values
+# cover (nearly) every non-null row is listed as a value set
+_ENUM_COVERAGE = 0.98
+# Most common values are listed for skewed columns whose top value covers at least this fraction
+_SKEW_MIN_FREQUENCY = 0.1
+_MAX_VALUE_CHARS = 40
+# Profile fields that reveal no values, kept for PII columns
+_PII_SAFE_FIELDS = ("null_frac", "distinct", "unique")
+
+
+# Last ANALYZE (manual or auto) of each requested table; NULL if never analyzed
+_ANALYZED_SQL = """
+    SELECT
+        schemaname as schema,
+        relname as table_name,
+        greatest(last_analyze, last_autoanalyze)::text as analyzed_at,
+        n_live_tup as live_rows
+    FROM pg_catalog.pg_stat_user_tables
+    WHERE (schemaname, relname) IN (SELECT * FROM unnest(%s::text[], %s::text[]))
+"""
+
+# anyarray columns are read as text and parsed in Python, since they cannot
+# be cast to a single array type for every column. For tables with children
+# the statistics over the whole hierarchy win.
+_PG_STATS_SQL = """
+    SELECT DISTINCT ON (schemaname, tablename, attname)
+        schemaname as schema,
+        tablename as table_name,
+        attname as column_name,
+        null_frac,
+        n_distinct,
+        most_common_vals::text as most_common_vals,
+        most_common_freqs,
+        histogram_bounds::text as histogram_bounds
+    FROM pg_catalog.pg_stats
+    WHERE (schemaname, tablename) IN (SELECT * FROM unnest(%s::text[], %s::text[]))
+    ORDER BY schemaname, tablename, attname, inherited DESC
+"""
+
+
+def parse_array(text: Optional[str]) -> Optional[List[Optional[str]]]:
+    """
+    Parse a one-dimensional PostgreSQL array literal into strings.
+
+    Returns:
+        The elements (None for NULL), or None for NULL input and for
+        multi-dimensional or malformed literals
+    """
+    if text is None or len(text) < 2 or text[0] != "{" or text[-1] != "}":
+        return None
+    body, values, i = text[1:-1], [], 0
+    if not body:
+        return []
+    while i <= len(body):
+        if i < len(body) and body[i] == "{":
+            return None
+        if i < len(body) and body[i] == '"':
+            i += 1
+            chars = []
+            while i < len(body) and body[i] != '"':
+                if body[i] == "\\":
+                    i += 1
+                chars.append(body[i] if i < len(body) else "")
+                i += 1
+            values.append("".join(chars))
+            i += 1
+        else:
+            end = body.find(",", i)
+            end = len(body) if end == -1 else end
+            raw = body[i:end]
+            values.append(None if raw == "NULL" else raw)
+            i = end
+        if i < len(body) and body[i] != ",":
+            return None
+        i += 1
+    return values
+
+
+def profile_column(row: Dict[str, Any], live_rows: int) -> Dict[str, Any]:
+    """
+    Reduce one pg_stats row to a compact profile.
+
+    Returns:
+        Dictionary with "null_frac", "distinct" (absolute estimate) and, when
+        they apply, "unique", "values" (complete value set), "top"
+        ([value, frequency] pairs) and "range" ([low, high])
+    """
+    null_frac = float(row["null_frac"] or 0.0)
+    n_distinct = float(row["n_distinct"] or 0.0)
+    # Negative n_distinct is a fraction of the row count
+    distinct = -n_distinct * live_rows if n_distinct < 0 else n_distinct
+    profile: Dict[str, Any] = {"null_frac": round(null_frac, 3), "distinct": int(round(distinct))}
+
+    if n_distinct == -1:
+        profile["unique"] = True
+
+    values = parse_array(row["most_common_vals"]) or []
+    frequencies = [float(f) for f in (row["most_common_freqs"] or [])]
+    values = [(value[:_MAX_VALUE_CHARS] if value is not None else None) for value in values]
+    covered = sum(frequencies)
+    if values and 0 < distinct <= COLUMN_PROFILE_MAX_VALUES and covered >= (1 - null_frac) * _ENUM_COVERAGE:
+        profile["values"] = values
+    elif values and frequencies and frequencies[0] >= _SKEW_MIN_FREQUENCY:
+        profile["top"] = [[value, round(frequency, 3)] for value, frequency in zip(values, frequencies)][:5]
+
+    bounds = parse_array(row["histogram_bounds"])
+    if bounds and "values" not in profile:
+        profile["range"] = [bounds[0], bounds[-1]]
+    return profile
+
+
+class ColumnProfileCache:
+    """
+    Per-data-source column profiles, re-read only for re-analyzed tables.
+
+    Args:
+        max_entries: Number of data sources kept
+        check_interval: Minimum seconds between ANALYZE timestamp checks per data source
+    """
+
+    def __init__(self, max_entries: int = SCHEMA_CACHE_MAX_ENTRIES, check_interval: float = COLUMN_PROFILE_CHECK_INTERVAL_S):
+        self.check_interval = check_interval
+        self._entries = LRUCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.refreshed_tables = 0
+        self.reused_tables = 0
+
+    def _entry(self, cache_key: str) -> Dict[str, Any]:
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            entry = {"checked_at": 0.0, "tables": {}}
+            self._entries.put(cache_key, entry)
+        return entry
+
+    def needs_check(self, cache_key: str, tables: List[Tuple[str, str]]) -> bool:
+        """Whether the ANALYZE timestamps should be read before serving these tables"""
+        entry = self._entry(cache_key)
+        if time.monotonic() - entry["checked_at"] >= self.check_interval:
+            return True
+        return any(f"{schema}.{table}" not in entry["tables"] for schema, table in tables)
+
+    def plan(self, cache_key: str, analyzed_rows: List[Dict[str, Any]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Compare ANALYZE timestamps with the cached ones.
+
+        Returns:
+            (schema, table, analyze row) for every table whose statistics changed
+        """
+        entry = self._entry(cache_key)
+        stale = []
+        with self._lock:
+            self.checks += 1
+            entry["checked_at"] = time.monotonic()
+            for row in analyzed_rows:
+                key = f"{row['schema']}.{row['table_name']}"
+                cached = entry["tables"].get(key)
+                if row["analyzed_at"] is None:
+                    # Never analyzed: nothing in pg_stats yet
+                    entry["tables"][key] = {"analyzed_at": None, "columns": {}}
+                elif cached is None or cached["analyzed_at"] != row["analyzed_at"]:
+                    stale.append((row["schema"], row["table_name"], row))
+                else:
+                    self.reused_tables += 1
+        return stale
+
+    def store(self, cache_key: str, stale: List[Tuple[str, str, Dict[str, Any]]], stats_rows: List[Dict[str, Any]]) -> None:
+        """Replace the profiles of the re-read tables"""
+        analyzed = {f"{schema}.{table}": row for schema, table, row in stale}
+        columns: Dict[str, Dict[str, Any]] = {key: {} for key in analyzed}
+        for row in stats_rows:
+            key = f"{row['schema']}.{row['table_name']}"
+            if key in analyzed:
+                columns[key][row["column_name"]] = profile_column(row, analyzed[key]["live_rows"] or 0)
+
+        entry = self._entry(cache_key)
+        with self._lock:
+            for key, row in analyzed.items():
+                entry["tables"][key] = {"analyzed_at": row["analyzed_at"], "columns": columns[key]}
+            self.refreshed_tables += len(analyzed)
+
+    def profiles(self, cache_key: str) -> Dict[str, Dict[str, Any]]:
+        """Cached column profiles by qualified table name"""
+        return {key: table["columns"] for key, table in self._entry(cache_key)["tables"].items()}
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._entries.stats(),
+            "checks": self.checks,
+            "refreshed_tables": self.refreshed_tables,
+            "reused_tables": self.reused_tables
+        }
+
+
+profile_cache = ColumnProfileCache()
+
+
+def _stats_args(tables: List[Tuple[str, str]]) -> tuple:
+    return [schema for schema, _ in tables], [table for _, table in tables]
+
+
+def get_profiles(
+    connection_string: str,
+    tables: List[Tuple[str, str]],
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Column profiles of the given tables, refreshing re-analyzed ones.
+
+    Args:
+        connection_string: PostgreSQL connection string of the data source
+        tables: (schema, table) pairs to profile
+        cache_key: Cache key of the data source (defaults to the connection string)
+        org_id: Organization whose connection quota the pooled connection counts against
+
+    Returns:
+        Dictionary of qualified table name -> column name -> profile
+    """
+    cache_key = cache_key or connection_string
+    if tables and profile_cache.needs_check(cache_key, tables):
+        with pooled_connection(connection_string, key=cache_key, org_id=org_id) as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            with catalog_query_seconds.time(query="analyzed_at"):
+                cursor.execute(_ANALYZED_SQL, _stats_args(tables))
+                analyzed_rows = cursor.fetchall()
+            stale = profile_cache.plan(cache_key, analyzed_rows)
+            if stale:
+                with catalog_query_seconds.time(query="pg_stats"):
+                    cursor.execute(_PG_STATS_SQL, _stats_args([(schema, table) for schema, table, _ in stale]))
+                    stats_rows = cursor.fetchall()
+                profile_cache.store(cache_key, stale, stats_rows)
+            cursor.close()
+    return profile_cache.profiles(cache_key)
+
+
+def pii_columns(metadata: Dict[str, Any]) -> Optional[Set[str]]:
+    """
+    Columns the metadata's pii_policy protects, or None when PII is allowed.
+
+    Entries may name a column alone, "table.column" or "schema.table.column".
+    """
+    policy = (metadata.get("security") or {}).get("pii_policy") or {}
+    if policy.get("allow_pii"):
+        return None
+    return {str(name).lower() for name in policy.get("pii_columns") or []}
+
+
+def _is_pii(table: Dict[str, Any], column: str, flagged: Set[str]) -> bool:
+    names = (column, f"{table['table_name']}.{column}", f"{table['schema']}.{table['table_name']}.{column}")
+    return any(name.lower() in flagged for name in names)
+
+
+def attach_profiles(metadata: Dict[str, Any], profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Copy of metadata with each table's "value_profile" filled in.
+
+    Only columns still present in the metadata are kept, so profiles of
+    dropped columns (pg_stats keeps them until the next ANALYZE) never show.
+    Profiles of PII columns are reduced to fields that reveal no values.
+    """
+    flagged = pii_columns(metadata)
+    tables = []
+    for table in metadata.get("tables", []):
+        columns = profiles.get(f"{table['schema']}.{table['table_name']}") or {}
+        profile = {}
+        for column in table["columns"]:
+            name = column["name"]
+            if name not in columns:
+                continue
+            if flagged and _is_pii(table, name, flagged):
+                profile[name] = {k: v for k, v in columns[name].items() if k in _PII_SAFE_FIELDS}
+            else:
+                profile[name] = columns[name]
+        tables.append({**table, "value_profile": profile} if profile else table)
+    return {**metadata, "tables": tables}
+
+
+def metadata_tables(metadata: Dict[str, Any]) -> List[Tuple[str, str]]:
+    return [(table["schema"], table["table_name"]) for table in metadata.get("tables", [])]
+
+
+def profiles_for(
+    metadata: Dict[str, Any],
+    connection_string: str,
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """attach_profiles() for the tables in metadata; profiles are best effort"""
+    try:
+        profiles = get_profiles(connection_string, metadata_tables(metadata), cache_key, org_id)
+    except Exception as e:
+        logger.warning("Could not load column profiles: %s", e)
+        return metadata
+    return attach_profiles(metadata, profiles)
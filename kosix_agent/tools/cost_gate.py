@@ -0,0 +1,330 @@
+"""
+EXPLAIN-based cost gate for generated analytics queries.
+
+Before a query runs, gate_query() asks the planner for its estimate
+(EXPLAIN without ANALYZE, so nothing is executed) and compares the total
+cost and row estimate of the plan's root against the organization's
+budget. An over-budget query is rewritten step by step, re-planning after
+each step, until it fits:
+
+1. tighten the top-level LIMIT to COST_GATE_TIGHT_LIMIT
+2. restrict the largest top-level table to the last
+   COST_GATE_DATE_WINDOW_DAYS on the date_filter_preference column
+3. sample the largest top-level table with TABLESAMPLE SYSTEM
+
+Every step changes what the query returns, so each one is reported back to
+the agent. A query that is still over budget after all of them (or when
+rewriting is disabled) is rejected with feedback on how to narrow it.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from kosix_agent.config.setting import (
+    COST_GATE_DATE_WINDOW_DAYS,
+    COST_GATE_MAX_COST,
+    COST_GATE_MAX_ROWS,
+    COST_GATE_ORG_BUDGETS,
+    COST_GATE_REWRITE,
+    COST_GATE_TIGHT_LIMIT
+)
+from kosix_agent.tools.sql_validator import _Analysis, _tokenize
+
+
+logger = logging.getLogger(__name__)
+
+# Depth-0 keywords that end the FROM clause / the WHERE clause
+_AFTER_FROM = {"where", "group", "order", "having", "limit", "offset", "fetch", "window", "for", "union", "intersect", "except"}
+_AFTER_WHERE = _AFTER_FROM - {"where"}
+
+_PLAIN_IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# Tables smaller than this are not worth sampling
+_MIN_SAMPLE_ROWS = 10000
+
+
+def budget_for(org_id: Optional[str]) -> Dict[str, float]:
+    """Cost and row budget of an organization"""
+    override = COST_GATE_ORG_BUDGETS.get(org_id or "", {})
+    return {
+        "max_cost": float(override.get("max_cost", COST_GATE_MAX_COST)),
+        "max_rows": float(override.get("max_rows", COST_GATE_MAX_ROWS))
+    }
+
+
+def gate_query(
+    conn,
+    sql: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    org_id: Optional[str] = None,
+    timeout_ms: int = 30000
+) -> Dict[str, Any]:
+    """
+    Check a query's planner estimate against the organization's budget.
+
+    Args:
+        conn: Open connection to the data source
+        sql: A validated SELECT statement
+        metadata: Cached schema metadata (row estimates and the date filter
+            column); without it only the LIMIT rewrite is available
+        org_id: Organization whose budget applies
+        timeout_ms: statement_timeout for the EXPLAIN calls
+
+    Returns:
+        Dictionary with the "decision" ("allow", "rewrite" or "reject"), the
+        "sql" to run, the original and final "estimate", the "budget", the
+        applied "rewrites" and "feedback" for the agent
+    """
+    budget = budget_for(org_id)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),))
+        original = _estimate(cursor, sql)
+    except psycopg2.Error as e:
+        # Let the real execution report the error
+        logger.debug("cost gate EXPLAIN failed: %s", e)
+        conn.rollback()
+        return {"decision": "allow", "sql": sql, "estimate": None, "budget": budget, "rewrites": [], "feedback": ""}
+
+    decision = {"sql": sql, "estimate": original, "original_estimate": original, "budget": budget, "rewrites": []}
+    if _within(original, budget):
+        return {**decision, "decision": "allow", "feedback": ""}
+
+    if COST_GATE_REWRITE:
+        tables = _tables_by_name(metadata)
+        guidelines = (metadata or {}).get("query_guidelines") or {}
+        steps = [
+            lambda query, estimate: _tighten_limit(query),
+            lambda query, estimate: _date_window(query, tables, guidelines.get("date_filter_preference")),
+            lambda query, estimate: _sample(query, tables, estimate, budget)
+        ]
+        for step in steps:
+            rewritten = step(decision["sql"], decision["estimate"])
+            if rewritten is None:
+                continue
+            query, note = rewritten
+            try:
+                cursor.execute("SAVEPOINT cost_gate")
+                estimate = _estimate(cursor, query)
+                cursor.execute("RELEASE SAVEPOINT cost_gate")
+            except psycopg2.Error as e:
+                logger.debug("cost gate rewrite rejected by the planner: %s", e)
+                cursor.execute("ROLLBACK TO SAVEPOINT cost_gate")
+                continue
+            decision["sql"], decision["estimate"] = query, estimate
+            decision["rewrites"].append(note)
+            if _within(estimate, budget):
+                return {
+                    **decision,
+                    "decision": "rewrite",
+                    "feedback": "The query was over budget and was rewritten: " + "; ".join(decision["rewrites"])
+                }
+
+    return {
+        **decision,
+        "sql": sql,
+        "estimate": original,
+        "decision": "reject",
+        "feedback": _rejection_feedback(original, budget, metadata)
+    }
+
+
+def _estimate(cursor, sql: str) -> Dict[str, Any]:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+
+    # The root's Total Cost and Plan Rows already account for a LIMIT (the
+    # planner scales them by the fraction of input it expects to read), so
+    # the budget applies to them and not to the inner nodes' row counts
+    scans, stack = {}, [root]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            scans[node["Relation Name"]] = node["Node Type"]
+        stack.extend(node.get("Plans", []))
+    return {"cost": float(root["Total Cost"]), "rows": float(root["Plan Rows"]), "scans": scans}
+
+
+def _within(estimate: Dict[str, Any], budget: Dict[str, float]) -> bool:
+    return estimate["cost"] <= budget["max_cost"] and estimate["rows"] <= budget["max_rows"]
+
+
+def _tables_by_name(metadata: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    tables = {}
+    for table in (metadata or {}).get("tables", []):
+        if table["table_name"] not in tables or table["schema"] == "public":
+            tables[table["table_name"]] = table
+    return tables
+
+
+def _top_level(sql: str) -> Optional[Dict[str, Any]]:
+    """
+    FROM items and WHERE span of the outermost SELECT.
+
+    Returns None for compound queries (UNION/INTERSECT/EXCEPT) and queries
+    without a top-level FROM, which the rewrites leave alone.
+    """
+    try:
+        tokens = _tokenize(sql)
+        analysis = _Analysis(tokens)
+    except ValueError:
+        return None
+
+    top = [i for i in range(len(tokens)) if analysis.depth[i] == 0]
+    if any(analysis.keyword(i, "union", "intersect", "except") for i in top):
+        return None
+    start = next((i for i in top if analysis.keyword(i, "from")), None)
+    if start is None:
+        return None
+
+    refs, expecting, end = [], True, len(tokens)
+    i = start + 1
+    while i < len(tokens):
+        if analysis.depth[i] == 0 and analysis.keyword(i, *_AFTER_FROM):
+            end = i
+            break
+        if expecting:
+            expecting = False
+            while analysis.keyword(i, "lateral", "only"):
+                i += 1
+            if i < len(tokens) and tokens[i][0] in ("ident", "qident") and not analysis.punct(i + 1, "("):
+                parts = [i]
+                while analysis.punct(parts[-1] + 1, ".") and parts[-1] + 2 < len(tokens):
+                    parts.append(parts[-1] + 2)
+                ref = {"name": tokens[parts[-1]][4], "alias": None, "end": tokens[parts[-1]][3], "sampled": False}
+                i = parts[-1] + 1
+                if analysis.keyword(i, "as"):
+                    i += 1
+                if i < len(tokens) and tokens[i][0] in ("ident", "qident") and not (
+                    tokens[i][0] == "ident" and tokens[i][4] in _AFTER_FROM | {"join", "inner", "left", "right", "full", "cross", "natural", "on", "using", "tablesample"}
+                ):
+                    ref["alias"], ref["end"] = tokens[i][4], tokens[i][3]
+                    i += 1
+                ref["sampled"] = analysis.keyword(i, "tablesample")
+                refs.append(ref)
+                continue
+        if analysis.punct(i, "("):
+            i = analysis.match[i] + 1
+            continue
+        if analysis.depth[i] == 0 and (analysis.punct(i, ",") or analysis.keyword(i, "join")):
+            expecting = True
+        i += 1
+
+    where = None
+    if end < len(tokens) and analysis.keyword(end, "where"):
+        stop = next((j for j in range(end + 1, len(tokens)) if analysis.depth[j] == 0 and analysis.keyword(j, *_AFTER_WHERE)), len(tokens))
+        where = (tokens[end + 1][2], tokens[stop - 1][3])
+
+    return {
+        "refs": refs,
+        "where": where,
+        # Offset where a new WHERE clause goes: right after the last FROM-clause token
+        "from_end": tokens[end - 1][3],
+        "tokens": tokens,
+        "analysis": analysis
+    }
+
+
+def _tighten_limit(sql: str) -> Optional[Tuple[str, str]]:
+    tokens = _tokenize(sql)
+    analysis = _Analysis(tokens)
+    for i, token in enumerate(tokens[:-1]):
+        if analysis.depth[i] == 0 and analysis.keyword(i, "limit"):
+            value = tokens[i + 1]
+            if value[0] == "number" and value[1].isdigit() and int(value[1]) > COST_GATE_TIGHT_LIMIT:
+                return (
+                    sql[:value[2]] + str(COST_GATE_TIGHT_LIMIT) + sql[value[3]:],
+                    f"LIMIT lowered from {value[1]} to {COST_GATE_TIGHT_LIMIT}"
+                )
+    return None
+
+
+def _quote(name: str) -> str:
+    return name if _PLAIN_IDENTIFIER.match(name) else '"' + name.replace('"', '""') + '"'
+
+
+def _largest(top: Dict[str, Any], tables: Dict[str, Dict[str, Any]], column: Optional[str] = None):
+    candidates = [
+        (ref, tables[ref["name"]]) for ref in top["refs"]
+        if ref["name"] in tables and (column is None or any(c["name"] == column for c in tables[ref["name"]]["columns"]))
+    ]
+    if not candidates:
+        return None, None
+    return max(candidates, key=lambda pair: pair[1].get("row_count_estimate") or 0)
+
+
+def _date_window(sql: str, tables: Dict[str, Dict[str, Any]], column: Optional[str]) -> Optional[Tuple[str, str]]:
+    if not column:
+        return None
+    top = _top_level(sql)
+    if top is None:
+        return None
+    ref, table = _largest(top, tables, column)
+    if ref is None:
+        return None
+    # Leave queries that already filter on the column alone
+    if top["where"] is not None and any(
+        token[0] in ("ident", "qident") and token[4] == column and top["where"][0] <= token[2] < top["where"][1]
+        for token in top["tokens"]
+    ):
+        return None
+
+    condition = f"{_quote(ref['alias'] or ref['name'])}.{_quote(column)} >= now() - interval '{COST_GATE_DATE_WINDOW_DAYS} days'"
+    if top["where"] is not None:
+        start, end = top["where"]
+        sql = f"{sql[:start]}({sql[start:end]}) AND {condition}{sql[end:]}"
+    else:
+        sql = f"{sql[:top['from_end']]} WHERE {condition}{sql[top['from_end']:]}"
+    return sql, f"restricted {table['table_name']} to the last {COST_GATE_DATE_WINDOW_DAYS} days of {column}"
+
+
+def _sample(
+    sql: str,
+    tables: Dict[str, Dict[str, Any]],
+    estimate: Dict[str, Any],
+    budget: Dict[str, float]
+) -> Optional[Tuple[str, str]]:
+    top = _top_level(sql)
+    if top is None:
+        return None
+    ref, table = _largest(top, tables)
+    if ref is None or ref["sampled"] or (table.get("row_count_estimate") or 0) < _MIN_SAMPLE_ROWS:
+        return None
+
+    # Aim below the budget: cost and row estimates scale roughly with the sampled fraction
+    ratio = min(budget["max_cost"] / max(estimate["cost"], 1.0), budget["max_rows"] / max(estimate["rows"], 1.0))
+    percent = float(f"{max(0.01, min(50.0, ratio * 80.0)):.2g}")
+    sql = f"{sql[:ref['end']]} TABLESAMPLE SYSTEM ({percent}){sql[ref['end']:]}"
+    return sql, f"sampled about {percent}% of {table['table_name']} (results are approximate; scale counts and sums by {round(100 / percent, 1)})"
+
+
+def _rejection_feedback(estimate: Dict[str, Any], budget: Dict[str, float], metadata: Optional[Dict[str, Any]]) -> str:
+    parts = [
+        f"Estimated cost {estimate['cost']:.0f} (budget {budget['max_cost']:.0f}) and "
+        f"{estimate['rows']:.0f} result rows (budget {budget['max_rows']:.0f})."
+    ]
+    tables = _tables_by_name(metadata)
+    hints: List[str] = []
+    for name, node_type in estimate["scans"].items():
+        if node_type != "Seq Scan" or name not in tables:
+            continue
+        indexed = sorted({", ".join(index["columns"]) for index in tables[name]["indexes"]} | (
+            {", ".join(tables[name]["primary_key"])} if tables[name]["primary_key"] else set()
+        ))
+        if indexed:
+            hints.append(f"{name} is scanned in full; filter on an indexed column ({'; '.join(indexed)})")
+        else:
+            hints.append(f"{name} is scanned in full; add a selective filter")
+    guidelines = (metadata or {}).get("query_guidelines") or {}
+    if guidelines.get("date_filter_preference"):
+        hints.append(f"restrict the date range on {guidelines['date_filter_preference']}")
+    hints.append("aggregate before joining or return fewer columns")
+    return " ".join(parts) + " Narrow the query: " + "; ".join(hints) + "."
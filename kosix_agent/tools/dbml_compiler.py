@@ -0,0 +1,940 @@
+"""
+DBML to PostgreSQL DDL compiler and transactional applier.
+
+parse_dbml() reads the DBML SchemaAgent emits (Table, Enum, Ref and
+inline column refs, Indexes, Notes; Project and TableGroup blocks are
+ignored) into plain dicts. plan_ddl() turns the parsed schema into
+ordered DDL: schemas, enum types, tables in foreign-key topological order
+with their primary key, unique, not-null and foreign key constraints
+inline, then foreign keys that close a cycle, indexes and comments.
+Planned against the live catalog, it only emits what is missing and
+reports conflicts (type, nullability or primary key differences) instead
+of altering existing columns.
+
+apply_dbml() plans against the catalog read by schema_tool's
+introspection queries and runs every statement in one transaction on a
+pooled connection, or returns the plan without executing on dry_run.
+"""
+
+import json
+import re
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.tools import ToolContext
+from psycopg2.extras import RealDictCursor
+
+from kosix_agent.tools import schema_tool as sync_schema
+from kosix_agent.utils.datasource import resolve_datasource
+from kosix_agent.utils.db_pool import pooled_connection
+
+
+# Alternatives ordered by how often they occur in DBML
+_TOKEN = re.compile(r"""
+    (?P<word>[A-Za-z0-9_$#+]+)
+  | (?P<space>[ \t\r]+)
+  | (?P<nl>\n)
+  | (?P<op><>|[{}\[\]():,.<>\-~])
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<str>'''.*?'''|'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\\n])*")
+  | (?P<expr>`[^`]*`)
+  | (?P<bad>.)
+""", re.S | re.X)
+
+# A PostgreSQL type spelled with words, an optional (precision[, scale]) and array suffixes
+_TYPE = re.compile(r"^[a-z_][a-z0-9_]*(?: [a-z_][a-z0-9_]*)*(?:\(\s*\d+\s*(?:,\s*\d+\s*)?\))?(?: [a-z_][a-z0-9_]*)*(?:\[\])*$", re.I)
+
+_DEFAULT_EXPR = re.compile(r"^(?:-?\d+(?:\.\d+)?|true|false|null|[a-z_][a-z0-9_.]*\(\s*\))$", re.I)
+
+_REFERENTIAL_ACTIONS = {"cascade", "restrict", "set null", "set default", "no action"}
+
+_RESERVED = {
+    "all", "analyse", "analyze", "and", "any", "array", "as", "asc", "both", "case", "cast", "check",
+    "collate", "column", "constraint", "create", "current_date", "current_role", "current_time",
+    "current_timestamp", "current_user", "default", "deferrable", "desc", "distinct", "do", "else",
+    "end", "except", "false", "fetch", "for", "foreign", "from", "grant", "group", "having", "in",
+    "initially", "intersect", "into", "lateral", "leading", "limit", "localtime", "localtimestamp",
+    "not", "null", "offset", "on", "only", "or", "order", "placing", "primary", "references",
+    "returning", "select", "session_user", "some", "symmetric", "table", "then", "to", "trailing",
+    "true", "union", "unique", "user", "using", "variadic", "when", "where", "window", "with"
+}
+
+# Spellings of the same type, folded to how the catalog introspection reports them
+_CANONICAL_TYPES = {
+    "int": "INTEGER", "int4": "INTEGER", "integer": "INTEGER", "serial": "INTEGER",
+    "bigint": "INTEGER", "int8": "INTEGER", "bigserial": "INTEGER",
+    "smallint": "SMALLINT", "int2": "SMALLINT",
+    "text": "TEXT", "varchar": "CHARACTER VARYING", "character varying": "CHARACTER VARYING",
+    "bool": "BOOLEAN", "boolean": "BOOLEAN",
+    "timestamp": "TIMESTAMP", "timestamp without time zone": "TIMESTAMP",
+    "timestamptz": "TIMESTAMP WITH TIME ZONE", "timestamp with time zone": "TIMESTAMP WITH TIME ZONE",
+    "float8": "DOUBLE PRECISION", "double precision": "DOUBLE PRECISION",
+    "float4": "REAL", "real": "REAL", "numeric": "NUMERIC", "decimal": "NUMERIC",
+    "json": "JSON", "jsonb": "JSONB", "uuid": "UUID", "date": "DATE", "bytea": "BYTEA",
+}
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+    tokens = []
+    line = 1
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        value = match.group()
+        if kind == "bad":
+            raise Exception(f"DBML line {line}: unexpected character {value!r}")
+        if kind != "comment":
+            tokens.append((kind, value, line))
+        if kind == "nl":
+            line += 1
+        elif kind in ("comment", "str"):
+            line += value.count("\n")
+    # Padding so lookahead never runs off the end
+    tokens.extend([("eof", "", line)] * 4)
+    return tokens
+
+
+def _unquote(kind: str, value: str) -> str:
+    if kind == "str":
+        if value.startswith("'''"):
+            return value[3:-3].strip()
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    if kind == "expr":
+        return value[1:-1]
+    return value
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.tables: List[Dict[str, Any]] = []
+        self.enums: List[Dict[str, Any]] = []
+        self.refs: List[Dict[str, Any]] = []
+        self.aliases: Dict[str, Tuple[str, str]] = {}
+
+    # -- token helpers ----------------------------------------------------
+
+    def peek(self, offset: int = 0) -> Tuple[str, str, int]:
+        return self.tokens[self.position + offset]
+
+    def next(self) -> Tuple[str, str, int]:
+        token = self.tokens[self.position]
+        if token[0] != "eof":
+            self.position += 1
+        return token
+
+    def error(self, message: str) -> Exception:
+        return Exception(f"DBML line {self.peek()[2]}: {message}")
+
+    def expect(self, value: str) -> None:
+        kind, token, _ = self.peek()
+        if token != value or kind in ("str", "expr"):
+            raise self.error(f"expected {value!r}, found {token!r}")
+        self.position += 1
+
+    def at(self, value: str) -> bool:
+        kind, token, _ = self.peek()
+        return kind == "op" and token == value
+
+    def skip_newlines(self) -> None:
+        while self.peek()[0] == "nl":
+            self.position += 1
+
+    def name(self) -> str:
+        kind, value, _ = self.next()
+        if kind not in ("word", "str"):
+            raise self.error(f"expected a name, found {value!r}")
+        return _unquote(kind, value)
+
+    def qualified_name(self) -> Tuple[str, str]:
+        first = self.name()
+        if self.at("."):
+            self.next()
+            return first, self.name()
+        return "public", first
+
+    def skip_block(self) -> None:
+        """Skip a `{ ... }` block (or the rest of the line) of a construct we do not compile"""
+        while not self.at("{") and self.peek()[0] not in ("nl", "eof"):
+            self.next()
+        if not self.at("{"):
+            return
+        depth = 0
+        while True:
+            kind, value, _ = self.next()
+            if kind == "eof":
+                raise self.error("unterminated block")
+            if kind == "op" and value == "{":
+                depth += 1
+            elif kind == "op" and value == "}":
+                depth -= 1
+                if depth == 0:
+                    return
+
+    # -- settings lists ---------------------------------------------------
+
+    def settings(self) -> List[Tuple[str, List[Tuple[str, str, int]]]]:
+        """Parse `[a, b: c, ...]` into (key, value tokens) pairs"""
+        self.expect("[")
+        items = []
+        while True:
+            self.skip_newlines()
+            key_words = []
+            while self.peek()[0] == "word":
+                key_words.append(self.next()[1].lower())
+            value: List[Tuple[str, str, int]] = []
+            if self.at(":"):
+                self.next()
+                depth = 0
+                while True:
+                    kind, token, _ = self.peek()
+                    if kind == "eof":
+                        raise self.error("unterminated settings list")
+                    if kind == "op" and token in ("(", "["):
+                        depth += 1
+                    elif kind == "op" and token in (")", "]"):
+                        if depth == 0:
+                            break
+                        depth -= 1
+                    elif kind == "op" and token == "," and depth == 0:
+                        break
+                    value.append(self.next())
+            if not key_words:
+                raise self.error(f"unexpected {self.peek()[1]!r} in settings")
+            items.append((" ".join(key_words), value))
+            self.skip_newlines()
+            if self.at(","):
+                self.next()
+                continue
+            self.expect("]")
+            return items
+
+    # -- top level --------------------------------------------------------
+
+    def parse(self) -> Dict[str, Any]:
+        while True:
+            self.skip_newlines()
+            kind, value, _ = self.peek()
+            if kind == "eof":
+                break
+            keyword = value.lower() if kind == "word" else ""
+            if keyword == "table":
+                self.next()
+                self.table()
+            elif keyword == "enum":
+                self.next()
+                self.enum()
+            elif keyword == "ref":
+                self.next()
+                self.ref_statement()
+            elif keyword in ("project", "tablegroup", "note", "tablepartial", "records"):
+                self.next()
+                self.skip_block()
+            else:
+                raise self.error(f"unexpected {value!r}")
+        return {"tables": self.tables, "enums": self.enums, "refs": self.refs}
+
+    def table(self) -> None:
+        schema, name = self.qualified_name()
+        if self.peek()[0] == "word" and self.peek()[1].lower() == "as":
+            self.next()
+            self.aliases[self.name()] = (schema, name)
+        note = None
+        if self.at("["):
+            for key, value in self.settings():
+                if key == "note" and value:
+                    note = _unquote(value[0][0], value[0][1])
+        self.expect("{")
+
+        table = {"schema": schema, "name": name, "columns": [], "indexes": [], "note": note}
+        self.aliases.setdefault(name, (schema, name))
+        while True:
+            self.skip_newlines()
+            kind, value, _ = self.peek()
+            if kind == "op" and value == "}":
+                self.next()
+                break
+            keyword = value.lower() if kind == "word" else ""
+            if keyword == "indexes" and self.peek(1)[1] == "{":
+                self.next()
+                self.indexes(table)
+            elif keyword == "note" and self.peek(1)[1] in (":", "{"):
+                self.next()
+                if self.at(":"):
+                    self.next()
+                    token = self.next()
+                    table["note"] = _unquote(token[0], token[1])
+                else:
+                    self.next()
+                    self.skip_newlines()
+                    token = self.next()
+                    table["note"] = _unquote(token[0], token[1])
+                    self.skip_newlines()
+                    self.expect("}")
+            else:
+                table["columns"].append(self.column(table))
+        self.tables.append(table)
+
+    def column(self, table: Dict[str, Any]) -> Dict[str, Any]:
+        name = self.name()
+        type_parts = []
+        while True:
+            kind, value, _ = self.peek()
+            if kind in ("nl", "eof") or (kind == "op" and value == "}"):
+                break
+            if kind == "op" and value == "[":
+                if self.peek(1)[1] == "]":
+                    self.next()
+                    self.next()
+                    type_parts.append("[]")
+                    continue
+                break
+            self.next()
+            type_parts.append(_unquote(kind, value) if kind == "str" else value)
+        if not type_parts:
+            raise self.error(f"column {name} has no type")
+
+        # Re-join the tokens: a space only before a word that follows a word or ")"
+        data_type = ""
+        for part in type_parts:
+            if data_type and re.match(r"\w", part) and re.search(r"[\w)]$", data_type):
+                data_type += " "
+            data_type += part
+
+        column = {
+            "name": name,
+            "type": data_type,
+            "pk": False,
+            "not_null": False,
+            "unique": False,
+            "increment": False,
+            "default": None,
+            "note": None
+        }
+        if self.at("["):
+            for key, value in self.settings():
+                if key in ("pk", "primary key"):
+                    column["pk"] = True
+                elif key == "not null":
+                    column["not_null"] = True
+                elif key == "null":
+                    column["not_null"] = False
+                elif key == "unique":
+                    column["unique"] = True
+                elif key == "increment":
+                    column["increment"] = True
+                elif key == "default":
+                    column["default"] = _default_sql(value)
+                elif key == "note" and value:
+                    column["note"] = _unquote(value[0][0], value[0][1])
+                elif key == "ref":
+                    self.refs.append(self.inline_ref(table, name, value))
+                elif key in ("check", "name"):
+                    continue
+                else:
+                    raise self.error(f"unsupported column setting {key!r}")
+        return column
+
+    def indexes(self, table: Dict[str, Any]) -> None:
+        self.expect("{")
+        while True:
+            self.skip_newlines()
+            if self.at("}"):
+                self.next()
+                return
+            kind, value, _ = self.peek()
+            if kind == "op" and value == "(":
+                self.next()
+                columns = []
+                while not self.at(")"):
+                    kind, value, _ = self.next()
+                    if kind == "op" and value == ",":
+                        continue
+                    if kind == "expr":
+                        columns.append({"expression": _unquote(kind, value)})
+                    else:
+                        columns.append(_unquote(kind, value))
+                self.next()
+            elif kind == "expr":
+                self.next()
+                columns = [{"expression": _unquote(kind, value)}]
+            else:
+                columns = [self.name()]
+
+            index = {"columns": columns, "pk": False, "unique": False, "name": None, "method": None}
+            if self.at("["):
+                for key, setting in self.settings():
+                    if key in ("pk", "primary key"):
+                        index["pk"] = True
+                    elif key == "unique":
+                        index["unique"] = True
+                    elif key == "name" and setting:
+                        index["name"] = _unquote(setting[0][0], setting[0][1])
+                    elif key == "type" and setting:
+                        index["method"] = setting[0][1].lower()
+            table["indexes"].append(index)
+
+    def enum(self) -> None:
+        schema, name = self.qualified_name()
+        self.expect("{")
+        values = []
+        while True:
+            self.skip_newlines()
+            if self.at("}"):
+                self.next()
+                break
+            values.append(self.name())
+            if self.at("["):
+                self.settings()
+        self.enums.append({"schema": schema, "name": name, "values": values})
+
+    def ref_statement(self) -> None:
+        ref_name = None
+        if self.peek()[0] in ("word", "str"):
+            ref_name = self.name()
+        if self.at(":"):
+            self.next()
+            self.refs.append(self.ref_body(ref_name))
+            return
+        self.expect("{")
+        while True:
+            self.skip_newlines()
+            if self.at("}"):
+                self.next()
+                return
+            self.refs.append(self.ref_body(ref_name))
+
+    def endpoint(self) -> Dict[str, Any]:
+        parts = [self.name()]
+        while self.at("."):
+            self.next()
+            if self.at("("):
+                self.next()
+                columns = []
+                while not self.at(")"):
+                    if self.at(","):
+                        self.next()
+                        continue
+                    columns.append(self.name())
+                self.next()
+                parts.append(columns)
+                break
+            parts.append(self.name())
+        if len(parts) < 2:
+            raise self.error("a Ref endpoint needs table.column")
+        columns = parts[-1] if isinstance(parts[-1], list) else [parts[-1]]
+        if len(parts) == 3:
+            schema, table = parts[0], parts[1]
+        else:
+            schema, table = self.aliases.get(parts[0], ("public", parts[0]))
+        return {"schema": schema, "table": table, "columns": columns}
+
+    def ref_body(self, ref_name: Optional[str]) -> Dict[str, Any]:
+        left = self.endpoint()
+        kind, operator, _ = self.next()
+        if operator not in (">", "<", "-", "<>"):
+            raise self.error(f"unknown relationship {operator!r}")
+        right = self.endpoint()
+        settings = self.settings() if self.at("[") else []
+        return _make_ref(ref_name, left, operator, right, settings, self)
+
+    def inline_ref(self, table: Dict[str, Any], column: str, value: List[Tuple[str, str, int]]) -> Dict[str, Any]:
+        if not value:
+            raise self.error("empty ref setting")
+        operator = value[0][1]
+        # Re-parse the target endpoint from the setting's tokens
+        saved_tokens, saved_position = self.tokens, self.position
+        self.tokens, self.position = value[1:] + [("eof", "", value[0][2])] * 4, 0
+        try:
+            right = self.endpoint()
+        finally:
+            self.tokens, self.position = saved_tokens, saved_position
+        left = {"schema": table["schema"], "table": table["name"], "columns": [column]}
+        return _make_ref(None, left, operator, right, [], self)
+
+
+def _make_ref(name, left, operator, right, settings, parser: _Parser) -> Dict[str, Any]:
+    if operator == "<>":
+        raise parser.error(
+            f"many-to-many Ref {left['table']} <> {right['table']} needs an explicit junction table"
+        )
+    if operator == "<":
+        left, right = right, left
+    if len(left["columns"]) != len(right["columns"]):
+        raise parser.error(f"Ref {left['table']} -> {right['table']} has mismatched column counts")
+
+    actions = {}
+    for key, value in settings:
+        if key in ("delete", "update") and value:
+            action = " ".join(token for _, token, _ in value).lower()
+            if action not in _REFERENTIAL_ACTIONS:
+                raise parser.error(f"unsupported {key} action {action!r}")
+            actions[key] = action
+    return {
+        "name": name,
+        "from": left,
+        "to": right,
+        "one_to_one": operator == "-",
+        "on_delete": actions.get("delete"),
+        "on_update": actions.get("update")
+    }
+
+
+def _default_sql(value: List[Tuple[str, str, int]]) -> str:
+    if len(value) == 1 and value[0][0] == "str":
+        return _literal(_unquote("str", value[0][1]))
+    if len(value) == 1 and value[0][0] == "expr":
+        expression = _unquote("expr", value[0][1])
+        if ";" in expression:
+            raise Exception(f"default expression {expression!r} must be a single expression")
+        return expression
+    text = "".join(token for _, token, _ in value)
+    if not _DEFAULT_EXPR.match(text):
+        raise Exception(f"unsupported default value {text!r}; quote literals or wrap expressions in backticks")
+    return text
+
+
+def parse_dbml(text: str) -> Dict[str, Any]:
+    """
+    Parse DBML into tables, enums and foreign key references.
+
+    Args:
+        text: DBML source, optionally wrapped in <dbml>...</dbml>
+
+    Returns:
+        Dictionary with "tables" (schema, name, columns, indexes, note),
+        "enums" (schema, name, values) and "refs" normalized to the
+        referencing ("from") and referenced ("to") side
+    """
+    match = re.search(r"<dbml>(.*?)</dbml>", text, re.S)
+    parsed = _Parser(match.group(1) if match else text).parse()
+
+    seen = set()
+    for table in parsed["tables"]:
+        key = (table["schema"], table["name"])
+        if key in seen:
+            raise Exception(f"Table {_qualified(*key)} is defined twice")
+        seen.add(key)
+        names = [column["name"] for column in table["columns"]]
+        if len(set(names)) != len(names):
+            raise Exception(f"Table {_qualified(*key)} has duplicate columns")
+
+    tables = {(t["schema"], t["name"]): t for t in parsed["tables"]}
+    for ref in parsed["refs"]:
+        if ref["one_to_one"]:
+            # users.id - profiles.user_id: the side that is not a primary key holds the foreign key
+            source = tables.get((ref["from"]["schema"], ref["from"]["table"]))
+            target = tables.get((ref["to"]["schema"], ref["to"]["table"]))
+            if source is not None and _primary_key(source) == ref["from"]["columns"] and (
+                target is None or _primary_key(target) != ref["to"]["columns"]
+            ):
+                ref["from"], ref["to"] = ref["to"], ref["from"]
+        for side in ("from", "to"):
+            endpoint = ref[side]
+            table = tables.get((endpoint["schema"], endpoint["table"]))
+            if table is None:
+                # A table outside the DBML; it has to exist in the database
+                continue
+            columns = {column["name"] for column in table["columns"]}
+            for column in endpoint["columns"]:
+                if column not in columns:
+                    raise Exception(f"Ref column {endpoint['table']}.{column} does not exist")
+    return parsed
+
+
+# ---------------------------------------------------------------------------
+# Compiler
+# ---------------------------------------------------------------------------
+
+def _ident(name: str) -> str:
+    if re.fullmatch(r"[a-z_][a-z0-9_$]*", name) and name not in _RESERVED:
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _qualified(schema: str, name: str) -> str:
+    return _ident(name) if schema == "public" else f"{_ident(schema)}.{_ident(name)}"
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _column_type(column: Dict[str, Any], enums: Dict[Tuple[str, str], Dict[str, Any]], table_schema: str) -> str:
+    data_type = column["type"]
+    if "." in data_type:
+        schema, name = data_type.split(".", 1)
+    else:
+        schema, name = table_schema, data_type
+    for key in ((schema, name), ("public", name)):
+        if key in enums:
+            return _qualified(*key)
+    if not _TYPE.match(data_type):
+        raise Exception(f"Column {column['name']} has an unsupported type {data_type!r}")
+    if column["increment"] and data_type.lower() in ("int", "integer", "int4", "bigint", "int8", "smallint", "int2"):
+        return f"{data_type} GENERATED BY DEFAULT AS IDENTITY"
+    return data_type
+
+
+def _canonical_type(data_type: str) -> str:
+    lowered = " ".join(data_type.lower().split())
+    match = re.match(r"^([a-z ]+?)\s*(\(.*\))?((?:\[\])*)$", lowered)
+    if match is None:
+        return data_type.upper()
+    base, args, array = match.group(1), (match.group(2) or "").replace(" ", ""), match.group(3)
+    if array:
+        return "ARRAY"
+    if base in ("numeric", "decimal") and args:
+        return f"DECIMAL{args}"
+    if base in ("varchar", "character varying") and args:
+        return f"VARCHAR{args}"
+    return _CANONICAL_TYPES.get(base, base.upper()) + (args.upper() if base not in _CANONICAL_TYPES else "")
+
+
+def _foreign_key_sql(ref: Dict[str, Any]) -> str:
+    source, target = ref["from"], ref["to"]
+    name = ref["name"] or f"{source['table']}_{'_'.join(source['columns'])}_fkey"
+    sql = (
+        f"CONSTRAINT {_ident(name[:63])} FOREIGN KEY ({', '.join(_ident(c) for c in source['columns'])}) "
+        f"REFERENCES {_qualified(target['schema'], target['table'])} ({', '.join(_ident(c) for c in target['columns'])})"
+    )
+    if ref["on_delete"]:
+        sql += f" ON DELETE {ref['on_delete'].upper()}"
+    if ref["on_update"]:
+        sql += f" ON UPDATE {ref['on_update'].upper()}"
+    return sql
+
+
+def _primary_key(table: Dict[str, Any]) -> List[str]:
+    for index in table["indexes"]:
+        if index["pk"]:
+            return [c for c in index["columns"] if isinstance(c, str)]
+    return [column["name"] for column in table["columns"] if column["pk"]]
+
+
+def _create_table_sql(table, enums, refs) -> str:
+    primary_key = _primary_key(table)
+    lines = []
+    for column in table["columns"]:
+        lines.append(_column_sql(column, enums, table["schema"], inline_pk=primary_key == [column["name"]]))
+    if len(primary_key) > 1:
+        lines.append(f"PRIMARY KEY ({', '.join(_ident(c) for c in primary_key)})")
+    for ref in refs:
+        if ref["one_to_one"] and not _is_unique_on(table, ref["from"]["columns"]):
+            lines.append(f"UNIQUE ({', '.join(_ident(c) for c in ref['from']['columns'])})")
+        lines.append(_foreign_key_sql(ref))
+    body = ",\n    ".join(lines)
+    return f"CREATE TABLE {_qualified(table['schema'], table['name'])} (\n    {body}\n)"
+
+
+def _column_sql(column, enums, table_schema: str, inline_pk: bool = False) -> str:
+    sql = f"{_ident(column['name'])} {_column_type(column, enums, table_schema)}"
+    if inline_pk:
+        sql += " PRIMARY KEY"
+    elif column["not_null"] or column["pk"]:
+        sql += " NOT NULL"
+    if column["default"] is not None:
+        sql += f" DEFAULT {column['default']}"
+    if column["unique"] and not inline_pk:
+        sql += " UNIQUE"
+    return sql
+
+
+def _is_unique_on(table: Dict[str, Any], columns: List[str]) -> bool:
+    if _primary_key(table) == columns:
+        return True
+    if len(columns) == 1 and any(c["name"] == columns[0] and c["unique"] for c in table["columns"]):
+        return True
+    return any(index["unique"] and index["columns"] == columns for index in table["indexes"])
+
+
+def _index_sql(table: Dict[str, Any], index: Dict[str, Any]) -> str:
+    parts = [c["expression"] if isinstance(c, dict) else _ident(c) for c in index["columns"]]
+    for part in parts:
+        if ";" in part:
+            raise Exception(f"Index expression {part!r} must be a single expression")
+    sql = "CREATE UNIQUE INDEX" if index["unique"] else "CREATE INDEX"
+    if index["name"]:
+        sql += f" {_ident(index['name'])}"
+    sql += f" ON {_qualified(table['schema'], table['name'])}"
+    if index["method"]:
+        if not re.fullmatch(r"[a-z]+", index["method"]):
+            raise Exception(f"Unsupported index type {index['method']!r}")
+        sql += f" USING {index['method']}"
+    return sql + f" ({', '.join(parts)})"
+
+
+def _topological_order(tables: List[Dict[str, Any]], refs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order tables so referenced tables come first; tables on a cycle keep their DBML order"""
+    keys = [(t["schema"], t["name"]) for t in tables]
+    position = {key: i for i, key in enumerate(keys)}
+    depends = {key: set() for key in keys}
+    dependents = {key: set() for key in keys}
+    for ref in refs:
+        source = (ref["from"]["schema"], ref["from"]["table"])
+        target = (ref["to"]["schema"], ref["to"]["table"])
+        if source in depends and target in depends and source != target:
+            depends[source].add(target)
+            dependents[target].add(source)
+
+    ready = deque(key for key in keys if not depends[key])
+    remaining = {key: len(depends[key]) for key in keys}
+    ordered = []
+    while ready:
+        key = ready.popleft()
+        ordered.append(key)
+        for dependent in sorted(dependents[key], key=position.get):
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    placed = set(ordered)
+    ordered.extend(key for key in keys if key not in placed)
+
+    by_key = dict(zip(keys, tables))
+    return [by_key[key] for key in ordered]
+
+
+def plan_ddl(
+    schema: Dict[str, Any],
+    existing_tables: Optional[List[Dict[str, Any]]] = None,
+    existing_enums: Optional[List[Tuple[str, str]]] = None
+) -> Dict[str, Any]:
+    """
+    Plan the DDL that brings a database in line with a parsed DBML schema.
+
+    Args:
+        schema: Output of parse_dbml
+        existing_tables: Tables as reported by getMetaData (None for an empty database)
+        existing_enums: (schema, name) of enum types that already exist
+
+    Returns:
+        Dictionary with the ordered "statements" and what they do:
+        "create_tables", "add_columns", "add_foreign_keys", "add_indexes",
+        plus "conflicts" that are not altered automatically and
+        "unmanaged_tables" present in the database but not in the DBML
+    """
+    existing = {(t["schema"], t["table_name"]): t for t in existing_tables or []}
+    existing_enums = set(existing_enums or [])
+    enums = {(e["schema"], e["name"]): e for e in schema["enums"]}
+
+    plan = {
+        "statements": [],
+        "create_tables": [],
+        "add_columns": [],
+        "add_foreign_keys": [],
+        "add_indexes": [],
+        "conflicts": [],
+        "unmanaged_tables": []
+    }
+    statements = plan["statements"]
+
+    new_schemas = sorted({t["schema"] for t in schema["tables"] if t["schema"] != "public"} |
+                         {e["schema"] for e in schema["enums"] if e["schema"] != "public"})
+    existing_schemas = {t["schema"] for t in existing.values()}
+    for schema_name in new_schemas:
+        if schema_name not in existing_schemas:
+            statements.append(f"CREATE SCHEMA IF NOT EXISTS {_ident(schema_name)}")
+
+    for key, enum in enums.items():
+        if key not in existing_enums:
+            values = ", ".join(_literal(value) for value in enum["values"])
+            statements.append(f"CREATE TYPE {_qualified(*key)} AS ENUM ({values})")
+
+    refs_by_table: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for ref in schema["refs"]:
+        refs_by_table.setdefault((ref["from"]["schema"], ref["from"]["table"]), []).append(ref)
+
+    declared = {(t["schema"], t["name"]) for t in schema["tables"]}
+    created = set()
+    deferred = []
+    comments = []
+    indexes = []
+    for table in _topological_order(schema["tables"], schema["refs"]):
+        key = (table["schema"], table["name"])
+        name = _qualified(*key)
+        refs = refs_by_table.get(key, [])
+
+        if key not in existing:
+            inline, later = [], []
+            for ref in refs:
+                target = (ref["to"]["schema"], ref["to"]["table"])
+                if target == key or _exists_before(target, created, existing, declared):
+                    inline.append(ref)
+                else:
+                    later.append(ref)
+            statements.append(_create_table_sql(table, enums, inline))
+            created.add(key)
+            plan["create_tables"].append(f"{table['schema']}.{table['name']}")
+            deferred.extend(later)
+            indexes.extend((table, index) for index in table["indexes"] if not index["pk"])
+            if table["note"]:
+                comments.append(f"COMMENT ON TABLE {name} IS {_literal(table['note'])}")
+            for column in table["columns"]:
+                if column["note"]:
+                    comments.append(f"COMMENT ON COLUMN {name}.{_ident(column['name'])} IS {_literal(column['note'])}")
+            continue
+
+        live = existing[key]
+        live_columns = {c["name"]: c for c in live["columns"]}
+        for column in table["columns"]:
+            current = live_columns.get(column["name"])
+            if current is None:
+                statements.append(f"ALTER TABLE {name} ADD COLUMN {_column_sql(column, enums, table['schema'])}")
+                plan["add_columns"].append(f"{table['schema']}.{table['name']}.{column['name']}")
+                continue
+            if (table["schema"], column["type"]) not in enums and ("public", column["type"]) not in enums:
+                wanted, actual = _canonical_type(column["type"]), current["data_type"].upper()
+                if wanted != actual and not (wanted == "ARRAY" and actual == "ARRAY"):
+                    plan["conflicts"].append(
+                        f"{table['schema']}.{table['name']}.{column['name']}: type is {actual}, DBML says {column['type']}"
+                    )
+            if (column["not_null"] or column["pk"]) and current["nullable"]:
+                plan["conflicts"].append(f"{table['schema']}.{table['name']}.{column['name']}: nullable in the database")
+
+        primary_key = _primary_key(table)
+        if primary_key and live["primary_key"] and primary_key != live["primary_key"]:
+            plan["conflicts"].append(
+                f"{table['schema']}.{table['name']}: primary key is ({', '.join(live['primary_key'])}), "
+                f"DBML says ({', '.join(primary_key)})"
+            )
+
+        live_fks = {
+            (fk["column"], fk["references"]["table"], fk["references"]["column"])
+            for fk in live["foreign_keys"]
+        }
+        for ref in refs:
+            pairs = zip(ref["from"]["columns"], ref["to"]["columns"])
+            if all((c, ref["to"]["table"], rc) in live_fks for c, rc in pairs):
+                continue
+            deferred.append(ref)
+
+        live_indexes = {tuple(index["columns"]) for index in live["indexes"]}
+        for index in table["indexes"]:
+            columns = tuple(c for c in index["columns"] if isinstance(c, str))
+            if not index["pk"] and columns not in live_indexes:
+                indexes.append((table, index))
+
+    for ref in deferred:
+        source = ref["from"]
+        statements.append(f"ALTER TABLE {_qualified(source['schema'], source['table'])} ADD {_foreign_key_sql(ref)}")
+        plan["add_foreign_keys"].append(
+            f"{source['table']}({', '.join(source['columns'])}) -> {ref['to']['table']}({', '.join(ref['to']['columns'])})"
+        )
+    for table, index in indexes:
+        statements.append(_index_sql(table, index))
+        plan["add_indexes"].append(f"{table['name']}({', '.join(c if isinstance(c, str) else c['expression'] for c in index['columns'])})")
+    statements.extend(comments)
+
+    managed_schemas = {key[0] for key in declared}
+    plan["unmanaged_tables"] = sorted(
+        f"{key[0]}.{key[1]}" for key in existing if key not in declared and key[0] in managed_schemas
+    )
+    return plan
+
+
+def _exists_before(target, created, existing, declared) -> bool:
+    """A referenced table is usable inline if it exists already or is not declared in the DBML at all"""
+    return target in created or target in existing or target not in declared
+
+
+def compile_ddl(dbml: str) -> List[str]:
+    """Compile DBML to the ordered DDL statements that create it in an empty database"""
+    return plan_ddl(parse_dbml(dbml))["statements"]
+
+
+_ENUMS_SQL = """
+    SELECT n.nspname AS schema, t.typname AS name
+    FROM pg_catalog.pg_type t
+    JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
+    WHERE t.typtype = 'e' AND n.nspname = ANY(%s)
+"""
+
+
+def apply_dbml(
+    connection_string: str,
+    dbml: str,
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Plan DBML against the live catalog and apply it in one transaction.
+
+    Args:
+        connection_string: PostgreSQL connection string of the data source
+        dbml: DBML source
+        cache_key: Pool key of the data source
+        org_id: Organization whose connection quota the work counts against
+        dry_run: Only return the plan
+
+    Returns:
+        The plan from plan_ddl plus "applied"
+    """
+    schema = parse_dbml(dbml)
+    schemas = sorted({t["schema"] for t in schema["tables"]} | {e["schema"] for e in schema["enums"]})
+
+    with pooled_connection(connection_string, key=cache_key, org_id=org_id) as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            existing_tables = sync_schema._build_tables(
+                sync_schema._get_tables(cursor, schemas),
+                sync_schema._get_columns(cursor, schemas),
+                sync_schema._get_indexes(cursor, schemas),
+                sync_schema._get_foreign_keys(cursor, schemas)
+            )
+            cursor.execute(_ENUMS_SQL, (schemas,))
+            existing_enums = [(row["schema"], row["name"]) for row in cursor.fetchall()]
+
+            plan = plan_ddl(schema, existing_tables, existing_enums)
+            plan["applied"] = False
+            if dry_run or not plan["statements"]:
+                return plan
+            if plan["conflicts"]:
+                raise Exception(f"DBML conflicts with the existing schema: {'; '.join(plan['conflicts'])}")
+
+            for statement in plan["statements"]:
+                cursor.execute(statement)
+            conn.commit()
+            plan["applied"] = True
+            return plan
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def apply_schema_tool(dbml: str, dry_run: bool = True, tool_context: ToolContext = None) -> str:
+    """
+    Creates the tables described by a DBML schema in the connected database.
+    With dry_run the DDL and the differences from the live database are returned without changing anything.
+
+    Args:
+        dbml: The DBML schema (the <dbml> block produced by SchemaAgent)
+        dry_run: Only report the planned DDL and differences
+
+    Returns:
+        JSON string with the planned statements, created tables, added columns,
+        foreign keys and indexes, conflicts, and whether it was applied
+    """
+    try:
+        datasource = resolve_datasource(tool_context)
+        plan = apply_dbml(
+            datasource["connection_uri"],
+            dbml,
+            cache_key=datasource["cache_key"],
+            org_id=datasource["organization_id"],
+            dry_run=dry_run
+        )
+        return json.dumps(plan)
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to apply schema: {str(e)}",
+            "status": "error"
+        })
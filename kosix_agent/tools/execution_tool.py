@@ -0,0 +1,363 @@
+"""
+Sandboxed, streaming SQL execution.
+
+Queries run on a pooled connection inside a READ ONLY transaction with a
+transaction-local statement_timeout taken from the schema security
+defaults. Rows are pulled through a named server-side cursor in fixed-size
+batches, so memory stays bounded by the batch size rather than by the
+result size. A running query can be cancelled from another thread (for
+example when the HTTP client disconnects), which cancels it on the server.
+
+Results of repeatable queries are served from the data-version-aware
+result cache (kosix_agent.utils.result_cache) while the tables they read
+have seen no writes.
+
+Before generated SQL runs, prepare_query validates it against the cached
+schema metadata (kosix_agent.tools.sql_validator), so malformed or unsafe
+queries are rejected without a database round trip, and then passes it
+through the EXPLAIN cost gate (kosix_agent.tools.cost_gate), which rejects
+or rewrites queries the planner expects to exceed the organization's
+budget. sql_agent runs the same checks through check_sql_tool before it
+answers, so it sees the structured errors and the gate's feedback and can
+revise the query itself. QueryStream refuses anything but a single statement.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+from google.adk.tools import ToolContext
+
+from kosix_agent.config.setting import COST_GATE_ENABLED, EXECUTION_BATCH_SIZE, RESULT_CACHE_ENABLED, SQL_VALIDATION_ENABLED
+from kosix_agent.tools.cost_gate import gate_query
+from kosix_agent.tools.schema_tool import _get_security_defaults
+from kosix_agent.tools.sql_validator import single_statement, validate_sql
+from kosix_agent.utils.columnar import ColumnarBuilder, ColumnarResult
+from kosix_agent.utils.datasource import resolve_datasource
+from kosix_agent.utils.db_pool import pooled_connection
+from kosix_agent.utils.metadata_cache import schema_cache
+from kosix_agent.utils.result_cache import result_cache
+
+
+class QueryCancelled(Exception):
+    """Raised when a query was cancelled before it finished"""
+
+
+class QueryStream:
+    """
+    A read-only query whose rows are consumed batch by batch.
+
+    Iterate over the stream to receive lists of row tuples. `columns` is
+    available once the first batch has been produced and `stats` is filled
+    in as the stream advances. Call cancel() from any thread to abort.
+
+    Args:
+        connection_string: PostgreSQL connection string of the data source
+        sql: A single SELECT (or WITH ... SELECT) statement
+        cache_key: Pool key of the data source
+        org_id: Organization whose connection quota the query counts against
+        row_limit: Maximum rows to return (capped by the security row limit)
+        timeout_ms: statement_timeout (capped by the security timeout)
+        batch_size: Rows fetched from the server per round trip
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        sql: str,
+        cache_key: Optional[str] = None,
+        org_id: Optional[str] = None,
+        row_limit: Optional[int] = None,
+        timeout_ms: Optional[int] = None,
+        batch_size: int = EXECUTION_BATCH_SIZE
+    ):
+        security = _get_security_defaults()
+        self.connection_string = connection_string
+        # A named cursor sends DECLARE ... FOR <sql>; whatever follows a ';' would run as its own statement
+        self.sql = single_statement(sql)
+        self.cache_key = cache_key
+        self.org_id = org_id
+        self.row_limit = min(row_limit or security["row_limit"], security["row_limit"])
+        self.timeout_ms = min(timeout_ms or security["timeout_ms"], security["timeout_ms"])
+        self.batch_size = batch_size
+
+        self.columns: List[str] = []
+        self.column_types: List[int] = []
+        self.row_count = 0
+        self.truncated = False
+        self.stats: Dict[str, float] = {}
+
+        self._conn = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """Abort the query; cancels it on the server if it is running"""
+        self._cancelled.set()
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.cancel()
+                except psycopg2.Error:
+                    pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def __iter__(self) -> Iterator[List[tuple]]:
+        started = time.perf_counter()
+        with pooled_connection(self.connection_string, key=self.cache_key, org_id=self.org_id) as conn:
+            acquired = time.perf_counter()
+            self.stats["queue_ms"] = round((acquired - started) * 1000, 2)
+            with self._lock:
+                self._conn = conn
+            cursor = None
+            try:
+                if self.cancelled:
+                    raise QueryCancelled("Query cancelled before execution")
+
+                setup = conn.cursor()
+                setup.execute("SET TRANSACTION READ ONLY")
+                setup.execute("SELECT set_config('statement_timeout', %s, true)", (str(self.timeout_ms),))
+                setup.close()
+
+                # DECLARE ... CURSOR only accepts a single SELECT/VALUES query
+                cursor = conn.cursor(name=f"kosix_{uuid.uuid4().hex}")
+                cursor.itersize = self.batch_size
+                cursor.execute(self.sql)
+
+                first = True
+                while self.row_count < self.row_limit:
+                    batch = cursor.fetchmany(min(self.batch_size, self.row_limit - self.row_count))
+                    if first:
+                        self.stats["first_batch_ms"] = round((time.perf_counter() - acquired) * 1000, 2)
+                        self.columns = [column.name for column in cursor.description or []]
+                        self.column_types = [column.type_code for column in cursor.description or []]
+                        first = False
+                    if not batch:
+                        break
+                    self.row_count += len(batch)
+                    yield batch
+
+                if self.row_count >= self.row_limit:
+                    self.truncated = bool(cursor.fetchmany(1))
+
+            except extensions.QueryCanceledError as e:
+                if self.cancelled:
+                    raise QueryCancelled("Query cancelled")
+                raise Exception(f"Query exceeded the {self.timeout_ms}ms timeout") from e
+            finally:
+                with self._lock:
+                    self._conn = None
+                if cursor is not None and not conn.closed:
+                    try:
+                        cursor.close()
+                    except psycopg2.Error:
+                        pass
+                self.stats["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def execute_query(
+    connection_string: str,
+    sql: str,
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None,
+    row_limit: Optional[int] = None,
+    timeout_ms: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Execute a read-only query and collect its (row-limited) result,
+    going through the result cache.
+
+    Returns:
+        Dictionary in the execution contract: columns, rows, row_count,
+        truncated and timing metadata
+    """
+    return collect_result_cached(QueryStream(connection_string, sql, cache_key, org_id, row_limit, timeout_ms))
+
+
+def execute_query_columnar(
+    connection_string: str,
+    sql: str,
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None,
+    row_limit: Optional[int] = None,
+    timeout_ms: Optional[int] = None
+) -> tuple:
+    """
+    Execute a read-only query into a column-oriented result.
+
+    Returns:
+        (ColumnarResult, stream) — the stream carries truncation and timing metadata
+    """
+    stream = QueryStream(connection_string, sql, cache_key, org_id, row_limit, timeout_ms)
+    return collect_columnar(stream), stream
+
+
+def collect_columnar(stream: QueryStream) -> ColumnarResult:
+    """Drain a QueryStream into typed column buffers"""
+    builder = None
+    for batch in stream:
+        if builder is None:
+            builder = ColumnarBuilder(stream.columns, stream.column_types)
+        builder.append_batch(batch)
+    if builder is None:
+        builder = ColumnarBuilder(stream.columns, stream.column_types)
+    return builder.build()
+
+
+def collect_result(stream: QueryStream) -> Dict[str, Any]:
+    """Drain a QueryStream into the execution result contract"""
+    result = collect_columnar(stream).to_contract()
+    result["truncated"] = stream.truncated
+    result["timing"] = {**stream.stats, "row_limit": stream.row_limit, "timeout_ms": stream.timeout_ms}
+    return result
+
+
+def probe_result_cache(stream: QueryStream) -> Tuple[Optional[Dict[str, Any]], Optional[tuple], Optional[Dict[str, str]]]:
+    """
+    Look a QueryStream's query up in the result cache before running it.
+
+    The data versions are read before the query runs, so a write that lands
+    while it runs invalidates the stored result on the next lookup.
+
+    Returns:
+        (entry, key, versions): the cached entry on a valid hit; otherwise
+        None with the key and data versions to store the result under
+        (versions is None when the result cannot be cached, and key too when
+        the query is never cached)
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None, None, None
+    key = result_cache.key(stream.cache_key or stream.connection_string, stream.sql, stream.row_limit)
+    if key is None:
+        return None, None, None
+    with pooled_connection(stream.connection_string, key=stream.cache_key, org_id=stream.org_id) as conn:
+        entry, versions = result_cache.probe(conn, key, stream.sql, stream.timeout_ms)
+    return entry, key, versions
+
+
+def collect_result_cached(stream: QueryStream) -> Dict[str, Any]:
+    """Serve a QueryStream from the result cache, or drain it and cache the result"""
+    started = time.perf_counter()
+    entry, key, versions = probe_result_cache(stream)
+    if key is None:
+        return collect_result(stream)
+
+    if entry is not None:
+        result = entry["result"].to_contract()
+        result["truncated"] = entry["truncated"]
+        result["timing"] = {
+            "cache": "hit",
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "row_limit": stream.row_limit,
+            "timeout_ms": stream.timeout_ms
+        }
+        return result
+
+    columnar = collect_columnar(stream)
+    if versions is not None and not stream.cancelled:
+        result_cache.put(key, columnar, stream.truncated, versions)
+
+    result = columnar.to_contract()
+    result["truncated"] = stream.truncated
+    result["timing"] = {
+        **stream.stats,
+        "cache": "miss",
+        "row_limit": stream.row_limit,
+        "timeout_ms": stream.timeout_ms
+    }
+    return result
+
+
+def _cached_metadata(datasource: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The data source's cached schema metadata, if it has been introspected"""
+    snapshot = schema_cache.get_snapshot(datasource["cache_key"], datasource["id"])
+    return snapshot["metadata"] if snapshot else None
+
+
+def _gate(sql: str, datasource: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Run the EXPLAIN cost gate on a pooled connection"""
+    with pooled_connection(datasource["connection_uri"], key=datasource["cache_key"], org_id=datasource["organization_id"]) as conn:
+        return gate_query(conn, sql, metadata, datasource["organization_id"], _get_security_defaults()["timeout_ms"])
+
+
+def gate_summary(gate: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a cost gate decision shown to the agent and the client"""
+    return {key: gate[key] for key in ("decision", "rewrites", "feedback", "estimate", "budget")}
+
+
+async def prepare_query(sql: str, datasource: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the pre-execution checks (static validation, then the cost gate) on generated SQL.
+
+    Args:
+        sql: The generated SQL
+        datasource: Resolved data source (see resolve_datasource)
+
+    Returns:
+        Dictionary with the "sql" to run, validation "warnings" and the
+        "cost_gate" decision (None when the gate is disabled); or, when the
+        query is rejected, an error payload with "status": "error"
+    """
+    metadata = await asyncio.to_thread(_cached_metadata, datasource)
+    warnings, gate = [], None
+    if SQL_VALIDATION_ENABLED:
+        validation = validate_sql(sql, metadata, row_limit=_get_security_defaults()["row_limit"])
+        if not validation["valid"]:
+            return {
+                "error": "Query rejected by validation: " + "; ".join(e["message"] for e in validation["errors"]),
+                "status": "error",
+                "errors": validation["errors"]
+            }
+        sql, warnings = validation["sql"], validation["warnings"]
+
+    if COST_GATE_ENABLED:
+        gate = await asyncio.to_thread(_gate, sql, datasource, metadata)
+        if gate["decision"] == "reject":
+            return {
+                "error": f"Query rejected by the cost gate: {gate['feedback']}",
+                "status": "error",
+                "cost_gate": gate_summary(gate)
+            }
+        sql = gate["sql"]
+
+    return {"sql": sql, "warnings": warnings, "cost_gate": gate}
+
+
+async def check_sql_tool(sql: str, tool_context: ToolContext = None) -> str:
+    """
+    Checks a SQL query before it is returned, without running it: static validation against the
+    schema, then the planner cost estimate against the organization's budget.
+
+    Args:
+        sql: The PostgreSQL SELECT statement to check
+
+    Returns:
+        JSON with "status": "ok", the "sql" that would run (with any automatic fixes), "warnings"
+        and the "cost_gate" decision ("allow" or "rewrite", with its rewrites and feedback);
+        or "status": "error" with the validation "errors" or the rejecting "cost_gate" feedback
+    """
+    try:
+        datasource = await asyncio.to_thread(resolve_datasource, tool_context)
+        prepared = await prepare_query(sql, datasource)
+        if prepared.get("status") == "error":
+            return json.dumps(prepared, default=str)
+        gate = prepared["cost_gate"]
+        return json.dumps({
+            "status": "ok",
+            "sql": prepared["sql"],
+            "warnings": prepared["warnings"],
+            "cost_gate": gate_summary(gate) if gate is not None else None
+        }, default=str)
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to check query: {str(e)}",
+            "status": "error"
+        })
@@ -0,0 +1,118 @@
+"""
+Analytics over uploaded files.
+
+Uploaded CSV, TSV, JSON lines and Excel files are parsed once into columnar
+tables (kosix_agent.utils.file_store). These tools answer questions about
+them from those tables, without SQL and without re-reading the raw file:
+file_schema_tool describes a file's columns, and file_query_tool groups and
+aggregates in one pass over the segments, reading only the columns the
+question involves. Files are looked up on behalf of the session's
+organization, like the bulk loader's.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.tools import ToolContext
+
+from kosix_agent.config.setting import FILE_ROWS_MAX_LIMIT
+from kosix_agent.utils.datasource import resolve_datasource
+from kosix_agent.utils.file_store import get_org_file, open_table
+
+
+_SAMPLE_ROWS = 5
+
+
+def _parse_aggregates(aggregates: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """"sum:amount" -> ("sum", "amount"); "count" -> ("count", None)"""
+    parsed = []
+    for spec in aggregates:
+        function, _, column = str(spec).partition(":")
+        parsed.append((function.strip().lower(), column.strip() or None))
+    return parsed
+
+
+def _open(file_id: str, tool_context: Optional[ToolContext]):
+    datasource = resolve_datasource(tool_context)
+    return open_table(get_org_file(file_id, datasource["organization_id"]))
+
+
+def describe_file(file_id: str, tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    with _open(file_id, tool_context) as table:
+        sample = table.rows(0, _SAMPLE_ROWS)
+        return {
+            "file_id": file_id,
+            "columns": table.schema["columns"],
+            "row_count": table.row_count,
+            "sample_rows": sample["rows"]
+        }
+
+
+def query_file(
+    file_id: str,
+    group_by: List[str],
+    aggregates: List[str],
+    filters: Dict[str, Any],
+    limit: int,
+    tool_context: Optional[ToolContext] = None
+) -> Dict[str, Any]:
+    with _open(file_id, tool_context) as table:
+        return table.aggregate(
+            [str(name) for name in group_by],
+            _parse_aggregates(aggregates),
+            filters,
+            max(1, min(limit, FILE_ROWS_MAX_LIMIT))
+        )
+
+
+async def file_schema_tool(file_id: str, tool_context: ToolContext = None) -> str:
+    """
+    Describes an uploaded data file: its columns with their types, the row count and a few sample rows.
+    Call this before file_query_tool to learn the column names.
+
+    Args:
+        file_id: Id of the uploaded file
+
+    Returns:
+        JSON with columns (name, type, nullable), row_count and sample_rows
+    """
+    try:
+        return json.dumps(await asyncio.to_thread(describe_file, file_id, tool_context), default=str)
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to describe file: {str(e)}",
+            "status": "error"
+        })
+
+
+async def file_query_tool(
+    file_id: str,
+    group_by: list,
+    aggregates: list,
+    filters: dict,
+    limit: int = 100,
+    tool_context: ToolContext = None
+) -> str:
+    """
+    Groups and aggregates the rows of an uploaded data file.
+
+    Args:
+        file_id: Id of the uploaded file
+        group_by: Column names to group by; an empty list returns one overall row
+        aggregates: Aggregates to compute, each "count" (rows), "count:column" (non-null values),
+            "sum:column", "avg:column", "min:column" or "max:column"
+        filters: Object mapping column names to the exact value a row must have; {} for all rows
+        limit: Maximum groups returned, ordered by the first aggregate, largest first
+
+    Returns:
+        JSON with columns, rows, row_count, total_groups and rows_scanned
+    """
+    try:
+        result = await asyncio.to_thread(query_file, file_id, group_by, aggregates, filters, limit, tool_context)
+        return json.dumps(result, default=str)
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to query file: {str(e)}",
+            "status": "error"
+        })
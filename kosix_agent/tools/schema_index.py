@@ -0,0 +1,295 @@
+"""
+Query-aware schema pruning.
+
+Builds a local BM25 index over each table's name, column names,
+descriptions and synonyms, and uses it to cut schema_tool's output down to
+the tables relevant to the user's question plus their foreign key closure.
+Query terms that are not in the vocabulary are matched by character
+trigram similarity, so small typos still hit. Everything runs in-process.
+"""
+
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from kosix_agent.config.setting import (
+    SCHEMA_PRUNE_ENABLED,
+    SCHEMA_PRUNE_MIN_CONFIDENCE,
+    SCHEMA_PRUNE_MIN_TABLES,
+    SCHEMA_PRUNE_TOKEN_BUDGET,
+    SCHEMA_PRUNE_TOP_K,
+)
+from kosix_agent.utils.lru import LRUCache
+from kosix_agent.utils.tokens import estimate_tokens
+
+
+_STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "as", "at", "be", "by", "can", "count", "data",
+    "did", "do", "does", "each", "find", "for", "from", "get", "give", "has", "have", "how",
+    "i", "in", "is", "it", "list", "many", "me", "much", "my", "number", "of", "on", "or",
+    "our", "per", "please", "show", "than", "that", "the", "their", "there", "this", "to",
+    "top", "total", "was", "we", "were", "what", "when", "where", "which", "who", "with", "you"
+}
+
+# Field weights: a hit on the table name says more than a hit on a column
+_TABLE_NAME_WEIGHT = 3
+_COLUMN_NAME_WEIGHT = 1
+_DESCRIPTION_WEIGHT = 1
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_TRIGRAM_MIN_SIMILARITY = 0.5
+
+_FILLER_DESCRIPTION = re.compile(r"^(Table|Column|Schema) \S+$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose into normalized, singularized terms"""
+    # Break camelCase before lowercasing, then split on anything non-alphanumeric
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text or "")
+    return [_singular(t) for t in re.split(r"[^a-z0-9]+", text.lower()) if t]
+
+
+def _singular(term: str) -> str:
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 4 and term.endswith(("ses", "xes", "ches", "shes")):
+        return term[:-2]
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SchemaIndex:
+    """
+    BM25 index with one document per table of a metadata dict.
+
+    Args:
+        metadata: Metadata dict as produced by getMetaData
+    """
+
+    def __init__(self, metadata: Dict[str, Any]):
+        self.tables = metadata["tables"]
+        self.synonyms = self._build_synonyms(metadata.get("synonyms") or {})
+
+        self._term_freqs: List[Counter] = []
+        self._doc_lengths: List[int] = []
+        document_freq: Counter = Counter()
+        for table in self.tables:
+            terms = self._table_terms(table)
+            self._term_freqs.append(terms)
+            self._doc_lengths.append(sum(terms.values()))
+            document_freq.update(terms.keys())
+
+        count = len(self.tables)
+        self._avg_length = (sum(self._doc_lengths) / count) if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_freq.items()
+        }
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, terms in enumerate(self._term_freqs):
+            for term in terms:
+                self._postings[term].append(doc_id)
+
+        self._trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        for term in self._idf:
+            for gram in _trigrams(term):
+                self._trigram_index[gram].add(term)
+
+    def search(self, query: str) -> Tuple[List[Tuple[int, float]], float]:
+        """
+        Score tables against a natural language query.
+
+        Returns:
+            (table index, score) pairs sorted by descending score, and the
+            fraction of content terms in the query that matched the schema
+        """
+        # Numbers are literals (years, ids, amounts), not schema vocabulary
+        query_terms = [t for t in tokenize(query) if t not in _STOPWORDS and not t.isdigit()]
+        if not query_terms:
+            return [], 0.0
+
+        scores: Dict[int, float] = defaultdict(float)
+        matched = 0
+        for term in query_terms:
+            resolved = self._resolve(term)
+            if not resolved:
+                continue
+            matched += 1
+            for candidate, weight in resolved:
+                idf = self._idf[candidate]
+                for doc_id in self._postings[candidate]:
+                    tf = self._term_freqs[doc_id][candidate]
+                    norm = 1 - _BM25_B + _BM25_B * self._doc_lengths[doc_id] / (self._avg_length or 1)
+                    scores[doc_id] += weight * idf * tf * (_BM25_K1 + 1) / (tf + _BM25_K1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked, matched / len(query_terms)
+
+    def _resolve(self, term: str) -> List[Tuple[str, float]]:
+        """Map a query term to indexed terms: exact, via synonyms, or by trigram similarity"""
+        resolved = []
+        if term in self._idf:
+            resolved.append((term, 1.0))
+        for synonym in self.synonyms.get(term, ()):
+            if synonym in self._idf:
+                resolved.append((synonym, 0.8))
+        if resolved:
+            return resolved
+
+        grams = _trigrams(term)
+        candidates = Counter()
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                candidates[candidate] += 1
+        best = None
+        for candidate, shared in candidates.items():
+            similarity = shared / len(grams | _trigrams(candidate))
+            if similarity >= _TRIGRAM_MIN_SIMILARITY and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return [best] if best else []
+
+    @staticmethod
+    def _table_terms(table: Dict[str, Any]) -> Counter:
+        terms: Counter = Counter()
+        for term in tokenize(table["table_name"]):
+            terms[term] += _TABLE_NAME_WEIGHT
+        for column in table["columns"]:
+            for term in tokenize(column["name"]):
+                terms[term] += _COLUMN_NAME_WEIGHT
+            if column.get("description") and not _FILLER_DESCRIPTION.match(column["description"]):
+                for term in tokenize(column["description"]):
+                    if term not in _STOPWORDS:
+                        terms[term] += _DESCRIPTION_WEIGHT
+        if table.get("description") and not _FILLER_DESCRIPTION.match(table["description"]):
+            for term in tokenize(table["description"]):
+                if term not in _STOPWORDS:
+                    terms[term] += _DESCRIPTION_WEIGHT
+        return terms
+
+    @staticmethod
+    def _build_synonyms(synonyms: Dict[str, Any]) -> Dict[str, Set[str]]:
+        """Make the metadata synonym map symmetric at the term level"""
+        expanded: Dict[str, Set[str]] = defaultdict(set)
+        for key, values in synonyms.items():
+            values = [values] if isinstance(values, str) else list(values or [])
+            key_terms = tokenize(key)
+            for value in values:
+                for a in key_terms:
+                    for b in tokenize(value):
+                        if a != b:
+                            expanded[a].add(b)
+                            expanded[b].add(a)
+        return expanded
+
+
+_indexes = LRUCache(max_entries=32)
+
+
+def get_index(metadata: Dict[str, Any], cache_key: Optional[str] = None) -> SchemaIndex:
+    """Return the index for a metadata snapshot, rebuilding it only when the snapshot changed"""
+    if cache_key is None:
+        return SchemaIndex(metadata)
+
+    entry = _indexes.get(cache_key)
+    if entry is not None and entry[0] is metadata:
+        return entry[1]
+
+    index = SchemaIndex(metadata)
+    _indexes.put(cache_key, (metadata, index))
+    return index
+
+
+def select_relevant_schema(
+    metadata: Dict[str, Any],
+    user_query: str,
+    cache_key: Optional[str] = None,
+    top_k: int = SCHEMA_PRUNE_TOP_K,
+    token_budget: int = SCHEMA_PRUNE_TOKEN_BUDGET,
+    min_confidence: float = SCHEMA_PRUNE_MIN_CONFIDENCE,
+    size_fn: Optional[Callable[[Dict[str, Any]], int]] = None
+) -> Dict[str, Any]:
+    """
+    Reduce metadata to the tables relevant to a user query.
+
+    Keeps the top-k scoring tables plus every table reachable from them over
+    foreign keys, then drops the lowest-ranked tables until the estimated
+    size fits the token budget. Falls back to the full metadata when the
+    schema is small, the query is empty, or too few query terms matched.
+
+    Args:
+        metadata: Full metadata dict
+        user_query: The user's natural language question
+        cache_key: Data source cache key, used to reuse the index across calls
+        top_k: Number of directly matching tables to keep
+        token_budget: Estimated token budget for the returned metadata
+        min_confidence: Minimum fraction of query terms that must match the schema
+        size_fn: Estimates the token size of a metadata dict as it will be sent
+            (defaults to the size of its JSON dump)
+
+    Returns:
+        Metadata dict; when pruned it carries a "schema_scope" entry describing the subset
+    """
+    size_fn = size_fn or (lambda m: estimate_tokens(json.dumps(m)))
+    tables = metadata["tables"]
+    if not SCHEMA_PRUNE_ENABLED or not user_query or len(tables) < SCHEMA_PRUNE_MIN_TABLES:
+        return metadata
+
+    ranked, confidence = get_index(metadata, cache_key).search(user_query)
+    if not ranked or confidence < min_confidence:
+        return metadata
+
+    # Direct hits: top-k, ignoring weak tail matches
+    best_score = ranked[0][1]
+    selected = [doc_id for doc_id, score in ranked[:top_k] if score >= best_score * 0.2]
+    scores = dict(ranked)
+
+    # Foreign key closure: everything the selected tables reference, transitively
+    by_name = defaultdict(list)
+    for doc_id, table in enumerate(tables):
+        by_name[table["table_name"]].append(doc_id)
+    order = list(selected)
+    seen = set(selected)
+    for doc_id in order:
+        for fk in tables[doc_id]["foreign_keys"]:
+            for ref_id in by_name.get(fk["references"]["table"], ()):
+                if ref_id not in seen:
+                    seen.add(ref_id)
+                    order.append(ref_id)
+
+    # Fit the budget: drop closure tables first, then the weakest direct hits
+    keep = sorted(order, key=lambda doc_id: (doc_id not in selected, -scores.get(doc_id, 0.0)))
+    pruned = _subset(metadata, keep, confidence)
+    while len(keep) > 1 and size_fn(pruned) > token_budget:
+        keep = keep[:-1]
+        pruned = _subset(metadata, keep, confidence)
+
+    return pruned
+
+
+def _subset(metadata: Dict[str, Any], keep: List[int], confidence: float) -> Dict[str, Any]:
+    tables = [metadata["tables"][doc_id] for doc_id in sorted(keep)]
+    names = {table["table_name"] for table in tables}
+
+    subset = dict(metadata)
+    subset["tables"] = tables
+    subset["relationships"] = [
+        r for r in metadata["relationships"]
+        if r["from_table"] in names and r["to_table"] in names
+    ]
+    subset["schema_scope"] = {
+        "mode": "relevant_subset",
+        "tables_returned": len(tables),
+        "tables_total": len(metadata["tables"]),
+        "match_confidence": round(confidence, 2),
+        "note": "Only tables relevant to the question are included. Call schema_tool with a broader user_query if a needed table is missing."
+    }
+    return subset
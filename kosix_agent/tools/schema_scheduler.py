@@ -0,0 +1,279 @@
+"""
+Background metadata refresh for every active PostgreSQL DataSource.
+
+The scheduler keeps DataSource.schemaMetadata warm so schema_tool calls hit
+the cache instead of introspecting on the user's turn. It runs on the
+server's event loop:
+
+- a dispatcher reloads the active POSTGRES DataSource rows every
+  SCHEMA_REFRESH_RELOAD_S and queues the sources that are due
+- SCHEMA_REFRESH_CONCURRENCY workers take sources off a priority queue and
+  run refresh_metadata_async on each, bounded by SCHEMA_REFRESH_TIMEOUT_S;
+  a slow or unreachable source times out without holding up the others
+- a source is active when a chat turn used it (touch()) or its
+  organization had a conversation within SCHEMA_REFRESH_ACTIVE_WINDOW_S.
+  Active sources are queued first and refreshed every
+  SCHEMA_REFRESH_INTERVAL_S, idle ones every SCHEMA_REFRESH_IDLE_INTERVAL_S
+- every interval is scaled by a random factor within SCHEMA_REFRESH_JITTER,
+  so sources loaded together do not keep refreshing in lockstep; failures
+  back off exponentially from SCHEMA_REFRESH_RETRY_S up to the interval
+
+An unchanged catalog costs one fingerprint query per refresh. Refreshes do
+not count against the per-organization connection quota, which stays
+reserved for user-facing work; the worker pool bounds them instead. With
+at least as many workers as sources, a cold start takes about as long as
+the slowest source.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from kosix_agent.config.setting import (
+    SCHEMA_REFRESH_ACTIVE_WINDOW_S,
+    SCHEMA_REFRESH_CONCURRENCY,
+    SCHEMA_REFRESH_IDLE_INTERVAL_S,
+    SCHEMA_REFRESH_INTERVAL_S,
+    SCHEMA_REFRESH_JITTER,
+    SCHEMA_REFRESH_RELOAD_S,
+    SCHEMA_REFRESH_RETRY_S,
+    SCHEMA_REFRESH_TIMEOUT_S
+)
+from kosix_agent.tools.schema_tool_async import refresh_metadata_async
+from kosix_agent.utils.metrics import schema_refresh_seconds
+from kosix_agent.utils.prisma_client import get_prisma
+
+
+logger = logging.getLogger(__name__)
+
+_DATASOURCES_SQL = """
+SELECT id, "organizationId" AS organization_id, "connectionUri" AS connection_uri
+FROM "DataSource"
+WHERE "isActive" AND "connectionUri" IS NOT NULL AND "type" = 'POSTGRES'
+"""
+
+_ACTIVE_ORGANIZATIONS_SQL = """
+SELECT DISTINCT "organizationId" AS organization_id
+FROM "Conversation"
+WHERE "updatedAt" >= $1::timestamp
+"""
+
+
+class _Source:
+    """Refresh state of one DataSource"""
+
+    def __init__(self, datasource: Dict[str, Any]):
+        self.id = datasource["id"]
+        self.organization_id = datasource["organization_id"]
+        self.connection_uri = datasource["connection_uri"]
+        # Monotonic time of the last refresh; None until the first one
+        self.last_run: Optional[float] = None
+        self.jitter = 1.0
+        self.failures = 0
+        self.queued = False
+        self.last_result: Optional[Dict[str, Any]] = None
+
+
+class IntrospectionScheduler:
+    """
+    Refreshes the metadata of many data sources concurrently.
+
+    Args:
+        concurrency: Worker pool size (refreshes in flight at once)
+        timeout: Seconds one refresh may take
+        interval: Refresh interval of active sources, in seconds
+        idle_interval: Refresh interval of idle sources, in seconds
+        jitter: Relative spread applied to every interval (0.2 = +-20%)
+        active_window: Seconds a use keeps a source active
+        reload_interval: Seconds between reloads of the DataSource rows
+        retry: First backoff after a failure, in seconds
+    """
+
+    def __init__(
+        self,
+        concurrency: int = SCHEMA_REFRESH_CONCURRENCY,
+        timeout: float = SCHEMA_REFRESH_TIMEOUT_S,
+        interval: float = SCHEMA_REFRESH_INTERVAL_S,
+        idle_interval: float = SCHEMA_REFRESH_IDLE_INTERVAL_S,
+        jitter: float = SCHEMA_REFRESH_JITTER,
+        active_window: float = SCHEMA_REFRESH_ACTIVE_WINDOW_S,
+        reload_interval: float = SCHEMA_REFRESH_RELOAD_S,
+        retry: float = SCHEMA_REFRESH_RETRY_S
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.jitter = jitter
+        self.active_window = active_window
+        self.reload_interval = reload_interval
+        self.retry = retry
+        self._sources: Dict[str, _Source] = {}
+        # DataSource id -> monotonic time of its last use
+        self._touched: Dict[str, float] = {}
+        self._active_organizations: Set[str] = set()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.counts = {"ok": 0, "timeout": 0, "error": 0}
+
+    def touch(self, datasource_id: str) -> None:
+        """Mark a data source as in use, which moves it ahead of idle ones"""
+        self._touched[datasource_id] = time.monotonic()
+        if self._wake is not None:
+            self._wake.set()
+
+    def is_active(self, source: _Source) -> bool:
+        touched = self._touched.get(source.id)
+        if touched is not None and time.monotonic() - touched <= self.active_window:
+            return True
+        return source.organization_id in self._active_organizations
+
+    def _due(self, source: _Source) -> float:
+        if source.last_run is None:
+            return 0.0
+        interval = self.interval if self.is_active(source) else self.idle_interval
+        if source.failures:
+            interval = min(interval, self.retry * 2 ** (source.failures - 1))
+        return source.last_run + interval * source.jitter
+
+    async def refresh(self, source: _Source) -> Dict[str, Any]:
+        """Refresh one source within the timeout; never raises"""
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"id": source.id}
+        try:
+            refreshed = await asyncio.wait_for(
+                refresh_metadata_async(source.connection_uri, cache_key=source.id, datasource_id=source.id),
+                timeout=self.timeout
+            )
+            result.update(status="ok", mode=refreshed["mode"], tables=len(refreshed["metadata"]["tables"]))
+            source.failures = 0
+        except asyncio.TimeoutError:
+            result.update(status="timeout", error=f"Introspection took longer than {self.timeout}s")
+            source.failures += 1
+        except Exception as e:
+            result.update(status="error", error=str(e))
+            source.failures += 1
+
+        elapsed = time.perf_counter() - started
+        schema_refresh_seconds.observe(elapsed, status=result["status"])
+        self.counts[result["status"]] += 1
+        result["ms"] = round(elapsed * 1000, 1)
+        if result["status"] != "ok":
+            logger.warning("Schema refresh of DataSource %s failed: %s", source.id, result["error"])
+
+        source.last_run = time.monotonic()
+        source.jitter = random.uniform(1 - self.jitter, 1 + self.jitter)
+        source.last_result = result
+        return result
+
+    async def refresh_many(self, datasources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Refresh the given data sources now, active ones first, at most `concurrency` at a time.
+
+        Args:
+            datasources: Dictionaries with id, organization_id and connection_uri
+
+        Returns:
+            One result per data source with its status, refresh mode and duration
+        """
+        self._merge(datasources)
+        sources = sorted((self._sources[d["id"]] for d in datasources), key=lambda s: not self.is_active(s))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(source: _Source) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.refresh(source)
+        return await asyncio.gather(*(run(source) for source in sources))
+
+    async def run(self) -> None:
+        """Dispatch due refreshes until cancelled"""
+        self._queue = asyncio.PriorityQueue()
+        self._wake = asyncio.Event()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        next_reload = 0.0
+        try:
+            while True:
+                self._wake.clear()
+                now = time.monotonic()
+                if now >= next_reload:
+                    await self._reload()
+                    next_reload = now + self.reload_interval
+                wait = next_reload - now
+                for source in self._sources.values():
+                    if source.queued:
+                        continue
+                    due = self._due(source)
+                    if due <= now:
+                        source.queued = True
+                        self._queue.put_nowait((0 if self.is_active(source) else 1, due, source.id))
+                    else:
+                        wait = min(wait, due - now)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=max(wait, 0.05))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._queue = None
+            self._wake = None
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, datasource_id = await self._queue.get()
+            source = self._sources.get(datasource_id)
+            if source is None:
+                continue
+            try:
+                await self.refresh(source)
+            finally:
+                source.queued = False
+                self._wake.set()
+
+    async def _reload(self) -> None:
+        try:
+            datasources = await asyncio.to_thread(_load_datasources)
+            self._active_organizations = await asyncio.to_thread(_active_organizations, self.active_window)
+        except Exception as e:
+            logger.warning("Could not load data sources to refresh: %s", e)
+            return
+        self._merge(datasources, prune=True)
+
+    def _merge(self, datasources: List[Dict[str, Any]], prune: bool = False) -> None:
+        ids = set()
+        for datasource in datasources:
+            ids.add(datasource["id"])
+            source = self._sources.get(datasource["id"])
+            if source is None or source.connection_uri != datasource["connection_uri"]:
+                # New, or pointed at another database: refresh it on the next pass
+                self._sources[datasource["id"]] = _Source(datasource)
+        if prune:
+            for datasource_id in [key for key in self._sources if key not in ids]:
+                del self._sources[datasource_id]
+
+    def stats(self) -> Dict[str, Any]:
+        sources = list(self._sources.values())
+        return {
+            "sources": len(sources),
+            "active": sum(1 for source in sources if self.is_active(source)),
+            "queued": sum(1 for source in sources if source.queued),
+            "failing": sum(1 for source in sources if source.failures),
+            "refreshes": dict(self.counts)
+        }
+
+
+def _load_datasources() -> List[Dict[str, Any]]:
+    return get_prisma().query_raw(_DATASOURCES_SQL)
+
+
+def _active_organizations(window: float) -> Set[str]:
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=window)
+    rows = get_prisma().query_raw(_ACTIVE_ORGANIZATIONS_SQL, since.isoformat())
+    return {row["organization_id"] for row in rows}
+
+
+schema_scheduler = IntrospectionScheduler()
@@ -0,0 +1,250 @@
+"""
+Schema metadata serializers for LLM context.
+
+A serializer turns the metadata dict into the text handed to the model.
+"json" reproduces the original indented JSON dump; "compact" is a DDL-like
+listing that drops auto-generated filler descriptions, abbreviates types,
+folds runs of same-typed columns onto one line and inlines foreign keys
+instead of repeating them in a separate relationship list.
+
+Additional formats can be plugged in with register_serializer.
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List
+
+from kosix_agent.config.setting import SCHEMA_SERIALIZATION_FORMAT
+from kosix_agent.utils.tokens import estimate_tokens
+
+
+Serializer = Callable[[Dict[str, Any]], str]
+
+_serializers: Dict[str, Serializer] = {}
+
+
+def register_serializer(name: str, serializer: Serializer) -> None:
+    """Make a serializer available under a format name"""
+    _serializers[name] = serializer
+
+
+def available_formats() -> List[str]:
+    return sorted(_serializers)
+
+
+def serialize_schema(metadata: Dict[str, Any], fmt: str = None) -> Dict[str, Any]:
+    """
+    Serialize metadata and report the size of the result.
+
+    Args:
+        metadata: Metadata dict as produced by getMetaData (optionally pruned)
+        fmt: Format name (defaults to SCHEMA_SERIALIZATION_FORMAT)
+
+    Returns:
+        Dictionary with the format, the serialized text, its character count
+        and its estimated token count
+    """
+    fmt = fmt or SCHEMA_SERIALIZATION_FORMAT
+    if fmt not in _serializers:
+        raise Exception(f"Unknown schema format '{fmt}', expected one of {available_formats()}")
+
+    text = _serializers[fmt](metadata)
+    return {
+        "format": fmt,
+        "text": text,
+        "chars": len(text),
+        "estimated_tokens": estimate_tokens(text)
+    }
+
+
+def to_json(metadata: Dict[str, Any]) -> str:
+    return json.dumps(metadata, indent=2)
+
+
+# Long PostgreSQL type names and their usual short spellings
+_TYPE_ALIASES = {
+    "INTEGER": "int",
+    "BIGINT": "bigint",
+    "SMALLINT": "smallint",
+    "TEXT": "text",
+    "BOOLEAN": "bool",
+    "UUID": "uuid",
+    "DATE": "date",
+    "TIMESTAMP": "timestamp",
+    "TIMESTAMP WITH TIME ZONE": "timestamptz",
+    "TIME WITHOUT TIME ZONE": "time",
+    "TIME WITH TIME ZONE": "timetz",
+    "DOUBLE PRECISION": "float8",
+    "REAL": "float4",
+    "NUMERIC": "numeric",
+    "CHARACTER VARYING": "varchar",
+    "CHARACTER": "char",
+    "JSON": "json",
+    "JSONB": "jsonb",
+    "BYTEA": "bytea",
+    "USER-DEFINED": "enum/udt",
+    "ARRAY": "array",
+}
+
+_FILLER_DESCRIPTION = re.compile(r"^(Primary analytics database for|Table|Column|Schema) \S+$")
+
+
+def _short_type(data_type: str) -> str:
+    if data_type in _TYPE_ALIASES:
+        return _TYPE_ALIASES[data_type]
+    # DECIMAL(12,2), VARCHAR(255), ...
+    return data_type.lower()
+
+
+def _real_description(description: str) -> str:
+    """Return the description unless it is auto-generated filler"""
+    if not description or _FILLER_DESCRIPTION.match(description):
+        return ""
+    return description
+
+
+def to_compact(metadata: Dict[str, Any]) -> str:
+    lines = []
+
+    database = metadata.get("database") or {}
+    if database:
+        lines.append(
+            f"# database {database.get('name')}: {database.get('dialect')} {database.get('dialect_version')}, "
+            f"timezone {database.get('timezone')}, default schema {database.get('default_schema')}"
+        )
+
+    security = metadata.get("security") or {}
+    guidelines = metadata.get("query_guidelines") or {}
+    if security or guidelines:
+        rules = []
+        if security:
+            rules.append(f"{security.get('access_mode')}, only {'/'.join(security.get('allowed_operations', []))}")
+            rules.append(f"row_limit {security.get('row_limit')}")
+            rules.append(f"timeout {security.get('timeout_ms')}ms")
+            pii_columns = security.get("pii_policy", {}).get("pii_columns") or []
+            if pii_columns:
+                rules.append(f"never select PII columns {', '.join(pii_columns)}")
+        if guidelines:
+            rules.append(f"default LIMIT {guidelines.get('default_limit')}")
+            if guidelines.get("require_explicit_joins"):
+                rules.append("explicit JOINs")
+            if guidelines.get("group_by_rules"):
+                rules.append(guidelines["group_by_rules"])
+            if guidelines.get("date_filter_preference"):
+                rules.append(f"filter dates on {guidelines['date_filter_preference']}")
+        lines.append(f"# rules: {'; '.join(rules)}")
+
+    scope = metadata.get("schema_scope")
+    if scope:
+        lines.append(
+            f"# showing {scope['tables_returned']} of {scope['tables_total']} tables relevant to the question; "
+            f"call schema_tool with a broader user_query if a needed table is missing"
+        )
+
+    for schema in metadata.get("schemas", []):
+        description = _real_description(schema.get("description"))
+        if description:
+            lines.append(f"# schema {schema['name']}: {description}")
+
+    for name, targets in (metadata.get("synonyms") or {}).items():
+        targets = [targets] if isinstance(targets, str) else list(targets)
+        lines.append(f"# synonym {name} = {', '.join(targets)}")
+    for definition in metadata.get("business_definitions") or []:
+        lines.append(f"# definition {json.dumps(definition, separators=(',', ':'))}")
+
+    lines.append("# format: table (~rows): columns as `name type [pk] [not null] [-> ref_table.ref_column]`")
+
+    for table in metadata.get("tables", []):
+        lines.append("")
+        lines.extend(_compact_table(table))
+
+    return "\n".join(lines)
+
+
+def _compact_table(table: Dict[str, Any]) -> List[str]:
+    header = f"{table['schema']}.{table['table_name']} (~{table['row_count_estimate']} rows)"
+    description = _real_description(table.get("description"))
+    if description:
+        header += f" -- {description}"
+    lines = [header]
+
+    primary_key = set(table.get("primary_key") or [])
+    references = {}
+    for fk in table.get("foreign_keys") or []:
+        references.setdefault(fk["column"], []).append(f"{fk['references']['table']}.{fk['references']['column']}")
+
+    # Fold consecutive plain columns that share a type and nullability
+    pending_names: List[str] = []
+    pending_suffix = None
+
+    def flush():
+        if pending_names:
+            lines.append(f"  {', '.join(pending_names)} {pending_suffix}")
+
+    for column in table.get("columns", []):
+        name = column["name"]
+        flags = [_short_type(column["data_type"])]
+        if name in primary_key:
+            flags.append("pk")
+        elif not column.get("nullable", True):
+            flags.append("not null")
+        suffix = " ".join(flags)
+        description = _real_description(column.get("description"))
+
+        if name in references or name in primary_key or description:
+            flush()
+            pending_names, pending_suffix = [], None
+            line = f"  {name} {suffix}"
+            if name in references:
+                line += f" -> {', '.join(references[name])}"
+            if description:
+                line += f" -- {description}"
+            lines.append(line)
+        elif suffix == pending_suffix:
+            pending_names.append(name)
+        else:
+            flush()
+            pending_names, pending_suffix = [name], suffix
+    flush()
+
+    if len(primary_key) > 1:
+        lines.append(f"  pk({', '.join(table['primary_key'])})")
+
+    indexes = [
+        f"{'unique ' if index['unique'] else ''}({', '.join(index['columns'])})"
+        for index in table.get("indexes") or []
+    ]
+    if indexes:
+        lines.append(f"  indexes: {'; '.join(indexes)}")
+
+    hints = [hint for hint in (_compact_profile(name, p) for name, p in (table.get("value_profile") or {}).items()) if hint]
+    if hints:
+        lines.append(f"  values: {'; '.join(hints)}")
+
+    return lines
+
+
+def _literal(value) -> str:
+    return "NULL" if value is None else "'" + str(value).replace("'", "''") + "'"
+
+
+def _compact_profile(name: str, profile: Dict[str, Any]) -> str:
+    """One-line value hint for a column, or "" when nothing useful is known"""
+    parts = []
+    if profile.get("values"):
+        parts.append(f"in ({', '.join(_literal(v) for v in profile['values'])})")
+    elif profile.get("unique"):
+        parts.append("unique")
+    elif profile.get("top"):
+        parts.append("mostly " + " ".join(f"{_literal(v)} ({f:.0%})" for v, f in profile["top"][:3]))
+    if profile.get("range") and not profile.get("values"):
+        parts.append(f"range {profile['range'][0]}..{profile['range'][1]}")
+    if not profile.get("values") and not profile.get("unique") and profile.get("distinct"):
+        parts.append(f"~{profile['distinct']} distinct")
+    if profile.get("null_frac", 0) >= 0.05:
+        parts.append(f"{profile['null_frac']:.0%} null")
+    return f"{name} {', '.join(parts)}" if parts else ""
+
+
+register_serializer("json", to_json)
+register_serializer("compact", to_compact)
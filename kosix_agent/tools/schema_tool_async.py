@@ -0,0 +1,271 @@
+"""
+Asyncio variant of schema_tool built on asyncpg.
+
+Shares the catalog queries, snapshot cache and metadata assembly with
+kosix_agent.tools.schema_tool, but never blocks the event loop: catalog
+queries run on pooled asyncpg connections and independent queries are
+issued concurrently, each on its own connection and against its own slot of
+the organization's connection quota. Prisma-backed lookups (DataSource resolution and the
+persisted cache tier) are pushed to a worker thread.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from google.adk.tools import ToolContext
+
+from kosix_agent.config.setting import COLUMN_PROFILE_ENABLED
+from kosix_agent.tools import column_profile
+from kosix_agent.tools import schema_tool as sync_schema
+from kosix_agent.tools.schema_index import select_relevant_schema
+from kosix_agent.tools.schema_serializer import serialize_schema
+from kosix_agent.utils.async_db_pool import get_async_pool, org_slot
+from kosix_agent.utils.datasource import resolve_datasource
+from kosix_agent.utils.metadata_cache import schema_cache
+from kosix_agent.utils.metrics import catalog_query_seconds, schema_phase_seconds, timed_async
+
+
+logger = logging.getLogger(__name__)
+
+
+async def schema_tool(user_query: str = "", tool_context: ToolContext = None) -> str:
+    """
+    Retrieves comprehensive PostgreSQL database schema metadata including tables, columns,
+    relationships, and query guidelines. This tool must be called before generating any SQL query.
+
+    Args:
+        user_query: The user's question. Used to return only the relevant tables and
+            their foreign key neighbours; pass an empty string for the full schema
+
+    Returns:
+        Database schema metadata as text (compact DDL-like listing or JSON)
+    """
+    try:
+        with schema_phase_seconds.time(phase="resolve_datasource"):
+            datasource = await asyncio.to_thread(resolve_datasource, tool_context)
+        with schema_phase_seconds.time(phase="metadata"):
+            metadata = await getCachedMetaDataAsync(
+                datasource["connection_uri"],
+                cache_key=datasource["cache_key"],
+                datasource_id=datasource["id"],
+                org_id=datasource["organization_id"]
+            )
+        fmt = tool_context.state.get("schema_format") if tool_context is not None else None
+        with schema_phase_seconds.time(phase="select_relevant"):
+            metadata = select_relevant_schema(
+                metadata,
+                user_query,
+                cache_key=datasource["cache_key"],
+                size_fn=lambda m: serialize_schema(m, fmt)["estimated_tokens"]
+            )
+        if COLUMN_PROFILE_ENABLED:
+            with schema_phase_seconds.time(phase="column_profiles"):
+                metadata = await profiles_for_async(
+                    metadata,
+                    datasource["connection_uri"],
+                    cache_key=datasource["cache_key"],
+                    org_id=datasource["organization_id"]
+                )
+        with schema_phase_seconds.time(phase="serialize"):
+            serialized = serialize_schema(metadata, fmt)
+        logger.info(
+            "schema_tool returned %d tables as %s: %d chars, ~%d tokens",
+            len(metadata["tables"]), serialized["format"], serialized["chars"], serialized["estimated_tokens"]
+        )
+        return serialized["text"]
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to retrieve schema: {str(e)}",
+            "status": "error"
+        })
+
+
+async def getCachedMetaDataAsync(
+    connection_string: str,
+    cache_key: Optional[str] = None,
+    datasource_id: Optional[str] = None,
+    org_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async counterpart of schema_tool.getCachedMetaData"""
+    result = await refresh_metadata_async(connection_string, cache_key, datasource_id, org_id)
+    return result["metadata"]
+
+
+async def refresh_metadata_async(
+    connection_string: str,
+    cache_key: Optional[str] = None,
+    datasource_id: Optional[str] = None,
+    org_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Async counterpart of schema_tool.refresh_metadata.
+
+    Returns:
+        Dictionary with the current "metadata", the refresh "mode"
+        ("cached", "incremental" or "full") and the structured "diff"
+    """
+    cache_key = cache_key or connection_string
+
+    try:
+        pool = await get_async_pool(connection_string, key=cache_key)
+        fingerprint = await _catalog(pool, org_id, "fingerprint", "fetchval", sync_schema._FINGERPRINT_SQL, None, None)
+        metadata = await _cache_get(cache_key, fingerprint, datasource_id)
+        if metadata is not None:
+            return {"metadata": metadata, "mode": "cached", "diff": sync_schema._empty_diff()}
+
+        snapshot, relation_rows = await asyncio.gather(
+            asyncio.to_thread(schema_cache.get_snapshot, cache_key, datasource_id),
+            _catalog(pool, org_id, "relation_versions", "fetch", sync_schema._RELATION_VERSIONS_SQL, None, None)
+        )
+        relations = sync_schema._format_relation_versions(relation_rows)
+
+        if snapshot is not None and "relations" in snapshot:
+            metadata, diff = await _introspect_incremental(pool, snapshot, relations, org_id)
+            mode = "incremental"
+        else:
+            metadata = await _introspect(pool, org_id=org_id)
+            diff = sync_schema._full_diff(metadata)
+            mode = "full"
+
+        await asyncio.to_thread(
+            schema_cache.put, cache_key, fingerprint, metadata, datasource_id, relations=relations
+        )
+        return {"metadata": metadata, "mode": mode, "diff": diff}
+
+    except Exception as e:
+        raise Exception(f"Error extracting metadata: {str(e)}")
+
+
+async def get_fingerprint_async(
+    connection_string: str,
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None
+) -> str:
+    """Return the live catalog fingerprint of a data source (one catalog query)"""
+    pool = await get_async_pool(connection_string, key=cache_key or connection_string)
+    return await _catalog(pool, org_id, "fingerprint", "fetchval", sync_schema._FINGERPRINT_SQL, None, None)
+
+
+async def profiles_for_async(
+    metadata: Dict[str, Any],
+    connection_string: str,
+    cache_key: Optional[str] = None,
+    org_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async counterpart of column_profile.profiles_for"""
+    cache_key = cache_key or connection_string
+    tables = column_profile.metadata_tables(metadata)
+    try:
+        if tables and column_profile.profile_cache.needs_check(cache_key, tables):
+            pool = await get_async_pool(connection_string, key=cache_key)
+            async with org_slot(org_id):
+                with catalog_query_seconds.time(query="analyzed_at"):
+                    rows = await pool.fetch(_q(column_profile._ANALYZED_SQL), *column_profile._stats_args(tables))
+                stale = column_profile.profile_cache.plan(cache_key, [dict(row) for row in rows])
+                if stale:
+                    with catalog_query_seconds.time(query="pg_stats"):
+                        rows = await pool.fetch(
+                            _q(column_profile._PG_STATS_SQL),
+                            *column_profile._stats_args([(schema, table) for schema, table, _ in stale])
+                        )
+                    column_profile.profile_cache.store(cache_key, stale, [dict(row) for row in rows])
+    except Exception as e:
+        logger.warning("Could not load column profiles: %s", e)
+        return metadata
+    return column_profile.attach_profiles(metadata, column_profile.profile_cache.profiles(cache_key))
+
+
+async def getMetaDataAsync(connection_string: str, schemas: List[str] = None) -> Dict[str, Any]:
+    """Async counterpart of schema_tool.getMetaData"""
+    try:
+        pool = await get_async_pool(connection_string)
+        return await _introspect(pool, schemas)
+    except Exception as e:
+        raise Exception(f"Error extracting metadata: {str(e)}")
+
+
+async def _introspect(pool, schemas: List[str] = None, org_id: Optional[str] = None) -> Dict[str, Any]:
+    """Run the catalog queries concurrently and assemble the metadata dict"""
+    database_row, schema_rows = await asyncio.gather(
+        _catalog(pool, org_id, "database_info", "fetchrow", sync_schema._DATABASE_INFO_SQL),
+        _catalog(pool, org_id, "schemas", "fetch", sync_schema._SCHEMAS_SQL, schemas, schemas)
+    )
+    available_schemas = [row["schema_name"] for row in schema_rows]
+
+    table_rows, column_rows, index_rows, fk_rows = await _fetch_relations(pool, available_schemas, org_id=org_id)
+    return sync_schema._assemble_metadata(
+        database_row, schema_rows, table_rows, column_rows, index_rows, fk_rows
+    )
+
+
+async def _introspect_incremental(
+    pool,
+    snapshot: Dict[str, Any],
+    relations: Dict[str, Dict[str, Any]],
+    org_id: Optional[str] = None
+) -> tuple:
+    """Re-fetch only changed relations concurrently and patch them into the snapshot"""
+    plan = sync_schema._plan_incremental(snapshot, relations)
+
+    schema_query = _catalog(pool, org_id, "schemas", "fetch", sync_schema._SCHEMAS_SQL, None, None)
+    if plan["refetch"]:
+        oids = [int(oid) for oid in plan["refetch"]]
+        schema_rows, relation_rows = await asyncio.gather(schema_query, _fetch_relations(pool, None, oids, org_id))
+        fetched_tables = sync_schema._build_tables(*relation_rows)
+    else:
+        schema_rows = await schema_query
+        fetched_tables = []
+
+    return sync_schema._patch_incremental(snapshot, relations, plan, fetched_tables, schema_rows)
+
+
+async def _fetch_relations(pool, schemas: List[str], oids: List[int] = None, org_id: Optional[str] = None) -> tuple:
+    """Issue the four per-table catalog queries concurrently on separate pooled connections"""
+    if oids is not None:
+        relation_filter, arg = sync_schema._OID_FILTER, oids
+    else:
+        relation_filter, arg = sync_schema._SCHEMA_FILTER, schemas
+
+    return tuple(await asyncio.gather(*(
+        _catalog(pool, org_id, name, "fetch", query.format(relation_filter=relation_filter), arg)
+        for name, query in [
+            ("tables", sync_schema._TABLES_SQL),
+            ("columns", sync_schema._COLUMNS_SQL),
+            ("indexes", sync_schema._INDEXES_SQL),
+            ("foreign_keys", sync_schema._FOREIGN_KEYS_SQL)
+        ]
+    )))
+
+
+async def _catalog(pool, org_id: Optional[str], name: str, method: str, query: str, *args: Any) -> Any:
+    """
+    Run one catalog query on its own pooled connection.
+
+    Every query takes its own slot of the organization's connection quota,
+    so concurrent queries count as the connections they actually hold.
+    """
+    async with org_slot(org_id):
+        return await timed_async(catalog_query_seconds, getattr(pool, method)(_q(query), *args), query=name)
+
+
+async def _cache_get(cache_key: str, fingerprint: str, datasource_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Look up the snapshot cache, touching the persisted tier off the event loop"""
+    if datasource_id is None:
+        return schema_cache.get(cache_key, fingerprint)
+    return await asyncio.to_thread(schema_cache.get, cache_key, fingerprint, datasource_id)
+
+
+_converted: Dict[str, str] = {}
+
+
+def _q(query: str) -> str:
+    """Convert a psycopg2-style query (%s placeholders, %% escapes) to asyncpg's $n style"""
+    converted = _converted.get(query)
+    if converted is None:
+        parts = query.replace("%%", "\0").split("%s")
+        converted = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+        converted = converted.replace("\0", "%")
+        _converted[query] = converted
+    return converted
@@ -0,0 +1,613 @@
+"""
+Static validation of generated SQL against cached schema metadata.
+
+validate_sql() tokenizes the query (comments, string literals, quoted
+identifiers and dollar quoting are understood) and, without touching the
+database:
+
+- rejects anything but a single read-only SELECT / WITH ... SELECT,
+  including SELECT INTO, row locking and server-side side-effect functions
+- resolves FROM / JOIN table references (CTE names, derived tables and
+  system catalogs excepted) and alias.column references against the
+  metadata, and unqualified columns when every source table is known
+- caps a top-level LIMIT / FETCH FIRST at the row limit or appends the
+  default LIMIT
+- adds an ON clause to a JOIN that has none, from the foreign keys between
+  the joined tables
+
+Errors come back as structured {code, message, hint} entries the agent can
+act on in one retry.
+"""
+
+import difflib
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from kosix_agent.tools.join_graph import _quote, foreign_key_groups
+
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>[eE]'(?:\\.|''|[^'\\])*'|'(?:''|[^'])*'|\$(?P<tag>[A-Za-z_]\w*)?\$.*?\$(?P=tag)?\$)
+  | (?P<qident>"(?:""|[^"])*")
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<param>\$\d+|%s|%\(\w+\)s)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op>::|<=|>=|<>|!=|\|\||[-+*/%<>=~!@\#^&|?]+)
+  | (?P<punct>[(),;.\[\]:])
+  | (?P<bad>.)
+""", re.S | re.X)
+
+_FORBIDDEN_KEYWORDS = {
+    "insert", "update", "delete", "merge", "upsert", "drop", "alter", "truncate", "create", "grant",
+    "revoke", "copy", "vacuum", "analyze", "call", "do", "lock", "reindex", "cluster", "refresh",
+    "comment", "security", "listen", "notify", "prepare", "execute", "deallocate", "discard", "set",
+    "reset", "begin", "commit", "rollback", "savepoint", "checkpoint", "load", "import"
+}
+
+_FORBIDDEN_FUNCTIONS = {
+    "pg_sleep", "pg_sleep_for", "pg_sleep_until", "pg_read_file", "pg_read_binary_file", "pg_ls_dir",
+    "pg_stat_file", "lo_import", "lo_export", "lo_unlink", "dblink", "dblink_exec", "dblink_connect",
+    "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_rotate_logfile", "set_config",
+    "pg_advisory_lock", "pg_advisory_xact_lock", "pg_try_advisory_lock", "nextval", "setval",
+    "txid_current", "pg_notify", "query_to_xml", "query_to_json", "pg_logical_emit_message"
+}
+
+# Keywords that end a FROM item list
+_CLAUSE_KEYWORDS = {
+    "where", "group", "order", "having", "limit", "offset", "fetch", "for", "union", "intersect",
+    "except", "window", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using",
+    "returning", "into", "select", "from", "tablesample", "with"
+}
+
+# Functions whose argument syntax contains FROM
+_FROM_FUNCTIONS = {"extract", "substring", "trim", "overlay", "position"}
+
+_SYSTEM_SCHEMAS = {"pg_catalog", "information_schema"}
+
+_KEYWORDS = _CLAUSE_KEYWORDS | {
+    "select", "distinct", "all", "as", "and", "or", "not", "null", "is", "in", "like", "ilike", "similar",
+    "between", "case", "when", "then", "else", "end", "outer", "asc", "desc", "nulls", "first", "last",
+    "true", "false", "unknown", "interval", "date", "time", "timestamp", "timestamptz", "zone", "at",
+    "over", "partition", "by", "rows", "range", "groups", "preceding", "following", "unbounded",
+    "current", "row", "filter", "within", "exists", "any", "some", "array", "cast", "escape",
+    "current_date", "current_time", "current_timestamp", "localtime", "localtimestamp", "current_user",
+    "session_user", "user", "next", "only", "ties", "percent", "lateral", "materialized", "recursive",
+    "values", "default", "collate", "both", "leading", "trailing", "year", "month", "day", "hour",
+    "minute", "second", "epoch", "week", "quarter", "dow", "doy", "isodow", "isoyear", "decade",
+    "century", "millennium", "microseconds", "milliseconds", "timezone", "varying", "precision",
+    "character", "double", "without", "ordinality", "grouping", "sets", "cube", "rollup", "bernoulli",
+    "system", "repeatable", "distinctrow"
+}
+
+
+def _tokenize(sql: str) -> List[Tuple[str, str, int, int, str]]:
+    """Tokens as (kind, text, start, end, name): name is the folded identifier or keyword"""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        if kind == "tag":
+            kind = "string"
+        text = match.group()
+        if kind == "bad":
+            raise ValueError(f"unexpected character {text!r} at offset {match.start()}")
+        if kind == "ident":
+            name = text.lower()
+        elif kind == "qident":
+            name = text[1:-1].replace('""', '"')
+        else:
+            name = text
+        tokens.append((kind, text, match.start(), match.end(), name))
+    return tokens
+
+
+class _Analysis:
+    """Single-pass facts about a token list"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.depth: List[int] = []
+        # Index of the matching parenthesis for every "(" and ")"
+        self.match: Dict[int, int] = {}
+        # "(" indexes that open the argument list of a function using FROM in its syntax
+        self.from_parens = set()
+
+        depth, stack = 0, []
+        for i, (kind, text, _, _, name) in enumerate(tokens):
+            if kind == "punct" and text == "(":
+                self.depth.append(depth)
+                stack.append(i)
+                if i > 0 and tokens[i - 1][0] == "ident" and tokens[i - 1][4] in _FROM_FUNCTIONS:
+                    self.from_parens.add(i)
+                depth += 1
+            elif kind == "punct" and text == ")":
+                depth -= 1
+                if not stack:
+                    raise ValueError("unbalanced parentheses")
+                opener = stack.pop()
+                self.match[opener], self.match[i] = i, opener
+                self.depth.append(depth)
+            else:
+                self.depth.append(depth)
+        if stack:
+            raise ValueError("unbalanced parentheses")
+
+    def keyword(self, i: int, *words: str) -> bool:
+        return 0 <= i < len(self.tokens) and self.tokens[i][0] == "ident" and self.tokens[i][4] in words
+
+    def punct(self, i: int, text: str) -> bool:
+        return 0 <= i < len(self.tokens) and self.tokens[i][0] == "punct" and self.tokens[i][1] == text
+
+    def enclosing_paren(self, i: int) -> Optional[int]:
+        """Index of the innermost "(" around token i"""
+        depth = self.depth[i]
+        for j in range(i - 1, -1, -1):
+            if self.punct(j, "(") and self.depth[j] == depth - 1:
+                return j
+        return None
+
+
+def _with_clauses(tokens, analysis: _Analysis) -> Tuple[Set[str], Set[int]]:
+    """
+    CTE names of every WITH list, and the token indexes where a statement
+    begins inside one: each CTE body and the statement the list belongs to.
+    """
+    names, starts = set(), set()
+    for w in range(len(tokens)):
+        if not analysis.keyword(w, "with"):
+            continue
+        i = w + 1
+        if analysis.keyword(i, "recursive"):
+            i += 1
+        # Anything but "name [(columns)] AS [NOT] [MATERIALIZED] (" ends the
+        # walk, which also skips WITH TIME ZONE and WITH ORDINALITY
+        while i < len(tokens) and tokens[i][0] in ("ident", "qident"):
+            name = tokens[i][4]
+            i += 1
+            if analysis.punct(i, "("):
+                i = analysis.match[i] + 1
+            if analysis.keyword(i, "as"):
+                i += 1
+            while analysis.keyword(i, "not", "materialized"):
+                i += 1
+            if not analysis.punct(i, "("):
+                break
+            names.add(name)
+            starts.add(i + 1)
+            i = analysis.match[i] + 1
+            if not analysis.punct(i, ","):
+                starts.add(i)
+                break
+            i += 1
+    return names, starts
+
+
+def single_statement(sql: str) -> str:
+    """
+    The query without trailing semicolons, rejecting anything but one statement.
+
+    Raises:
+        Exception: When the query is empty, cannot be tokenized, or contains
+            a ';' outside string literals, quoted identifiers and comments
+    """
+    try:
+        tokens = _tokenize(sql)
+    except ValueError as e:
+        raise Exception(f"Could not parse the query: {e}")
+    while tokens and tokens[-1][0] == "punct" and tokens[-1][1] == ";":
+        tokens.pop()
+    if not tokens:
+        raise Exception("The query is empty")
+    if any(kind == "punct" and text == ";" for kind, text, _, _, _ in tokens):
+        raise Exception("Only one statement is allowed")
+    return sql[:tokens[-1][3]].strip()
+
+
+def _error(code: str, message: str, hint: str = "") -> Dict[str, str]:
+    return {"code": code, "message": message, "hint": hint}
+
+
+def _closest(name: str, candidates) -> str:
+    matches = difflib.get_close_matches(name.lower(), [c.lower() for c in candidates], n=3, cutoff=0.6)
+    originals = {c.lower(): c for c in candidates}
+    return f"did you mean {', '.join(originals[m] for m in matches)}?" if matches else ""
+
+
+def _table_index(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    by_qualified, by_name = {}, {}
+    for table in (metadata or {}).get("tables", []):
+        by_qualified[(table["schema"], table["table_name"])] = table
+        by_name.setdefault(table["table_name"], []).append(table)
+    return {"qualified": by_qualified, "name": by_name}
+
+
+def _resolve_table(index: Dict[str, Any], schema: Optional[str], name: str) -> Optional[Dict[str, Any]]:
+    if schema is not None:
+        return index["qualified"].get((schema, name))
+    candidates = index["name"].get(name, [])
+    for table in candidates:
+        if table["schema"] == "public":
+            return table
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def validate_sql(
+    sql: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    row_limit: int = 1000,
+    default_limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Validate and normalize a generated query without a database round trip.
+
+    Args:
+        sql: The generated SQL
+        metadata: Schema metadata as produced by getMetaData; without it only
+            the statement-level checks and LIMIT handling run
+        row_limit: Largest LIMIT allowed
+        default_limit: LIMIT appended when the query has none (defaults to
+            the metadata's query_guidelines default_limit, then row_limit)
+
+    Returns:
+        Dictionary with "valid", the rewritten "sql", "errors" and
+        "warnings" (lists of {code, message, hint}), the resolved "tables"
+        and the validation time in "elapsed_us"
+    """
+    started = time.perf_counter()
+    result = _validate(sql, metadata, row_limit, default_limit)
+    result["elapsed_us"] = round((time.perf_counter() - started) * 1e6, 1)
+    return result
+
+
+def _validate(sql: str, metadata, row_limit: int, default_limit: Optional[int]) -> Dict[str, Any]:
+    errors: List[Dict[str, str]] = []
+    warnings: List[Dict[str, str]] = []
+    edits: List[Tuple[int, int, str]] = []
+
+    def finish(tables=()):
+        fixed = sql
+        # Right to left; edits at the same offset keep the order they were made in
+        for _, (start, end, replacement) in sorted(enumerate(edits), key=lambda e: (e[1][0], e[1][1], e[0]), reverse=True):
+            fixed = fixed[:start] + replacement + fixed[end:]
+        return {
+            "valid": not errors,
+            "sql": fixed.strip(),
+            "errors": errors,
+            "warnings": warnings,
+            "tables": sorted(set(tables))
+        }
+
+    try:
+        tokens = _tokenize(sql)
+        analysis = _Analysis(tokens)
+    except ValueError as e:
+        errors.append(_error("syntax", f"Could not parse the query: {e}", "Check quoting and parentheses"))
+        return finish()
+
+    # Statement shape ---------------------------------------------------------
+    while tokens and analysis.punct(len(tokens) - 1, ";"):
+        edits.append((tokens[-1][2], tokens[-1][3], ""))
+        tokens = tokens[:-1]
+    if not tokens:
+        errors.append(_error("empty", "The query is empty", "Return a single SELECT statement"))
+        return finish()
+    if any(analysis.punct(i, ";") for i in range(len(tokens))):
+        errors.append(_error("multiple_statements", "Only one statement is allowed", "Remove everything after the first ';'"))
+        return finish()
+
+    first = next((i for i, token in enumerate(tokens) if not analysis.punct(i, "(")), None)
+    if first is None or not analysis.keyword(first, "select", "with"):
+        errors.append(_error(
+            "not_read_only",
+            f"Only SELECT queries are allowed, got {tokens[first][1] if first is not None else '('!r}",
+            "Rewrite the request as a single SELECT (or WITH ... SELECT)"
+        ))
+        return finish()
+
+    # CTE names and statement starts ------------------------------------------
+    ctes, starts = _with_clauses(tokens, analysis)
+    starts.add(first)
+    # The operand after a set operator is a statement of its own
+    for i in range(len(tokens)):
+        if analysis.keyword(i, "union", "intersect", "except"):
+            j = i + 1
+            if analysis.keyword(j, "all", "distinct"):
+                j += 1
+            while analysis.punct(j, "("):
+                j += 1
+            starts.add(j)
+
+    seen = set()
+    for i, (kind, text, _, _, name) in enumerate(tokens):
+        if kind != "ident":
+            continue
+        # Statement keywords only mean something where a statement begins;
+        # elsewhere they are column or alias names (comment, load, set, ...)
+        if name in _FORBIDDEN_KEYWORDS and i in starts and name not in seen:
+            seen.add(name)
+            errors.append(_error("not_read_only", f"{text.upper()} is not allowed in a read-only query", "Use SELECT only"))
+        elif name == "into" and "into" not in seen:
+            seen.add(name)
+            errors.append(_error("not_read_only", "SELECT INTO creates a table and is not allowed", "Remove the INTO clause"))
+        elif name == "for" and analysis.keyword(i + 1, "update", "share", "no", "key"):
+            errors.append(_error("not_read_only", "Row locking clauses are not allowed", "Remove the FOR UPDATE/SHARE clause"))
+        elif name in _FORBIDDEN_FUNCTIONS and analysis.punct(i + 1, "("):
+            errors.append(_error("forbidden_function", f"{name}() is not allowed", "Use plain SELECT expressions"))
+    if errors:
+        return finish()
+
+    # FROM / JOIN items ------------------------------------------------------
+    index = _table_index(metadata)
+    have_metadata = bool(index["qualified"])
+    refs: List[Dict[str, Any]] = []
+    table_token_indexes = set()
+    opaque_sources = bool(ctes)
+    joins_without_condition = []
+
+    def read_item(i: int, clause_id: int) -> int:
+        """Read one FROM item starting at token i; returns the index after it"""
+        nonlocal opaque_sources
+        while analysis.keyword(i, "lateral", "only"):
+            i += 1
+        ref = {"schema": None, "name": None, "alias": None, "table": None, "clause": clause_id, "end": None}
+        if analysis.punct(i, "("):
+            opaque_sources = True
+            i = analysis.match[i] + 1
+        elif i < len(tokens) and tokens[i][0] in ("ident", "qident"):
+            parts = [i]
+            while analysis.punct(parts[-1] + 1, ".") and parts[-1] + 2 < len(tokens):
+                parts.append(parts[-1] + 2)
+            i = parts[-1] + 1
+            if analysis.punct(i, "("):
+                # Set-returning function in FROM
+                opaque_sources = True
+                i = analysis.match[i] + 1
+            else:
+                table_token_indexes.update(parts)
+                ref["name"] = tokens[parts[-1]][4]
+                ref["schema"] = tokens[parts[-2]][4] if len(parts) > 1 else None
+        else:
+            return i
+        ref["end"] = tokens[i - 1][3]
+
+        if analysis.keyword(i, "as"):
+            i += 1
+        if i < len(tokens) and tokens[i][0] in ("ident", "qident") and not (
+            tokens[i][0] == "ident" and (tokens[i][4] in _CLAUSE_KEYWORDS or tokens[i][4] in _KEYWORDS)
+        ):
+            ref["alias"] = tokens[i][4]
+            table_token_indexes.add(i)
+            ref["end"] = tokens[i][3]
+            i += 1
+            if analysis.punct(i, "("):
+                i = analysis.match[i] + 1
+                ref["end"] = tokens[i - 1][3]
+        if analysis.keyword(i, "tablesample"):
+            while i < len(tokens) and not analysis.punct(i, "("):
+                i += 1
+            if i < len(tokens):
+                i = analysis.match[i] + 1
+        refs.append(ref)
+        return i
+
+    for i, (kind, text, _, _, name) in enumerate(tokens):
+        if kind != "ident" or name not in ("from", "join"):
+            continue
+        if name == "from":
+            paren = analysis.enclosing_paren(i)
+            if paren is not None and paren in analysis.from_parens:
+                continue
+            if analysis.keyword(i - 1, "distinct") and analysis.keyword(i - 2, "is", "not"):
+                continue
+            j = read_item(i + 1, i)
+            while analysis.punct(j, ",") and analysis.depth[j] == analysis.depth[i]:
+                j = read_item(j + 1, i)
+        else:
+            # Find the FROM clause this JOIN belongs to
+            clause = max((r["clause"] for r in refs if analysis.depth[r["clause"]] == analysis.depth[i] and r["clause"] < i), default=i)
+            kinds = []
+            k = i - 1
+            while analysis.keyword(k, "inner", "left", "right", "full", "outer", "cross", "natural"):
+                kinds.append(tokens[k][4])
+                k -= 1
+            before = len(refs)
+            j = read_item(i + 1, clause)
+            if "cross" in kinds or "natural" in kinds or len(refs) == before:
+                continue
+            if not analysis.keyword(j, "on", "using"):
+                joins_without_condition.append(refs[-1])
+
+    # Table resolution ---------------------------------------------------------
+    resolved_tables = []
+    for ref in refs:
+        if ref["schema"] is None and ref["name"] in ctes:
+            ref["cte"] = True
+            continue
+        if ref["schema"] in _SYSTEM_SCHEMAS or (ref["schema"] is None and ref["name"].startswith("pg_")):
+            ref["system"] = True
+            opaque_sources = True
+            continue
+        if not have_metadata:
+            continue
+        table = _resolve_table(index, ref["schema"], ref["name"])
+        if table is None:
+            label = f"{ref['schema']}.{ref['name']}" if ref["schema"] else ref["name"]
+            errors.append(_error(
+                "unknown_table",
+                f"Table {label} does not exist",
+                _closest(ref["name"], index["name"]) or "Call schema_tool to list the available tables"
+            ))
+            continue
+        ref["table"] = table
+        resolved_tables.append(f"{table['schema']}.{table['table_name']}")
+
+    # Column resolution --------------------------------------------------------
+    if have_metadata:
+        by_alias = {}
+        for ref in refs:
+            if ref.get("cte") or ref.get("system"):
+                by_alias[ref["alias"] or ref["name"]] = None
+            elif ref["name"] is not None:
+                by_alias[ref["alias"] or ref["name"]] = ref["table"]
+                if ref["alias"] is None and ref["schema"] is not None:
+                    by_alias[f"{ref['schema']}.{ref['name']}"] = ref["table"]
+            elif ref["alias"] is not None:
+                by_alias[ref["alias"]] = None
+
+        output_aliases = {
+            tokens[i + 1][4] for i in range(len(tokens) - 1)
+            if analysis.keyword(i, "as") and tokens[i + 1][0] in ("ident", "qident")
+        }
+        # Aliases without AS: "count(*) n," or "total t FROM"
+        for i in range(1, len(tokens)):
+            previous = tokens[i - 1]
+            if tokens[i][0] not in ("ident", "qident") or (tokens[i][0] == "ident" and tokens[i][4] in _KEYWORDS):
+                continue
+            if not (analysis.punct(i - 1, ")") or previous[0] in ("number", "string", "qident") or (
+                previous[0] == "ident" and previous[4] not in _KEYWORDS
+            )):
+                continue
+            if i + 1 == len(tokens) or analysis.punct(i + 1, ",") or analysis.keyword(i + 1, "from"):
+                output_aliases.add(tokens[i][4])
+        # Named windows: "OVER w ... WINDOW w AS (...)"
+        windows = set()
+        for i in range(len(tokens)):
+            if not analysis.keyword(i, "window"):
+                continue
+            j = i + 1
+            while j < len(tokens) and tokens[j][0] in ("ident", "qident") and analysis.keyword(j + 1, "as") and analysis.punct(j + 2, "("):
+                windows.add(tokens[j][4])
+                j = analysis.match[j + 2] + 1
+                if not analysis.punct(j, ","):
+                    break
+                j += 1
+        columns_in_scope = set()
+        for ref in refs:
+            if ref["table"] is not None:
+                columns_in_scope.update(c["name"] for c in ref["table"]["columns"])
+
+        for i, (kind, text, _, _, name) in enumerate(tokens):
+            if kind not in ("ident", "qident") or i in table_token_indexes:
+                continue
+            qualified = analysis.punct(i + 1, ".") and i + 2 < len(tokens)
+            if qualified and not analysis.punct(i - 1, "."):
+                parts = [i, i + 2]
+                if analysis.punct(i + 3, ".") and i + 4 < len(tokens):
+                    parts.append(i + 4)
+                column_token = tokens[parts[-1]]
+                if column_token[1] == "*" or analysis.punct(parts[-1] + 1, "("):
+                    continue
+                owner = ".".join(tokens[p][4] for p in parts[:-1])
+                if owner not in by_alias:
+                    if owner in output_aliases or owner in ctes:
+                        continue
+                    errors.append(_error(
+                        "unknown_alias",
+                        f"{owner}.{column_token[4]} refers to {owner}, which is not a table or alias in FROM",
+                        f"Add {owner} to FROM or use one of: {', '.join(sorted(a for a in by_alias if a))}"
+                    ))
+                    continue
+                table = by_alias[owner]
+                if table is None or column_token[0] not in ("ident", "qident"):
+                    continue
+                names = [c["name"] for c in table["columns"]]
+                if column_token[4] not in names:
+                    errors.append(_error(
+                        "unknown_column",
+                        f"Column {column_token[4]} does not exist in {table['table_name']}",
+                        _closest(column_token[4], names) or f"Columns: {', '.join(names)}"
+                    ))
+                continue
+
+            if opaque_sources or errors or analysis.punct(i - 1, ".") or qualified:
+                continue
+            if kind == "ident" and name in _KEYWORDS:
+                continue
+            if analysis.punct(i + 1, "(") or analysis.keyword(i - 1, "as") or (
+                i > 0 and tokens[i - 1][0] == "op" and tokens[i - 1][1] == "::"
+            ):
+                continue
+            paren = analysis.enclosing_paren(i)
+            if paren is not None and paren in analysis.from_parens:
+                continue
+            if name in output_aliases or name in by_alias or name in columns_in_scope or name in windows:
+                continue
+            errors.append(_error(
+                "unknown_column",
+                f"Column {name} does not exist in {', '.join(sorted(t.split('.')[-1] for t in resolved_tables)) or 'the queried tables'}",
+                _closest(name, columns_in_scope) or "Qualify the column with its table alias"
+            ))
+
+    # Join predicates ----------------------------------------------------------
+    for ref in joins_without_condition:
+        if ref["table"] is None:
+            errors.append(_error(
+                "missing_join_condition",
+                f"JOIN {ref['name'] or 'subquery'} has no ON clause",
+                "Add an ON condition that relates it to the other tables"
+            ))
+            continue
+        earlier = [r for r in refs if r["clause"] == ref["clause"] and r is not ref and r["end"] < ref["end"] and r["table"] is not None]
+        condition = _join_condition(ref, earlier)
+        if condition is None:
+            errors.append(_error(
+                "missing_join_condition",
+                f"JOIN {ref['table']['table_name']} has no ON clause and no foreign key relates it to the other tables",
+                "Add an explicit ON condition"
+            ))
+            continue
+        edits.append((ref["end"], ref["end"], f" ON {condition}"))
+        warnings.append(_error("join_condition_added", f"Added ON {condition} from the foreign keys"))
+
+    # LIMIT ------------------------------------------------------------------------
+    if default_limit is None:
+        default_limit = ((metadata or {}).get("query_guidelines") or {}).get("default_limit") or row_limit
+    default_limit = min(default_limit, row_limit)
+
+    limited = False
+    for i, (kind, text, _, _, name) in enumerate(tokens):
+        if analysis.depth[i] != 0 or kind != "ident":
+            continue
+        if name == "limit":
+            limited = True
+            value = tokens[i + 1] if i + 1 < len(tokens) else None
+            if value is not None and value[0] == "number" and value[1].isdigit():
+                if int(value[1]) > row_limit:
+                    edits.append((value[2], value[3], str(row_limit)))
+                    warnings.append(_error("limit_capped", f"LIMIT {value[1]} was capped to {row_limit}"))
+            elif value is not None and value[0] == "ident" and value[4] == "all":
+                edits.append((value[2], value[3], str(row_limit)))
+                warnings.append(_error("limit_capped", f"LIMIT ALL was replaced with LIMIT {row_limit}"))
+            else:
+                errors.append(_error("limit_not_constant", "LIMIT must be an integer constant", f"Use LIMIT {default_limit}"))
+        elif name == "fetch" and analysis.keyword(i + 1, "first", "next"):
+            limited = True
+            value = tokens[i + 2] if i + 2 < len(tokens) else None
+            if value is not None and value[0] == "number" and value[1].isdigit() and int(value[1]) > row_limit:
+                edits.append((value[2], value[3], str(row_limit)))
+                warnings.append(_error("limit_capped", f"FETCH FIRST {value[1]} was capped to {row_limit}"))
+    if not limited:
+        edits.append((tokens[-1][3], tokens[-1][3], f" LIMIT {default_limit}"))
+        warnings.append(_error("limit_added", f"Added LIMIT {default_limit}"))
+
+    return finish(resolved_tables)
+
+
+def _join_condition(ref: Dict[str, Any], earlier: List[Dict[str, Any]]) -> Optional[str]:
+    """ON condition from a foreign key between the joined table and the closest earlier table"""
+    joined = ref["table"]
+    joined_alias = ref["alias"] or ref["name"]
+    for other in reversed(earlier):
+        table, alias = other["table"], other["alias"] or other["name"]
+        for child, child_alias, parent, parent_alias in ((joined, joined_alias, table, alias), (table, alias, joined, joined_alias)):
+            for target, pairs in foreign_key_groups(child):
+                if target == parent["table_name"]:
+                    return " AND ".join(
+                        f"{_quote(child_alias)}.{_quote(column)} = {_quote(parent_alias)}.{_quote(referenced)}"
+                        for column, referenced in pairs
+                    )
+    return None
@@ -0,0 +1,145 @@
+"""
+Shared asyncpg pools for the asyncio tool path.
+
+Mirrors kosix_agent.utils.db_pool for code running on the event loop: one
+pool per DataSource, created lazily on the running loop, with the same size
+and idle settings and the same per-organization connection quota.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import asyncpg
+
+from kosix_agent.config.setting import (
+    ORG_MAX_CONNECTIONS,
+    POOL_ACQUIRE_TIMEOUT_S,
+    POOL_MAX_IDLE_S,
+    POOL_MAX_SIZE,
+    POOL_MIN_SIZE,
+)
+from kosix_agent.utils.db_pool import PoolTimeout, redact_dsn
+
+
+logger = logging.getLogger(__name__)
+
+# libpq / Prisma query parameters asyncpg does not understand
+_UNSUPPORTED_PARAMS = {"channel_binding", "schema", "connection_limit", "pool_timeout"}
+
+# Pool key -> (pool, loop it was created on, connection string it serves)
+_pools: Dict[str, Tuple[asyncpg.Pool, asyncio.AbstractEventLoop, str]] = {}
+_org_semaphores: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+# Keeps close tasks of retired pools referenced until they finish
+_closing: Set[asyncio.Task] = set()
+
+
+def asyncpg_dsn(dsn: str) -> str:
+    """Drop connection string parameters that asyncpg would reject"""
+    parts = urlsplit(dsn)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in _UNSUPPORTED_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+async def get_async_pool(dsn: str, key: Optional[str] = None) -> asyncpg.Pool:
+    """
+    Return the asyncpg pool for a data source on the running loop, creating it on first use.
+
+    A pool whose DataSource now has another connection URI, or that belongs
+    to another event loop, is replaced and retired.
+    """
+    key = key or dsn
+    loop = asyncio.get_running_loop()
+
+    entry = _pools.get(key)
+    if entry is not None and entry[1] is loop and entry[2] == dsn:
+        return entry[0]
+
+    pool = await asyncpg.create_pool(
+        asyncpg_dsn(dsn),
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=POOL_MAX_IDLE_S
+    )
+
+    # Another task may have created the pool while we were connecting
+    entry = _pools.get(key)
+    if entry is not None and entry[1] is loop and entry[2] == dsn:
+        await pool.close()
+        return entry[0]
+
+    _pools[key] = (pool, loop, dsn)
+    if entry is not None:
+        _retire(entry[0], entry[1])
+    for stale_key, (stale, stale_loop, _) in list(_pools.items()):
+        if stale_loop.is_closed():
+            del _pools[stale_key]
+            _retire(stale, stale_loop)
+    return pool
+
+
+def _retire(pool: asyncpg.Pool, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a replaced pool on its own loop, letting borrowed connections finish"""
+    if loop.is_closed():
+        # Nothing can run on a closed loop any more; drop the sockets
+        try:
+            pool.terminate()
+        except Exception as e:
+            logger.debug("Could not terminate a pool of a closed loop: %s", e)
+        # The loop's id may be reused by a new loop, which needs its own semaphores
+        for semaphore_key in [k for k in _org_semaphores if k[1] == id(loop)]:
+            del _org_semaphores[semaphore_key]
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop is running:
+        task = loop.create_task(pool.close())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+    else:
+        asyncio.run_coroutine_threadsafe(pool.close(), loop)
+
+
+@asynccontextmanager
+async def org_slot(org_id: Optional[str]) -> AsyncIterator[None]:
+    """Count one in-flight operation against the organization's connection quota"""
+    if org_id is None:
+        yield
+        return
+
+    loop_key = (org_id, id(asyncio.get_running_loop()))
+    semaphore = _org_semaphores.setdefault(loop_key, asyncio.Semaphore(ORG_MAX_CONNECTIONS))
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=POOL_ACQUIRE_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        raise PoolTimeout(f"Organization {org_id} reached its limit of {ORG_MAX_CONNECTIONS} connections")
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    """Return size and idle counts of every asyncpg pool"""
+    return {
+        redact_dsn(key): {
+            "size": pool.get_size(),
+            "idle": pool.get_idle_size(),
+            "in_use": pool.get_size() - pool.get_idle_size(),
+            "min_size": pool.get_min_size(),
+            "max_size": pool.get_max_size()
+        }
+        for key, (pool, _, _) in _pools.items()
+    }
+
+
+async def close_all_async() -> None:
+    loop = asyncio.get_running_loop()
+    for key, (pool, pool_loop, _) in list(_pools.items()):
+        if pool_loop is loop:
+            await pool.close()
+            del _pools[key]
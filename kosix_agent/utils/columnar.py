@@ -0,0 +1,412 @@
+"""
+Column-oriented query results.
+
+A ColumnarResult keeps one typed buffer per column instead of one dict per
+row: fixed-width values live in `array.array` buffers, strings in an
+Arrow-style offsets + UTF-8 data pair, and nulls in a validity bitmap.
+The buffers are written to the binary wire format without copying (the
+encoder hands out memoryviews), decoded back as zero-copy memoryview casts,
+and converted to the row-oriented JSON the agents consume on demand.
+
+Wire format (little-endian hosts write natively; readers byteswap if needed):
+
+    b"KXC1" | u32 header length | JSON header | pad to 8 | buffer | pad to 8 | ...
+
+The header lists every column with its type, null count and the offset and
+length of each of its buffers relative to the start of the buffer area.
+Clients that list WIRE_MEDIA_TYPE in their Accept header get the chat
+endpoint's row batches in this format (base64 in the SSE "rows" event).
+"""
+
+import json
+import struct
+import sys
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import accumulate, islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+WIRE_MAGIC = b"KXC1"
+WIRE_MEDIA_TYPE = "application/vnd.kosix.columnar"
+
+_EPOCH_DATE = date(1970, 1, 1)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Column type -> array typecode of its value buffer (None for variable width)
+_TYPECODES = {
+    "int64": "q",
+    "float64": "d",
+    "bool": "B",
+    "timestamp": "q",
+    "timestamptz": "q",
+    "date": "i",
+    "decimal": None,
+    "string": None,
+}
+
+# PostgreSQL type OIDs (cursor.description type_code) -> column type
+_PG_TYPES = {
+    16: "bool",
+    19: "string",
+    20: "int64",
+    21: "int64",
+    23: "int64",
+    25: "string",
+    26: "int64",
+    114: "string",
+    700: "float64",
+    701: "float64",
+    1042: "string",
+    1043: "string",
+    1082: "date",
+    1114: "timestamp",
+    1184: "timestamptz",
+    1700: "decimal",
+    2950: "string",
+    3802: "string",
+}
+
+
+def _pad(length: int) -> int:
+    return (8 - length % 8) % 8
+
+
+class Column:
+    """
+    One column of a ColumnarResult.
+
+    Args:
+        name: Column name
+        type_: One of int64, float64, bool, timestamp, timestamptz, date, decimal, string
+    """
+
+    def __init__(self, name: str, type_: str):
+        if type_ not in _TYPECODES:
+            raise Exception(f"Unsupported column type '{type_}'")
+        self.name = name
+        self.type = type_
+        self.length = 0
+        self.null_count = 0
+        self.validity = bytearray()
+        if _TYPECODES[type_] is None:
+            self.offsets = array("q", [0])
+            self.data = bytearray()
+            self.values = None
+        else:
+            self.offsets = None
+            self.data = None
+            self.values = array(_TYPECODES[type_])
+
+    def append(self, value: Any) -> None:
+        bit = self.length % 8
+        if bit == 0:
+            self.validity.append(0)
+
+        if value is None:
+            self.null_count += 1
+            if self.values is not None:
+                self.values.append(0)
+            else:
+                self.offsets.append(self.offsets[-1])
+        else:
+            self.validity[-1] |= 1 << bit
+            if self.values is not None:
+                self.values.append(self._encode(value))
+            else:
+                self.data += self._encode(value)
+                self.offsets.append(len(self.data))
+        self.length += 1
+
+    def extend(self, values: List[Any]) -> None:
+        """Append many values at once (much cheaper than append() per value)"""
+        if self.length % 8:
+            # The bitmap fast path below needs a byte-aligned start
+            for value in values:
+                self.append(value)
+            return
+
+        count = len(values)
+        nulls = values.count(None)
+        if nulls:
+            validity = bytearray((count + 7) // 8)
+            for i, value in enumerate(values):
+                if value is not None:
+                    validity[i >> 3] |= 1 << (i & 7)
+        else:
+            validity = bytearray(b"\xff" * (count // 8))
+            if count % 8:
+                validity.append((1 << (count % 8)) - 1)
+
+        encode = self._encode
+        if self.values is not None:
+            if self.type in ("int64", "float64"):
+                self.values.extend([0 if v is None else v for v in values] if nulls else values)
+            else:
+                self.values.extend([0 if v is None else encode(v) for v in values])
+        else:
+            chunks = [b"" if v is None else encode(v) for v in values]
+            self.offsets.extend(islice(accumulate(map(len, chunks), initial=self.offsets[-1]), 1, None))
+            self.data += b"".join(chunks)
+
+        self.validity += validity
+        self.null_count += nulls
+        self.length += count
+
+    def _encode(self, value: Any) -> Any:
+        if self.type in ("int64", "float64"):
+            return value
+        if self.type == "bool":
+            return 1 if value else 0
+        if self.type == "timestamp":
+            return (value - _EPOCH_NAIVE) // _MICROSECOND
+        if self.type == "timestamptz":
+            return (value - _EPOCH_UTC) // _MICROSECOND
+        if self.type == "date":
+            return (value - _EPOCH_DATE).days
+        if isinstance(value, (dict, list, bool)):
+            # JSON values (json/jsonb, or a column of mixed types) keep their JSON spelling
+            return json.dumps(value, default=str).encode()
+        return str(value).encode()
+
+    def is_valid(self, index: int) -> bool:
+        return bool(self.validity[index >> 3] & (1 << (index & 7)))
+
+    def value(self, index: int) -> Any:
+        """Return the JSON-ready value at a row index"""
+        if not self.is_valid(index):
+            return None
+        if self.values is None:
+            return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode()
+
+        raw = self.values[index]
+        if self.type == "bool":
+            return bool(raw)
+        if self.type == "timestamp":
+            return (_EPOCH_NAIVE + raw * _MICROSECOND).isoformat()
+        if self.type == "timestamptz":
+            return (_EPOCH_UTC + raw * _MICROSECOND).isoformat()
+        if self.type == "date":
+            return (_EPOCH_DATE + timedelta(days=raw)).isoformat()
+        return raw
+
+    def to_list(self) -> List[Any]:
+        """Decode the whole column at once (much cheaper than per-index value())"""
+        if self.values is None:
+            offsets = self.offsets
+            data = bytes(self.data)
+            if data.isascii():
+                # Byte offsets equal character offsets, so decode once and slice
+                text = data.decode()
+                values = [text[offsets[i]:offsets[i + 1]] for i in range(self.length)]
+            else:
+                values = [data[offsets[i]:offsets[i + 1]].decode() for i in range(self.length)]
+        else:
+            raw = self.values.tolist()
+            if self.type == "bool":
+                values = [bool(v) for v in raw]
+            elif self.type == "timestamp":
+                values = [(_EPOCH_NAIVE + v * _MICROSECOND).isoformat() for v in raw]
+            elif self.type == "timestamptz":
+                values = [(_EPOCH_UTC + v * _MICROSECOND).isoformat() for v in raw]
+            elif self.type == "date":
+                values = [(_EPOCH_DATE + timedelta(days=v)).isoformat() for v in raw]
+            else:
+                values = raw
+
+        if self.null_count:
+            validity = self.validity
+            values = [
+                v if validity[i >> 3] & (1 << (i & 7)) else None
+                for i, v in enumerate(values)
+            ]
+        return values
+
+    def buffers(self) -> List[Any]:
+        """Raw buffers in wire order: validity, then values or offsets + data"""
+        if self.values is not None:
+            return [self.validity, self.values]
+        return [self.validity, self.offsets, self.data]
+
+    def nbytes(self) -> int:
+        return sum(memoryview(b).nbytes for b in self.buffers())
+
+
+class ColumnarResult:
+    """
+    A query result stored column by column.
+
+    Args:
+        columns: Column objects of equal length
+    """
+
+    def __init__(self, columns: List[Column]):
+        self.columns = columns
+
+    @property
+    def column_names(self) -> List[str]:
+        return [c.name for c in self.columns]
+
+    @property
+    def row_count(self) -> int:
+        return self.columns[0].length if self.columns else 0
+
+    def nbytes(self) -> int:
+        return sum(c.nbytes() for c in self.columns)
+
+    def to_rows(self) -> List[List[Any]]:
+        """Row-major, JSON-ready values"""
+        return [list(row) for row in zip(*(c.to_list() for c in self.columns))]
+
+    def to_contract(self) -> Dict[str, Any]:
+        """The {columns, rows, row_count} result contract used by the agents"""
+        return {
+            "columns": self.column_names,
+            "rows": self.to_rows(),
+            "row_count": self.row_count
+        }
+
+    def to_wire_buffers(self) -> List[Any]:
+        """
+        Encode to the wire format as a list of bytes-like chunks.
+
+        Column buffers are returned as memoryviews over the live buffers,
+        so nothing is copied until the chunks are written out.
+        """
+        layout = []
+        chunks: List[Any] = []
+        offset = 0
+        padding = b"\0" * 8
+        for column in self.columns:
+            buffers = []
+            for buffer in column.buffers():
+                view = memoryview(buffer).cast("B")
+                buffers.append({"offset": offset, "length": view.nbytes})
+                chunks.append(view)
+                pad = _pad(view.nbytes)
+                if pad:
+                    chunks.append(padding[:pad])
+                offset += view.nbytes + pad
+            layout.append({
+                "name": column.name,
+                "type": column.type,
+                "length": column.length,
+                "null_count": column.null_count,
+                "buffers": buffers
+            })
+
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "row_count": self.row_count,
+            "columns": layout
+        }, separators=(",", ":")).encode()
+        prefix = WIRE_MAGIC + struct.pack("<I", len(header)) + header
+        prefix += padding[:_pad(len(prefix))]
+        return [prefix] + chunks
+
+    def to_wire(self) -> bytes:
+        return b"".join(self.to_wire_buffers())
+
+    @classmethod
+    def from_wire(cls, payload: bytes) -> "ColumnarResult":
+        """Decode a wire payload; fixed-width buffers are zero-copy views into it"""
+        view = memoryview(payload)
+        if bytes(view[:4]) != WIRE_MAGIC:
+            raise Exception("Not a columnar result payload")
+        (header_length,) = struct.unpack("<I", view[4:8])
+        header = json.loads(bytes(view[8:8 + header_length]))
+        start = 8 + header_length
+        start += _pad(start)
+        swap = header["byteorder"] != sys.byteorder
+
+        columns = []
+        for spec in header["columns"]:
+            column = Column(spec["name"], spec["type"])
+            column.length = spec["length"]
+            column.null_count = spec["null_count"]
+            raw = [view[start + b["offset"]:start + b["offset"] + b["length"]] for b in spec["buffers"]]
+            column.validity = raw[0]
+            if column.values is not None:
+                column.values = _typed(raw[1], _TYPECODES[column.type], swap)
+            else:
+                column.offsets = _typed(raw[1], "q", swap)
+                column.data = raw[2]
+            columns.append(column)
+        return cls(columns)
+
+
+def _typed(view: memoryview, typecode: str, swap: bool) -> Sequence:
+    if not swap:
+        return view.cast(typecode)
+    values = array(typecode)
+    values.frombytes(view)
+    values.byteswap()
+    return values
+
+
+def infer_type(type_code: Optional[int], sample: Any = None) -> str:
+    """Pick a column type from a PostgreSQL type OID, falling back to a sample value"""
+    if type_code in _PG_TYPES:
+        return _PG_TYPES[type_code]
+    if sample is None:
+        return "string"
+    if isinstance(sample, bool):
+        return "bool"
+    if isinstance(sample, int):
+        return "int64" if -2 ** 63 <= sample < 2 ** 63 else "decimal"
+    if isinstance(sample, float):
+        return "float64"
+    if isinstance(sample, datetime):
+        return "timestamptz" if sample.tzinfo is not None else "timestamp"
+    if isinstance(sample, date):
+        return "date"
+    if isinstance(sample, Decimal):
+        return "decimal"
+    return "string"
+
+
+def infer_column_type(type_code: Optional[int], values: Iterable[Any]) -> str:
+    """
+    Pick a column type from a PostgreSQL type OID or, when the OID is not
+    known, from sampled values: a type all of them share, otherwise string
+    (json values mixing scalars and objects, for example).
+    """
+    if type_code in _PG_TYPES:
+        return _PG_TYPES[type_code]
+    found = {infer_type(None, value) for value in values if value is not None}
+    return found.pop() if len(found) == 1 else "string"
+
+
+class ColumnarBuilder:
+    """
+    Accumulates row batches into a ColumnarResult.
+
+    Args:
+        names: Column names
+        type_codes: PostgreSQL type OIDs per column (None where unknown)
+    """
+
+    def __init__(self, names: List[str], type_codes: Optional[List[Optional[int]]] = None):
+        self.names = names
+        self.type_codes = type_codes or [None] * len(names)
+        self._columns: Optional[List[Column]] = None
+
+    def append_batch(self, rows: Iterable[Sequence[Any]]) -> None:
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return
+        if self._columns is None:
+            self._columns = [
+                Column(name, infer_column_type(type_code, (row[i] for row in rows)))
+                for i, (name, type_code) in enumerate(zip(self.names, self.type_codes))
+            ]
+        for i, column in enumerate(self._columns):
+            column.extend([row[i] for row in rows])
+
+    def build(self) -> ColumnarResult:
+        if self._columns is None:
+            self._columns = [Column(name, infer_type(type_code)) for name, type_code in zip(self.names, self.type_codes)]
+        return ColumnarResult(self._columns)
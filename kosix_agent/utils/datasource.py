@@ -0,0 +1,76 @@
+"""
+Resolves which DataSource a tool call runs against.
+
+Sessions carry the bound DataSource and organization in ADK session state
+(`datasource_id`, `org_id`). Without a binding, tools fall back to
+DEFAULT_DATASOURCE_URI (KOSIX_DATASOURCE_URI) and no persisted state is
+used; when that is not configured the call fails.
+
+Resolved rows are kept for DATASOURCE_CACHE_TTL_S per (DataSource,
+organization), so tool calls within a turn do not each query Prisma. A
+changed connection URI is picked up once the entry expires.
+"""
+
+from typing import Any, Dict, Optional
+
+from kosix_agent.config.setting import DATASOURCE_CACHE_MAX_ENTRIES, DATASOURCE_CACHE_TTL_S, DEFAULT_DATASOURCE_URI
+from kosix_agent.utils.lru import LRUCache
+from kosix_agent.utils.prisma_client import get_prisma
+
+
+# (datasource_id, org_id) -> resolved DataSource; failed lookups are not cached
+_resolved = LRUCache(max_entries=DATASOURCE_CACHE_MAX_ENTRIES, ttl_seconds=DATASOURCE_CACHE_TTL_S)
+
+
+def resolve_datasource(tool_context=None) -> Dict[str, Any]:
+    """
+    Resolve the DataSource for the current tool invocation.
+
+    Args:
+        tool_context: ADK ToolContext (or CallbackContext) of the invocation, if any
+
+    Returns:
+        Dictionary with id, organization_id, connection_uri and cache_key
+    """
+    state = tool_context.state if tool_context is not None else {}
+    datasource_id = state.get("datasource_id")
+
+    if not datasource_id:
+        if not DEFAULT_DATASOURCE_URI:
+            raise Exception("No DataSource is bound to this session and KOSIX_DATASOURCE_URI is not set")
+        return {
+            "id": None,
+            "organization_id": state.get("org_id"),
+            "connection_uri": DEFAULT_DATASOURCE_URI,
+            "cache_key": DEFAULT_DATASOURCE_URI
+        }
+
+    key = (datasource_id, state.get("org_id"))
+    datasource = _resolved.get(key)
+    if datasource is None:
+        datasource = get_datasource(*key)
+        _resolved.put(key, datasource)
+    return dict(datasource)
+
+
+def get_datasource(datasource_id: str, org_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Load a DataSource row on behalf of an organization.
+
+    A data source of another organization is reported as not found, so ids
+    cannot be probed (or queried) across organizations.
+    """
+    if not org_id:
+        raise Exception("No organization is bound to this session")
+    record = get_prisma().datasource.find_unique(where={"id": datasource_id})
+    if record is None or record.organizationId != org_id:
+        raise Exception(f"DataSource {datasource_id} not found")
+    if not record.connectionUri:
+        raise Exception(f"DataSource {datasource_id} has no connection URI")
+
+    return {
+        "id": record.id,
+        "organization_id": record.organizationId,
+        "connection_uri": record.connectionUri,
+        "cache_key": record.id
+    }
@@ -0,0 +1,399 @@
+"""
+Shared psycopg2 connection pools for tool-side database access.
+
+One pool is kept per DataSource (keyed by DataSource id, or by connection
+string for the default source). Pools keep warm connections between tool
+calls so TLS and authentication are paid once, recycle connections after
+a maximum lifetime, health-check connections that sat idle, and cap the
+total number of connections an organization may hold across its pools.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import psycopg2
+from psycopg2 import extensions
+
+from kosix_agent.config.setting import (
+    ORG_MAX_CONNECTIONS,
+    POOL_ACQUIRE_TIMEOUT_S,
+    POOL_HEALTH_CHECK_AFTER_S,
+    POOL_MAX_IDLE_S,
+    POOL_MAX_LIFETIME_S,
+    POOL_MAX_SIZE,
+    POOL_MIN_SIZE,
+)
+
+
+# Prisma connection string parameters that libpq rejects
+_PRISMA_PARAMS = {"schema", "connection_limit", "pool_timeout"}
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the acquire timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of psycopg2 connections to a single database.
+
+    Args:
+        dsn: PostgreSQL connection string
+        min_size: Connections kept open even when idle
+        max_size: Upper bound on open connections
+        max_lifetime: Seconds after which a connection is closed instead of reused
+        max_idle: Seconds an idle connection above min_size is kept
+        health_check_after: Idle seconds after which a connection is pinged before reuse
+        acquire_timeout: Seconds to wait for a free connection before raising PoolTimeout
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        max_lifetime: float = POOL_MAX_LIFETIME_S,
+        max_idle: float = POOL_MAX_IDLE_S,
+        health_check_after: float = POOL_HEALTH_CHECK_AFTER_S,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT_S
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        # Idle entries are [connection, created_at, last_used_at]
+        self._idle: deque = deque()
+        self._created_at: Dict[int, float] = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._metrics = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "connections_recycled": 0,
+            "health_check_failures": 0,
+            "acquired": 0,
+            "acquire_timeouts": 0,
+            "acquire_wait_ms_total": 0.0,
+        }
+
+    def open(self) -> "ConnectionPool":
+        """Pre-open min_size connections"""
+        with self._cond:
+            missing = self.min_size - self._size
+        for _ in range(missing):
+            conn = psycopg2.connect(self.dsn)
+            with self._cond:
+                self._register(conn)
+                self._idle.append([conn, self._created_at[id(conn)], time.monotonic()])
+        return self
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection for the duration of the with-block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def acquire(self) -> Any:
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+
+        while True:
+            retired: List[Any] = []
+            try:
+                entry = self._take_idle(deadline, retired)
+            finally:
+                self._close(retired)
+            if entry is None:
+                break
+
+            # The connection is out of the pool, so it can be pinged without the lock
+            conn, last_used = entry
+            if time.monotonic() - last_used <= self.health_check_after or self._ping(conn):
+                with self._cond:
+                    return self._checked_out(conn, started)
+            with self._cond:
+                self._metrics["health_check_failures"] += 1
+                self._forget(conn)
+            self._close([conn])
+
+        try:
+            conn = psycopg2.connect(self.dsn)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._size -= 1
+            self._register(conn)
+            return self._checked_out(conn, started)
+
+    def release(self, conn: Any) -> None:
+        # Leave no transaction or session state behind for the next borrower.
+        # The rollback is a round trip, so it runs before taking the lock.
+        try:
+            broken = bool(conn.closed)
+            if not broken:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+        except psycopg2.Error:
+            broken = True
+
+        retired: List[Any] = []
+        now = time.monotonic()
+        with self._cond:
+            created_at = self._created_at.get(id(conn), now)
+            if broken:
+                self._forget(conn)
+                retired.append(conn)
+            elif self._closed or now - created_at > self.max_lifetime:
+                self._metrics["connections_recycled"] += 1
+                self._forget(conn)
+                retired.append(conn)
+            else:
+                self._idle.append([conn, created_at, now])
+                self._trim_idle(now, retired)
+            self._cond.notify()
+        self._close(retired)
+
+    def close(self) -> None:
+        """Close idle connections and refuse further acquisitions"""
+        retired: List[Any] = []
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn = self._idle.pop()[0]
+                self._forget(conn)
+                retired.append(conn)
+            self._cond.notify_all()
+        self._close(retired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            acquired = self._metrics["acquired"]
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._metrics,
+                "acquire_wait_ms_avg": round(self._metrics["acquire_wait_ms_total"] / acquired, 3) if acquired else 0.0
+            }
+
+    def _take_idle(self, deadline: float, retired: List[Any]) -> Optional[Tuple[Any, float]]:
+        """
+        Under the lock, take an idle connection or reserve a slot for a new one.
+
+        Closed and expired idle connections are unregistered and appended to
+        retired for the caller to close after the lock is released.
+
+        Returns:
+            (connection, last_used_at), or None when a slot was reserved
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("Connection pool is closed")
+
+                while self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    if conn.closed:
+                        self._forget(conn)
+                        retired.append(conn)
+                    elif time.monotonic() - created_at > self.max_lifetime:
+                        self._metrics["connections_recycled"] += 1
+                        self._forget(conn)
+                        retired.append(conn)
+                    else:
+                        return conn, last_used
+
+                if self._size < self.max_size:
+                    # Reserve the slot and connect outside the lock
+                    self._size += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics["acquire_timeouts"] += 1
+                    raise PoolTimeout(f"No connection available within {self.acquire_timeout}s")
+                self._cond.wait(remaining)
+
+    def _ping(self, conn: Any) -> bool:
+        """Health-check a connection that sat idle; called without the lock"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _trim_idle(self, now: float, retired: List[Any]) -> None:
+        """Retire connections idle longer than max_idle while staying above min_size"""
+        while self._idle and self._size > self.min_size and now - self._idle[0][2] > self.max_idle:
+            conn = self._idle.popleft()[0]
+            self._forget(conn)
+            retired.append(conn)
+
+    def _register(self, conn: Any) -> None:
+        self._created_at[id(conn)] = time.monotonic()
+        self._size += 1
+        self._metrics["connections_created"] += 1
+
+    def _forget(self, conn: Any) -> None:
+        """Stop counting a connection against the pool; the caller closes it after releasing the lock"""
+        if self._created_at.pop(id(conn), None) is None:
+            return
+        self._size -= 1
+        self._metrics["connections_closed"] += 1
+        self._cond.notify()
+
+    def _close(self, conns: List[Any]) -> None:
+        for conn in conns:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def _checked_out(self, conn: Any, started: float) -> Any:
+        self._metrics["acquired"] += 1
+        self._metrics["acquire_wait_ms_total"] += (time.monotonic() - started) * 1000
+        return conn
+
+
+class OrgConnectionLimiter:
+    """
+    Caps concurrently borrowed connections per organization across all its pools.
+
+    Args:
+        max_connections: Connections a single organization may hold at once
+        acquire_timeout: Seconds to wait for the organization's quota
+    """
+
+    def __init__(self, max_connections: int = ORG_MAX_CONNECTIONS, acquire_timeout: float = POOL_ACQUIRE_TIMEOUT_S):
+        self.max_connections = max_connections
+        self.acquire_timeout = acquire_timeout
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, org_id: Optional[str]) -> Iterator[None]:
+        if org_id is None:
+            yield
+            return
+
+        with self._lock:
+            semaphore = self._semaphores.setdefault(org_id, threading.BoundedSemaphore(self.max_connections))
+        if not semaphore.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeout(f"Organization {org_id} reached its limit of {self.max_connections} connections")
+
+        with self._lock:
+            self._in_use[org_id] = self._in_use.get(org_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_use[org_id] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._in_use)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+org_limiter = OrgConnectionLimiter()
+
+
+def get_pool(dsn: str, key: Optional[str] = None) -> ConnectionPool:
+    """Return the pool for a data source, creating it on first use"""
+    key = key or dsn
+    pool = _pools.get(key)
+    if pool is not None and pool.dsn == dsn:
+        return pool
+
+    # Connect outside the lock, so a slow or unreachable database does not
+    # hold up the first use of every other data source
+    created = ConnectionPool(dsn).open()
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.dsn == dsn:
+            # Another thread created it first
+            retired = created
+        else:
+            # New, or the connection URI of the DataSource changed
+            retired = pool
+            pool = _pools[key] = created
+    if retired is not None:
+        retired.close()
+    return pool
+
+
+@contextmanager
+def pooled_connection(dsn: str, key: Optional[str] = None, org_id: Optional[str] = None) -> Iterator[Any]:
+    """
+    Borrow a pooled connection for a data source.
+
+    Args:
+        dsn: PostgreSQL connection string
+        key: Pool key, normally the DataSource id (defaults to the connection string)
+        org_id: Organization whose connection quota the borrow counts against
+    """
+    with org_limiter.slot(org_id):
+        with get_pool(dsn, key).connection() as conn:
+            yield conn
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return per-pool metrics and per-organization usage"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {
+        "pools": {
+            redact_dsn(key): pool.stats()
+            for key, pool in pools.items()
+        },
+        "org_connections_in_use": org_limiter.stats()
+    }
+
+
+def close_all() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def redact_dsn(dsn: str) -> str:
+    """Strip credentials from a connection string used as a pool key"""
+    if "@" not in dsn:
+        return dsn
+    scheme, _, rest = dsn.partition("://")
+    return f"{scheme}://***@{rest.split('@', 1)[1]}"
+
+
+def libpq_dsn(dsn: str) -> str:
+    """Drop Prisma-only parameters so a DATABASE_URL can be used with psycopg2"""
+    parts = urlsplit(dsn)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in _PRISMA_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
@@ -0,0 +1,646 @@
+"""
+Uploaded files as columnar tables.
+
+An upload is written to disk as it is received and hashed on the way
+(receive_upload), so the checksum is known when the last byte arrives
+without reading the file again. Raw files and their tables are stored
+under FILE_STORE_DIR by checksum:
+
+    raw/<sha256><ext>       the uploaded bytes (File.storagePath)
+    tables/<sha256>.kxt     the parsed rows
+
+Content that was already parsed is never parsed again: a second upload of
+the same bytes, in any organization, reuses the existing table and its
+schema.
+
+Parsing reads the file once through SourceReader. Column types are
+inferred from the first FILE_SCHEMA_SAMPLE_ROWS rows (int64, float64,
+bool, date, timestamp, timestamptz, otherwise string); numbers count only
+in plain decimal notation, so values such as 00123 or 1_000 stay text.
+Rows are then converted FILE_SEGMENT_ROWS at a time into ColumnarResult
+segments and appended to the table file, so memory is bounded by one
+segment whatever the size of the upload. A value that does not fit the sampled type widens
+the column (int64 -> float64 -> string, date -> timestamp -> string) from
+its segment on; the schema reports the widened type and readers convert
+the earlier segments to it.
+
+Table file format:
+
+    segment | pad to 8 | segment | pad to 8 | ... | JSON footer | u64 footer length | b"KXT1"
+
+Each segment is a columnar wire payload (kosix_agent.utils.columnar). The
+footer holds the schema and the offset, length and row count of every
+segment, so a reader seeks straight to the segments it needs.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from itertools import chain, islice
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from prisma import Json
+
+from kosix_agent.config.setting import (
+    FILE_QUERY_MAX_GROUPS,
+    FILE_SCHEMA_SAMPLE_ROWS,
+    FILE_SEGMENT_ROWS,
+    FILE_STORE_DIR,
+    FILE_UPLOAD_MAX_BYTES
+)
+from kosix_agent.utils.columnar import Column, ColumnarResult
+from kosix_agent.utils.prisma_client import get_prisma
+from kosix_agent.utils.source_reader import SourceReader, source_format
+
+
+logger = logging.getLogger(__name__)
+
+TABLE_MAGIC = b"KXT1"
+_TRAILER = struct.Struct("<Q4s")
+
+_BOOLS = {"true": True, "false": False}
+# Plain decimal notation only: float() also takes "1_000.5", " 2", "nan" and "inf"
+_FLOAT = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?")
+# Column type -> the type it is widened to when a value does not fit
+_WIDER = {
+    "int64": "float64",
+    "float64": "string",
+    "bool": "string",
+    "date": "timestamp",
+    "timestamp": "string",
+    "timestamptz": "string",
+}
+
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+# Checksum -> lock, so concurrent uploads of the same bytes parse once
+_parse_locks: Dict[str, threading.Lock] = {}
+_parse_locks_guard = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded FILE_UPLOAD_MAX_BYTES"""
+
+
+# =============================================================================
+# Type inference and conversion
+# =============================================================================
+
+def _parse_int(value: str) -> int:
+    parsed = int(value)
+    # int() also takes "00123", "1_000", "+5" and surrounding spaces; zip codes,
+    # account numbers and the like spelled that way stay text
+    if str(parsed) != value:
+        raise ValueError("not a canonical integer")
+    if not -2 ** 63 <= parsed < 2 ** 63:
+        raise OverflowError("integer out of int64 range")
+    return parsed
+
+
+def _parse_float(value: str) -> float:
+    if _FLOAT.fullmatch(value) is None:
+        raise ValueError("not a decimal number")
+    return float(value)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        raise ValueError("timestamp with a time zone")
+    return parsed
+
+
+def _parse_timestamptz(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        raise ValueError("timestamp without a time zone")
+    return parsed
+
+
+def _parse_date(value: str) -> date:
+    if len(value) != 10:
+        raise ValueError("not a date")
+    return date.fromisoformat(value)
+
+
+_PARSERS = {
+    "int64": _parse_int,
+    "float64": _parse_float,
+    "bool": lambda value: _BOOLS[value.lower()],
+    "date": _parse_date,
+    "timestamp": _parse_timestamp,
+    "timestamptz": _parse_timestamptz,
+    "string": str,
+}
+
+
+def _value_type(value: str) -> str:
+    for type_ in ("int64", "float64", "bool", "date", "timestamp", "timestamptz"):
+        try:
+            _PARSERS[type_](value)
+            return type_
+        except (ValueError, KeyError, OverflowError):
+            continue
+    return "string"
+
+
+def _widens_to(narrow: str, wide: str) -> bool:
+    while narrow != wide and narrow != "string":
+        narrow = _WIDER[narrow]
+    return narrow == wide
+
+
+def _merge(current: Optional[str], found: str) -> str:
+    """The narrowest type holding values of both types"""
+    if current is None or _widens_to(current, found):
+        return found
+    if _widens_to(found, current):
+        return current
+    return "string"
+
+
+def _column_names(header: List[str]) -> List[str]:
+    names, seen = [], set()
+    for i, name in enumerate(header):
+        name = name or f"column_{i + 1}"
+        unique, n = name, 2
+        while unique in seen:
+            unique, n = f"{name}_{n}", n + 1
+        seen.add(unique)
+        names.append(unique)
+    return names
+
+
+def infer_schema(names: List[str], rows: List[List[Optional[str]]]) -> List[Dict[str, Any]]:
+    """
+    Infer column types from sample rows.
+
+    Args:
+        names: Column names
+        rows: Sample rows as text values (None or "" is a null)
+
+    Returns:
+        List of {"name", "type", "nullable"}
+    """
+    columns = []
+    for i, name in enumerate(names):
+        type_, nullable = None, False
+        for row in rows:
+            value = row[i] if i < len(row) else None
+            if value is None or value == "":
+                nullable = True
+                continue
+            if type_ != "string":
+                type_ = _merge(type_, _value_type(value))
+        columns.append({"name": name, "type": type_ or "string", "nullable": nullable or not rows})
+    return columns
+
+
+def _cast(values: List[Any], from_type: str, to_type: str) -> List[Any]:
+    """Convert decoded values of an earlier segment to the column's widened type"""
+    if from_type == to_type:
+        return values
+    if to_type == "float64":
+        return [None if v is None else float(v) for v in values]
+    if to_type == "timestamp":
+        return [None if v is None else v + "T00:00:00" for v in values]
+    if from_type == "bool":
+        return [None if v is None else ("true" if v else "false") for v in values]
+    return [None if v is None else str(v) for v in values]
+
+
+# =============================================================================
+# Table files
+# =============================================================================
+
+class FileTableWriter:
+    """
+    Writes a table file segment by segment.
+
+    The file is written under a temporary name and moved into place by
+    close(), so readers never see a partial table.
+
+    Args:
+        path: Table file path
+        columns: Inferred schema columns; types are widened in place
+    """
+
+    def __init__(self, path: str, columns: List[Dict[str, Any]]):
+        self.path = path
+        self.columns = columns
+        self.segments: List[Dict[str, int]] = []
+        self.row_count = 0
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._offset = 0
+
+    def write_segment(self, rows: List[List[Optional[str]]]) -> None:
+        if not rows:
+            return
+        payload = ColumnarResult([self._column(i, rows) for i in range(len(self.columns))]).to_wire_buffers()
+        length = 0
+        for chunk in payload:
+            self._file.write(chunk)
+            length += memoryview(chunk).nbytes
+        pad = (8 - length % 8) % 8
+        self._file.write(b"\0" * pad)
+        self.segments.append({"offset": self._offset, "length": length, "rows": len(rows)})
+        self._offset += length + pad
+        self.row_count += len(rows)
+
+    def _column(self, i: int, rows: List[List[Optional[str]]]) -> Column:
+        spec = self.columns[i]
+        while True:
+            parse = _PARSERS[spec["type"]]
+            column = Column(spec["name"], spec["type"])
+            try:
+                values = [row[i] for row in rows]
+                column.extend([None if value is None or value == "" else parse(value) for value in values])
+                return column
+            except (ValueError, KeyError, OverflowError):
+                logger.info("Column %s does not fit %s past the sample; widening", spec["name"], spec["type"])
+                spec["type"] = _WIDER[spec["type"]]
+
+    def close(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the footer and publish the table; returns the schema with row and segment counts"""
+        schema = {**schema, "columns": self.columns, "row_count": self.row_count, "segments": len(self.segments)}
+        footer = json.dumps({"schema": schema, "segments": self.segments}, separators=(",", ":")).encode()
+        self._file.write(footer)
+        self._file.write(_TRAILER.pack(len(footer), TABLE_MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return schema
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class FileTable:
+    """
+    Reads a table file written by FileTableWriter.
+
+    Only the footer is read on open; segments are read one at a time when
+    scanned, so reading is bounded by one segment as well.
+
+    Args:
+        path: Table file path
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._file.seek(-_TRAILER.size, os.SEEK_END)
+        footer_length, magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+        if magic != TABLE_MAGIC:
+            self._file.close()
+            raise Exception(f"{path} is not a table file")
+        self._file.seek(-_TRAILER.size - footer_length, os.SEEK_END)
+        footer = json.loads(self._file.read(footer_length))
+        self.schema: Dict[str, Any] = footer["schema"]
+        self.segments: List[Dict[str, int]] = footer["segments"]
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column["name"] for column in self.schema["columns"]]
+
+    @property
+    def row_count(self) -> int:
+        return self.schema["row_count"]
+
+    def read_segment(self, index: int) -> ColumnarResult:
+        segment = self.segments[index]
+        self._file.seek(segment["offset"])
+        return ColumnarResult.from_wire(self._file.read(segment["length"]))
+
+    def scan(self, columns: Optional[List[str]] = None, start_segment: int = 0) -> Iterator[Dict[str, List[Any]]]:
+        """
+        Yield the table segment by segment as {column name: values}.
+
+        Args:
+            columns: Columns to return (all by default)
+            start_segment: First segment to read
+        """
+        types = {column["name"]: column["type"] for column in self.schema["columns"]}
+        names = columns or self.column_names
+        unknown = [name for name in names if name not in types]
+        if unknown:
+            raise Exception(f"Unknown columns: {', '.join(unknown)}")
+        for index in range(start_segment, len(self.segments)):
+            segment = {column.name: column for column in self.read_segment(index).columns}
+            yield {
+                name: _cast(segment[name].to_list(), segment[name].type, types[name])
+                for name in names
+            }
+
+    def rows(self, offset: int = 0, limit: int = 100, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """A page of rows in the {columns, rows, row_count} contract, reading only the segments it spans"""
+        names = columns or self.column_names
+        start, skipped = 0, 0
+        while start < len(self.segments) and skipped + self.segments[start]["rows"] <= offset:
+            skipped += self.segments[start]["rows"]
+            start += 1
+        rows: List[List[Any]] = []
+        skip = offset - skipped
+        for values in self.scan(names, start):
+            page = list(zip(*(values[name] for name in names)))[skip:skip + limit - len(rows)]
+            rows.extend(list(row) for row in page)
+            skip = 0
+            if len(rows) >= limit:
+                break
+        return {"columns": names, "rows": rows, "row_count": len(rows), "total_rows": self.row_count}
+
+    def aggregate(
+        self,
+        group_by: List[str],
+        aggregates: List[Tuple[str, Optional[str]]],
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 100,
+        max_groups: int = FILE_QUERY_MAX_GROUPS
+    ) -> Dict[str, Any]:
+        """
+        Group and aggregate the table in one pass, reading only the columns involved.
+
+        Args:
+            group_by: Columns to group by (none for a single row)
+            aggregates: (function, column) pairs; function is one of AGGREGATES
+                and column is None for a row count
+            filters: Column -> value a row must equal to be included
+            limit: Groups returned, largest first aggregate first
+            max_groups: Fail instead of holding more groups than this
+
+        Returns:
+            The {columns, rows, row_count} contract plus total_groups and rows_scanned
+        """
+        filters = dict(filters or {})
+        types = {column["name"]: column["type"] for column in self.schema["columns"]}
+        if not aggregates:
+            raise Exception("At least one aggregate is required")
+        for function, column in aggregates:
+            if function not in AGGREGATES:
+                raise Exception(f"Unknown aggregate {function}; use one of {', '.join(AGGREGATES)}")
+            if column is None and function != "count":
+                raise Exception(f"{function} needs a column")
+            if function in ("sum", "avg") and column in types and types[column] not in ("int64", "float64"):
+                raise Exception(f"{function} needs a numeric column; {column} is {types[column]}")
+        for name, value in filters.items():
+            if isinstance(value, str) and types.get(name) in ("int64", "float64", "bool"):
+                try:
+                    filters[name] = _PARSERS[types[name]](value)
+                except (ValueError, KeyError, OverflowError):
+                    raise Exception(f"Filter value {value!r} does not fit column {name} ({types[name]})")
+
+        needed = list(dict.fromkeys([*group_by, *filters, *(column for _, column in aggregates if column is not None)]))
+        groups: Dict[tuple, List[List[Any]]] = {}
+        scanned = 0
+        for segment in self.scan(needed or self.column_names[:1]):
+            size = len(next(iter(segment.values())))
+            scanned += size
+            keep: Any = range(size)
+            for name, value in filters.items():
+                values = segment[name]
+                keep = [i for i in keep if values[i] == value]
+            keys = list(zip(*(segment[name] for name in group_by))) if group_by else None
+            inputs = [segment[column] if column is not None else None for _, column in aggregates]
+
+            for i in keep:
+                key = keys[i] if keys is not None else ()
+                state = groups.get(key)
+                if state is None:
+                    if len(groups) >= max_groups:
+                        raise Exception(f"More than {max_groups} groups; group by fewer or coarser columns")
+                    # [values counted, running sum or extreme] per aggregate
+                    state = groups[key] = [[0, 0] for _ in aggregates]
+                for j, (function, _) in enumerate(aggregates):
+                    acc = state[j]
+                    if inputs[j] is None:
+                        acc[0] += 1
+                        continue
+                    value = inputs[j][i]
+                    if value is None:
+                        continue
+                    if function in ("sum", "avg"):
+                        acc[1] += value
+                    elif function == "min" and (acc[0] == 0 or value < acc[1]):
+                        acc[1] = value
+                    elif function == "max" and (acc[0] == 0 or value > acc[1]):
+                        acc[1] = value
+                    acc[0] += 1
+
+        if not group_by and not groups:
+            groups[()] = [[0, 0] for _ in aggregates]
+        rows = []
+        for key, state in groups.items():
+            values = []
+            for (function, _), (counted, total) in zip(aggregates, state):
+                if function == "count":
+                    values.append(counted)
+                elif not counted:
+                    values.append(None)
+                else:
+                    values.append(total / counted if function == "avg" else total)
+            rows.append(list(key) + values)
+        first = len(group_by)
+        rows.sort(key=lambda row: (row[first] is not None, row[first] if row[first] is not None else 0), reverse=True)
+        return {
+            "columns": group_by + [function if column is None else f"{function}_{column}" for function, column in aggregates],
+            "rows": rows[:limit],
+            "row_count": min(len(rows), limit),
+            "total_groups": len(rows),
+            "rows_scanned": scanned
+        }
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "FileTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def materialize(source_path: str, path: str, fmt: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parse a data file into a table file.
+
+    Args:
+        source_path: CSV, TSV, JSON lines or Excel file
+        path: Table file to write
+        fmt: Source format (defaults to the file extension)
+
+    Returns:
+        The parsed schema: format, columns, sampled_rows, row_count,
+        segments and malformed_rows (rows skipped for a wrong field count
+        or invalid JSON)
+    """
+    with SourceReader(source_path, fmt) as source:
+        names = _column_names(source.header)
+        width = len(names)
+        rows = iter(source)
+        sample = list(islice(rows, FILE_SCHEMA_SAMPLE_ROWS))
+        columns = infer_schema(names, [values for _, values in sample if len(values) == width])
+
+        writer = FileTableWriter(path, columns)
+        malformed = 0
+        try:
+            segment: List[List[Optional[str]]] = []
+            for _, values in chain(sample, rows):
+                if len(values) != width:
+                    malformed += 1
+                    continue
+                segment.append(values)
+                if len(segment) >= FILE_SEGMENT_ROWS:
+                    writer.write_segment(segment)
+                    segment = []
+            writer.write_segment(segment)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.close({"format": source.format, "sampled_rows": len(sample), "malformed_rows": malformed})
+
+
+# =============================================================================
+# Uploads
+# =============================================================================
+
+def raw_path(checksum: str, filename: str) -> str:
+    return os.path.join(FILE_STORE_DIR, "raw", checksum + os.path.splitext(filename)[1].lower())
+
+
+def table_path(checksum: str) -> str:
+    return os.path.join(FILE_STORE_DIR, "tables", f"{checksum}.kxt")
+
+
+async def receive_upload(chunks: AsyncIterator[bytes], max_bytes: int = FILE_UPLOAD_MAX_BYTES) -> Dict[str, Any]:
+    """
+    Write an upload stream to a temporary file, hashing it on the way.
+
+    Args:
+        chunks: The request body as it arrives
+        max_bytes: Reject uploads larger than this (0 for no limit)
+
+    Returns:
+        Dictionary with the temporary "path", the sha256 "checksum" and the "size"
+    """
+    directory = os.path.join(FILE_STORE_DIR, "tmp")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return {"path": path, "checksum": digest.hexdigest(), "size": size}
+
+
+def _parse_lock(checksum: str) -> threading.Lock:
+    with _parse_locks_guard:
+        return _parse_locks.setdefault(checksum, threading.Lock())
+
+
+def ingest(upload_path: str, checksum: str, filename: str) -> Dict[str, Any]:
+    """
+    Move a received upload into the store and parse it unless its checksum is known.
+
+    Args:
+        upload_path: Temporary file from receive_upload (moved or removed)
+        checksum: sha256 of the upload
+        filename: Original file name, for the format
+
+    Returns:
+        Dictionary with the raw "storage_path", the parsed "schema" and
+        "deduplicated" when an existing table was reused
+    """
+    storage_path = raw_path(checksum, filename)
+    tables = table_path(checksum)
+    os.makedirs(os.path.dirname(storage_path), exist_ok=True)
+    os.makedirs(os.path.dirname(tables), exist_ok=True)
+
+    with _parse_lock(checksum):
+        if os.path.exists(storage_path):
+            os.remove(upload_path)
+        else:
+            os.replace(upload_path, storage_path)
+
+        if os.path.exists(tables):
+            with FileTable(tables) as table:
+                return {"storage_path": storage_path, "schema": table.schema, "deduplicated": True}
+        schema = materialize(storage_path, tables, source_format(filename))
+    logger.info("Parsed %s: %d rows, %d columns", filename, schema["row_count"], len(schema["columns"]))
+    return {"storage_path": storage_path, "schema": schema, "deduplicated": False}
+
+
+def find_parsed_file(org_id: str, checksum: str) -> Optional[Any]:
+    """An already parsed File of the organization with the same content, if any"""
+    return get_prisma().file.find_first(
+        where={"organizationId": org_id, "checksum": checksum, "parsedAt": {"not": None}},
+        order={"createdAt": "desc"}
+    )
+
+
+def get_org_file(file_id: str, org_id: Optional[str]) -> Any:
+    """
+    Load a File row on behalf of an organization.
+
+    A file of another organization is reported as not found, so ids cannot
+    be probed across organizations.
+    """
+    if not org_id:
+        raise Exception("No organization is bound to this session")
+    record = get_prisma().file.find_unique(where={"id": file_id})
+    if record is None or record.organizationId != org_id:
+        raise Exception(f"File {file_id} not found")
+    return record
+
+
+def create_file(org_id: str, user_id: str, filename: str, mime_type: str, upload: Dict[str, Any]) -> Any:
+    """Insert the File row of a received upload, before it is parsed"""
+    return get_prisma().file.create(data={
+        "filename": filename,
+        "mimeType": mime_type,
+        "size": upload["size"],
+        "storagePath": raw_path(upload["checksum"], filename),
+        "checksum": upload["checksum"],
+        "organizationId": org_id,
+        "uploadedById": user_id
+    })
+
+
+def parse_file(file_id: str, upload_path: str, checksum: str, filename: str) -> None:
+    """Ingest an upload and record its parsed schema (or the error) on the File row"""
+    db = get_prisma()
+    try:
+        result = ingest(upload_path, checksum, filename)
+    except Exception as e:
+        logger.warning("Could not parse file %s: %s", file_id, e)
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        db.file.update(where={"id": file_id}, data={"parsedSchema": Json({"error": str(e)})})
+        return
+    db.file.update(where={"id": file_id}, data={
+        "parsedSchema": Json(result["schema"]),
+        "parsedAt": datetime.now(timezone.utc)
+    })
+
+
+def open_table(record: Any) -> FileTable:
+    """Open the table of a parsed File row"""
+    if record.parsedAt is None:
+        raise Exception(f"File {record.id} has not been parsed")
+    return FileTable(table_path(record.checksum))
@@ -0,0 +1,272 @@
+"""
+Conversation history: persisted turns, keyset pagination and bounded agent context.
+
+Pages are addressed by an opaque cursor encoding the (createdAt, id) of
+the last row returned, so fetching a page is one index range scan on
+(conversationId, createdAt, id) whatever its position in the
+conversation, where OFFSET pagination would re-read every earlier row.
+
+The agents never see the whole conversation: agent_context() returns the
+last HISTORY_WINDOW_MESSAGES messages plus the conversation's rolling
+summary. The summary is maintained when a turn is recorded by folding in
+the messages that just left the window, one short line each, and dropping
+the oldest lines once it exceeds HISTORY_SUMMARY_MAX_TOKENS. Recording a
+turn and building the context both read a bounded number of rows, so their
+cost and the prompt size do not grow with the conversation.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from prisma import Json
+
+from kosix_agent.config.setting import (
+    HISTORY_MAX_PAGE_SIZE,
+    HISTORY_PAGE_SIZE,
+    HISTORY_SUMMARY_MAX_TOKENS,
+    HISTORY_WINDOW_MESSAGES
+)
+from kosix_agent.utils.prisma_client import get_prisma
+from kosix_agent.utils.tokens import estimate_tokens
+
+
+# Characters of a message kept in its summary line
+_SUMMARY_LINE_CHARS = 200
+# Messages that left the window folded per recorded turn (a turn adds two)
+_FOLD_BATCH = 8
+
+_NEWEST_FIRST = [{"createdAt": "desc"}, {"id": "desc"}]
+
+
+def encode_cursor(created_at: datetime, record_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, record_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(record_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def _older_than(field: str, cursor: Tuple[datetime, str]) -> Dict[str, Any]:
+    """Rows strictly after the cursor in (field, id) descending order"""
+    created_at, record_id = cursor
+    return {"OR": [{field: {"lt": created_at}}, {field: created_at, "id": {"lt": record_id}}]}
+
+
+def _page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE))
+
+
+def _message(record) -> Dict[str, Any]:
+    return {
+        "id": record.id,
+        "role": record.role,
+        "content": record.content,
+        "created_at": record.createdAt.isoformat()
+    }
+
+
+def _conversation(record) -> Dict[str, Any]:
+    return {
+        "id": record.id,
+        "title": record.title,
+        "status": record.status,
+        "created_at": record.createdAt.isoformat(),
+        "updated_at": record.updatedAt.isoformat()
+    }
+
+
+def list_messages(conversation_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of a conversation's messages, newest first.
+
+    Args:
+        conversation_id: Conversation to read
+        limit: Page size (capped at HISTORY_MAX_PAGE_SIZE)
+        cursor: next_cursor of the previous page, or None for the newest messages
+
+    Returns:
+        Dictionary with "messages" and "next_cursor" (None on the last page)
+    """
+    limit = _page_size(limit)
+    where: Dict[str, Any] = {"conversationId": conversation_id}
+    if cursor:
+        where = {"AND": [where, _older_than("createdAt", decode_cursor(cursor))]}
+    rows = get_prisma().message.find_many(where=where, order=_NEWEST_FIRST, take=limit + 1)
+    page = rows[:limit]
+    return {
+        "messages": [_message(row) for row in page],
+        "next_cursor": encode_cursor(page[-1].createdAt, page[-1].id) if len(rows) > limit else None
+    }
+
+
+def list_conversations(user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of a user's conversations, most recently active first.
+
+    Returns:
+        Dictionary with "conversations" and "next_cursor" (None on the last page)
+    """
+    limit = _page_size(limit)
+    where: Dict[str, Any] = {"userId": user_id}
+    if cursor:
+        where = {"AND": [where, _older_than("updatedAt", decode_cursor(cursor))]}
+    rows = get_prisma().conversation.find_many(
+        where=where,
+        order=[{"updatedAt": "desc"}, {"id": "desc"}],
+        take=limit + 1
+    )
+    page = rows[:limit]
+    return {
+        "conversations": [_conversation(row) for row in page],
+        "next_cursor": encode_cursor(page[-1].updatedAt, page[-1].id) if len(rows) > limit else None
+    }
+
+
+def message_text(content: Any) -> str:
+    """Plain text of a stored message content"""
+    if isinstance(content, dict):
+        parts = [content.get("text") or "", content.get("sql") or ""]
+        return "\n".join(part for part in parts if part)
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+def get_conversation(conversation_id: str, user_id: str, org_id: Optional[str]) -> Optional[Any]:
+    """
+    Load a Conversation row on behalf of a user of an organization.
+
+    Returns None when no conversation has this id yet. One of another user
+    or organization is reported as not found, so ids cannot be probed.
+    """
+    record = get_prisma().conversation.find_unique(where={"id": conversation_id})
+    if record is None:
+        return None
+    if record.userId != user_id or record.organizationId != org_id:
+        raise Exception(f"Conversation {conversation_id} not found")
+    return record
+
+
+def agent_context(conversation_id: str, user_id: str, org_id: str) -> Dict[str, Any]:
+    """
+    What the agents get to see of a conversation of the user.
+
+    Returns:
+        Dictionary with "summary" (text or None) and "recent" (the last
+        HISTORY_WINDOW_MESSAGES messages as {"role", "text"}, oldest first)
+    """
+    db = get_prisma()
+    conversation = get_conversation(conversation_id, user_id, org_id)
+    if conversation is None:
+        return {"summary": None, "recent": []}
+    rows = db.message.find_many(
+        where={"conversationId": conversation_id},
+        order=_NEWEST_FIRST,
+        take=HISTORY_WINDOW_MESSAGES
+    )
+    return {
+        "summary": render_summary(conversation.summary),
+        "recent": [{"role": row.role, "text": message_text(row.content)} for row in reversed(rows)]
+    }
+
+
+def render_summary(summary: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not isinstance(summary, dict) or not summary.get("lines"):
+        return None
+    lines = list(summary["lines"])
+    if summary.get("omitted"):
+        lines.insert(0, f"({summary['omitted']} earlier messages omitted)")
+    return "\n".join(lines)
+
+
+def fold_summary(summary: Optional[Dict[str, Any]], messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fold messages that left the window into a rolling summary.
+
+    Args:
+        summary: Current summary ({"lines", "omitted", "through"}) or None
+        messages: Messages to fold, oldest first, each with "role", "text" and "cursor"
+
+    Returns:
+        The new summary
+    """
+    summary = dict(summary or {"lines": [], "omitted": 0, "through": None})
+    lines = list(summary["lines"])
+    for message in messages:
+        text = " ".join(message["text"].split())
+        if len(text) > _SUMMARY_LINE_CHARS:
+            text = text[:_SUMMARY_LINE_CHARS - 3] + "..."
+        lines.append(f"{message['role'].lower()}: {text}")
+        summary["through"] = message["cursor"]
+
+    omitted = summary["omitted"]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > HISTORY_SUMMARY_MAX_TOKENS:
+        lines.pop(0)
+        omitted += 1
+    summary["lines"] = lines
+    summary["omitted"] = omitted
+    return summary
+
+
+def record_turn(
+    conversation_id: str,
+    user_id: str,
+    org_id: str,
+    user_message: Dict[str, Any],
+    reply: Dict[str, Any],
+    started_at: datetime,
+    ended_at: datetime
+) -> None:
+    """
+    Store a user message and the agents' reply, and advance the rolling summary.
+
+    Creates the conversation on its first turn; a conversation of another
+    user or organization is reported as not found. Reads at most
+    HISTORY_WINDOW_MESSAGES + a few rows however long the conversation is.
+    """
+    db = get_prisma()
+    conversation = db.conversation.upsert(
+        where={"id": conversation_id},
+        data={
+            "create": {
+                "id": conversation_id,
+                "title": (user_message.get("text") or "")[:80] or None,
+                "userId": user_id,
+                "organizationId": org_id
+            },
+            "update": {}
+        }
+    )
+    if conversation.userId != user_id or conversation.organizationId != org_id:
+        raise Exception(f"Conversation {conversation_id} not found")
+    db.message.create_many(data=[
+        {"role": "USER", "content": Json(user_message), "conversationId": conversation_id, "createdAt": started_at},
+        {"role": "ASSISTANT", "content": Json(reply), "conversationId": conversation_id, "createdAt": ended_at}
+    ])
+
+    summary = conversation.summary if isinstance(conversation.summary, dict) else None
+    rows = db.message.find_many(
+        where={"conversationId": conversation_id},
+        order=_NEWEST_FIRST,
+        take=HISTORY_WINDOW_MESSAGES + _FOLD_BATCH
+    )
+    through = decode_cursor(summary["through"]) if summary and summary.get("through") else None
+    left_window = [
+        row for row in reversed(rows[HISTORY_WINDOW_MESSAGES:])
+        if through is None or (row.createdAt, row.id) > through
+    ]
+    data: Dict[str, Any] = {"updatedAt": ended_at}
+    if left_window:
+        summary = fold_summary(summary, [
+            {"role": row.role, "text": message_text(row.content), "cursor": encode_cursor(row.createdAt, row.id)}
+            for row in left_window
+        ])
+        data["summary"] = Json(summary)
+    db.conversation.update(where={"id": conversation_id}, data=data)
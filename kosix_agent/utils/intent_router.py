@@ -0,0 +1,211 @@
+"""
+Local intent classifier for the root router.
+
+Combines keyword rules with a multinomial Naive Bayes model over word
+unigrams and bigrams, trained at import time on TRAINING_EXAMPLES. Rule
+matches scale the model's class probabilities before renormalizing, so a
+message both agree on gets a high confidence, while a message they
+disagree on (or that neither recognizes) stays below the threshold and is
+left to the LLM router. Classification is pure Python and takes tens of
+microseconds.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from kosix_agent.config.setting import ROUTER_MIN_CONFIDENCE
+
+
+INTENTS = ("schema_creation", "data_insertion", "analytics")
+
+# Intent -> name of the agent that handles it
+INTENT_AGENTS = {
+    "schema_creation": "CreatorCoordinator",
+    "data_insertion": "InserterCoordinator",
+    "analytics": "sql_agent",
+}
+
+# (pattern, intent, weight): matching multiplies the intent's probability by weight
+_RULES = [
+    (re.compile(r"\b(create|design|build|make|generate|set up|model)\b.{0,40}\b(tables?|schemas?|database|db|data model)\b"), "schema_creation", 6.0),
+    (re.compile(r"\b(normali[sz]e|3nf|erd|entity relationship|primary keys?|foreign keys?)\b"), "schema_creation", 8.0),
+    (re.compile(r"\b(add|alter|rename|drop)\b.{0,20}\b(columns?|tables?)\b"), "schema_creation", 3.0),
+    (re.compile(r"\b(insert|upload|import|ingest|load|seed|populate|bulk)\b"), "data_insertion", 5.0),
+    (re.compile(r"\b(csv|xlsx|excel|spreadsheet|json file|parquet)\b"), "data_insertion", 3.0),
+    (re.compile(r"\b(how many|how much|count|average|avg|sum|total|median|top \d+|most|least|trend|per (day|week|month|year))\b"), "analytics", 5.0),
+    (re.compile(r"^(show|list|find|which|what|who|when|get|give me|display|compare)\b"), "analytics", 3.0),
+    (re.compile(r"\b(report|revenue|sales|breakdown|grouped by|by month|last (week|month|year|\d+ days))\b"), "analytics", 2.0),
+]
+
+TRAINING_EXAMPLES: List[Tuple[str, str]] = [
+    ("create a database for my online store", "schema_creation"),
+    ("design tables for a school management system", "schema_creation"),
+    ("i need a schema for a hospital with patients doctors and appointments", "schema_creation"),
+    ("build an employee table with name salary and department", "schema_creation"),
+    ("set up tables for an inventory system", "schema_creation"),
+    ("make a normalized schema for a library", "schema_creation"),
+    ("create a customers table and an orders table", "schema_creation"),
+    ("design a database for a restaurant booking app", "schema_creation"),
+    ("model a crm with leads accounts and contacts", "schema_creation"),
+    ("generate the schema for an hr system", "schema_creation"),
+    ("add a products table linked to categories", "schema_creation"),
+    ("i want to store students courses and enrollments", "schema_creation"),
+    ("create tables for a blog with posts and comments", "schema_creation"),
+    ("help me design the data model for a ride sharing app", "schema_creation"),
+    ("build a finance database with accounts and transactions", "schema_creation"),
+    ("normalize these fields into tables: invoice number, client name, item, amount", "schema_creation"),
+    ("turn this flat sheet layout into a proper relational design", "schema_creation"),
+    ("insert these rows into the customers table", "data_insertion"),
+    ("upload this csv into orders", "data_insertion"),
+    ("import the attached spreadsheet", "data_insertion"),
+    ("load sample data into the products table", "data_insertion"),
+    ("add a new employee named john with salary 50000", "data_insertion"),
+    ("ingest this excel file", "data_insertion"),
+    ("populate the database with test records", "data_insertion"),
+    ("bulk insert the following records", "data_insertion"),
+    ("seed the categories table with electronics books and toys", "data_insertion"),
+    ("put this data into the sales table", "data_insertion"),
+    ("insert a new order for customer 42", "data_insertion"),
+    ("upload my file of transactions", "data_insertion"),
+    ("add these students to the enrollments table", "data_insertion"),
+    ("import the json file into inventory", "data_insertion"),
+    ("save these records to the database", "data_insertion"),
+    ("how many customers do we have", "analytics"),
+    ("show total revenue by month", "analytics"),
+    ("list the top 10 products by sales", "analytics"),
+    ("what is the average order value", "analytics"),
+    ("which employees earn more than 50000", "analytics"),
+    ("give me a breakdown of orders per region", "analytics"),
+    ("find customers who have not ordered in the last 90 days", "analytics"),
+    ("compare sales this year with last year", "analytics"),
+    ("show me the trend of signups per week", "analytics"),
+    ("who are our most active users", "analytics"),
+    ("count the orders placed yesterday", "analytics"),
+    ("what were the best selling categories last month", "analytics"),
+    ("report on inventory levels below reorder point", "analytics"),
+    ("sum of payments grouped by method", "analytics"),
+    ("display the latest 20 transactions", "analytics"),
+]
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def features(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesClassifier:
+    """
+    Multinomial Naive Bayes with Laplace smoothing.
+
+    Args:
+        examples: (text, label) training pairs
+        alpha: Additive smoothing
+    """
+
+    def __init__(self, examples: List[Tuple[str, str]], alpha: float = 0.5):
+        self.alpha = alpha
+        self.labels = sorted({label for _, label in examples})
+        self.counts = {label: Counter() for label in self.labels}
+        documents = Counter(label for _, label in examples)
+        for text, label in examples:
+            self.counts[label].update(features(text))
+        self.vocabulary = set().union(*self.counts.values())
+        self.log_priors = {label: math.log(documents[label] / len(examples)) for label in self.labels}
+        self.totals = {label: sum(counts.values()) for label, counts in self.counts.items()}
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        tokens = [token for token in features(text) if token in self.vocabulary]
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for label in self.labels:
+            counts, denominator = self.counts[label], self.totals[label] + self.alpha * vocabulary_size
+            scores[label] = self.log_priors[label] + sum(
+                math.log((counts[token] + self.alpha) / denominator) for token in tokens
+            )
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+
+class IntentRouter:
+    """
+    Rule-boosted Naive Bayes intent classifier with routing metrics.
+
+    Args:
+        examples: Training pairs for the lexical model
+        min_confidence: Confidence at or above which a message is routed locally
+    """
+
+    def __init__(self, examples: List[Tuple[str, str]] = TRAINING_EXAMPLES, min_confidence: float = ROUTER_MIN_CONFIDENCE):
+        self.model = NaiveBayesClassifier(examples)
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self.decisions = Counter()
+        # Confidence histogram in tenths: bucket 9 holds [0.9, 1.0]
+        self.confidence_buckets = [0] * 10
+        self.classify_us = 0.0
+        self.classified = 0
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        Classify a message.
+
+        Returns:
+            Dictionary with the "intent", its "confidence", the per-intent
+            "scores" and the "rules" that matched
+        """
+        started = time.perf_counter()
+        normalized = " ".join(text.lower().split())
+        scores = self.model.predict_proba(normalized)
+        matched = []
+        for pattern, intent, weight in _RULES:
+            if pattern.search(normalized):
+                scores[intent] *= weight
+                matched.append(intent)
+        total = sum(scores.values())
+        scores = {intent: score / total for intent, score in scores.items()}
+        intent = max(scores, key=scores.get)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+
+        with self._lock:
+            self.classified += 1
+            self.classify_us += elapsed_us
+            self.confidence_buckets[min(int(scores[intent] * 10), 9)] += 1
+        return {"intent": intent, "confidence": round(scores[intent], 4), "scores": scores, "rules": matched}
+
+    def route(self, text: str, available_agents: List[str]) -> Tuple[Dict[str, Any], str]:
+        """
+        Decide whether a message can skip the LLM router.
+
+        Returns:
+            (classification, agent name) where the agent name is empty when
+            the message should fall back to the LLM router
+        """
+        result = self.classify(text)
+        agent = INTENT_AGENTS[result["intent"]]
+        if result["confidence"] < self.min_confidence or agent not in available_agents:
+            agent = ""
+        with self._lock:
+            self.decisions[f"fast_path:{result['intent']}" if agent else "fallback"] += 1
+        return result, agent
+
+    def stats(self) -> Dict[str, Any]:
+        routed = sum(count for key, count in self.decisions.items() if key.startswith("fast_path:"))
+        total = routed + self.decisions["fallback"]
+        return {
+            "decisions": dict(self.decisions),
+            "fast_path_rate": round(routed / total, 4) if total else 0.0,
+            "confidence_histogram": list(self.confidence_buckets),
+            "mean_classify_us": round(self.classify_us / self.classified, 1) if self.classified else 0.0
+        }
+
+
+intent_router = IntentRouter()
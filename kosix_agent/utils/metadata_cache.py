@@ -0,0 +1,134 @@
+"""
+Two-tier schema metadata cache.
+
+Tier 1 is an in-process LRU keyed by DataSource (or connection string).
+Tier 2 is the persisted DataSource.schemaMetadata row, shared across
+processes and restarts. Entries are snapshots tagged with the catalog
+fingerprint they were introspected at; a snapshot is only served while the
+live fingerprint still matches, so a cache hit costs one fingerprint query.
+The persisted tier is only read when the process holds no snapshot of the
+source: a stale in-process snapshot is refreshed incrementally from the
+catalog instead of round-tripping to the DataSource row on every change.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from prisma import Json
+
+from kosix_agent.config.setting import SCHEMA_CACHE_MAX_ENTRIES, SCHEMA_CACHE_PERSIST
+from kosix_agent.utils.lru import LRUCache
+from kosix_agent.utils.prisma_client import get_prisma
+
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaMetadataCache:
+    """
+    Fingerprint-validated metadata cache over an LRU and DataSource.schemaMetadata.
+
+    Args:
+        max_entries: Size of the in-process LRU
+        persist: Whether to read and write the DataSource.schemaMetadata tier
+    """
+
+    def __init__(self, max_entries: int = SCHEMA_CACHE_MAX_ENTRIES, persist: bool = SCHEMA_CACHE_PERSIST):
+        self.persist = persist
+        self._memory = LRUCache(max_entries=max_entries)
+        self.memory_hits = 0
+        self.persisted_hits = 0
+        self.misses = 0
+
+    def get_snapshot(self, cache_key: str, datasource_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the most recent snapshot regardless of fingerprint.
+
+        Used to seed incremental refreshes; callers must validate it.
+        """
+        snapshot = self._memory.get(cache_key)
+        if snapshot is None and datasource_id and self.persist:
+            snapshot = _load_persisted(datasource_id)
+            if snapshot is not None:
+                self._memory.put(cache_key, snapshot)
+        return snapshot
+
+    def get(self, cache_key: str, fingerprint: str, datasource_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return cached metadata if it was introspected at the given fingerprint"""
+        snapshot = self._memory.get(cache_key)
+        if snapshot is not None and snapshot.get("fingerprint") == fingerprint:
+            self.memory_hits += 1
+            return snapshot["metadata"]
+
+        if snapshot is None and datasource_id and self.persist:
+            snapshot = _load_persisted(datasource_id)
+            if snapshot is not None and snapshot.get("fingerprint") == fingerprint:
+                self._memory.put(cache_key, snapshot)
+                self.persisted_hits += 1
+                return snapshot["metadata"]
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        cache_key: str,
+        fingerprint: str,
+        metadata: Dict[str, Any],
+        datasource_id: Optional[str] = None,
+        **extra: Any
+    ) -> Dict[str, Any]:
+        """Store a snapshot in both tiers and return it"""
+        snapshot = {"fingerprint": fingerprint, "metadata": metadata, **extra}
+        self._memory.put(cache_key, snapshot)
+        if datasource_id and self.persist:
+            _store_persisted(datasource_id, snapshot)
+        return snapshot
+
+    def invalidate(self, cache_key: str) -> None:
+        """Drop the in-process snapshot; the persisted one is revalidated on next use"""
+        self._memory.pop(cache_key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.persisted_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "persisted_hits": self.persisted_hits,
+            "misses": self.misses,
+            "evictions": self._memory.evictions,
+            "hit_rate": round((self.memory_hits + self.persisted_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+def _load_persisted(datasource_id: str) -> Optional[Dict[str, Any]]:
+    """Read the snapshot stored on the DataSource row, if any"""
+    try:
+        record = get_prisma().datasource.find_unique(where={"id": datasource_id})
+    except Exception as e:
+        logger.warning("Could not load persisted schema metadata for %s: %s", datasource_id, e)
+        return None
+
+    if record is None or not isinstance(record.schemaMetadata, dict):
+        return None
+    if "fingerprint" not in record.schemaMetadata or "metadata" not in record.schemaMetadata:
+        return None
+    return record.schemaMetadata
+
+
+def _store_persisted(datasource_id: str, snapshot: Dict[str, Any]) -> None:
+    """Write the snapshot and introspection time to the DataSource row"""
+    try:
+        get_prisma().datasource.update(
+            where={"id": datasource_id},
+            data={
+                "schemaMetadata": Json(snapshot),
+                "lastIntrospectedAt": datetime.now(timezone.utc)
+            }
+        )
+    except Exception as e:
+        logger.warning("Could not persist schema metadata for %s: %s", datasource_id, e)
+
+
+schema_cache = SchemaMetadataCache()
@@ -0,0 +1,250 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are updated where the work happens (agent hops,
+model calls, tools, catalog queries) and rendered on scrape together with
+collectors, which read point-in-time values such as pool sizes and cache
+counters from the components that already keep them. Everything is kept
+in memory and per process.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Seconds; spans sub-millisecond catalog queries up to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# A sample produced by a collector: (metric name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Cumulative bucket counts, sum and count per label set.
+
+    Args:
+        buckets: Upper bounds in ascending order (+Inf is implied)
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the wall-clock duration of the block, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels: Any) -> Optional[Dict[str, Any]]:
+        """Count and sum of one label set, or None if nothing was observed"""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return {"count": entry[2], "sum": entry[1]} if entry else None
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # name -> (kind, documentation, collect function)
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], List[Sample]]]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, kind: str, documentation: str, collect: Callable[[], List[Sample]]) -> None:
+        """
+        Register a metric family whose samples are read at scrape time.
+
+        Args:
+            name: Metric family name
+            kind: "gauge" or "counter"
+            documentation: HELP text
+            collect: Returns (sample name, labels, value) tuples; sample names
+                normally equal the family name
+        """
+        with self._lock:
+            self._collectors[name] = (kind, documentation, collect)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        lines: List[str] = []
+        for metric in metrics:
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header() + samples)
+        for name, (kind, documentation, collect) in collectors:
+            try:
+                samples = collect()
+            except Exception as e:
+                lines.append(f"# {name} collector failed: {_escape(e)}")
+                continue
+            if samples:
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"])
+                lines.extend(f"{sample}{_format_labels(labels)} {_format_value(value)}" for sample, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+agent_seconds = registry.histogram(
+    "kosix_agent_duration_seconds",
+    "Wall-clock time of an agent run within a turn, including the agents it transferred to",
+    ["agent"]
+)
+llm_seconds = registry.histogram(
+    "kosix_llm_call_duration_seconds",
+    "Latency of one model call",
+    ["agent", "model"]
+)
+llm_tokens = registry.counter(
+    "kosix_llm_tokens_total",
+    "Tokens reported by the model provider",
+    ["agent", "model", "kind"]
+)
+llm_short_circuits = registry.counter(
+    "kosix_llm_calls_skipped_total",
+    "Model calls answered by a callback without calling the model",
+    ["agent"]
+)
+tool_seconds = registry.histogram(
+    "kosix_tool_duration_seconds",
+    "Latency of one tool call",
+    ["tool", "status"]
+)
+schema_phase_seconds = registry.histogram(
+    "kosix_schema_tool_phase_seconds",
+    "Time spent in each phase of schema_tool",
+    ["phase"]
+)
+catalog_query_seconds = registry.histogram(
+    "kosix_catalog_query_duration_seconds",
+    "Latency of each catalog query issued by schema introspection",
+    ["query"]
+)
+schema_refresh_seconds = registry.histogram(
+    "kosix_schema_refresh_duration_seconds",
+    "Latency of one background schema refresh of a data source",
+    ["status"]
+)
+
+
+async def timed_async(histogram: Histogram, awaitable, **labels: Any) -> Any:
+    """Await and observe one awaitable, so each of several gathered coroutines is timed on its own"""
+    with histogram.time(**labels):
+        return await awaitable
@@ -0,0 +1,235 @@
+"""
+Semantic cache of natural-language questions to generated SQL.
+
+A question is normalized (lowercased, whitespace collapsed) and its
+literals — quoted strings, ISO dates and numbers — are pulled out, leaving
+a template such as "top <num> customers by revenue in <date>". Cached
+questions are grouped per scope (organization, data source and schema
+fingerprint), so a schema change starts a fresh scope and the old entries
+are dropped. A lookup matches an identical template directly, or the most
+lexically similar template (Jaccard over unigrams and bigrams) above the
+configured threshold with the same literal kinds.
+
+When the literals differ, each old literal must occur exactly once in the
+cached SQL to be re-bound to the new value; otherwise the lookup misses.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from kosix_agent.config.setting import (
+    NL_SQL_CACHE_MAX_ENTRIES,
+    NL_SQL_CACHE_MAX_SCOPES,
+    NL_SQL_CACHE_SIMILARITY,
+    NL_SQL_CACHE_TTL_S,
+)
+from kosix_agent.utils.lru import LRUCache
+
+
+_LITERAL = re.compile(
+    r"'(?P<squote>[^']*)'|\"(?P<dquote>[^\"]*)\"|(?P<date>\b\d{4}-\d{2}-\d{2}\b)|(?P<num>(?<![\w.])-?\d+(?:\.\d+)?(?![\w.]))"
+)
+_WORD = re.compile(r"<\w+>|[a-z0-9_]+")
+
+
+def normalize_question(question: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Split a question into a lowercase template and its literals.
+
+    Returns:
+        (template, [(kind, value), ...]) where kind is "str", "date" or "num"
+    """
+    literals = []
+
+    def replace(match):
+        if match.group("squote") is not None or match.group("dquote") is not None:
+            kind, value = "str", match.group("squote") if match.group("squote") is not None else match.group("dquote")
+        elif match.group("date") is not None:
+            kind, value = "date", match.group("date")
+        else:
+            kind, value = "num", match.group("num")
+        literals.append((kind, value))
+        return f" <{kind}> "
+
+    template = _LITERAL.sub(replace, question.strip())
+    template = " ".join(template.lower().split()).rstrip("?.! ")
+    return template, literals
+
+
+def _shingles(template: str) -> frozenset:
+    words = _WORD.findall(template)
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def rebind_literals(sql: str, old: List[Tuple[str, str]], new: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    Substitute the new question's literals for the old ones in cached SQL.
+
+    Returns:
+        The re-bound SQL, or None when an old literal is missing from the SQL
+        or occurs more than once (so its position is ambiguous)
+    """
+    pending = []
+    for (kind, old_value), (_, new_value) in zip(old, new):
+        if old_value == new_value:
+            continue
+        if kind == "num":
+            pattern = re.compile(rf"(?<![\w.']){re.escape(old_value)}(?![\w.'])")
+            replacement = new_value
+        else:
+            pattern = re.compile(re.escape("'" + old_value.replace("'", "''") + "'"))
+            replacement = "'" + new_value.replace("'", "''") + "'"
+        if len(pattern.findall(sql)) != 1:
+            return None
+        pending.append((pattern, replacement))
+
+    # Substitute only after every literal was located, against the original text positions
+    spans = sorted(
+        ((m.start(), m.end(), replacement) for pattern, replacement in pending for m in [pattern.search(sql)]),
+        reverse=True
+    )
+    for i, (start, end, _) in enumerate(spans[1:]):
+        if end > spans[i][0]:
+            return None
+    for start, end, replacement in spans:
+        sql = sql[:start] + replacement + sql[end:]
+    return sql
+
+
+class NLSQLCache:
+    """
+    Per-scope question -> SQL cache with lexical fuzzy matching.
+
+    Args:
+        max_entries: Questions kept per scope
+        max_scopes: Scopes (org, data source, schema fingerprint) kept
+        similarity: Minimum Jaccard similarity for a fuzzy match
+        ttl_seconds: Age after which an entry is no longer served
+    """
+
+    def __init__(
+        self,
+        max_entries: int = NL_SQL_CACHE_MAX_ENTRIES,
+        max_scopes: int = NL_SQL_CACHE_MAX_SCOPES,
+        similarity: float = NL_SQL_CACHE_SIMILARITY,
+        ttl_seconds: float = NL_SQL_CACHE_TTL_S
+    ):
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+        self._scopes = LRUCache(max_entries=max_scopes)
+        # (org_id, datasource_key) -> fingerprint of its live scope
+        self._fingerprints: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.rebinds = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved_ms = 0.0
+
+    def _scope(self, org_id: str, datasource_key: str, fingerprint: str, create: bool) -> Optional[LRUCache]:
+        with self._lock:
+            owner = (org_id, datasource_key)
+            current = self._fingerprints.get(owner)
+            if current is not None and current != fingerprint:
+                # The schema changed; everything generated against it is stale
+                self._scopes.pop((org_id, datasource_key, current))
+                self.invalidations += 1
+            self._fingerprints[owner] = fingerprint
+
+            key = (org_id, datasource_key, fingerprint)
+            scope = self._scopes.get(key)
+            if scope is None and create:
+                scope = LRUCache(max_entries=self.max_entries, ttl_seconds=self.ttl_seconds)
+                self._scopes.put(key, scope)
+            return scope
+
+    def lookup(self, org_id: str, datasource_key: str, fingerprint: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Find SQL generated earlier for the same or a near-identical question.
+
+        Returns:
+            Dictionary with the "sql", the matched "question", the "similarity"
+            and whether literals were "rebound", or None on a miss
+        """
+        template, literals = normalize_question(question)
+        scope = self._scope(org_id, datasource_key, fingerprint, create=False)
+        entry, score = None, 0.0
+        if scope is not None:
+            entry = scope.get(template)
+            score = 1.0 if entry is not None else 0.0
+            if entry is None:
+                shingles = _shingles(template)
+                kinds = [kind for kind, _ in literals]
+                for _, candidate in scope.items():
+                    if [kind for kind, _ in candidate["literals"]] != kinds:
+                        continue
+                    candidate_score = _similarity(shingles, candidate["shingles"])
+                    if candidate_score >= self.similarity and candidate_score > score:
+                        entry, score = candidate, candidate_score
+
+        if entry is not None:
+            sql = rebind_literals(entry["sql"], entry["literals"], literals)
+            if sql is not None:
+                rebound = sql != entry["sql"]
+                with self._lock:
+                    self.hits += 1
+                    self.fuzzy_hits += score < 1.0
+                    self.rebinds += rebound
+                    self.latency_saved_ms += entry["latency_ms"]
+                return {"sql": sql, "question": entry["question"], "similarity": round(score, 4), "rebound": rebound}
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(
+        self,
+        org_id: str,
+        datasource_key: str,
+        fingerprint: str,
+        question: str,
+        sql: str,
+        latency_ms: float = 0.0
+    ) -> None:
+        """Remember the SQL generated for a question and how long generating it took"""
+        template, literals = normalize_question(question)
+        scope = self._scope(org_id, datasource_key, fingerprint, create=True)
+        scope.put(template, {
+            "question": question,
+            "sql": sql,
+            "literals": literals,
+            "shingles": _shingles(template),
+            "latency_ms": latency_ms
+        })
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+            self._fingerprints.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "scopes": len(self._scopes),
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "rebinds": self.rebinds,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            # Whole scopes pushed out of the LRU
+            "evictions": self._scopes.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved_ms, 1)
+        }
+
+
+nl_sql_cache = NLSQLCache()
@@ -0,0 +1,25 @@
+"""
+Lazily connected, process-wide Prisma client for the application database.
+"""
+
+import threading
+
+from prisma import Prisma
+
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_prisma() -> Prisma:
+    """Return the shared sync Prisma client, connecting it on first use"""
+    global _client
+
+    if _client is None:
+        with _lock:
+            if _client is None:
+                client = Prisma()
+                client.connect()
+                _client = client
+
+    return _client
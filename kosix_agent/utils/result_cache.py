@@ -0,0 +1,231 @@
+"""
+Data-version-aware query result cache.
+
+Results are keyed by data source, normalized SQL and row limit, and tagged
+with a data version for every table the query reads: the table's
+cumulative insert/update/delete counters from pg_stat_user_tables plus its
+relfilenode (which changes on TRUNCATE and rewrites). A cached result is
+only served while every referenced table still reports the version it had
+when the query was run, so a hit costs one small catalog query.
+
+The tables are taken from the planner (EXPLAIN VERBOSE), which sees through
+views, CTEs and subqueries. Statistics counters are flushed by the writing
+backend at transaction end and may lag by up to a second; the TTL bounds
+how long any such window, or a write the counters do not see, can be served.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from kosix_agent.config.setting import (
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_S,
+)
+from kosix_agent.utils.columnar import ColumnarResult
+from kosix_agent.utils.lru import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+# Functions whose results differ between executions of the same text
+_VOLATILE = re.compile(
+    r"\b(random|clock_timestamp|statement_timestamp|timeofday|nextval|setval|currval|lastval|"
+    r"gen_random_uuid|uuid_generate_v[14]|txid_current|pg_current_xact_id|pg_sleep)\s*\("
+)
+
+# Statistics for these are not tracked in pg_stat_user_tables
+_UNTRACKED_SCHEMAS = ("pg_catalog", "information_schema", "pg_toast")
+
+_DATA_VERSIONS_SQL = """
+SELECT
+    r.name,
+    COALESCE(s.n_tup_ins + s.n_tup_upd + s.n_tup_del, 0) AS writes,
+    pg_relation_filenode(c.oid) AS filenode
+FROM unnest(%s::text[]) AS r(name)
+JOIN pg_class c ON c.oid = to_regclass(r.name)
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+"""
+
+
+def normalize_sql(sql: str) -> Optional[str]:
+    """
+    Canonical form of a query for cache keying.
+
+    Comments are dropped, whitespace is collapsed and everything outside
+    string literals and quoted identifiers is lowercased.
+
+    Returns:
+        The normalized text, or None when the text holds more than one statement
+    """
+    out = []
+    i, n = 0, len(sql)
+    pending_space = False
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if sql[end] == ch:
+                    if end + 1 < n and sql[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            if pending_space and out:
+                out.append(" ")
+            pending_space = False
+            out.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+            pending_space = True
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = True
+            continue
+        if ch.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if pending_space and out:
+            out.append(" ")
+        pending_space = False
+        out.append(ch.lower())
+        i += 1
+
+    normalized = "".join(out).rstrip("; ")
+    if ";" in _strip_literals(normalized):
+        return None
+    return normalized
+
+
+def _strip_literals(sql: str) -> str:
+    return re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"", "''", sql)
+
+
+class QueryResultCache:
+    """
+    LRU of ColumnarResults validated against per-table data versions.
+
+    Args:
+        max_entries: Maximum number of cached results
+        max_bytes: Budget over the buffer size of the cached results
+        ttl_seconds: Upper bound on how long a result is served
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        ttl_seconds: float = RESULT_CACHE_TTL_S
+    ):
+        self._entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    def key(self, datasource_key: str, sql: str, row_limit: int) -> Optional[tuple]:
+        """Cache key for a query, or None if the query must never be cached"""
+        normalized = normalize_sql(sql)
+        if normalized is None or _VOLATILE.search(_strip_literals(normalized)):
+            self.uncacheable += 1
+            return None
+        return (datasource_key, normalized, row_limit)
+
+    def probe(self, conn, key: tuple, sql: str, timeout_ms: int) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, str]]]:
+        """
+        Look up a query on an open connection.
+
+        Returns:
+            (entry, None) on a valid hit; (None, versions) on a miss, where
+            versions are the data versions to store the result under, or None
+            when the result cannot be cached
+        """
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),))
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                if _data_versions(cursor, list(entry["versions"])) == entry["versions"]:
+                    return entry, None
+                self._entries.pop(key)
+                self.invalidations += 1
+
+            tables = _referenced_tables(cursor, sql)
+            if tables is None:
+                self.uncacheable += 1
+                return None, None
+            versions = _data_versions(cursor, tables)
+            if len(versions) != len(tables):
+                self.uncacheable += 1
+                return None, None
+            return None, versions
+        except psycopg2.Error as e:
+            # Let the real execution report the error
+            logger.debug("result cache probe failed: %s", e)
+            return None, None
+
+    def put(self, key: tuple, result: ColumnarResult, truncated: bool, versions: Dict[str, str]) -> None:
+        """Store a result under the data versions observed before it was executed"""
+        self._entries.put(
+            key,
+            {"result": result, "truncated": truncated, "versions": versions},
+            size=result.nbytes()
+        )
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._entries.stats(),
+            "invalidations": self.invalidations,
+            "uncacheable": self.uncacheable
+        }
+
+
+def _referenced_tables(cursor, sql: str) -> Optional[List[str]]:
+    """Qualified names of the tables the planner reads, or None if any cannot be versioned"""
+    cursor.execute(f"EXPLAIN (VERBOSE, FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    tables = set()
+    stack = [node["Plan"] for node in plan]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            schema = node.get("Schema")
+            if schema is None or schema in _UNTRACKED_SCHEMAS or schema.startswith("pg_temp"):
+                return None
+            tables.add(_quote_ident(schema) + "." + _quote_ident(node["Relation Name"]))
+        elif node.get("Node Type") == "Foreign Scan":
+            return None
+        stack.extend(node.get("Plans", []))
+    return sorted(tables)
+
+
+def _data_versions(cursor, tables: List[str]) -> Dict[str, str]:
+    if not tables:
+        return {}
+    cursor.execute(_DATA_VERSIONS_SQL, (tables,))
+    return {name: f"{writes}:{filenode}" for name, writes, filenode in cursor.fetchall()}
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+result_cache = QueryResultCache()
@@ -0,0 +1,167 @@
+"""
+Streaming reader for tabular data files.
+
+Shared by the bulk loader (kosix_agent.tools.bulk_loader) and file
+ingestion (kosix_agent.utils.file_store). Rows are read one at a time, so
+memory does not depend on the size of the file. CSV, TSV and JSON lines
+are read with the standard library; Excel workbooks (first sheet) need
+openpyxl, imported on first use.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+SOURCE_FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".txt": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".xlsx": "xlsx",
+    ".xlsm": "xlsx",
+}
+
+
+def source_format(filename: str) -> Optional[str]:
+    """Format of a file from its extension, None when it is not supported"""
+    return SOURCE_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def _cell_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+class SourceReader:
+    """
+    Streams the rows of a CSV, TSV, JSON lines or Excel file as lists of strings.
+
+    Iteration yields (line number, values) with values aligned to header.
+    A row that cannot be read (wrong field count, invalid JSON) carries its
+    error as one extra value. JSON lines take their header from the keys of
+    the first object; nested values are kept as JSON text. Excel cells are
+    converted to text (dates as ISO 8601, whole numbers without ".0").
+
+    Args:
+        path: Path of the file
+        fmt: csv, tsv, jsonl or xlsx (defaults to the file extension)
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None):
+        self.path = path
+        self.format = fmt or source_format(path)
+        if self.format is None:
+            raise Exception(f"Unsupported source file {os.path.basename(path)}: expected CSV, TSV, JSON lines or Excel")
+        self.size = os.path.getsize(path)
+        self._raw = None
+        self._text = None
+        self._workbook = None
+        self._first: Optional[Tuple[int, Dict[str, Any]]] = None
+        if self.format == "xlsx":
+            self._open_workbook()
+        else:
+            self._raw = open(path, "rb")
+            self._text = io.TextIOWrapper(self._raw, encoding="utf-8-sig", newline="")
+            if self.format == "jsonl":
+                self._lines = enumerate(self._text, start=1)
+                self._first = self._next_object()
+                self.header = list(self._first[1]) if self._first and "__error__" not in self._first[1] else []
+            else:
+                self._reader = csv.reader(self._text, delimiter="\t" if self.format == "tsv" else ",")
+                self.header = [name.strip() for name in next(self._reader, [])]
+
+    def _open_workbook(self) -> None:
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise Exception("Reading Excel files requires the openpyxl package")
+        # read_only streams the sheet XML instead of building the whole workbook
+        self._workbook = load_workbook(self.path, read_only=True, data_only=True)
+        self._sheet_rows = enumerate(self._workbook.worksheets[0].iter_rows(values_only=True), start=1)
+        self.header = []
+        for _, row in self._sheet_rows:
+            if any(cell is not None for cell in row):
+                self.header = [(_cell_text(cell) or "").strip() for cell in row]
+                break
+
+    @property
+    def bytes_read(self) -> int:
+        """
+        Bytes consumed so far, for progress reporting. Text formats report
+        the position of the underlying file (ahead of the parser by at most
+        one read buffer); workbooks are compressed, so they report 0.
+        """
+        return self._raw.tell() if self._raw is not None else 0
+
+    def __iter__(self) -> Iterator[Tuple[int, List[Optional[str]]]]:
+        if self.format == "jsonl":
+            if self._first is not None:
+                yield self._first[0], self._values(self._first[1])
+            while True:
+                item = self._next_object()
+                if item is None:
+                    return
+                yield item[0], self._values(item[1])
+        elif self.format == "xlsx":
+            width = len(self.header)
+            for number, row in self._sheet_rows:
+                values = [_cell_text(cell) for cell in row]
+                while values and values[-1] is None:
+                    values.pop()
+                if not values:
+                    continue
+                yield number, self._aligned(values, width)
+        else:
+            width = len(self.header)
+            for row in self._reader:
+                if not row:
+                    continue
+                yield self._reader.line_num, self._aligned(row, width)
+
+    @staticmethod
+    def _aligned(row: List[Optional[str]], width: int) -> List[Optional[str]]:
+        if len(row) == width:
+            return row
+        return (row + [None] * width)[:width] + [f"expected {width} fields, found {len(row)}"]
+
+    def _next_object(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        for number, line in self._lines:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                item = {"__error__": str(e)}
+            return number, item if isinstance(item, dict) else {"__error__": "not a JSON object"}
+        return None
+
+    def _values(self, item: Dict[str, Any]) -> List[Optional[str]]:
+        if "__error__" in item:
+            return [None] * len(self.header) + [item["__error__"]]
+        return [_cell_text(item.get(name)) for name in self.header]
+
+    def close(self) -> None:
+        if self._text is not None:
+            self._text.close()
+        if self._workbook is not None:
+            self._workbook.close()
+
+    def __enter__(self) -> "SourceReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
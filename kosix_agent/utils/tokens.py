@@ -0,0 +1,14 @@
+"""
+Cheap, offline token estimates for LLM context budgeting.
+"""
+
+import math
+
+
+# Average characters per token for English text and code in current tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a string without a tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
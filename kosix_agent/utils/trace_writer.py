@@ -0,0 +1,219 @@
+"""
+Buffered AgentTrace writer.
+
+record() is all the request path pays: it appends a tuple to a bounded
+in-memory buffer under a lock. A background thread drains the buffer in
+batches and streams each batch into "AgentTrace" with a single COPY, so
+the cost per trace on the database is a fraction of an INSERT round trip.
+JSON encoding, ids and truncation all happen on that thread.
+
+When the buffer is full (the database is slow or down) new traces are
+dropped and counted instead of blocking the caller; a batch whose COPY
+fails is dropped and counted too. Traces are diagnostics, never worth
+slowing a user turn for.
+"""
+
+import atexit
+import io
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from kosix_agent.config.setting import (
+    APP_DATABASE_URI,
+    TRACE_BATCH_SIZE,
+    TRACE_BUFFER_SIZE,
+    TRACE_FLUSH_INTERVAL_S,
+    TRACE_MAX_FIELD_CHARS
+)
+from kosix_agent.utils.db_pool import libpq_dsn, pooled_connection
+
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ('"id"', '"agentName"', '"input"', '"output"', '"durationMs"', '"conversationId"', '"createdAt"')
+
+# COPY text format escapes
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_field(value: Optional[str]) -> str:
+    return "\\N" if value is None else value.translate(_ESCAPES)
+
+
+def _json_field(value: Any, max_chars: int) -> str:
+    # jsonb rejects \u0000 inside strings
+    text = json.dumps(value, default=str, ensure_ascii=False).replace("\\u0000", "")
+    if len(text) > max_chars:
+        text = json.dumps({"truncated": len(text), "preview": text[:max_chars]}, ensure_ascii=False)
+    return text
+
+
+def _timestamp(epoch: float) -> str:
+    # "createdAt" is timestamp(3) without time zone holding UTC, as Prisma writes it
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class TraceWriter:
+    """
+    Bounded trace buffer drained by a background COPY worker.
+
+    Args:
+        dsn: Connection string of the database holding the trace table
+        table: Trace table name (quoted as given)
+        capacity: Unwritten traces kept before new ones are dropped
+        batch_size: Traces per COPY; a full batch wakes the worker early
+        flush_interval: Maximum seconds a trace waits in the buffer
+        max_field_chars: Input/output JSON longer than this is truncated
+    """
+
+    def __init__(
+        self,
+        dsn: str = APP_DATABASE_URI,
+        table: str = "AgentTrace",
+        capacity: int = TRACE_BUFFER_SIZE,
+        batch_size: int = TRACE_BATCH_SIZE,
+        flush_interval: float = TRACE_FLUSH_INTERVAL_S,
+        max_field_chars: int = TRACE_MAX_FIELD_CHARS
+    ):
+        self.dsn = libpq_dsn(dsn) if dsn else dsn
+        self.table = table
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_field_chars = max_field_chars
+        self._copy_sql = f'COPY "{table}" ({", ".join(_COLUMNS)}) FROM STDIN'
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_ms_total = 0.0
+
+    def record(
+        self,
+        agent_name: str,
+        input: Any,
+        output: Any,
+        duration_ms: float,
+        conversation_id: Optional[str] = None
+    ) -> bool:
+        """
+        Queue one trace without blocking.
+
+        Returns:
+            False if the trace was dropped (buffer full, writer closed or no database configured)
+        """
+        item = (agent_name, input, output, duration_ms, conversation_id, time.time())
+        with self._lock:
+            if self._closed or not self.dsn or len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._buffer.append(item)
+            self.enqueued += 1
+            depth = len(self._buffer)
+            if self._thread is None:
+                self._start()
+        if depth >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self) -> int:
+        """Write everything buffered on the calling thread; returns the number of traces written"""
+        written = 0
+        while True:
+            batch = self._take()
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop accepting traces and write out what is buffered"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        else:
+            self.flush()
+
+    def depth(self) -> int:
+        return len(self._buffer)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "flush_ms_avg": round(self.flush_ms_total / self.flushes, 3) if self.flushes else 0.0
+        }
+
+    def _start(self) -> None:
+        # Called with the lock held
+        self._thread = threading.Thread(target=self._run, name="agent-trace-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self._closed:
+                self.flush()
+                return
+
+    def _take(self) -> List[tuple]:
+        with self._lock:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _write(self, batch: List[tuple]) -> int:
+        started = time.perf_counter()
+        try:
+            buffer = io.StringIO()
+            for agent_name, input, output, duration_ms, conversation_id, created_at in batch:
+                buffer.write("\t".join((
+                    str(uuid.uuid4()),
+                    _copy_field(agent_name),
+                    _copy_field(_json_field(input, self.max_field_chars)),
+                    _copy_field(_json_field(output, self.max_field_chars)),
+                    str(int(round(duration_ms))),
+                    _copy_field(conversation_id),
+                    _timestamp(created_at)
+                )))
+                buffer.write("\n")
+            buffer.seek(0)
+
+            with pooled_connection(self.dsn) as conn:
+                cursor = conn.cursor()
+                cursor.copy_expert(self._copy_sql, buffer)
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning("Dropped %d agent traces: %s", len(batch), e)
+            return 0
+
+        self.written += len(batch)
+        self.flushes += 1
+        self.flush_ms_total += (time.perf_counter() - started) * 1000
+        return len(batch)
+
+
+trace_writer = TraceWriter()
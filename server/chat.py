@@ -0,0 +1,435 @@
+"""
+Streaming chat endpoint.
+
+POST /chat/message answers with a Server-Sent Events stream. A "start"
+event is written as soon as the request is accepted, so time to first byte
+does not depend on how long the agents take. The ADK runner then runs in a
+producer task and its events are forwarded as they happen:
+
+    start       the conversation id (the ADK session id)
+    route       a transfer to another agent
+    tool_call   a tool invocation (name and arguments)
+    tool_result a tool's response
+    message     agent text (partial chunks when the model streams)
+    sql         SQL generated by sql_agent; again from "execution" when the
+                checks changed it, with the cost gate's decision, rewrites
+                and feedback when it rewrote the query
+    columns     result column names, then
+    rows        result batches, as the server-side cursor produces them: JSON
+                row arrays, or base64 columnar payloads (kosix_agent.utils.columnar)
+                when the request's Accept header lists WIRE_MEDIA_TYPE
+    rows_done   row count, truncation and query timing ("cache": "hit" when the
+                rows came from the result cache)
+    error       a failure; the stream ends after it
+    done        end of the turn, with timings
+
+Events go through a bounded queue: when the client reads slower than the
+agents (or the database cursor) produce, the producer blocks on the queue
+instead of buffering, which pauses the agent run or the row fetch. When the
+client disconnects the producer task is cancelled and a running query is
+cancelled on the database server.
+
+The request's DataSource and conversation must belong to its organization
+(and the conversation to its user); otherwise the turn ends with an error
+reporting them as not found, before any agent runs.
+
+Result rows go through the result cache (kosix_agent.utils.result_cache)
+like execute_query: a valid hit is replayed without running the query, and
+a miss is streamed live and stored once it has completed.
+
+The conversation id is the ADK session id, so the active agent and the
+last turns' tool calls carry over from turn to turn; ContextPlugin replays
+only the last CONTEXT_MAX_TURNS of them. When the request names an
+organization, turns are also persisted as Message rows
+(kosix_agent.utils.history), and the conversation's rolling summary plus
+the recent messages the session does not replay are passed in session
+state, so the agents' prompts stay the same size however long the
+conversation gets and survive a restart.
+"""
+
+import asyncio
+import base64
+import concurrent.futures
+import json
+import logging
+import re
+import time
+import uuid
+from datetime import date, datetime, time as datetime_time, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from google.adk.runners import InMemoryRunner, Runner
+from google.genai import types
+from pydantic import BaseModel
+
+from kosix_agent.agents.context_plugin import HISTORY_CONTEXT_KEY, ContextPlugin
+from kosix_agent.agents.metrics_plugin import MetricsPlugin
+from kosix_agent.agents.trace_plugin import TracePlugin
+from kosix_agent.config.setting import (
+    CHAT_STREAM_HEARTBEAT_S,
+    CHAT_STREAM_QUEUE_SIZE,
+    CONTEXT_MAX_TURNS,
+    EXECUTION_BATCH_SIZE,
+    HISTORY_PERSIST_ENABLED,
+    TRACE_ENABLED
+)
+from kosix_agent.tools.execution_tool import QueryCancelled, QueryStream, gate_summary, prepare_query, probe_result_cache
+from kosix_agent.tools.schema_scheduler import schema_scheduler
+from kosix_agent.utils.columnar import WIRE_MEDIA_TYPE, ColumnarBuilder, ColumnarResult
+from kosix_agent.utils.datasource import get_datasource, resolve_datasource
+from kosix_agent.utils.history import agent_context, get_conversation, record_turn
+from kosix_agent.utils.result_cache import result_cache
+
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "kosix"
+
+router = APIRouter(prefix="/chat")
+
+_SQL = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+# Longest tool response forwarded in a tool_result event
+_MAX_TOOL_RESULT_CHARS = 2000
+
+_runner: Optional[Runner] = None
+# Plugins holding per-invocation state, settled when a turn ends without reaching after_run
+_invocation_plugins: List[Any] = []
+
+
+class ChatMessage(BaseModel):
+    message: str
+    user_id: str
+    org_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    datasource_id: Optional[str] = None
+    # Run the generated SQL and stream its rows after the agent turn
+    execute: bool = True
+
+
+def get_runner() -> Runner:
+    """The ADK runner for root_agent, created on first use"""
+    global _runner
+    if _runner is None:
+        from kosix_agent.agent import root_agent
+        _invocation_plugins[:] = [MetricsPlugin()] + ([TracePlugin()] if TRACE_ENABLED else [])
+        _runner = InMemoryRunner(agent=root_agent, app_name=APP_NAME, plugins=[ContextPlugin(), *_invocation_plugins])
+    return _runner
+
+
+def _json_default(value: Any) -> Any:
+    # ISO 8601 like the columnar results, so cached and live rows read the same
+    if isinstance(value, (date, datetime, datetime_time)):
+        return value.isoformat()
+    return str(value)
+
+
+def sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=_json_default, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.post("/message")
+async def chat_message(body: ChatMessage, request: Request, runner: Runner = Depends(get_runner)) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_turn(body, request, runner),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _stream_turn(body: ChatMessage, request: Request, runner: Runner) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    conversation_id = body.conversation_id or str(uuid.uuid4())
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CHAT_STREAM_QUEUE_SIZE)
+    columnar = WIRE_MEDIA_TYPE in request.headers.get("accept", "")
+    turn = _Turn(body, runner, conversation_id, queue, columnar)
+
+    event_id = 0
+    yield sse("start", {"conversation_id": conversation_id}, event_id)
+
+    producer = asyncio.create_task(turn.run())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=CHAT_STREAM_HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # SSE comment: keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            event, data = item
+            event_id += 1
+            if event == "done":
+                data = {**data, "total_ms": round((time.perf_counter() - started) * 1000, 1)}
+            yield sse(event, data, event_id)
+    finally:
+        # The client disconnected mid-stream: stop the agents and any running query
+        if not producer.done():
+            turn.cancel()
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+class _Turn:
+    """Produces the events of one chat turn into a bounded queue"""
+
+    def __init__(self, body: ChatMessage, runner: Runner, conversation_id: str, queue: asyncio.Queue, columnar: bool = False):
+        self.body = body
+        self.runner = runner
+        self.conversation_id = conversation_id
+        self.persist = HISTORY_PERSIST_ENABLED and bool(body.org_id)
+        self.session_id = conversation_id
+        self.queue = queue
+        # Send row batches in the columnar wire format instead of JSON arrays
+        self.columnar = columnar
+        self.stream: Optional[QueryStream] = None
+        # Accumulates a streamed result for the result cache
+        self.builder: Optional[ColumnarBuilder] = None
+        self.cancelled = False
+        self.reply: Dict[str, Any] = {}
+        # The request's DataSource, once checked to belong to its organization
+        self.datasource: Optional[Dict[str, Any]] = None
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.stream is not None:
+            self.stream.cancel()
+
+    async def emit(self, event: str, data: Dict[str, Any]) -> None:
+        # Blocks while the queue is full, which is what pauses the producer
+        await self.queue.put((event, data))
+
+    async def run(self) -> None:
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        started_at = datetime.now(timezone.utc)
+        try:
+            await self._authorize()
+            sql = await self._run_agents()
+            timings["agents_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if sql and self.body.execute:
+                rows_started = time.perf_counter()
+                await self._stream_rows(sql)
+                timings["rows_ms"] = round((time.perf_counter() - rows_started) * 1000, 1)
+            if self.persist:
+                await self._record(started_at)
+            await self.emit("done", timings)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("chat turn failed")
+            await self.emit("error", {"error": str(e), "status": "error"})
+        finally:
+            if not self.cancelled:
+                await self.queue.put(None)
+
+    async def _authorize(self) -> None:
+        """Refuse a DataSource or Conversation the request's organization and user do not own"""
+        if self.body.datasource_id:
+            self.datasource = await asyncio.to_thread(get_datasource, self.body.datasource_id, self.body.org_id)
+        if self.body.conversation_id:
+            await asyncio.to_thread(get_conversation, self.conversation_id, self.body.user_id, self.body.org_id)
+
+    async def _session(self) -> Optional[Dict[str, Any]]:
+        """Create the conversation's session on its first turn; returns the state to update on later ones"""
+        if self.body.datasource_id:
+            # Keeps the source's cached schema fresh ahead of the next turns
+            schema_scheduler.touch(self.body.datasource_id)
+        service = self.runner.session_service
+        session = await service.get_session(app_name=self.runner.app_name, user_id=self.body.user_id, session_id=self.session_id)
+        state: Dict[str, Any] = {"org_id": self.body.org_id, "conversation_id": self.conversation_id}
+        if self.body.datasource_id:
+            state["datasource_id"] = self.body.datasource_id
+        if self.persist:
+            try:
+                context = await asyncio.to_thread(agent_context, self.conversation_id, self.body.user_id, self.body.org_id)
+                if session is not None:
+                    # ContextPlugin replays the session's last turns itself (up to
+                    # CONTEXT_MAX_TURNS with this one); drop their two messages each
+                    replayed = min(sum(1 for event in session.events if event.author == "user"), CONTEXT_MAX_TURNS - 1)
+                    context["recent"] = context["recent"][:max(0, len(context["recent"]) - 2 * replayed)]
+                state[HISTORY_CONTEXT_KEY] = context
+            except Exception as e:
+                logger.warning("Could not load history of conversation %s: %s", self.conversation_id, e)
+
+        if session is None:
+            await service.create_session(
+                app_name=self.runner.app_name,
+                user_id=self.body.user_id,
+                session_id=self.session_id,
+                state=state
+            )
+            return None
+        changed = {key: value for key, value in state.items() if session.state.get(key) != value}
+        return changed or None
+
+    async def _run_agents(self) -> Optional[str]:
+        """Forward runner events; returns the SQL generated during the turn, if any"""
+        state_delta = await self._session()
+        message = types.Content(role="user", parts=[types.Part(text=self.body.message)])
+        sql = None
+        invocation_id = None
+        try:
+            async for event in self.runner.run_async(
+                user_id=self.body.user_id, session_id=self.session_id, new_message=message, state_delta=state_delta
+            ):
+                invocation_id = event.invocation_id
+                if event.actions and event.actions.transfer_to_agent:
+                    await self.emit("route", {"from": event.author, "agent": event.actions.transfer_to_agent})
+                for part in (event.content.parts if event.content and event.content.parts else []):
+                    if part.function_call and part.function_call.name != "transfer_to_agent":
+                        await self.emit("tool_call", {
+                            "agent": event.author,
+                            "name": part.function_call.name,
+                            "args": part.function_call.args
+                        })
+                    elif part.function_response and part.function_response.name != "transfer_to_agent":
+                        response = json.dumps(part.function_response.response, default=str)
+                        await self.emit("tool_result", {
+                            "agent": event.author,
+                            "name": part.function_response.name,
+                            "response": response[:_MAX_TOOL_RESULT_CHARS],
+                            "truncated": len(response) > _MAX_TOOL_RESULT_CHARS
+                        })
+                    elif part.text and not part.thought:
+                        if event.author == "sql_agent" and not event.partial and _SQL.match(part.text):
+                            sql = part.text.strip()
+                            self.reply.update(agent=event.author, sql=sql)
+                            await self.emit("sql", {"agent": event.author, "sql": sql})
+                        else:
+                            if not event.partial:
+                                self.reply.update(agent=event.author, text=part.text)
+                            await self.emit("message", {"agent": event.author, "text": part.text, "partial": bool(event.partial)})
+        finally:
+            # A cancelled stream or an exception out of the run skips the plugins' after_run
+            if invocation_id is not None:
+                for plugin in _invocation_plugins:
+                    plugin.end_invocation(invocation_id)
+        return sql
+
+    async def _record(self, started_at: datetime) -> None:
+        """Persist the turn; history is best effort and never fails the turn"""
+        try:
+            await asyncio.to_thread(
+                record_turn,
+                self.conversation_id,
+                self.body.user_id,
+                self.body.org_id,
+                {"text": self.body.message},
+                self.reply,
+                started_at,
+                datetime.now(timezone.utc)
+            )
+        except Exception as e:
+            logger.warning("Could not record turn of conversation %s: %s", self.conversation_id, e)
+
+    async def _stream_rows(self, sql: str) -> None:
+        datasource = self.datasource or await asyncio.to_thread(resolve_datasource, None)
+        prepared = await prepare_query(sql, datasource)
+        if prepared.get("status") == "error":
+            await self.emit("error", prepared)
+            return
+        gate = prepared["cost_gate"]
+        if prepared["sql"] != sql or (gate is not None and gate["decision"] != "allow"):
+            # Rewritten results can be approximate (sampled or windowed); say so
+            event = {"agent": "execution", "sql": prepared["sql"], "warnings": prepared["warnings"]}
+            if gate is not None and gate["decision"] != "allow":
+                event["cost_gate"] = gate_summary(gate)
+            await self.emit("sql", event)
+
+        self.stream = QueryStream(
+            datasource["connection_uri"],
+            prepared["sql"],
+            cache_key=datasource["cache_key"],
+            org_id=datasource["organization_id"]
+        )
+        started = time.perf_counter()
+        entry, key, versions = await asyncio.to_thread(probe_result_cache, self.stream)
+        if entry is not None:
+            await self._replay(entry, started)
+            return
+
+        self.builder = None
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.to_thread(self._pump_rows, loop, versions is not None)
+        except QueryCancelled:
+            return
+        if versions is not None and not self.stream.cancelled:
+            builder = self.builder or ColumnarBuilder(self.stream.columns, self.stream.column_types)
+            result_cache.put(key, builder.build(), self.stream.truncated, versions)
+        await self.emit("rows_done", {
+            "columns": self.stream.columns,
+            "row_count": self.stream.row_count,
+            "truncated": self.stream.truncated,
+            "timing": {**self.stream.stats, "cache": "miss"} if key is not None else self.stream.stats
+        })
+
+    async def _replay(self, entry: Dict[str, Any], started: float) -> None:
+        """Send a cached result as a live one would be sent"""
+        result = entry["result"]
+        if result.row_count:
+            await self.emit("columns", {"columns": result.column_names})
+            if self.columnar:
+                await self.emit("rows", self._wire(result))
+            else:
+                rows = result.to_rows()
+                for offset in range(0, len(rows), EXECUTION_BATCH_SIZE):
+                    await self.emit("rows", {"rows": rows[offset:offset + EXECUTION_BATCH_SIZE]})
+        await self.emit("rows_done", {
+            "columns": result.column_names,
+            "row_count": result.row_count,
+            "truncated": entry["truncated"],
+            "timing": {"cache": "hit", "total_ms": round((time.perf_counter() - started) * 1000, 2)}
+        })
+
+    def _pump_rows(self, loop: asyncio.AbstractEventLoop, collect: bool = False) -> None:
+        """Iterate the cursor on a worker thread, blocking it while the client catches up"""
+        stream = self.stream
+        for batch in stream:
+            if collect:
+                if self.builder is None:
+                    self.builder = ColumnarBuilder(stream.columns, stream.column_types)
+                self.builder.append_batch(batch)
+            items = [("rows", self._rows(stream, batch))]
+            if stream.row_count == len(batch):
+                # Column names are known once the first batch has been fetched
+                items.insert(0, ("columns", {"columns": stream.columns}))
+            for item in items:
+                if not self._put_from_thread(loop, item, stream):
+                    raise QueryCancelled("Client disconnected")
+
+    def _rows(self, stream: QueryStream, batch) -> Dict[str, Any]:
+        if not self.columnar:
+            return {"rows": [list(row) for row in batch]}
+        builder = ColumnarBuilder(stream.columns, stream.column_types)
+        builder.append_batch(batch)
+        return self._wire(builder.build())
+
+    @staticmethod
+    def _wire(result: ColumnarResult) -> Dict[str, Any]:
+        return {"format": WIRE_MEDIA_TYPE, "data": base64.b64encode(result.to_wire()).decode("ascii")}
+
+    def _put_from_thread(self, loop: asyncio.AbstractEventLoop, item, stream: QueryStream) -> bool:
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stream.cancelled:
+                    future.cancel()
+                    return False
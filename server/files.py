@@ -0,0 +1,110 @@
+"""
+File upload endpoints (kosix_agent.utils.file_store).
+
+POST /files?org_id=...&user_id=...&filename=...   the raw file as the request body
+GET  /files/{id}                                  the File and its parsed schema
+GET  /files/{id}/rows?offset=&limit=&columns=     rows of the parsed table
+
+The body is streamed to disk and hashed as it arrives. When the
+organization already has a parsed File with the same checksum, that File is
+returned and nothing is parsed. Otherwise the File row is created and
+parsing runs after the response (202); its status is "parsing" until
+parsedAt is set, or "failed" with the error in parsedSchema.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from kosix_agent.config.setting import FILE_ROWS_MAX_LIMIT
+from kosix_agent.utils.file_store import (
+    UploadTooLarge,
+    create_file,
+    find_parsed_file,
+    open_table,
+    parse_file,
+    receive_upload
+)
+from kosix_agent.utils.prisma_client import get_prisma
+from kosix_agent.utils.source_reader import source_format
+
+
+router = APIRouter(prefix="/files")
+
+
+def _describe(record: Any, deduplicated: bool = False) -> Dict[str, Any]:
+    schema = record.parsedSchema
+    if record.parsedAt is not None:
+        status = "parsed"
+    elif isinstance(schema, dict) and "error" in schema:
+        status = "failed"
+    else:
+        status = "parsing"
+    return {
+        "id": record.id,
+        "filename": record.filename,
+        "size": record.size,
+        "checksum": record.checksum,
+        "status": status,
+        "deduplicated": deduplicated,
+        "parsed_schema": schema,
+        "parsed_at": record.parsedAt
+    }
+
+
+@router.post("")
+async def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    org_id: str,
+    user_id: str,
+    filename: str
+) -> JSONResponse:
+    if source_format(filename) is None:
+        raise HTTPException(status_code=415, detail="Expected a CSV, TSV, JSON lines or Excel file")
+    try:
+        upload = await receive_upload(request.stream())
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    existing = await asyncio.to_thread(find_parsed_file, org_id, upload["checksum"])
+    if existing is not None:
+        os.remove(upload["path"])
+        return JSONResponse(jsonable_encoder(_describe(existing, deduplicated=True)), status_code=200)
+
+    mime_type = request.headers.get("content-type", "application/octet-stream")
+    record = await asyncio.to_thread(create_file, org_id, user_id, filename, mime_type, upload)
+    # Runs on the threadpool once the response is sent
+    background_tasks.add_task(parse_file, record.id, upload["path"], upload["checksum"], filename)
+    return JSONResponse(jsonable_encoder(_describe(record)), status_code=202)
+
+
+async def _get_file(file_id: str) -> Any:
+    record = await asyncio.to_thread(get_prisma().file.find_unique, where={"id": file_id})
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"File {file_id} not found")
+    return record
+
+
+@router.get("/{file_id}")
+async def get_file(file_id: str) -> Dict[str, Any]:
+    return _describe(await _get_file(file_id))
+
+
+@router.get("/{file_id}/rows")
+async def get_rows(file_id: str, offset: int = 0, limit: int = 100, columns: Optional[str] = None) -> Dict[str, Any]:
+    record = await _get_file(file_id)
+    if offset < 0 or not 0 < limit <= FILE_ROWS_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"offset must be >= 0 and limit between 1 and {FILE_ROWS_MAX_LIMIT}")
+
+    def read() -> Dict[str, Any]:
+        with open_table(record) as table:
+            return table.rows(offset, limit, columns.split(",") if columns else None)
+    try:
+        return await asyncio.to_thread(read)
+    except Exception as e:
+        raise HTTPException(status_code=409 if record.parsedAt is None else 400, detail=str(e))
@@ -0,0 +1,226 @@
+"""
+Health probes and the Prometheus metrics endpoint.
+
+GET /health checks the application database (SELECT 1 through the shared
+Prisma client, which every request depends on) and the ADK runner (a session round trip through its session service).
+Each probe runs at most once per KOSIX_HEALTH_CACHE_TTL_S; requests in
+between get the cached result, and concurrent requests wait for the probe
+already in flight instead of starting their own, so a load balancer
+polling /health cannot turn into load on the database.
+
+GET /metrics renders kosix_agent.utils.metrics: the agent, model, tool
+and schema_tool histograms recorded during turns, plus pool and cache
+figures read from their owners at scrape time.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from kosix_agent.config.setting import HEALTH_CACHE_TTL_S, HEALTH_PROBE_TIMEOUT_S
+from kosix_agent.tools.column_profile import profile_cache
+from kosix_agent.tools.schema_scheduler import schema_scheduler
+from kosix_agent.utils.async_db_pool import async_pool_stats
+from kosix_agent.utils.db_pool import pool_stats
+from kosix_agent.utils.intent_router import intent_router
+from kosix_agent.utils.metadata_cache import schema_cache
+from kosix_agent.utils.metrics import Sample, registry
+from kosix_agent.utils.nl_sql_cache import nl_sql_cache
+from kosix_agent.utils.prisma_client import get_prisma
+from kosix_agent.utils.result_cache import result_cache
+from kosix_agent.utils.trace_writer import trace_writer
+from server.chat import APP_NAME, get_runner
+
+
+router = APIRouter()
+
+
+class Probe:
+    """
+    A dependency check whose result is cached and never runs concurrently.
+
+    Args:
+        check: Coroutine function that raises when the dependency is unhealthy
+        ttl: Seconds a result is reused
+        timeout: Seconds before the check counts as failed
+    """
+
+    def __init__(self, check: Callable[[], Awaitable[None]], ttl: float = HEALTH_CACHE_TTL_S, timeout: float = HEALTH_PROBE_TIMEOUT_S):
+        self.check = check
+        self.ttl = ttl
+        self.timeout = timeout
+        self.runs = 0
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._result is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def result(self) -> Dict[str, Any]:
+        if not self._fresh():
+            async with self._lock:
+                # Another request may have refreshed it while this one waited
+                if not self._fresh():
+                    self._result = await self._run()
+                    self._checked_at = time.monotonic()
+        return {**self._result, "ageMs": round((time.monotonic() - self._checked_at) * 1000)}
+
+    async def _run(self) -> Dict[str, Any]:
+        self.runs += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.check(), timeout=self.timeout)
+            result = {"status": "connected"}
+        except asyncio.TimeoutError:
+            result = {"status": "timeout", "error": f"No response within {self.timeout}s"}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        result["responseTimeMs"] = round((time.perf_counter() - started) * 1000, 1)
+        result["checkedAt"] = datetime.now(timezone.utc).isoformat()
+        return result
+
+
+def _select_one() -> None:
+    get_prisma().query_raw("SELECT 1")
+
+
+async def _check_database() -> None:
+    # The Prisma client is synchronous (and connects on first use), so it runs off the event loop
+    await asyncio.to_thread(_select_one)
+
+
+async def _check_adk() -> None:
+    runner = get_runner()
+    session_id = f"health-{uuid.uuid4()}"
+    await runner.session_service.create_session(app_name=APP_NAME, user_id="health", session_id=session_id)
+    await runner.session_service.delete_session(app_name=APP_NAME, user_id="health", session_id=session_id)
+
+
+probes = {
+    "adk": Probe(_check_adk),
+    "database": Probe(_check_database),
+}
+
+
+@router.get("/health")
+async def health_check() -> JSONResponse:
+    started = time.perf_counter()
+    names = list(probes)
+    results = dict(zip(names, await asyncio.gather(*(probes[name].result() for name in names))))
+    healthy = all(result["status"] == "connected" for result in results.values())
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "ok" if healthy else "degraded",
+            **results,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "responseTimeMs": round((time.perf_counter() - started) * 1000, 1)
+        }
+    )
+
+
+@router.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def _pool_connections() -> List[Sample]:
+    samples = []
+    for driver, pools in [("psycopg2", pool_stats()["pools"]), ("asyncpg", async_pool_stats())]:
+        for pool, stats in pools.items():
+            for state in ("idle", "in_use"):
+                samples.append(("kosix_db_pool_connections", {"driver": driver, "pool": pool, "state": state}, stats[state]))
+    return samples
+
+
+def _pool_counters() -> List[Sample]:
+    samples = []
+    for pool, stats in pool_stats()["pools"].items():
+        for counter in ("acquired", "acquire_timeouts", "connections_created", "connections_recycled", "health_check_failures"):
+            samples.append(("kosix_db_pool_events_total", {"pool": pool, "event": counter}, stats[counter]))
+    return samples
+
+
+def _pool_wait() -> List[Sample]:
+    return [
+        ("kosix_db_pool_acquire_wait_seconds_total", {"pool": pool}, stats["acquire_wait_ms_total"] / 1000)
+        for pool, stats in pool_stats()["pools"].items()
+    ]
+
+
+def _org_connections() -> List[Sample]:
+    return [
+        ("kosix_org_connections_in_use", {"org": org_id}, in_use)
+        for org_id, in_use in pool_stats()["org_connections_in_use"].items()
+    ]
+
+
+def _cache_stats() -> Dict[str, Dict[str, Any]]:
+    schema = schema_cache.stats()
+    nl_sql = nl_sql_cache.stats()
+    return {
+        "schema_metadata": {
+            "hits": schema["memory_hits"] + schema["persisted_hits"],
+            "misses": schema["misses"],
+            "evictions": schema["evictions"],
+            "entries": schema["entries"],
+            "hit_rate": schema["hit_rate"]
+        },
+        "query_result": result_cache.stats(),
+        "nl_sql": {**nl_sql, "entries": nl_sql["scopes"]},
+        "column_profile": profile_cache.stats(),
+    }
+
+
+def _cache_family(field: str, name: str) -> Callable[[], List[Sample]]:
+    return lambda: [(name, {"cache": cache}, stats[field]) for cache, stats in _cache_stats().items()]
+
+
+def _router_decisions() -> List[Sample]:
+    return [
+        ("kosix_router_decisions_total", {"decision": decision}, count)
+        for decision, count in intent_router.stats()["decisions"].items()
+    ]
+
+
+def _schema_refresh_sources() -> List[Sample]:
+    stats = schema_scheduler.stats()
+    return [
+        ("kosix_schema_refresh_sources", {"state": state}, stats[state])
+        for state in ("sources", "active", "queued", "failing")
+    ]
+
+
+def _trace_records() -> List[Sample]:
+    stats = trace_writer.stats()
+    return [
+        ("kosix_trace_records_total", {"outcome": outcome}, stats[outcome])
+        for outcome in ("enqueued", "written", "dropped", "failed")
+    ]
+
+
+registry.register_collector("kosix_db_pool_connections", "gauge", "Pooled connections by state", _pool_connections)
+registry.register_collector("kosix_db_pool_events_total", "counter", "Connection pool events", _pool_counters)
+registry.register_collector("kosix_db_pool_acquire_wait_seconds_total", "counter", "Time spent waiting for a pooled connection", _pool_wait)
+registry.register_collector("kosix_org_connections_in_use", "gauge", "Borrowed connections per organization", _org_connections)
+registry.register_collector("kosix_cache_hits_total", "counter", "Cache hits", _cache_family("hits", "kosix_cache_hits_total"))
+registry.register_collector("kosix_cache_misses_total", "counter", "Cache misses", _cache_family("misses", "kosix_cache_misses_total"))
+registry.register_collector("kosix_cache_evictions_total", "counter", "Entries evicted by size, count or age", _cache_family("evictions", "kosix_cache_evictions_total"))
+registry.register_collector("kosix_cache_entries", "gauge", "Entries held by a cache", _cache_family("entries", "kosix_cache_entries"))
+registry.register_collector("kosix_cache_hit_ratio", "gauge", "Hits over lookups since start", _cache_family("hit_rate", "kosix_cache_hit_ratio"))
+registry.register_collector("kosix_router_decisions_total", "counter", "Local intent router decisions", _router_decisions)
+registry.register_collector("kosix_trace_records_total", "counter", "AgentTrace records by outcome", _trace_records)
+registry.register_collector(
+    "kosix_trace_buffered", "gauge", "AgentTrace records waiting to be written",
+    lambda: [("kosix_trace_buffered", {}, trace_writer.depth())]
+)
+registry.register_collector(
+    "kosix_schema_refresh_sources", "gauge", "Data sources known to the schema refresh scheduler, by state",
+    _schema_refresh_sources
+)
@@ -0,0 +1,34 @@
+"""
+Conversation history endpoints with keyset (cursor) pagination.
+
+GET /conversations?user_id=...              a user's conversations, most recent first
+GET /conversations/{id}/messages            a conversation's messages, newest first
+
+Both take an optional limit and the next_cursor of the previous page.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+
+from kosix_agent.utils.history import list_conversations, list_messages
+
+
+router = APIRouter(prefix="/conversations")
+
+
+@router.get("")
+async def get_conversations(user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        return await asyncio.to_thread(list_conversations, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{conversation_id}/messages")
+async def get_messages(conversation_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        return await asyncio.to_thread(list_messages, conversation_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
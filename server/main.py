@@ -1,29 +1,45 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
-from datetime import datetime
+from pathlib import Path
+import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(root_path="/api/v1")
+# The server is started from server/; make the repository root importable for kosix_agent
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server.chat import router as chat_router
+from server.files import router as files_router
+from server.health import router as health_router
+from server.history import router as history_router
+from kosix_agent.config.setting import SCHEMA_REFRESH_ENABLED
+from kosix_agent.tools.schema_scheduler import schema_scheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep every active DataSource's schemaMetadata warm in the background
+    refresher = asyncio.create_task(schema_scheduler.run()) if SCHEMA_REFRESH_ENABLED else None
+    yield
+    if refresher is not None:
+        refresher.cancel()
+        try:
+            await refresher
+        except asyncio.CancelledError:
+            pass
+
+
+app = FastAPI(root_path="/api/v1", lifespan=lifespan)
 
 api_router = APIRouter()
 
-@app.get("/health")
-async def health_check():
-    return {
-        "status": "ok",
-        "adk": {
-            "status": "connected",
-            "responseTimeMs": 2
-        },
-        "database": {
-            "status": "connected",
-            "responseTimeMs": 27
-        },
-        "timestamp": datetime.now().isoformat() + "Z",
-        "responseTimeMs": 29
-    }
+api_router.include_router(health_router)
+api_router.include_router(chat_router)
+api_router.include_router(history_router)
+api_router.include_router(files_router)
 
 app.include_router(api_router)
 
@@ -0,0 +1,8 @@
+-- AlterTable
+ALTER TABLE "Conversation" ADD COLUMN     "summary" JSONB;
+
+-- CreateIndex
+CREATE INDEX "Conversation_userId_updatedAt_id_idx" ON "Conversation"("userId", "updatedAt", "id");
+
+-- CreateIndex
+CREATE INDEX "Message_conversationId_createdAt_id_idx" ON "Message"("conversationId", "createdAt", "id");
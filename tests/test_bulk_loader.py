@@ -0,0 +1,161 @@
+"""
+Tests for the chunked COPY bulk loader.
+
+The source is a real CSV in a temporary directory; the table metadata and
+the pooled connection are replaced by fakes, and the fake COPY refuses
+rows whose id was already loaded, like a primary key would. No database
+is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import csv
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+from kosix_agent.tools import bulk_loader
+from kosix_agent.tools.bulk_loader import RowError, bulk_load, compile_coercer, suggest_mapping
+
+
+METADATA = {"tables": [{
+    "schema": "public",
+    "table_name": "orders",
+    "columns": [
+        {"name": "id", "data_type": "INTEGER", "nullable": False},
+        {"name": "amount", "data_type": "DECIMAL(10,2)", "nullable": True},
+        {"name": "ordered_on", "data_type": "DATE", "nullable": True},
+    ]
+}]}
+
+
+class _UniqueViolation(bulk_loader.psycopg2.Error):
+    pgerror = "ERROR:  duplicate key value violates unique constraint \"orders_pkey\"\nDETAIL: ..."
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def copy_expert(self, sql, stream):
+        self.conn.copies += 1
+        for line in stream.getvalue().splitlines():
+            row_id = line.split("\t")[0]
+            if row_id in self.conn.loaded or row_id in self.conn.pending:
+                raise _UniqueViolation("duplicate key")
+            self.conn.pending.append(row_id)
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, existing=()):
+        self.loaded = list(existing)
+        self.pending = []
+        self.copies = 0
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.loaded.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+
+class BulkLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, "orders.csv")
+        self.rejects = os.path.join(self.directory.name, "rejects.csv")
+        self.conn = _Connection(existing=["7"])
+        self.saved = bulk_loader.getCachedMetaData, bulk_loader.pooled_connection
+
+        @contextmanager
+        def pooled_connection(dsn, key=None, org_id=None):
+            yield self.conn
+
+        bulk_loader.getCachedMetaData = lambda *args, **kwargs: METADATA
+        bulk_loader.pooled_connection = pooled_connection
+
+    def tearDown(self):
+        bulk_loader.getCachedMetaData, bulk_loader.pooled_connection = self.saved
+        self.directory.cleanup()
+
+    def write(self, rows):
+        with open(self.source, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Order ID", "Amount", "Ordered On"])
+            writer.writerows(rows)
+
+    def load(self, **kwargs):
+        options = {"mapping": {"Order ID": "id", "Amount": "amount", "Ordered On": "ordered_on"},
+                   "chunk_rows": 8, "reject_path": self.rejects}
+        options.update(kwargs)
+        return bulk_load("postgresql://db", "orders", self.source, **options)
+
+    def rejected(self):
+        with open(self.rejects, newline="") as f:
+            return [(row["_line"], row["_error"]) for row in csv.DictReader(f)]
+
+    def test_database_rejects_are_isolated_by_bisection(self):
+        self.write([[str(i), "1.50", "2026-01-31"] for i in range(1, 17)])
+        summary = self.load()
+        self.assertTrue(summary["completed"])
+        self.assertEqual((summary["rows_read"], summary["rows_loaded"], summary["rows_rejected"]), (16, 15, 1))
+        self.assertEqual(sorted(self.conn.loaded, key=int), [str(i) for i in range(1, 17)])
+        # Row 7 sits on line 8 (after the header); the first line of the error is kept
+        self.assertEqual(self.rejected(), [("8", 'ERROR:  duplicate key value violates unique constraint "orders_pkey"')])
+        self.assertEqual(summary["reject_file"], self.rejects)
+        # The clean chunk is one COPY; the other is bisected down to the bad row
+        self.assertLess(self.conn.copies, 10)
+
+    def test_coercion_failures_are_rejected_before_copy(self):
+        self.write([["1", "12,50", "31/01/2026"], ["x", "1", ""], ["", "1", ""], ["2", "", "2026-02-30"]])
+        summary = self.load()
+        self.assertEqual(self.conn.loaded, ["7", "1"])
+        self.assertEqual([line for line, _ in self.rejected()], ["3", "4", "5"])
+        self.assertEqual(summary["rows_rejected"], 3)
+
+    def test_stops_when_the_whole_first_chunk_is_rejected(self):
+        self.write([["7", "1", ""]] * 3 + [["1", "1", ""]])
+        summary = self.load(chunk_rows=3)
+        self.assertFalse(summary["completed"])
+        self.assertIn("first chunk", summary["stopped"])
+        self.assertEqual(self.conn.loaded, ["7"])
+
+    def test_stops_after_max_rejects(self):
+        self.write([["x", "1", ""]] * 5 + [[str(i), "1", ""] for i in range(10, 30)])
+        summary = self.load(chunk_rows=8, max_rejects=5)
+        self.assertEqual(summary["stopped"], "Stopped after 5 rejected rows")
+        self.assertEqual(summary["rows_read"], 8)
+        self.assertEqual(summary["rows_loaded"], 3)
+
+
+class CoercionTest(unittest.TestCase):
+
+    def test_converters(self):
+        amount = compile_coercer({"name": "amount", "data_type": "DECIMAL(10,2)", "nullable": True})
+        self.assertEqual(amount(" 12.50 "), "12.50")
+        self.assertIsNone(amount("N/A"))
+        required = compile_coercer({"name": "id", "data_type": "INTEGER", "nullable": False})
+        with self.assertRaisesRegex(RowError, "id is required"):
+            required("")
+        with self.assertRaises(RowError):
+            required("1.5x")
+        note = compile_coercer({"name": "note", "data_type": "TEXT", "nullable": True})
+        self.assertEqual(note(""), "")
+
+    def test_suggested_mapping(self):
+        mapping = suggest_mapping(["ID", "Amount", "Orderd On", "Unrelated"], METADATA["tables"][0]["columns"])
+        self.assertEqual(mapping, {"ID": "id", "Amount": "amount", "Orderd On": "ordered_on"})
+
+
+if __name__ == "__main__":
+    unittest.main()
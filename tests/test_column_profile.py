@@ -0,0 +1,61 @@
+"""
+Tests for column value profiles.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from kosix_agent.tools.column_profile import attach_profiles, profile_column
+
+
+def _stats(most_common_vals, most_common_freqs, histogram_bounds=None, n_distinct=3):
+    return {
+        "null_frac": 0.0,
+        "n_distinct": n_distinct,
+        "most_common_vals": most_common_vals,
+        "most_common_freqs": most_common_freqs,
+        "histogram_bounds": histogram_bounds
+    }
+
+
+def _metadata(pii_policy):
+    return {
+        "security": {"pii_policy": pii_policy},
+        "tables": [{
+            "schema": "public",
+            "table_name": "users",
+            "columns": [{"name": "email"}, {"name": "status"}, {"name": "age"}]
+        }]
+    }
+
+
+PROFILES = {
+    "public.users": {
+        "email": profile_column(_stats('{a@x.io,b@x.io}', [0.5, 0.5], n_distinct=2), 10),
+        "status": profile_column(_stats('{active,banned,new}', [0.6, 0.3, 0.1]), 10),
+        "age": profile_column(_stats(None, None, "{18,30,64}", n_distinct=-1), 10)
+    }
+}
+
+
+class PiiPolicyTest(unittest.TestCase):
+
+    def profile(self, pii_policy):
+        return attach_profiles(_metadata(pii_policy), PROFILES)["tables"][0]["value_profile"]
+
+    def test_pii_columns_reveal_no_values(self):
+        profile = self.profile({"allow_pii": False, "pii_columns": ["users.email", "AGE"]})
+        self.assertEqual(profile["email"], {"null_frac": 0.0, "distinct": 2})
+        self.assertEqual(profile["age"], {"null_frac": 0.0, "distinct": 10, "unique": True})
+        self.assertEqual(profile["status"]["values"], ["active", "banned", "new"])
+
+    def test_allow_pii(self):
+        profile = self.profile({"allow_pii": True, "pii_columns": ["email"]})
+        self.assertEqual(profile["email"]["values"], ["a@x.io", "b@x.io"])
+        self.assertEqual(profile["age"]["range"], ["18", "64"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests for the EXPLAIN cost gate.
+
+The planner is replaced by a cursor that returns canned EXPLAIN (FORMAT JSON)
+plans, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+from typing import Any, Dict, List
+
+from kosix_agent.tools import cost_gate
+
+
+def _scan(rows: float, cost: float) -> Dict[str, Any]:
+    return {"Node Type": "Seq Scan", "Relation Name": "events", "Plan Rows": rows, "Total Cost": cost}
+
+
+def _limit(limit: int, child: Dict[str, Any]) -> Dict[str, Any]:
+    # The planner scales a Limit's cost by the fraction of its input it reads
+    fraction = limit / child["Plan Rows"]
+    return {"Node Type": "Limit", "Plan Rows": limit, "Total Cost": child["Total Cost"] * fraction, "Plans": [child]}
+
+
+class _Cursor:
+    def __init__(self, plans: Dict[str, Dict[str, Any]]):
+        self.plans = plans
+        self.executed: List[str] = []
+
+    def execute(self, sql: str, params: Any = None) -> None:
+        self.executed.append(sql)
+
+    def fetchone(self) -> List[Any]:
+        explained = self.executed[-1].removeprefix("EXPLAIN (FORMAT JSON) ")
+        return [[{"Plan": self.plans[explained]}]]
+
+
+class _Connection:
+    def __init__(self, plans: Dict[str, Dict[str, Any]]):
+        self.cursor_ = _Cursor(plans)
+
+    def cursor(self) -> _Cursor:
+        return self.cursor_
+
+    def rollback(self) -> None:
+        pass
+
+
+BUDGET = {"max_cost": 1e6, "max_rows": 5e6}
+
+
+class EstimateTest(unittest.TestCase):
+
+    def test_limit_bounds_rows_and_cost(self):
+        sql = "SELECT * FROM events LIMIT 1000"
+        plan = _limit(1000, _scan(rows=2e8, cost=4e6))
+        estimate = cost_gate._estimate(_Cursor({sql: plan}), sql)
+        self.assertEqual(estimate["rows"], 1000)
+        self.assertEqual(estimate["cost"], plan["Total Cost"])
+        self.assertEqual(estimate["scans"], {"events": "Seq Scan"})
+
+    def test_aggregate_is_budgeted_on_its_result(self):
+        sql = "SELECT count(*) FROM events"
+        plan = {"Node Type": "Aggregate", "Plan Rows": 1, "Total Cost": 4.5e6, "Plans": [_scan(rows=2e8, cost=4e6)]}
+        estimate = cost_gate._estimate(_Cursor({sql: plan}), sql)
+        self.assertEqual(estimate["rows"], 1)
+        self.assertFalse(cost_gate._within(estimate, BUDGET))
+
+
+class GateQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.budget_for = cost_gate.budget_for
+        cost_gate.budget_for = lambda org_id: dict(BUDGET)
+
+    def tearDown(self):
+        cost_gate.budget_for = self.budget_for
+
+    def test_limit_over_big_table_passes_unchanged(self):
+        sql = "SELECT * FROM events LIMIT 1000"
+        result = cost_gate.gate_query(_Connection({sql: _limit(1000, _scan(rows=2e8, cost=4e6))}), sql)
+        self.assertEqual(result["decision"], "allow")
+        self.assertEqual(result["sql"], sql)
+        self.assertEqual(result["rewrites"], [])
+
+    def test_unbounded_scan_of_big_table_is_gated(self):
+        sql = "SELECT * FROM events"
+        result = cost_gate.gate_query(_Connection({sql: _scan(rows=2e8, cost=4e6)}), sql)
+        self.assertEqual(result["decision"], "reject")
+        self.assertEqual(result["sql"], sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests for the per-DataSource connection pool.
+
+psycopg2 is replaced by fake connections that record whether the pool lock
+was held while they talked to the database, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+
+from kosix_agent.utils import db_pool
+
+
+_IDLE, _IN_TRANSACTION = "idle", "intrans"
+
+
+class _Connection:
+    def __init__(self, pool_ref, healthy=True):
+        self.pool_ref = pool_ref
+        self.healthy = healthy
+        self.closed = 0
+        self.autocommit = False
+        self.info = SimpleNamespace(transaction_status=_IDLE)
+        self.io_under_lock = []
+
+    def _io(self, call):
+        pool = self.pool_ref()
+        if pool is not None and pool._cond._is_owned():
+            self.io_under_lock.append(call)
+
+    def cursor(self):
+        conn = self
+
+        class _Cursor:
+            def execute(self, sql):
+                conn._io("execute")
+                if not conn.healthy:
+                    raise db_pool.psycopg2.Error("server closed the connection")
+
+            def close(self):
+                pass
+
+        return _Cursor()
+
+    def rollback(self):
+        self._io("rollback")
+        self.info.transaction_status = _IDLE
+
+    def close(self):
+        self._io("close")
+        self.closed = 1
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = db_pool.psycopg2.connect, db_pool.extensions
+        db_pool.extensions = SimpleNamespace(TRANSACTION_STATUS_IDLE=_IDLE)
+        self.connections = []
+        self.pool = None
+
+        def connect(dsn):
+            conn = _Connection(lambda: self.pool)
+            self.connections.append(conn)
+            return conn
+
+        db_pool.psycopg2.connect = connect
+
+    def tearDown(self):
+        db_pool.psycopg2.connect, db_pool.extensions = self.saved
+
+    def make_pool(self, **kwargs):
+        options = {"min_size": 0, "max_size": 2, "max_lifetime": 60, "max_idle": 60,
+                   "health_check_after": 60, "acquire_timeout": 0.05}
+        options.update(kwargs)
+        self.pool = db_pool.ConnectionPool("postgresql://db", **options)
+        return self.pool
+
+    def assert_no_io_under_lock(self):
+        for conn in self.connections:
+            self.assertEqual(conn.io_under_lock, [])
+
+    def test_reuses_released_connection(self):
+        pool = self.make_pool()
+        with pool.connection() as first:
+            first.info.transaction_status = _IN_TRANSACTION
+        with pool.connection() as second:
+            self.assertIs(second, first)
+            self.assertEqual(second.info.transaction_status, _IDLE)
+        self.assertEqual(pool.stats()["connections_created"], 1)
+        self.assert_no_io_under_lock()
+
+    def test_failed_health_check_evicts(self):
+        pool = self.make_pool(health_check_after=0)
+        with pool.connection() as conn:
+            pass
+        conn.healthy = False
+        time.sleep(0.001)
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        stats = pool.stats()
+        self.assertEqual(stats["health_check_failures"], 1)
+        self.assertEqual(stats["size"], 1)
+        self.assert_no_io_under_lock()
+
+    def test_expired_connection_is_recycled(self):
+        pool = self.make_pool(max_lifetime=0)
+        with pool.connection() as conn:
+            time.sleep(0.001)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["connections_recycled"], 1)
+        self.assertEqual(pool.stats()["size"], 0)
+        self.assert_no_io_under_lock()
+
+    def test_idle_connections_trimmed_to_min_size(self):
+        pool = self.make_pool(min_size=1, max_idle=0)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        time.sleep(0.001)
+        pool.release(second)
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(pool.stats()["idle"], 1)
+        self.assert_no_io_under_lock()
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = self.make_pool(max_size=1)
+        conn = pool.acquire()
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()["acquire_timeouts"], 1)
+
+    def test_close_closes_idle_connections(self):
+        pool = self.make_pool()
+        with pool.connection() as conn:
+            pass
+        pool.close()
+        self.assertTrue(conn.closed)
+        with self.assertRaises(Exception):
+            pool.acquire()
+        self.assert_no_io_under_lock()
+
+
+if __name__ == "__main__":
+    unittest.main()
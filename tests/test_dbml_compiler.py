@@ -0,0 +1,195 @@
+"""
+Tests for the DBML parser and DDL planner.
+
+Existing tables are given in the shape schema_tool's introspection
+reports them, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from kosix_agent.tools.dbml_compiler import compile_ddl, parse_dbml, plan_ddl
+
+
+DBML = """
+<dbml>
+Enum order_status {
+  pending
+  shipped [note: 'left the warehouse']
+}
+
+Table orders {
+  id int [pk, increment]
+  customer_id int [not null, ref: > customers.id]
+  status order_status [not null, default: 'pending']
+  created_at timestamp [default: `now()`]
+  Note: 'One row per order'
+
+  Indexes {
+    (customer_id, created_at) [name: 'orders_customer_created']
+    status
+  }
+}
+
+Table customers {
+  id int [pk]
+  email varchar(255) [unique, not null]
+}
+
+Table order_items {
+  order_id int
+  sku varchar(32)
+  qty int [default: 1]
+
+  Indexes {
+    (order_id, sku) [pk]
+  }
+}
+
+Ref: order_items.order_id > orders.id [delete: cascade]
+</dbml>
+"""
+
+CYCLE = """
+Table a {
+  id int [pk]
+  b_id int [ref: > b.id]
+}
+
+Table b {
+  id int [pk]
+  a_id int [ref: > a.id]
+}
+"""
+
+
+def _live_table(name, columns, primary_key, foreign_keys=(), indexes=()):
+    return {
+        "schema": "public",
+        "table_name": name,
+        "columns": [{"name": n, "data_type": t, "nullable": nullable} for n, t, nullable in columns],
+        "primary_key": list(primary_key),
+        "foreign_keys": [
+            {"column": column, "references": {"table": table, "column": ref_column}}
+            for column, table, ref_column in foreign_keys
+        ],
+        "indexes": [{"columns": list(columns)} for columns in indexes]
+    }
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_tables_enums_and_refs(self):
+        schema = parse_dbml(DBML)
+        self.assertEqual([t["name"] for t in schema["tables"]], ["orders", "customers", "order_items"])
+        self.assertEqual(schema["enums"][0]["values"], ["pending", "shipped"])
+
+        inline, standalone = schema["refs"]
+        self.assertEqual((inline["from"]["table"], inline["from"]["columns"]), ("orders", ["customer_id"]))
+        self.assertEqual((inline["to"]["table"], inline["to"]["columns"]), ("customers", ["id"]))
+        self.assertIsNone(inline["on_delete"])
+        self.assertEqual((standalone["from"]["table"], standalone["to"]["table"]), ("order_items", "orders"))
+        self.assertEqual(standalone["on_delete"], "cascade")
+
+    def test_reversed_and_one_to_one_refs_point_at_the_referenced_side(self):
+        schema = parse_dbml("""
+            Table users { id int [pk] }
+            Table profiles { user_id int }
+            Table posts { author_id int }
+            Ref: users.id - profiles.user_id
+            Ref: users.id < posts.author_id
+        """)
+        one_to_one, reversed_ref = schema["refs"]
+        self.assertEqual((one_to_one["from"]["table"], one_to_one["to"]["table"]), ("profiles", "users"))
+        self.assertTrue(one_to_one["one_to_one"])
+        self.assertEqual((reversed_ref["from"]["table"], reversed_ref["to"]["table"]), ("posts", "users"))
+
+    def test_invalid_schemas(self):
+        cases = {
+            "Table t { id int }\nTable t { id int }": "defined twice",
+            "Table t { id int\n id text }": "duplicate columns",
+            "Table t { id int [ref: > u.missing] }\nTable u { id int }": "does not exist",
+            "Table t { id int }\nTable u { id int }\nRef: t.id <> u.id": "junction table",
+            "Table t { id int }\nTable u { id int }\nRef: t.id > u.id [delete: explode]": "unsupported delete action",
+        }
+        for dbml, message in cases.items():
+            with self.assertRaisesRegex(Exception, message, msg=dbml):
+                parse_dbml(dbml)
+
+
+class PlanTest(unittest.TestCase):
+
+    def test_create_order_and_constraints(self):
+        statements = compile_ddl(DBML)
+        self.assertEqual(statements[0], "CREATE TYPE order_status AS ENUM ('pending', 'shipped')")
+        creates = [s.split(" (")[0] for s in statements if s.startswith("CREATE TABLE")]
+        self.assertEqual(creates, ["CREATE TABLE customers", "CREATE TABLE orders", "CREATE TABLE order_items"])
+
+        orders = next(s for s in statements if s.startswith("CREATE TABLE orders"))
+        self.assertIn("id int GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY", orders)
+        self.assertIn("status order_status NOT NULL DEFAULT 'pending'", orders)
+        self.assertIn("created_at timestamp DEFAULT now()", orders)
+        self.assertIn("FOREIGN KEY (customer_id) REFERENCES customers (id)", orders)
+
+        items = next(s for s in statements if s.startswith("CREATE TABLE order_items"))
+        self.assertIn("PRIMARY KEY (order_id, sku)", items)
+        self.assertIn("REFERENCES orders (id) ON DELETE CASCADE", items)
+        self.assertFalse(any(s.startswith("ALTER TABLE") for s in statements))
+
+    def test_composite_and_named_indexes(self):
+        statements = compile_ddl(DBML)
+        self.assertIn("CREATE INDEX orders_customer_created ON orders (customer_id, created_at)", statements)
+        self.assertIn("CREATE INDEX ON orders (status)", statements)
+        self.assertFalse(any(s.startswith("CREATE INDEX") and "order_items" in s for s in statements))
+        self.assertEqual(statements[-1], "COMMENT ON TABLE orders IS 'One row per order'")
+
+    def test_cycle_closes_with_a_deferred_foreign_key(self):
+        plan = plan_ddl(parse_dbml(CYCLE))
+        self.assertEqual(plan["create_tables"], ["public.a", "public.b"])
+        create_a, create_b, alter = plan["statements"]
+        self.assertNotIn("FOREIGN KEY", create_a)
+        self.assertIn("FOREIGN KEY (a_id) REFERENCES a (id)", create_b)
+        self.assertEqual(alter, "ALTER TABLE a ADD CONSTRAINT a_b_id_fkey FOREIGN KEY (b_id) REFERENCES b (id)")
+        self.assertEqual(plan["add_foreign_keys"], ["a(b_id) -> b(id)"])
+
+    def test_existing_tables_only_get_what_is_missing(self):
+        existing = [
+            _live_table("customers", [("id", "INTEGER", False), ("email", "VARCHAR(255)", False)], ["id"]),
+            _live_table(
+                "orders",
+                [("id", "INTEGER", False), ("customer_id", "INTEGER", False),
+                 ("status", "USER-DEFINED", False)],
+                ["id"],
+                foreign_keys=[("customer_id", "customers", "id")],
+                indexes=[("customer_id", "created_at")]
+            ),
+            _live_table("legacy", [("id", "INTEGER", False)], ["id"]),
+        ]
+        plan = plan_ddl(parse_dbml(DBML), existing, [("public", "order_status")])
+
+        self.assertEqual(plan["create_tables"], ["public.order_items"])
+        self.assertEqual(plan["add_columns"], ["public.orders.created_at"])
+        self.assertEqual(plan["add_indexes"], ["orders(status)"])
+        self.assertEqual(plan["add_foreign_keys"], [])
+        self.assertEqual(plan["conflicts"], [])
+        self.assertEqual(plan["unmanaged_tables"], ["public.legacy"])
+        self.assertFalse(any(s.startswith("CREATE TYPE") for s in plan["statements"]))
+        self.assertIn("ALTER TABLE orders ADD COLUMN created_at timestamp DEFAULT now()", plan["statements"])
+
+    def test_conflicts_are_reported_not_altered(self):
+        existing = [
+            _live_table("customers", [("id", "TEXT", False), ("email", "VARCHAR(255)", True)], ["email"]),
+        ]
+        plan = plan_ddl(parse_dbml(DBML), existing, [("public", "order_status")])
+        self.assertEqual(plan["conflicts"], [
+            "public.customers.id: type is TEXT, DBML says int",
+            "public.customers.email: nullable in the database",
+            "public.customers: primary key is (email), DBML says (id)",
+        ])
+        self.assertFalse(any(s.startswith("ALTER TABLE customers") for s in plan["statements"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for uploaded file parsing and aggregation.
+
+Files are materialized into a temporary directory, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+from kosix_agent.utils.file_store import FileTable, infer_schema, materialize
+
+
+CSV = """region,zip,amount,paid
+north,00123,10,true
+south,10001,2.5,false
+north,02134,,true
+east,1_000,7,true
+south,94105,4,true
+"""
+
+
+class InferenceTest(unittest.TestCase):
+
+    def types(self, *values):
+        return infer_schema(["value"], [[value] for value in values])[0]["type"]
+
+    def test_plain_numbers(self):
+        self.assertEqual(self.types("1", "-20", "0"), "int64")
+        self.assertEqual(self.types("1", "2.5", "1e3"), "float64")
+        self.assertEqual(self.types("1", str(2 ** 63)), "float64")
+
+    def test_non_canonical_numbers_stay_text(self):
+        for value in ("00123", "1_000", "+5", " 7", "nan", "inf"):
+            self.assertEqual(self.types("1", value), "string", value)
+
+
+class AggregateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        source = os.path.join(self.directory.name, "sales.csv")
+        with open(source, "w") as f:
+            f.write(CSV)
+        self.path = os.path.join(self.directory.name, "sales.kxt")
+        materialize(source, self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_schema(self):
+        with FileTable(self.path) as table:
+            types = {column["name"]: column["type"] for column in table.schema["columns"]}
+        self.assertEqual(types, {"region": "string", "zip": "string", "amount": "float64", "paid": "bool"})
+
+    def test_group_by(self):
+        with FileTable(self.path) as table:
+            result = table.aggregate(["region"], [("sum", "amount"), ("count", None), ("count", "amount")])
+        self.assertEqual(result["columns"], ["region", "sum_amount", "count", "count_amount"])
+        self.assertEqual(result["rows"], [["north", 10.0, 2, 1], ["east", 7.0, 1, 1], ["south", 6.5, 2, 2]])
+        self.assertEqual(result["rows_scanned"], 5)
+
+    def test_filters_and_limit(self):
+        with FileTable(self.path) as table:
+            result = table.aggregate(["region"], [("max", "amount")], {"paid": "true"}, limit=1)
+            self.assertEqual(result["rows"], [["north", 10.0]])
+            self.assertEqual(result["total_groups"], 3)
+            overall = table.aggregate([], [("avg", "amount")], {"region": "west"})
+            self.assertEqual(overall["rows"], [[None]])
+
+    def test_invalid_aggregates(self):
+        with FileTable(self.path) as table:
+            with self.assertRaises(Exception):
+                table.aggregate([], [("sum", "region")])
+            with self.assertRaises(Exception):
+                table.aggregate([], [("median", "amount")])
+            with self.assertRaises(Exception):
+                table.aggregate(["region"], [("count", None)], max_groups=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Tests for keyset-paginated history and the rolling conversation summary.
+
+Prisma is replaced by in-memory tables that evaluate the where, order and
+take arguments the history module passes, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from kosix_agent.config.setting import HISTORY_MAX_PAGE_SIZE, HISTORY_WINDOW_MESSAGES
+from kosix_agent.utils import history
+
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _matches(row, where) -> bool:
+    for key, value in where.items():
+        if key == "AND":
+            if not all(_matches(row, clause) for clause in value):
+                return False
+        elif key == "OR":
+            if not any(_matches(row, clause) for clause in value):
+                return False
+        elif isinstance(value, dict):
+            if not getattr(row, key) < value["lt"]:
+                return False
+        elif getattr(row, key) != value:
+            return False
+    return True
+
+
+class _Table:
+    def __init__(self):
+        self.rows = []
+        self.taken = []
+
+    def find_many(self, where, order, take):
+        fields = [next(iter(clause)) for clause in order]
+        rows = sorted(
+            (row for row in self.rows if _matches(row, where)),
+            key=lambda row: tuple(getattr(row, field) for field in fields),
+            reverse=True
+        )
+        self.taken.append(take)
+        return rows[:take]
+
+    def create_many(self, data):
+        for item in data:
+            self.rows.append(SimpleNamespace(id=f"m{len(self.rows):03d}", **item))
+
+
+class _Conversations:
+    def __init__(self):
+        self.record = None
+
+    def upsert(self, where, data):
+        if self.record is None:
+            self.record = SimpleNamespace(summary=None, **data["create"])
+        return self.record
+
+    def find_unique(self, where):
+        return self.record
+
+    def update(self, where, data):
+        for key, value in data.items():
+            setattr(self.record, key, value)
+
+
+class PaginationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = _Table()
+        # Pairs of messages share a timestamp, so pages must break ties on id
+        for i in range(7):
+            self.messages.rows.append(SimpleNamespace(
+                id=f"m{i}", role="USER", content={"text": str(i)},
+                conversationId="conv-a", createdAt=START + timedelta(seconds=i // 2)
+            ))
+        self.messages.rows.append(SimpleNamespace(
+            id="other", role="USER", content={}, conversationId="conv-b", createdAt=START
+        ))
+        self.saved = history.get_prisma
+        history.get_prisma = lambda: SimpleNamespace(message=self.messages)
+
+    def tearDown(self):
+        history.get_prisma = self.saved
+
+    def test_pages_cover_every_message_once(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = history.list_messages("conv-a", limit=3, cursor=cursor)
+            seen.extend(message["id"] for message in page["messages"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["m6", "m5", "m4", "m3", "m2", "m1", "m0"])
+        self.assertEqual(pages, 3)
+        self.assertEqual(self.messages.taken, [4, 4, 4])
+
+    def test_exact_last_page_has_no_cursor(self):
+        page = history.list_messages("conv-a", limit=7)
+        self.assertEqual(len(page["messages"]), 7)
+        self.assertIsNone(page["next_cursor"])
+
+    def test_cursor_round_trip_and_validation(self):
+        cursor = history.encode_cursor(START, "m1")
+        self.assertEqual(history.decode_cursor(cursor), (START, "m1"))
+        with self.assertRaises(ValueError):
+            history.decode_cursor("not-a-cursor")
+
+    def test_page_size_is_capped(self):
+        history.list_messages("conv-a", limit=10 ** 6)
+        history.list_messages("conv-a", limit=0)
+        self.assertEqual(self.messages.taken, [HISTORY_MAX_PAGE_SIZE + 1, history.HISTORY_PAGE_SIZE + 1])
+
+
+class SummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = SimpleNamespace(message=_Table(), conversation=_Conversations())
+        self.saved = history.get_prisma, history.Json
+        history.get_prisma = lambda: self.db
+        history.Json = lambda value: value
+
+    def tearDown(self):
+        history.get_prisma, history.Json = self.saved
+
+    def record(self, turns):
+        for i in range(turns):
+            at = START + timedelta(minutes=i)
+            history.record_turn(
+                "conv-a", "user-a", "org-a",
+                {"text": f"question {i}"}, {"text": f"answer {i}"},
+                at, at + timedelta(seconds=1)
+            )
+
+    def test_messages_leaving_the_window_are_folded_once(self):
+        turns = HISTORY_WINDOW_MESSAGES // 2 + 3
+        self.record(turns)
+        summary = self.db.conversation.record.summary
+        self.assertEqual(summary["lines"], [
+            line for i in range(3) for line in (f"user: question {i}", f"assistant: answer {i}")
+        ])
+        # Every turn reads a bounded window, however long the conversation
+        self.assertEqual(set(self.db.message.taken), {HISTORY_WINDOW_MESSAGES + history._FOLD_BATCH})
+
+        context = history.agent_context("conv-a", "user-a", "org-a")
+        self.assertEqual(len(context["recent"]), HISTORY_WINDOW_MESSAGES)
+        self.assertEqual(context["recent"][0]["text"], "question 3")
+        self.assertTrue(context["summary"].startswith("user: question 0"))
+
+    def test_summary_drops_its_oldest_lines_beyond_the_budget(self):
+        messages = [{"role": "USER", "text": "word " * 100, "cursor": str(i)} for i in range(200)]
+        summary = history.fold_summary(None, messages)
+        self.assertGreater(summary["omitted"], 0)
+        self.assertEqual(summary["omitted"] + len(summary["lines"]), 200)
+        self.assertEqual(summary["through"], "199")
+        self.assertTrue(history.render_summary(summary).startswith(f"({summary['omitted']} earlier messages omitted)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
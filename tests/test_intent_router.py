@@ -0,0 +1,59 @@
+"""
+Tests for the local intent router.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from kosix_agent.utils.intent_router import INTENTS, IntentRouter
+
+
+AGENTS = ["CreatorCoordinator", "InserterCoordinator", "sql_agent"]
+
+
+class IntentRouterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.router = IntentRouter(min_confidence=0.9)
+
+    def test_clear_messages_are_classified(self):
+        for text, intent in (
+            ("Create a database for a veterinary clinic with pets and owners", "schema_creation"),
+            ("Upload this CSV of invoices into the payments table", "data_insertion"),
+            ("How many orders were placed per month last year?", "analytics"),
+        ):
+            result = self.router.classify(text)
+            self.assertEqual(result["intent"], intent, text)
+            self.assertGreaterEqual(result["confidence"], 0.9, text)
+            self.assertIn(intent, result["rules"])
+            self.assertAlmostEqual(sum(result["scores"].values()), 1.0)
+            self.assertEqual(set(result["scores"]), set(INTENTS))
+
+    def test_confident_messages_skip_the_llm(self):
+        result, agent = self.router.route("What is the total revenue by region", AGENTS)
+        self.assertEqual((result["intent"], agent), ("analytics", "sql_agent"))
+
+    def test_unrecognized_or_mixed_messages_fall_back(self):
+        for text in ("hello there", "make tables and load the csv"):
+            result, agent = self.router.route(text, AGENTS)
+            self.assertLess(result["confidence"], 0.9, text)
+            self.assertEqual(agent, "", text)
+
+    def test_intents_without_an_agent_fall_back(self):
+        _, agent = self.router.route("Upload this CSV of invoices into the payments table", ["sql_agent"])
+        self.assertEqual(agent, "")
+
+    def test_stats(self):
+        self.router.route("How many customers do we have", AGENTS)
+        self.router.route("hello there", AGENTS)
+        stats = self.router.stats()
+        self.assertEqual(stats["decisions"], {"fast_path:analytics": 1, "fallback": 1})
+        self.assertEqual(stats["fast_path_rate"], 0.5)
+        self.assertEqual(sum(stats["confidence_histogram"]), 2)
+        self.assertEqual(stats["confidence_histogram"][9], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
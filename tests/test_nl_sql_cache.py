@@ -0,0 +1,91 @@
+"""
+Tests for the natural-language to SQL cache.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from kosix_agent.utils.nl_sql_cache import NLSQLCache, normalize_question, rebind_literals
+
+
+SQL = "SELECT name, sum(total) FROM orders WHERE region = 'north' AND ordered_on >= '2026-01-01' GROUP BY name LIMIT 10"
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_literals_are_lifted_out_of_the_template(self):
+        template, literals = normalize_question("  Top 10 customers in 'north'   since 2026-01-01? ")
+        self.assertEqual(template, "top <num> customers in <str> since <date>")
+        self.assertEqual(literals, [("num", "10"), ("str", "north"), ("date", "2026-01-01")])
+
+    def test_numbers_inside_words_are_kept(self):
+        template, literals = normalize_question("Sales for q3 in sku_12")
+        self.assertEqual(template, "sales for q3 in sku_12")
+        self.assertEqual(literals, [])
+
+
+class RebindTest(unittest.TestCase):
+
+    def test_literals_are_substituted(self):
+        old = [("num", "10"), ("str", "north"), ("date", "2026-01-01")]
+        new = [("num", "5"), ("str", "O'Hare"), ("date", "2026-02-01")]
+        self.assertEqual(
+            rebind_literals(SQL, old, new),
+            "SELECT name, sum(total) FROM orders WHERE region = 'O''Hare' AND ordered_on >= '2026-02-01' "
+            "GROUP BY name LIMIT 5"
+        )
+
+    def test_ambiguous_or_missing_literals_miss(self):
+        self.assertIsNone(rebind_literals("SELECT 10 FROM t LIMIT 10", [("num", "10")], [("num", "5")]))
+        self.assertIsNone(rebind_literals("SELECT * FROM t", [("str", "north")], [("str", "south")]))
+        # Part of a larger number or identifier does not count
+        self.assertIsNone(rebind_literals("SELECT * FROM t LIMIT 100", [("num", "10")], [("num", "5")]))
+
+
+class LookupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = NLSQLCache(max_entries=8, max_scopes=4, similarity=0.6)
+        self.cache.store("org", "ds", "v1", "Top 10 customers in 'north' since 2026-01-01", SQL, latency_ms=1500)
+
+    def lookup(self, question, org="org", fingerprint="v1"):
+        return self.cache.lookup(org, "ds", fingerprint, question)
+
+    def test_identical_template_rebinds(self):
+        hit = self.lookup("top 5 customers in 'south' since 2026-01-01?")
+        self.assertEqual((hit["similarity"], hit["rebound"]), (1.0, True))
+        self.assertIn("region = 'south'", hit["sql"])
+        self.assertTrue(hit["sql"].endswith("LIMIT 5"))
+
+    def test_near_identical_question_is_a_fuzzy_hit(self):
+        hit = self.lookup("Show top 10 customers in 'north' since 2026-01-01")
+        self.assertLess(hit["similarity"], 1.0)
+        self.assertEqual(hit["sql"], SQL)
+        self.assertEqual(self.cache.stats()["fuzzy_hits"], 1)
+
+    def test_unrelated_or_differently_shaped_questions_miss(self):
+        self.assertIsNone(self.lookup("How many refunds were issued last week"))
+        # Same words, but a number where a string was
+        self.assertIsNone(self.lookup("Top 10 customers in 7 since 2026-01-01"))
+
+    def test_scopes_are_isolated(self):
+        self.assertIsNone(self.lookup("Top 10 customers in 'north' since 2026-01-01", org="other"))
+
+    def test_schema_change_drops_the_scope(self):
+        self.assertIsNone(self.lookup("Top 10 customers in 'north' since 2026-01-01", fingerprint="v2"))
+        self.assertIsNone(self.lookup("Top 10 customers in 'north' since 2026-01-01", fingerprint="v1"))
+        stats = self.cache.stats()
+        self.assertEqual((stats["invalidations"], stats["scopes"]), (2, 0))
+
+    def test_stats(self):
+        self.lookup("Top 10 customers in 'north' since 2026-01-01")
+        self.lookup("Something else entirely")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        self.assertEqual(stats["latency_saved_ms"], 1500.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for organization and user scoping of DataSources and conversations.
+
+Prisma is replaced by in-memory tables, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from kosix_agent.utils import datasource, history
+
+
+class _Table:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = {row["id"]: SimpleNamespace(**row) for row in rows}
+        self.reads = 0
+        self.writes = 0
+
+    def find_unique(self, where):
+        self.reads += 1
+        return self.rows.get(where["id"])
+
+    def upsert(self, where, data):
+        if where["id"] not in self.rows:
+            self.rows[where["id"]] = SimpleNamespace(summary=None, **data["create"])
+        return self.rows[where["id"]]
+
+    def create_many(self, data):
+        self.writes += len(data)
+
+    def find_many(self, **kwargs):
+        return []
+
+    def update(self, **kwargs):
+        self.writes += 1
+
+
+class _Prisma:
+    def __init__(self):
+        self.datasource = _Table([
+            {"id": "ds-a", "organizationId": "org-a", "connectionUri": "postgresql://a/db"}
+        ])
+        self.conversation = _Table([
+            {"id": "conv-a", "userId": "user-a", "organizationId": "org-a", "summary": None}
+        ])
+        self.message = _Table([])
+
+
+class OwnershipTest(unittest.TestCase):
+
+    def setUp(self):
+        self.prisma = _Prisma()
+        self.saved = datasource.get_prisma, history.get_prisma
+        datasource.get_prisma = history.get_prisma = lambda: self.prisma
+        datasource._resolved.clear()
+
+    def tearDown(self):
+        datasource.get_prisma, history.get_prisma = self.saved
+
+    def test_datasource_of_another_organization_is_not_found(self):
+        self.assertEqual(datasource.get_datasource("ds-a", "org-a")["connection_uri"], "postgresql://a/db")
+        with self.assertRaisesRegex(Exception, "DataSource ds-a not found"):
+            datasource.get_datasource("ds-a", "org-b")
+        with self.assertRaisesRegex(Exception, "No organization"):
+            datasource.get_datasource("ds-a", None)
+
+    def test_session_state_is_checked_too(self):
+        context = SimpleNamespace(state={"datasource_id": "ds-a", "org_id": "org-b"})
+        with self.assertRaisesRegex(Exception, "not found"):
+            datasource.resolve_datasource(context)
+
+    def test_resolved_datasource_is_cached_per_organization(self):
+        context = SimpleNamespace(state={"datasource_id": "ds-a", "org_id": "org-a"})
+        for _ in range(3):
+            self.assertEqual(datasource.resolve_datasource(context)["cache_key"], "ds-a")
+        self.assertEqual(self.prisma.datasource.reads, 1)
+
+        context.state["org_id"] = "org-b"
+        for _ in range(2):
+            with self.assertRaisesRegex(Exception, "not found"):
+                datasource.resolve_datasource(context)
+        self.assertEqual(self.prisma.datasource.reads, 3)
+
+    def test_conversation_of_another_user_is_not_found(self):
+        self.assertIsNotNone(history.get_conversation("conv-a", "user-a", "org-a"))
+        self.assertIsNone(history.get_conversation("conv-new", "user-b", "org-b"))
+        for user_id, org_id in (("user-b", "org-a"), ("user-a", "org-b")):
+            with self.assertRaisesRegex(Exception, "Conversation conv-a not found"):
+                history.agent_context("conv-a", user_id, org_id)
+
+    def test_record_turn_does_not_write_to_another_users_conversation(self):
+        with self.assertRaisesRegex(Exception, "not found"):
+            history.record_turn("conv-a", "user-b", "org-a", {"text": "hi"}, {"text": "SELECT 1"}, None, None)
+        self.assertEqual(self.prisma.message.writes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests for the per-invocation state of the metrics and trace plugins.
+
+Callbacks are driven directly with stand-in contexts, and traces go to a
+list instead of the AgentTrace writer, so neither ADK nor a database is
+needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+from kosix_agent.agents.metrics_plugin import MetricsPlugin
+from kosix_agent.agents.trace_plugin import TracePlugin
+
+
+class _Writer:
+    def __init__(self):
+        self.traces = []
+
+    def record(self, agent_name, input, output, duration_ms, conversation_id=None):
+        self.traces.append((agent_name, input, output, conversation_id))
+        return True
+
+
+def _invocation(invocation_id):
+    session = SimpleNamespace(id="session", state={"conversation_id": "conv"})
+    return SimpleNamespace(invocation_id=invocation_id, session=session, user_content=None)
+
+
+async def _start_turn(plugin, invocation_id):
+    """Run the callbacks of a turn up to a tool call that never returns"""
+    agent = SimpleNamespace(name="sql_agent")
+    context = SimpleNamespace(invocation_id=invocation_id, agent_name="sql_agent", function_call_id=f"{invocation_id}-call")
+    await plugin.before_run_callback(invocation_context=_invocation(invocation_id))
+    await plugin.before_agent_callback(agent=agent, callback_context=context)
+    await plugin.before_tool_callback(tool=SimpleNamespace(name="schema_tool"), tool_args={}, tool_context=context)
+    if isinstance(plugin, MetricsPlugin):
+        request = SimpleNamespace(model="model")
+        await plugin.before_model_callback(callback_context=context, llm_request=request)
+
+
+def _state(plugin):
+    sizes = {"agents": len(plugin._agents), "tools": len(plugin._tools)}
+    if isinstance(plugin, MetricsPlugin):
+        sizes.update(models=len(plugin._models), open=len(plugin._open))
+    else:
+        sizes.update(outputs=len(plugin._outputs), invocations=len(plugin._invocations))
+    return sizes
+
+
+class InvocationStateTest(unittest.TestCase):
+
+    def plugins(self, **kwargs):
+        return [MetricsPlugin(**kwargs), TracePlugin(_Writer(), **kwargs)]
+
+    def assert_empty(self, plugin):
+        self.assertEqual(set(_state(plugin).values()), {0}, type(plugin).__name__)
+
+    def test_end_invocation_clears_an_abandoned_turn(self):
+        for plugin in self.plugins():
+            asyncio.run(_start_turn(plugin, "inv-1"))
+            self.assertTrue(any(_state(plugin).values()))
+            plugin.end_invocation("inv-1")
+            self.assert_empty(plugin)
+            # after_run of a turn that was already settled is a no-op
+            asyncio.run(plugin.after_run_callback(invocation_context=_invocation("inv-1")))
+            self.assert_empty(plugin)
+
+    def test_trace_of_an_abandoned_turn_is_recorded_once(self):
+        writer = _Writer()
+        plugin = TracePlugin(writer)
+        asyncio.run(_start_turn(plugin, "inv-1"))
+        plugin.end_invocation("inv-1")
+        plugin.end_invocation("inv-1")
+        self.assertEqual(writer.traces, [("sql_agent", {"message": None}, {"text": None}, "conv")])
+
+    def test_open_turns_are_bounded(self):
+        for plugin in self.plugins(max_open_invocations=2):
+            for i in range(5):
+                asyncio.run(_start_turn(plugin, f"inv-{i}"))
+            self.assertEqual({key[0] for key in plugin._agents}, {"inv-3", "inv-4"})
+            self.assertEqual({owner for owner, _ in plugin._tools.values()}, {"inv-3", "inv-4"})
+
+    def test_old_turns_expire(self):
+        for plugin in self.plugins(invocation_ttl=0):
+            asyncio.run(_start_turn(plugin, "inv-1"))
+            time.sleep(0.001)
+            asyncio.run(_start_turn(plugin, "inv-2"))
+            self.assertEqual({key[0] for key in plugin._agents}, {"inv-2"})
+            plugin.end_invocation("inv-2")
+            self.assert_empty(plugin)
+
+
+if __name__ == "__main__":
+    unittest.main()
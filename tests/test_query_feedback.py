@@ -0,0 +1,136 @@
+"""
+Tests for the feedback of the pre-execution checks.
+
+The checks themselves (prepare_query) and the result cache are replaced by
+canned answers, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+
+from kosix_agent.tools import execution_tool
+from kosix_agent.utils.columnar import ColumnarBuilder
+from server import chat
+
+
+DATASOURCE = {"id": None, "organization_id": "org-a", "connection_uri": "postgresql://a/db", "cache_key": "a"}
+
+REWRITE = {
+    "decision": "rewrite",
+    "sql": "SELECT region, count(*) FROM events TABLESAMPLE SYSTEM (10) GROUP BY region LIMIT 1000",
+    "rewrites": ["sampled 10% of events"],
+    "feedback": "The query was over budget and was rewritten: sampled 10% of events",
+    "estimate": {"cost": 9e5, "rows": 7},
+    "budget": {"max_cost": 1e6, "max_rows": 5e6}
+}
+
+
+def _prepared(sql, gate=None, warnings=()):
+    async def prepare_query(query, datasource):
+        return {"sql": sql, "warnings": list(warnings), "cost_gate": gate}
+    return prepare_query
+
+
+class ChatSqlEventTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = chat.prepare_query, chat.probe_result_cache
+        builder = ColumnarBuilder(["region", "count"], [25, 20])
+        builder.append_batch([("north", 3)])
+        entry = {"result": builder.build(), "truncated": False}
+        chat.probe_result_cache = lambda stream: (entry, ("key",), {})
+
+    def tearDown(self):
+        chat.prepare_query, chat.probe_result_cache = self.saved
+
+    def events(self, sql):
+        queue = asyncio.Queue()
+        body = SimpleNamespace(org_id="org-a", user_id="user-a", datasource_id=None, execute=True)
+        turn = chat._Turn(body, None, "conv-a", queue)
+        turn.datasource = DATASOURCE
+        asyncio.run(turn._stream_rows(sql))
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        return events
+
+    def test_rewrite_is_reported_on_the_sql_event(self):
+        chat.prepare_query = _prepared(REWRITE["sql"], REWRITE)
+        events = self.events("SELECT region, count(*) FROM events GROUP BY region LIMIT 1000")
+        name, data = events[0]
+        self.assertEqual(name, "sql")
+        self.assertEqual(data["sql"], REWRITE["sql"])
+        self.assertEqual(data["cost_gate"]["decision"], "rewrite")
+        self.assertEqual(data["cost_gate"]["rewrites"], ["sampled 10% of events"])
+        self.assertIn("rewritten", data["cost_gate"]["feedback"])
+        self.assertEqual([name for name, _ in events[1:]], ["columns", "rows", "rows_done"])
+
+    def test_allowed_query_sends_no_extra_sql_event(self):
+        sql = "SELECT region FROM events LIMIT 10"
+        chat.prepare_query = _prepared(sql, {**REWRITE, "decision": "allow", "sql": sql, "rewrites": [], "feedback": ""})
+        self.assertEqual([name for name, _ in self.events(sql)], ["columns", "rows", "rows_done"])
+
+
+class CheckSqlToolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = execution_tool.prepare_query, execution_tool.resolve_datasource
+        execution_tool.resolve_datasource = lambda tool_context: DATASOURCE
+
+    def tearDown(self):
+        execution_tool.prepare_query, execution_tool.resolve_datasource = self.saved
+
+    def test_gate_decision_reaches_the_agent(self):
+        execution_tool.prepare_query = _prepared(REWRITE["sql"], REWRITE)
+        result = json.loads(asyncio.run(execution_tool.check_sql_tool("SELECT region, count(*) FROM events GROUP BY region")))
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(result["cost_gate"]["decision"], "rewrite")
+        self.assertEqual(result["cost_gate"]["feedback"], REWRITE["feedback"])
+
+    def test_rejection_is_returned_as_is(self):
+        rejected = {"error": "Query rejected by the cost gate: add a filter", "status": "error", "cost_gate": {**REWRITE, "decision": "reject"}}
+
+        async def prepare_query(sql, datasource):
+            return rejected
+        execution_tool.prepare_query = prepare_query
+        self.assertEqual(json.loads(asyncio.run(execution_tool.check_sql_tool("SELECT * FROM events"))), rejected)
+
+
+class ValidationFeedbackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (
+            execution_tool.resolve_datasource, execution_tool._cached_metadata,
+            execution_tool.SQL_VALIDATION_ENABLED, execution_tool.COST_GATE_ENABLED
+        )
+        execution_tool.resolve_datasource = lambda tool_context: DATASOURCE
+        execution_tool._cached_metadata = lambda datasource: {"tables": [{
+            "schema": "public",
+            "table_name": "events",
+            "columns": [{"name": "id"}, {"name": "region"}],
+            "primary_key": ["id"],
+            "foreign_keys": [],
+            "indexes": []
+        }]}
+        execution_tool.SQL_VALIDATION_ENABLED, execution_tool.COST_GATE_ENABLED = True, False
+
+    def tearDown(self):
+        (
+            execution_tool.resolve_datasource, execution_tool._cached_metadata,
+            execution_tool.SQL_VALIDATION_ENABLED, execution_tool.COST_GATE_ENABLED
+        ) = self.saved
+
+    def test_validation_errors_reach_the_agent(self):
+        result = json.loads(asyncio.run(execution_tool.check_sql_tool("SELECT regoin FROM events")))
+        self.assertEqual(result["status"], "error")
+        self.assertEqual([error["code"] for error in result["errors"]], ["unknown_column"])
+        self.assertIn("region", result["errors"][0]["hint"])
+
+
+if __name__ == "__main__":
+    unittest.main()
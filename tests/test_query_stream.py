@@ -0,0 +1,124 @@
+"""
+Tests for the sandboxed, streaming query execution.
+
+The pooled connection is replaced by a fake that serves rows from a list
+and records the statements it receives, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from kosix_agent.tools import execution_tool
+from kosix_agent.tools.execution_tool import QueryCancelled, QueryStream
+
+
+class _QueryCanceledError(Exception):
+    pass
+
+
+class _Cursor:
+    def __init__(self, conn, named):
+        self.conn = conn
+        self.named = named
+        self.description = [SimpleNamespace(name="n", type_code=23)]
+        self.position = 0
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append((sql, params, self.named))
+
+    def fetchmany(self, size):
+        if self.conn.fail_with is not None:
+            raise self.conn.fail_with
+        rows = self.conn.rows[self.position:self.position + size]
+        self.position += len(rows)
+        return rows
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.fail_with = None
+        self.closed = 0
+        self.cancels = 0
+
+    def cursor(self, name=None):
+        return _Cursor(self, name is not None)
+
+    def cancel(self):
+        self.cancels += 1
+
+
+class QueryStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = execution_tool.pooled_connection, execution_tool.extensions
+        self.conn = _Connection([(i,) for i in range(25)])
+
+        @contextmanager
+        def pooled_connection(dsn, key=None, org_id=None):
+            yield self.conn
+
+        execution_tool.pooled_connection = pooled_connection
+        execution_tool.extensions = SimpleNamespace(QueryCanceledError=_QueryCanceledError)
+
+    def tearDown(self):
+        execution_tool.pooled_connection, execution_tool.extensions = self.saved
+
+    def test_runs_read_only_with_a_capped_timeout(self):
+        stream = QueryStream("postgresql://db", "SELECT n FROM t;", timeout_ms=10 ** 9, batch_size=10)
+        batches = list(stream)
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+        self.assertEqual(stream.columns, ["n"])
+        self.assertFalse(stream.truncated)
+
+        setup, timeout, query = self.conn.statements
+        self.assertEqual(setup, ("SET TRANSACTION READ ONLY", None, False))
+        self.assertEqual(timeout[1], ("30000",))
+        self.assertEqual(query, ("SELECT n FROM t", None, True))
+
+    def test_row_limit_truncates(self):
+        stream = QueryStream("postgresql://db", "SELECT n FROM t", row_limit=12, batch_size=5)
+        self.assertEqual(sum(len(batch) for batch in stream), 12)
+        self.assertTrue(stream.truncated)
+
+        stream = QueryStream("postgresql://db", "SELECT n FROM t", row_limit=10 ** 6)
+        self.assertEqual(stream.row_limit, 1000)
+
+    def test_rejects_more_than_one_statement(self):
+        for sql in ("SELECT 1; DELETE FROM t", "SELECT 1;; SELECT 2", ""):
+            with self.assertRaises(Exception, msg=sql):
+                QueryStream("postgresql://db", sql)
+        self.assertEqual(QueryStream("postgresql://db", "SELECT ';' AS c;").sql, "SELECT ';' AS c")
+
+    def test_statement_timeout_is_reported(self):
+        self.conn.fail_with = _QueryCanceledError("canceling statement due to statement timeout")
+        stream = QueryStream("postgresql://db", "SELECT n FROM t", timeout_ms=500)
+        with self.assertRaisesRegex(Exception, "exceeded the 500ms timeout"):
+            list(stream)
+
+    def test_cancel(self):
+        stream = QueryStream("postgresql://db", "SELECT n FROM t", batch_size=10)
+        batches = iter(stream)
+        next(batches)
+        stream.cancel()
+        self.assertEqual(self.conn.cancels, 1)
+        self.conn.fail_with = _QueryCanceledError("canceling statement due to user request")
+        with self.assertRaises(QueryCancelled):
+            next(batches)
+
+        stream = QueryStream("postgresql://db", "SELECT n FROM t")
+        stream.cancel()
+        with self.assertRaises(QueryCancelled):
+            list(stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for the data-version-aware query result cache.
+
+A fake cursor answers the EXPLAIN and pg_stat_user_tables queries the
+cache issues, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import json
+import unittest
+
+from kosix_agent.utils.columnar import ColumnarBuilder
+from kosix_agent.utils.result_cache import QueryResultCache, normalize_sql
+
+
+SQL = "SELECT region, count(*) FROM sales.orders o JOIN customers c ON c.id = o.customer_id GROUP BY region"
+
+
+class _Catalog:
+    """Plan and statistics counters of a tiny database"""
+
+    def __init__(self):
+        self.plan = [{"Plan": {"Node Type": "Hash Join", "Plans": [
+            {"Node Type": "Seq Scan", "Schema": "sales", "Relation Name": "orders"},
+            {"Node Type": "Seq Scan", "Schema": "public", "Relation Name": "customers"}
+        ]}}]
+        self.writes = {'"sales"."orders"': 10, '"public"."customers"': 3}
+        self.filenodes = {'"sales"."orders"': 16384, '"public"."customers"': 16390}
+
+    def cursor(self):
+        return _Cursor(self)
+
+
+class _Cursor:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.result = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith("EXPLAIN"):
+            self.result = [(json.dumps(self.catalog.plan),)]
+        elif params and isinstance(params[0], list):
+            self.result = [
+                (name, self.catalog.writes[name], self.catalog.filenodes[name])
+                for name in params[0] if name in self.catalog.writes
+            ]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+def _result():
+    builder = ColumnarBuilder(["region", "count"], [25, 20])
+    builder.append_batch([("north", 3), ("south", 5)])
+    return builder.build()
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_formatting_does_not_change_the_key(self):
+        self.assertEqual(
+            normalize_sql("SELECT  Region\n FROM t -- by region\n WHERE name = 'North';"),
+            "select region from t where name = 'North'"
+        )
+        self.assertEqual(normalize_sql('select "Region" /* quoted */ from t'), 'select "Region" from t')
+
+    def test_multiple_statements_are_not_keyed(self):
+        self.assertIsNone(normalize_sql("SELECT 1; SELECT 2"))
+        self.assertEqual(normalize_sql("SELECT ';'"), "select ';'")
+
+    def test_volatile_queries_are_uncacheable(self):
+        cache = QueryResultCache()
+        self.assertIsNone(cache.key("ds", "SELECT * FROM t ORDER BY random() LIMIT 5", 1000))
+        self.assertIsNotNone(cache.key("ds", "SELECT 'random()' FROM t", 1000))
+        self.assertEqual(cache.stats()["uncacheable"], 1)
+
+
+class ProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = _Catalog()
+        self.cache = QueryResultCache(max_entries=8, max_bytes=1 << 20, ttl_seconds=60)
+        self.key = self.cache.key("ds", SQL, 1000)
+
+    def fill(self):
+        entry, versions = self.cache.probe(self.catalog, self.key, SQL, 1000)
+        self.assertIsNone(entry)
+        self.assertEqual(set(versions), {'"sales"."orders"', '"public"."customers"'})
+        self.cache.put(self.key, _result(), False, versions)
+
+    def test_hit_while_tables_are_unchanged(self):
+        self.fill()
+        entry, _ = self.cache.probe(self.catalog, self.key, SQL, 1000)
+        self.assertEqual(entry["result"].row_count, 2)
+
+    def test_write_to_a_referenced_table_invalidates(self):
+        self.fill()
+        self.catalog.writes['"public"."customers"'] += 1
+        entry, versions = self.cache.probe(self.catalog, self.key, SQL, 1000)
+        self.assertIsNone(entry)
+        self.assertEqual(versions['"public"."customers"'], "4:16390")
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_truncate_invalidates(self):
+        self.fill()
+        self.catalog.filenodes['"sales"."orders"'] = 20000
+        entry, _ = self.cache.probe(self.catalog, self.key, SQL, 1000)
+        self.assertIsNone(entry)
+
+    def test_catalog_and_foreign_tables_are_not_cached(self):
+        for node in ({"Node Type": "Seq Scan", "Schema": "pg_catalog", "Relation Name": "pg_class"},
+                     {"Node Type": "Foreign Scan"}):
+            self.catalog.plan = [{"Plan": node}]
+            self.assertEqual(self.cache.probe(self.catalog, self.key, SQL, 1000), (None, None))
+        self.assertEqual(self.cache.stats()["uncacheable"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
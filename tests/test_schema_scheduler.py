@@ -0,0 +1,121 @@
+"""
+Tests for the background schema refresh scheduler.
+
+refresh_metadata_async is replaced by a coroutine that sleeps for a
+per-source delay (or fails) and records how many refreshes overlap, so no
+database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import asyncio
+import time
+import unittest
+
+from kosix_agent.tools import schema_scheduler
+from kosix_agent.tools.schema_scheduler import IntrospectionScheduler
+
+
+def _sources(count, organization="org-a"):
+    return [{"id": f"ds-{i}", "organization_id": organization, "connection_uri": f"postgresql://db/{i}"}
+            for i in range(count)]
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.delays = {}
+        self.failures = set()
+        self.started = []
+        self.in_flight = 0
+        self.peak = 0
+        self.saved = schema_scheduler.refresh_metadata_async
+
+        async def refresh_metadata_async(dsn, cache_key=None, datasource_id=None):
+            self.started.append(datasource_id)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            try:
+                await asyncio.sleep(self.delays.get(datasource_id, 0.01))
+                if datasource_id in self.failures:
+                    raise ConnectionError("connection refused")
+                return {"mode": "cached", "metadata": {"tables": [{}, {}]}}
+            finally:
+                self.in_flight -= 1
+
+        schema_scheduler.refresh_metadata_async = refresh_metadata_async
+
+    def tearDown(self):
+        schema_scheduler.refresh_metadata_async = self.saved
+
+    def test_refreshes_run_concurrently_within_the_bound(self):
+        scheduler = IntrospectionScheduler(concurrency=4, timeout=5)
+        self.delays = {f"ds-{i}": 0.05 for i in range(8)}
+        started = time.perf_counter()
+        results = asyncio.run(scheduler.refresh_many(_sources(8)))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([r["status"] for r in results], ["ok"] * 8)
+        self.assertEqual(results[0]["tables"], 2)
+        self.assertEqual(self.peak, 4)
+        # Two waves of four, not eight refreshes one after another
+        self.assertLess(elapsed, 0.3)
+
+    def test_slow_and_failing_sources_do_not_hold_up_the_others(self):
+        scheduler = IntrospectionScheduler(concurrency=4, timeout=0.1)
+        self.delays = {"ds-0": 5}
+        self.failures = {"ds-1"}
+        started = time.perf_counter()
+        with self.assertLogs(schema_scheduler.logger, "WARNING") as logs:
+            results = {r["id"]: r for r in asyncio.run(scheduler.refresh_many(_sources(4)))}
+        self.assertEqual(len(logs.output), 2)
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(results["ds-0"]["status"], "timeout")
+        self.assertEqual((results["ds-1"]["status"], results["ds-1"]["error"]), ("error", "connection refused"))
+        self.assertEqual(results["ds-2"]["status"], "ok")
+        self.assertEqual(scheduler.counts, {"ok": 2, "timeout": 1, "error": 1})
+        self.assertEqual(scheduler.stats()["failing"], 2)
+
+    def test_active_sources_go_first(self):
+        scheduler = IntrospectionScheduler(concurrency=1)
+        scheduler.touch("ds-2")
+        asyncio.run(scheduler.refresh_many(_sources(3)))
+        self.assertEqual(self.started[0], "ds-2")
+
+    def test_intervals_and_backoff(self):
+        scheduler = IntrospectionScheduler(interval=60, idle_interval=600, jitter=0, retry=5)
+        self.failures = {"ds-1"}
+        with self.assertLogs(schema_scheduler.logger, "WARNING"):
+            asyncio.run(scheduler.refresh_many(_sources(2)))
+        scheduler.touch("ds-0")
+        active, failing = scheduler._sources["ds-0"], scheduler._sources["ds-1"]
+
+        self.assertAlmostEqual(scheduler._due(active) - active.last_run, 60)
+        self.assertAlmostEqual(scheduler._due(failing) - failing.last_run, 5)
+        with self.assertLogs(schema_scheduler.logger, "WARNING"):
+            asyncio.run(scheduler.refresh(failing))
+        self.assertAlmostEqual(scheduler._due(failing) - failing.last_run, 10)
+        self.failures = set()
+        asyncio.run(scheduler.refresh(failing))
+        self.assertAlmostEqual(scheduler._due(failing) - failing.last_run, 600)
+
+    def test_reload_keeps_state_and_drops_removed_sources(self):
+        scheduler = IntrospectionScheduler()
+        asyncio.run(scheduler.refresh_many(_sources(3)))
+        moved = _sources(2)
+        moved[1]["connection_uri"] = "postgresql://elsewhere/1"
+        scheduler._merge(moved, prune=True)
+
+        self.assertEqual(sorted(scheduler._sources), ["ds-0", "ds-1"])
+        self.assertIsNotNone(scheduler._sources["ds-0"].last_run)
+        # A source pointed at another database is refreshed again right away
+        self.assertEqual(scheduler._due(scheduler._sources["ds-1"]), 0.0)
+
+    def test_only_postgres_sources_are_loaded(self):
+        self.assertIn("\"type\" = 'POSTGRES'", schema_scheduler._DATASOURCES_SQL)
+
+
+if __name__ == "__main__":
+    unittest.main()
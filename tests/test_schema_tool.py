@@ -0,0 +1,246 @@
+"""
+Tests for catalog introspection.
+
+A fake catalog answers schema_tool's pg_catalog queries from in-memory
+relations (filtered by schema or by relation oid like the real ones) and
+counts the queries it receives, so no database is needed.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import hashlib
+import unittest
+from contextlib import contextmanager
+
+from kosix_agent.tools import schema_tool
+
+
+def _query_names():
+    names = {
+        schema_tool._DATABASE_INFO_SQL: ("database_info", None),
+        schema_tool._SCHEMAS_SQL: ("schemas", None),
+        schema_tool._RELATION_VERSIONS_SQL: ("relation_versions", None),
+        schema_tool._FINGERPRINT_SQL: ("fingerprint", None),
+    }
+    for name, query in (("tables", schema_tool._TABLES_SQL), ("columns", schema_tool._COLUMNS_SQL),
+                        ("indexes", schema_tool._INDEXES_SQL), ("foreign_keys", schema_tool._FOREIGN_KEYS_SQL)):
+        names[query.format(relation_filter=schema_tool._SCHEMA_FILTER)] = (name, "schema")
+        names[query.format(relation_filter=schema_tool._OID_FILTER)] = (name, "oid")
+    return names
+
+
+_QUERIES = _query_names()
+
+
+class _Catalog:
+    """Relations by oid: name, columns (name, type, typmod, not null), primary key and foreign keys"""
+
+    def __init__(self):
+        self.relations = {}
+        self.executed = []
+
+    def add(self, oid, name, columns, primary_key=(), foreign_keys=()):
+        self.relations[oid] = {
+            "schema": "public", "name": name, "version": 1, "columns": list(columns),
+            "primary_key": list(primary_key), "foreign_keys": list(foreign_keys)
+        }
+
+    def alter(self, oid, **changes):
+        self.relations[oid].update(changes)
+        self.relations[oid]["version"] += 1
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(self)
+
+    def rows(self, name, relations):
+        if name == "relation_versions":
+            return [{"oid": oid, "schema": r["schema"], "table_name": r["name"], "version": str(r["version"])}
+                    for oid, r in relations]
+        if name == "tables":
+            return [{"oid": oid, "schema": r["schema"], "table_name": r["name"], "description": None, "row_count": 10}
+                    for oid, r in relations]
+        if name == "columns":
+            return [
+                {"schema": r["schema"], "table_name": r["name"], "column_name": column, "data_type": data_type,
+                 "udt_name": data_type.split()[0], "typmod": typmod, "not_null": not_null, "description": None}
+                for _, r in relations for column, data_type, typmod, not_null in r["columns"]
+            ]
+        if name == "indexes":
+            return [
+                {"schema": r["schema"], "table_name": r["name"], "index_name": f"{r['name']}_pkey", "is_primary": True,
+                 "is_unique": True, "columns": r["primary_key"], "pk_columns": r["primary_key"]}
+                for _, r in relations if r["primary_key"]
+            ]
+        if name == "foreign_keys":
+            return [
+                {"schema": r["schema"], "table_name": r["name"], "column_name": column, "foreign_schema": "public",
+                 "foreign_table_name": self.relations[target]["name"], "foreign_column_name": target_column,
+                 "constraint_name": constraint}
+                for _, r in relations for constraint, column, target, target_column in r["foreign_keys"]
+            ]
+        if name == "schemas":
+            return [{"schema_name": "public", "description": None}]
+        raise AssertionError(name)
+
+
+class _Cursor:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.result = []
+
+    def execute(self, sql, params=None):
+        name, filter_kind = _QUERIES[sql]
+        self.catalog.executed.append(name)
+        relations = sorted(self.catalog.relations.items())
+        if filter_kind == "oid":
+            relations = [(oid, r) for oid, r in relations if oid in params[0]]
+        elif filter_kind == "schema":
+            relations = [(oid, r) for oid, r in relations if r["schema"] in params[0]]
+
+        if name == "database_info":
+            self.result = [{"name": "shop", "version": "PostgreSQL 16.2 on x86_64", "timezone": "UTC"}]
+        elif name == "fingerprint":
+            state = repr([(oid, r["name"], r["version"]) for oid, r in relations])
+            self.result = [{"fingerprint": hashlib.md5(state.encode()).hexdigest()}]
+        else:
+            self.result = self.catalog.rows(name, relations)
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def _shop(catalog, extra_tables=0):
+    catalog.add(1, "customers", [("id", "integer", -1, True), ("name", "character varying", 84, False)], ["id"])
+    catalog.add(2, "orders", [
+        ("id", "integer", -1, True),
+        ("customer_id", "integer", -1, True),
+        ("total", "numeric", ((10 << 16) | 2) + 4, False),
+    ], ["id"], [("orders_customer_id_fkey", "customer_id", 1, "id")])
+    catalog.add(3, "order_lines", [
+        ("order_id", "integer", -1, True), ("line", "integer", -1, True), ("sku", "text", -1, True)
+    ], ["order_id", "line"], [("order_lines_order_id_fkey", "order_id", 2, "id")])
+    for i in range(extra_tables):
+        catalog.add(100 + i, f"audit_{i:03d}", [("id", "bigint", -1, True)], ["id"])
+
+
+class _CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = _Catalog()
+        self.saved = schema_tool.pooled_connection
+
+        @contextmanager
+        def pooled_connection(dsn, key=None, org_id=None):
+            yield self.catalog
+
+        schema_tool.pooled_connection = pooled_connection
+
+    def tearDown(self):
+        schema_tool.pooled_connection = self.saved
+
+
+class IntrospectionTest(_CatalogTest):
+
+    def test_metadata_shape(self):
+        _shop(self.catalog)
+        metadata = schema_tool.getMetaData("postgresql://shop")
+        tables = {t["table_name"]: t for t in metadata["tables"]}
+        self.assertEqual(metadata["database"]["dialect_version"], "16")
+        self.assertEqual(sorted(tables), ["customers", "order_lines", "orders"])
+
+        columns = {c["name"]: c for c in tables["orders"]["columns"]}
+        self.assertEqual(columns["total"]["data_type"], "DECIMAL(10,2)")
+        self.assertTrue(columns["total"]["nullable"])
+        self.assertFalse(columns["id"]["nullable"])
+        self.assertEqual({c["name"]: c["data_type"] for c in tables["customers"]["columns"]},
+                         {"id": "INTEGER", "name": "VARCHAR(80)"})
+        self.assertEqual(tables["order_lines"]["primary_key"], ["order_id", "line"])
+        self.assertEqual(tables["orders"]["foreign_keys"], [{
+            "column": "customer_id", "references": {"table": "customers", "column": "id"},
+            "constraint": "orders_customer_id_fkey"
+        }])
+        self.assertEqual(
+            sorted((r["from_table"], r["to_table"]) for r in metadata["relationships"]),
+            [("order_lines", "orders"), ("orders", "customers")]
+        )
+
+    def test_query_count_does_not_grow_with_the_schema(self):
+        _shop(self.catalog)
+        schema_tool.getMetaData("postgresql://shop")
+        small = list(self.catalog.executed)
+
+        self.catalog = _Catalog()
+        _shop(self.catalog, extra_tables=200)
+        metadata = schema_tool.getMetaData("postgresql://shop")
+        self.assertEqual(len(metadata["tables"]), 203)
+        self.assertEqual(self.catalog.executed, small)
+        self.assertEqual(small, ["database_info", "schemas", "tables", "columns", "indexes", "foreign_keys"])
+
+
+class RefreshTest(_CatalogTest):
+
+    def setUp(self):
+        super().setUp()
+        _shop(self.catalog)
+        self.key = self.id()
+        schema_tool.schema_cache.invalidate(self.key)
+        self.assertEqual(self.refresh()["mode"], "full")
+
+    def refresh(self):
+        self.catalog.executed = []
+        return schema_tool.refresh_metadata("postgresql://shop", cache_key=self.key)
+
+    def tables(self, result):
+        return {t["table_name"]: t for t in result["metadata"]["tables"]}
+
+    def test_unchanged_catalog_costs_one_query(self):
+        result = self.refresh()
+        self.assertEqual(result["mode"], "cached")
+        self.assertEqual(self.catalog.executed, ["fingerprint"])
+
+    def test_only_altered_tables_are_refetched(self):
+        columns = self.catalog.relations[3]["columns"] + [("qty", "integer", -1, False)]
+        self.catalog.alter(3, columns=columns)
+        result = self.refresh()
+
+        self.assertEqual(result["mode"], "incremental")
+        self.assertEqual(result["diff"]["refetched_tables"], 1)
+        altered, = result["diff"]["altered"]
+        self.assertEqual((altered["table"], altered["columns_added"]), ("public.order_lines", ["qty"]))
+        self.assertIn("qty", [c["name"] for c in self.tables(result)["order_lines"]["columns"]])
+        self.assertEqual(self.catalog.executed, [
+            "fingerprint", "relation_versions", "tables", "columns", "indexes", "foreign_keys", "schemas"
+        ])
+        self.assertEqual(self.refresh()["mode"], "cached")
+
+    def test_rename_refetches_referencing_tables(self):
+        self.catalog.alter(1, name="clients")
+        result = self.refresh()
+
+        self.assertEqual(result["diff"]["refetched_tables"], 2)
+        renamed = next(t for t in result["diff"]["altered"] if t["table"] == "public.clients")
+        self.assertEqual(renamed["renamed_from"], "public.customers")
+        tables = self.tables(result)
+        self.assertNotIn("customers", tables)
+        self.assertEqual(tables["orders"]["foreign_keys"][0]["references"]["table"], "clients")
+        self.assertIn(("orders", "clients"), [(r["from_table"], r["to_table"]) for r in result["metadata"]["relationships"]])
+
+    def test_added_and_dropped_tables(self):
+        del self.catalog.relations[3]
+        self.catalog.add(4, "refunds", [("id", "integer", -1, True)], ["id"])
+        result = self.refresh()
+
+        self.assertEqual(result["diff"]["added"], ["public.refunds"])
+        self.assertEqual(result["diff"]["dropped"], ["public.order_lines"])
+        self.assertEqual(sorted(self.tables(result)), ["customers", "orders", "refunds"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests for the static SQL validator.
+
+Usage:
+    uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from kosix_agent.tools.sql_validator import single_statement, validate_sql
+
+
+METADATA = {
+    "tables": [{
+        "schema": "public",
+        "table_name": "reviews",
+        "columns": [{"name": name} for name in ("id", "comment", "load", "set", "rating", "created_at")],
+        "primary_key": ["id"],
+        "foreign_keys": [],
+        "indexes": []
+    }]
+}
+
+
+class ReadOnlyTest(unittest.TestCase):
+
+    def assertValid(self, sql):
+        result = validate_sql(sql, METADATA)
+        self.assertTrue(result["valid"], result["errors"])
+
+    def assertRejected(self, sql):
+        result = validate_sql(sql, METADATA)
+        self.assertEqual([e["code"] for e in result["errors"]], ["not_read_only"])
+
+    def test_statement_keywords_as_column_names(self):
+        self.assertValid("SELECT comment FROM reviews")
+        self.assertValid("SELECT r.load, set, count(comment) AS n FROM reviews r GROUP BY 1, 2")
+
+    def test_data_modifying_ctes(self):
+        self.assertRejected("WITH gone AS (DELETE FROM reviews RETURNING id) SELECT * FROM gone")
+        self.assertRejected("WITH x AS (SELECT 1) UPDATE reviews SET rating = 1")
+
+    def test_named_windows(self):
+        self.assertValid("SELECT sum(rating) OVER w FROM reviews WINDOW w AS (ORDER BY created_at)")
+        self.assertValid(
+            "SELECT avg(rating) OVER (w ROWS 2 PRECEDING), rank() OVER byid FROM reviews "
+            "WINDOW w AS (ORDER BY created_at), byid AS (PARTITION BY id)"
+        )
+
+
+CAMEL_CASE = {
+    "tables": [
+        {
+            "schema": "public",
+            "table_name": "User",
+            "columns": [{"name": "id"}, {"name": "email"}],
+            "primary_key": ["id"],
+            "foreign_keys": [],
+            "indexes": []
+        },
+        {
+            "schema": "public",
+            "table_name": "Conversation",
+            "columns": [{"name": "id"}, {"name": "userId"}, {"name": "title"}],
+            "primary_key": ["id"],
+            "foreign_keys": [{"column": "userId", "references": {"table": "User", "column": "id"}}],
+            "indexes": []
+        }
+    ]
+}
+
+
+class JoinConditionTest(unittest.TestCase):
+
+    def test_mixed_case_identifiers_are_quoted(self):
+        result = validate_sql('SELECT c.title, u.email FROM "Conversation" c JOIN "User" u LIMIT 10', CAMEL_CASE)
+        self.assertTrue(result["valid"], result["errors"])
+        self.assertEqual(
+            result["sql"],
+            'SELECT c.title, u.email FROM "Conversation" c JOIN "User" u ON c."userId" = u.id LIMIT 10'
+        )
+
+    def test_unaliased_mixed_case_tables(self):
+        result = validate_sql('SELECT title FROM "User" JOIN "Conversation" LIMIT 10', CAMEL_CASE)
+        self.assertIn('ON "Conversation"."userId" = "User".id', result["sql"])
+
+
+class SingleStatementTest(unittest.TestCase):
+
+    def test_trailing_semicolons_are_dropped(self):
+        self.assertEqual(single_statement("SELECT 1;; "), "SELECT 1")
+        self.assertEqual(single_statement("SELECT ';' AS s, \"a;b\" FROM t -- done;"), "SELECT ';' AS s, \"a;b\" FROM t")
+
+    def test_more_than_one_statement(self):
+        for sql in ("SELECT 1; DROP TABLE reviews", "SELECT 1; /* x */ SELECT 2;", ";", "   "):
+            with self.assertRaises(Exception, msg=sql):
+                single_statement(sql)
+
+
+if __name__ == "__main__":
+    unittest.main()